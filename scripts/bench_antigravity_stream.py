@@ -0,0 +1,102 @@
+"""
+Antigravity 流式管线 CPU 基准测试
+
+模拟上游 SSE（思维链 + 正文 + usageMetadata），经过 send_antigravity_request_stream 相同的
+思维链过滤阶段后，分别送入三个转换器，测量每 1000 个上游 chunk 的 CPU 时间（time.process_time）：
+- openai:    convert_antigravity_stream_to_openai
+- gemini:    convert_antigravity_stream_to_gemini
+- anthropic: antigravity_sse_to_anthropic_sse
+
+日志级别固定为 warning，只统计管线本身（含被丢弃日志的参数构造）的开销。
+
+用法:
+    python scripts/bench_antigravity_stream.py [--chunks 5000] [--rounds 5] [--return-thoughts]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from typing import List
+
+os.environ.setdefault("LOG_LEVEL", "warning")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+
+def _upstream_lines(chunks: int) -> List[bytes]:
+    """构造上游 SSE 行：前 1/4 为思维链，其余为正文，每行都带 usageMetadata"""
+    lines: List[bytes] = []
+    for i in range(chunks):
+        if i < chunks // 4:
+            part = {"text": f"thinking step {i} " * 4, "thought": True}
+        else:
+            part = {"text": f"token {i} 你好，世界 " * 3}
+        data = {
+            "response": {
+                "candidates": [{"content": {"role": "model", "parts": [part]}}],
+                "usageMetadata": {"promptTokenCount": 1200, "candidatesTokenCount": i + 1, "totalTokenCount": 1201 + i},
+                "modelVersion": "gemini-2.5-pro",
+            },
+            "traceId": "0123456789abcdef",
+        }
+        lines.append(f"data: {json.dumps(data, ensure_ascii=False)}".encode("utf-8"))
+        lines.append(b"")
+    return lines
+
+
+class _NullCtx:
+    async def __aexit__(self, *args):
+        return None
+
+
+async def _aiter(items):
+    for item in items:
+        yield item
+
+
+def _converters():
+    from src.anthropic_streaming import antigravity_sse_to_anthropic_sse
+    from src.antigravity_router import convert_antigravity_stream_to_gemini, convert_antigravity_stream_to_openai
+
+    return {
+        "openai": lambda lines: convert_antigravity_stream_to_openai(
+            lines, _NullCtx(), None, "gemini-2.5-pro", "chatcmpl-bench", None, None
+        ),
+        "gemini": lambda lines: convert_antigravity_stream_to_gemini(
+            lines, _NullCtx(), None, None, None, model="gemini-2.5-pro"
+        ),
+        "anthropic": lambda lines: antigravity_sse_to_anthropic_sse(
+            lines, model="gemini-2.5-pro", message_id="msg_bench"
+        ),
+    }
+
+
+async def _measure(convert, upstream: List[bytes], return_thoughts: bool) -> float:
+    from src.antigravity_api import _filter_thinking_from_stream
+
+    started = time.process_time()
+    async for _ in convert(_filter_thinking_from_stream(_aiter(upstream), return_thoughts)):
+        pass
+    return time.process_time() - started
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=5000)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--return-thoughts", action="store_true")
+    args = parser.parse_args()
+
+    upstream = _upstream_lines(args.chunks)
+    print(f"chunks={args.chunks} rounds={args.rounds} return_thoughts={args.return_thoughts}")
+    for name, convert in _converters().items():
+        samples = [await _measure(convert, upstream, args.return_thoughts) for _ in range(args.rounds)]
+        per_1000 = [s / args.chunks * 1000 * 1000 for s in samples]
+        print(f"{name:<10} cpu per 1000 chunks: median={statistics.median(per_1000):7.2f}ms min={min(per_1000):7.2f}ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
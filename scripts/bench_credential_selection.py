@@ -0,0 +1,98 @@
+"""
+凭证选择延迟基准测试
+
+在临时目录中创建 SQLite 凭证库，分别写入 10 ~ 2000 个凭证，
+测量 SQLiteManager.get_next_available_credential 的单次选择延迟。
+
+用法:
+    python scripts/bench_credential_selection.py [--iterations 2000]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+SIZES = (10, 100, 500, 1000, 2000)
+
+
+async def _bench_size(size: int, iterations: int) -> dict:
+    import aiosqlite
+
+    from src.storage.sqlite_manager import SQLiteManager
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["CREDENTIALS_DIR"] = tmp
+        manager = SQLiteManager()
+        await manager.initialize()
+
+        async with aiosqlite.connect(manager._db_path) as db:
+            await db.executemany(
+                """
+                INSERT INTO credentials (filename, credential_data, rotation_order,
+                                         success_count, failure_count, total_latency_ms, recent_errors)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                [
+                    (
+                        f"cred_{i}.json",
+                        json.dumps({"access_token": f"token_{i}", "refresh_token": "r", "expiry": "2099-01-01T00:00:00+00:00"}),
+                        i,
+                        i % 50,
+                        i % 7,
+                        (i % 50) * 800.0,
+                        json.dumps([{"code": 429, "time": time.time()}] * (i % 3)),
+                    )
+                    for i in range(size)
+                ],
+            )
+            await db.commit()
+
+        # 首次选择：加载凭证池并计算权重
+        start = time.perf_counter()
+        await manager.get_next_available_credential(model_key="pro")
+        first_ms = (time.perf_counter() - start) * 1000
+
+        samples = []
+        for i in range(iterations):
+            if i % 100 == 0:
+                # 模拟请求结果回写，验证增量健康度更新不会拖慢选择
+                await manager.record_request_result(f"cred_{i % size}.json", success=bool(i % 2), latency_ms=500)
+            start = time.perf_counter()
+            await manager.get_next_available_credential(model_key="pro")
+            samples.append((time.perf_counter() - start) * 1_000_000)
+
+        await manager.close()
+
+    samples.sort()
+    return {
+        "size": size,
+        "first_ms": first_ms,
+        "mean_us": statistics.fmean(samples),
+        "p50_us": samples[len(samples) // 2],
+        "p99_us": samples[int(len(samples) * 0.99) - 1],
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    print(f"{'credentials':>12} {'first pick':>12} {'mean':>10} {'p50':>10} {'p99':>10}")
+    for size in SIZES:
+        r = await _bench_size(size, args.iterations)
+        print(
+            f"{r['size']:>12} {r['first_ms']:>10.1f}ms {r['mean_us']:>8.1f}us "
+            f"{r['p50_us']:>8.1f}us {r['p99_us']:>8.1f}us"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,109 @@
+"""
+curl_cffi 会话复用基准测试
+
+对比三种方式下一次完整请求（获取会话、发送请求、读完响应、归还/关闭会话）的耗时：
+- per-request: 每次请求新建 CurlAsyncSession（tls_impersonate.get_curl_async_session 的用法）
+- pooled:      共享会话注册表（http_client.get_client）
+- recycled:    共享会话注册表，每 --recycle-every 个请求轮换一次会话（HTTP_POOL_CLIENT_MAX_REQUESTS）
+
+另外单独测量新建并关闭一个 AsyncSession（含伪装配置）的开销。
+默认在本地启动一个 keep-alive HTTP/1.1 服务器；也可以用 --url 指向真实的 HTTPS 端点，
+此时 per-request 还包含每次请求的 TCP 与 TLS 握手。
+
+用法:
+    python scripts/bench_curl_sessions.py [--requests 500] [--concurrency 8] [--recycle-every 100] [--url URL]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from typing import Awaitable, Callable, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from bench_http_ttfb import _handle, _report  # noqa: E402
+
+
+async def _run(requests: int, concurrency: int, once: Callable[[], Awaitable[None]]) -> List[float]:
+    samples: List[float] = []
+    counter = iter(range(requests))
+
+    async def worker() -> None:
+        for _ in counter:
+            started = time.perf_counter()
+            await once()
+            samples.append(time.perf_counter() - started)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return samples
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--recycle-every", type=int, default=100)
+    parser.add_argument("--url", default=None)
+    args = parser.parse_args()
+
+    import src.httpx_client as httpx_client
+    from src.tls_impersonate import CURL_CFFI_AVAILABLE, CurlAsyncSession, get_impersonate_target
+
+    if not CURL_CFFI_AVAILABLE:
+        print("curl_cffi 未安装，无法运行该基准测试")
+        return
+
+    async def _no_proxy():
+        return None
+
+    # 基准测试不读取存储中的代理配置
+    httpx_client.get_proxy_config = _no_proxy
+    manager = httpx_client.http_client
+    manager._use_curl_cffi = True
+    target = get_impersonate_target()
+
+    server = None
+    url = args.url
+    if url is None:
+        server = await asyncio.start_server(_handle, "127.0.0.1", 0)
+        url = f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}/ping"
+
+    async def per_request() -> None:
+        session = CurlAsyncSession(impersonate=target, discard_cookies=True)
+        try:
+            response = await session.get(url, timeout=30.0)
+            response.content
+        finally:
+            await session.close()
+
+    async def pooled() -> None:
+        async with manager.get_client(timeout=30.0) as client:
+            response = await client.get(url)
+            response.content
+
+    async def create_only() -> None:
+        session = CurlAsyncSession(impersonate=target, discard_cookies=True)
+        await session.close()
+
+    print(f"impersonate={target} url={url} requests={args.requests} concurrency={args.concurrency}")
+    _report("session-new", await _run(args.requests, 1, create_only))
+    _report("per-request", await _run(args.requests, args.concurrency, per_request))
+    _report("pooled", await _run(args.requests, args.concurrency, pooled))
+    os.environ["HTTP_POOL_CLIENT_MAX_REQUESTS"] = str(args.recycle_every)
+    _report("recycled", await _run(args.requests, args.concurrency, pooled))
+
+    status = manager.get_pool_status()
+    print(
+        f"clients_created={status['clients_created']} recycled={status['recycled']} "
+        f"reuse_ratio={status['reuse_ratio']:.3f}"
+    )
+    await manager.close_all()
+    if server is not None:
+        server.close()
+        await server.wait_closed()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,116 @@
+"""
+HTTP 客户端首字节时间（TTFB）基准测试
+
+对比两种客户端获取方式下流式请求的 TTFB（发出请求到收到响应头）：
+- per-request: 每次请求新建客户端（HTTP_CLIENT_POOLING_ENABLED=false，旧行为）
+- pooled:      共享客户端注册表，复用 keep-alive 连接
+
+默认在本地启动一个 keep-alive HTTP/1.1 服务器；也可以用 --url 指向真实的 HTTPS 端点，
+此时还包含 DNS、TCP 与 TLS 握手的开销。
+
+用法:
+    python scripts/bench_http_ttfb.py [--requests 200] [--concurrency 4] [--backend httpx|curl] [--url URL]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from typing import List
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+_BODY = b'data: {"ok": true}\n\n'
+
+
+async def _handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    try:
+        while True:
+            head = await reader.readuntil(b"\r\n\r\n")
+            length = 0
+            for line in head.split(b"\r\n"):
+                if line.lower().startswith(b"content-length:"):
+                    length = int(line.split(b":", 1)[1])
+            if length:
+                await reader.readexactly(length)
+            writer.write(
+                b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n"
+                + f"Content-Length: {len(_BODY)}\r\n\r\n".encode()
+                + _BODY
+            )
+            await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def _measure(url: str, requests: int, concurrency: int) -> List[float]:
+    from src.httpx_client import create_streaming_client_with_kwargs, safe_close_client
+
+    samples: List[float] = []
+    counter = iter(range(requests))
+
+    async def worker() -> None:
+        for _ in counter:
+            started = time.perf_counter()
+            client = await create_streaming_client_with_kwargs(timeout=30.0)
+            try:
+                async with client.stream("POST", url, json={"n": 1}) as response:
+                    samples.append(time.perf_counter() - started)
+                    async for _ in response.aiter_lines():
+                        pass
+            finally:
+                await safe_close_client(client)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return samples
+
+
+def _report(name: str, samples: List[float]) -> None:
+    ordered = sorted(samples)
+    p50 = ordered[len(ordered) // 2] * 1000
+    p99 = ordered[max(0, int(len(ordered) * 0.99) - 1)] * 1000
+    print(f"{name:<12} n={len(samples):<5} mean={statistics.mean(samples) * 1000:7.2f}ms p50={p50:7.2f}ms p99={p99:7.2f}ms")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--backend", choices=["httpx", "curl"], default="httpx")
+    parser.add_argument("--url", default=None)
+    args = parser.parse_args()
+
+    import src.httpx_client as httpx_client
+
+    async def _no_proxy():
+        return None
+
+    # 基准测试不读取存储中的代理配置
+    httpx_client.get_proxy_config = _no_proxy
+    manager = httpx_client.http_client
+    manager._use_curl_cffi = args.backend == "curl" and httpx_client.CURL_CFFI_AVAILABLE
+
+    server = None
+    url = args.url
+    if url is None:
+        server = await asyncio.start_server(_handle, "127.0.0.1", 0)
+        url = f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}/stream"
+
+    print(f"backend={'curl_cffi' if manager._use_curl_cffi else 'httpx'} url={url}")
+    for name, pooling in (("per-request", "false"), ("pooled", "true")):
+        os.environ["HTTP_CLIENT_POOLING_ENABLED"] = pooling
+        _report(name, await _measure(url, args.requests, args.concurrency))
+
+    print(manager.get_pool_status())
+    await manager.close_all()
+    if server is not None:
+        server.close()
+        await server.wait_closed()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,117 @@
+"""
+限流器基准测试
+
+对比旧的“加锁 + 最小间隔”实现与令牌桶（GCRA）实现：
+- 精度：N 个并发等待者的实际放行时间与理想时间（第 i 个在 max(0, i - burst + 1) / rate 秒放行）的偏差
+- 开销：每次 reserve/try_acquire 的耗时，以及按键分组时的内存（键数量）
+
+用法:
+    python scripts/bench_rate_limiter.py [--waiters 1000] [--rate 1000] [--burst 50] [--keys 1000]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from typing import List, Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+
+class _LegacyIntervalLimiter:
+    """旧实现：加锁串行，每次调用至少间隔 min_interval（不支持突发）"""
+
+    def __init__(self, min_interval: float):
+        self._min_interval = min_interval
+        self._last_call: Optional[float] = None
+        self._lock = asyncio.Lock()
+
+    async def wait(self) -> None:
+        async with self._lock:
+            now = time.monotonic()
+            if self._last_call is not None:
+                elapsed = now - self._last_call
+                if elapsed < self._min_interval:
+                    await asyncio.sleep(self._min_interval - elapsed)
+            self._last_call = time.monotonic()
+
+
+async def _release_times(limiter, waiters: int) -> List[float]:
+    start = time.monotonic()
+    released = [0.0] * waiters
+
+    async def waiter(i: int) -> None:
+        await limiter.wait()
+        released[i] = time.monotonic() - start
+
+    await asyncio.gather(*(waiter(i) for i in range(waiters)))
+    return released
+
+
+def _report(name: str, released: List[float], rate: float, burst: int) -> None:
+    ideal = [max(0, i - burst + 1) / rate for i in range(len(released))]
+    errors_ms = sorted(abs(actual - expected) * 1000 for actual, expected in zip(released, ideal))
+    p99 = errors_ms[int(len(errors_ms) * 0.99) - 1]
+    print(
+        f"{name:<28} total={max(released):7.3f}s ideal={max(ideal):7.3f}s "
+        f"err_mean={statistics.mean(errors_ms):7.2f}ms err_p99={p99:7.2f}ms"
+    )
+
+
+def _bench_overhead(keys: int, ops: int) -> None:
+    from src.rate_limiter import KeyedTokenBucketLimiter, TokenBucketLimiter
+
+    bucket = TokenBucketLimiter(rate=1e9, burst=1000)
+    start = time.perf_counter()
+    for _ in range(ops):
+        bucket.try_acquire()
+    single_ns = (time.perf_counter() - start) / ops * 1e9
+
+    keyed = KeyedTokenBucketLimiter(rate=1e9, burst=1000)
+    names = [f"cred_{i}.json" for i in range(keys)]
+    start = time.perf_counter()
+    for i in range(ops):
+        keyed.reserve(names[i % keys])
+    keyed_ns = (time.perf_counter() - start) / ops * 1e9
+
+    print(f"{'try_acquire':<28} {single_ns:7.0f} ns/op")
+    print(f"{'keyed reserve (' + str(keys) + ' keys)':<28} {keyed_ns:7.0f} ns/op, tracked keys={len(keyed)}")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--waiters", type=int, default=1000)
+    parser.add_argument("--rate", type=float, default=1000.0)
+    parser.add_argument("--burst", type=int, default=50)
+    parser.add_argument("--keys", type=int, default=1000)
+    parser.add_argument("--ops", type=int, default=200000)
+    args = parser.parse_args()
+
+    from src.rate_limiter import TokenBucketLimiter
+
+    print(f"waiters={args.waiters} rate={args.rate:.0f}/s")
+    _report(
+        "legacy interval (burst=1)",
+        await _release_times(_LegacyIntervalLimiter(1.0 / args.rate), args.waiters),
+        args.rate,
+        1,
+    )
+    _report(
+        "token bucket (burst=1)",
+        await _release_times(TokenBucketLimiter(args.rate, burst=1), args.waiters),
+        args.rate,
+        1,
+    )
+    _report(
+        f"token bucket (burst={args.burst})",
+        await _release_times(TokenBucketLimiter(args.rate, burst=args.burst), args.waiters),
+        args.rate,
+        args.burst,
+    )
+    _bench_overhead(args.keys, args.ops)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
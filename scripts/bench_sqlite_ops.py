@@ -0,0 +1,110 @@
+"""
+SQLiteManager 吞吐量基准测试
+
+对比两种连接方式下常用存储操作的 ops/sec：
+- per-call: 每次调用新建 aiosqlite 连接（旧实现）
+- pooled:   持久化连接池（1 写 + N 读）
+
+用法:
+    python scripts/bench_sqlite_ops.py [--credentials 200] [--ops 2000] [--concurrency 8]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from contextlib import asynccontextmanager
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+
+class _PerCallConnectionPool:
+    """与 SQLiteConnectionPool 接口相同，但每次借出都新建连接（复现旧行为）"""
+
+    def __init__(self, db_path: str):
+        self._db_path = db_path
+
+    async def close(self) -> None:
+        pass
+
+    @asynccontextmanager
+    async def _connect(self):
+        import aiosqlite
+
+        async with aiosqlite.connect(self._db_path) as db:
+            yield db
+
+    reader = _connect
+    writer = _connect
+
+
+def _operations(manager, size: int):
+    """返回 (名称, 协程工厂) 列表，工厂参数为操作序号"""
+    return [
+        ("get_credential", lambda i: manager.get_credential(f"cred_{i % size}.json")),
+        ("get_credential_state", lambda i: manager.get_credential_state(f"cred_{i % size}.json")),
+        (
+            "update_credential_state",
+            lambda i: manager.update_credential_state(f"cred_{i % size}.json", {"last_success": time.time()}),
+        ),
+        (
+            "set_model_cooldown",
+            lambda i: manager.set_model_cooldown(f"cred_{i % size}.json", "pro", time.time() + 60),
+        ),
+        ("record_request_result", lambda i: manager.record_request_result(f"cred_{i % size}.json", True, 100)),
+    ]
+
+
+async def _run_op(factory, ops: int, concurrency: int) -> float:
+    counter = iter(range(ops))
+
+    async def worker():
+        for i in counter:
+            await factory(i)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return ops / (time.perf_counter() - start)
+
+
+async def _bench(mode: str, size: int, ops: int, concurrency: int) -> dict:
+    from src.storage.sqlite_manager import SQLiteManager
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["CREDENTIALS_DIR"] = tmp
+        manager = SQLiteManager()
+        await manager.initialize()
+        for i in range(size):
+            await manager.store_credential(f"cred_{i}.json", {"access_token": f"token_{i}", "refresh_token": "r"})
+
+        if mode == "per-call":
+            await manager._conn_pool.close()
+            manager._conn_pool = _PerCallConnectionPool(manager._db_path)
+
+        results = {}
+        for name, factory in _operations(manager, size):
+            results[name] = await _run_op(factory, ops, concurrency)
+
+        await manager.close()
+    return results
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--credentials", type=int, default=200)
+    parser.add_argument("--ops", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    before = await _bench("per-call", args.credentials, args.ops, args.concurrency)
+    after = await _bench("pooled", args.credentials, args.ops, args.concurrency)
+
+    print(f"{'operation':<26} {'per-call':>12} {'pooled':>12} {'speedup':>9}")
+    for name in before:
+        print(f"{name:<26} {before[name]:>8.0f} op/s {after[name]:>8.0f} op/s {after[name] / before[name]:>8.1f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,77 @@
+"""
+OpenAI 流式 chunk 构建微基准测试
+
+对比每个文本增量 chunk 的构建耗时：
+- dict+json:   每个 chunk 构造嵌套字典后 json.dumps（原先的写法）
+- dict+codec:  每个 chunk 构造嵌套字典后 json_codec.dumps（当前后端见输出）
+- builder:     SSEChunkBuilder.build_content_chunk（预渲染前缀，只转义 delta 文本）
+
+用法:
+    python scripts/bench_sse_chunks.py [--chunks 100000] [--rounds 5] [--text-size 24]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from typing import Callable, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+
+def _texts(chunks: int, size: int) -> List[str]:
+    base = "token 你好，世界 \"quoted\"\n"
+    return [(f"{i} " + base * (size // len(base) + 1))[:size] for i in range(chunks)]
+
+
+def _measure(build: Callable[[str], str], texts: List[str]) -> float:
+    started = time.perf_counter()
+    for text in texts:
+        build(text)
+    return time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=100000)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--text-size", type=int, default=24)
+    args = parser.parse_args()
+
+    from src import json_codec
+    from src.stream_error_handler import SSEChunkBuilder
+
+    request_id, model, created = "chatcmpl-bench", "gemini-2.5-pro", int(time.time())
+    builder = SSEChunkBuilder(request_id, model, created)
+
+    def chunk_dict(text: str) -> dict:
+        return {
+            "id": request_id,
+            "object": "chat.completion.chunk",
+            "created": created,
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "delta": {"content": text},
+                "finish_reason": None
+            }]
+        }
+
+    candidates = {
+        "dict+json": lambda text: f"data: {json.dumps(chunk_dict(text))}\n\n",
+        "dict+codec": lambda text: f"data: {json_codec.dumps(chunk_dict(text))}\n\n",
+        "builder": builder.build_content_chunk,
+    }
+
+    texts = _texts(args.chunks, args.text_size)
+    print(f"chunks={args.chunks} rounds={args.rounds} text_size={args.text_size} codec={json_codec.backend}")
+    for name, build in candidates.items():
+        samples = [_measure(build, texts) for _ in range(args.rounds)]
+        per_chunk = [s / args.chunks * 1e6 for s in samples]
+        print(f"{name:<11} per chunk: median={statistics.median(per_chunk):6.3f}us min={min(per_chunk):6.3f}us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+流式文本合并模拟测试
+
+模拟上游按固定间隔（带抖动）逐 token 吐出文本，对比不同合并窗口下：
+- 发出的 SSE 帧数与总字节数（每帧对应一次 send 系统调用）
+- 每个 token 从到达合并阶段到随所在帧发出的额外延迟（平均 / p99 / 最大）
+
+用法:
+    python scripts/bench_stream_coalescing.py [--tokens 2000] [--interval-ms 2] [--windows 0,10,15,20]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+
+async def _run(tokens: int, interval: float, window_ms: float, seed: int):
+    from src.stream_coalescing import CoalescePolicy, TextDelta, coalesce_stream
+    from src.stream_error_handler import SSEChunkBuilder
+
+    builder = SSEChunkBuilder("chatcmpl-bench", "gemini-2.5-pro")
+    policy = CoalescePolicy(window_ms=window_ms)
+    rng = random.Random(seed)
+    arrivals = []
+
+    async def upstream():
+        for i in range(tokens):
+            await asyncio.sleep(interval * rng.uniform(0.2, 1.8))
+            arrivals.append(time.perf_counter())
+            text = f"tok{i} "
+            # 与转换器一致：未启用合并时直接产出渲染好的帧
+            yield TextDelta(text, builder.build_content_chunk) if policy.enabled else builder.build_content_chunk(text)
+        yield builder.build_finish_chunk("stop")
+
+    frames = 0
+    size = 0
+    emitted = 0
+    delays = []
+    async for frame in coalesce_stream(upstream(), policy):
+        now = time.perf_counter()
+        frames += 1
+        size += len(frame)
+        # 本帧携带的 token = 已到达但尚未发出的全部 token
+        for arrived in arrivals[emitted:]:
+            delays.append((now - arrived) * 1000)
+        emitted = len(arrivals)
+    delays.sort()
+    return frames, size, delays
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tokens", type=int, default=2000)
+    parser.add_argument("--interval-ms", type=float, default=2.0)
+    parser.add_argument("--windows", default="0,10,15,20")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    print(f"tokens={args.tokens} interval={args.interval_ms}ms")
+    for window_ms in (float(w) for w in args.windows.split(",")):
+        frames, size, delays = asyncio.run(_run(args.tokens, args.interval_ms / 1000, window_ms, args.seed))
+        p99 = delays[int(len(delays) * 0.99) - 1]
+        print(f"window={window_ms:5.1f}ms frames={frames:6d} bytes={size:8d} "
+              f"delay avg={statistics.mean(delays):6.2f}ms p99={p99:6.2f}ms max={delays[-1]:6.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
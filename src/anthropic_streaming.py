@@ -1,19 +1,22 @@
 from __future__ import annotations
 
-import json
+import asyncio
 import os
 import uuid
 from typing import Any, AsyncIterator, Dict, Optional, List, Union
 
 from log import log
+from . import json_codec
+from .antigravity_events import AntigravityEvent, iter_antigravity_events
 from .signature_cache import cache_signature, cache_tool_signature, get_last_signature
 from .openai_transfer import generate_tool_call_id
 from .ssop import SSOPScanner
+from .stream_cancellation import record_partial_usage
 from .converters.thoughtSignature_fix import encode_tool_id_with_signature
 
 
 def _sse_event(event: str, data: Dict[str, Any]) -> bytes:
-    payload = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+    payload = json_codec.dumps(data)
     return f"event: {event}\ndata: {payload}\n\n".encode("utf-8")
 
 _DEBUG_TRUE = {"1", "true", "yes", "on"}
@@ -208,7 +211,7 @@ class _StreamingState:
 
 
 async def antigravity_sse_to_anthropic_sse(
-    lines: AsyncIterator[Union[str, bytes]],
+    lines: AsyncIterator[Union[str, bytes, AntigravityEvent]],
     *,
     model: str,
     message_id: str,
@@ -218,6 +221,8 @@ async def antigravity_sse_to_anthropic_sse(
 ) -> AsyncIterator[bytes]:
     """
     将 Antigravity SSE（data: {...}）转换为 Anthropic Messages Streaming SSE。
+
+    lines 可以是 _filter_thinking_from_stream 输出的 AntigravityEvent（已解析），也可以是原始 SSE 行。
     """
     state = _StreamingState(message_id=message_id, model=model)
     success_recorded = False
@@ -286,19 +291,12 @@ async def antigravity_sse_to_anthropic_sse(
         flush_pending_ready(ready)
 
     try:
-        async for line in lines:
+        async for event in iter_antigravity_events(lines):
             ready_output: list[bytes] = []
-            
-            # ✅ [FIX 2026-01-22] 修复类型错误：处理 bytes 和 str 两种类型
-            # response.aiter_lines() 可能返回 bytes 或 str，需要统一处理
-            if isinstance(line, bytes):
-                line = line.decode("utf-8", errors="ignore")
-            
-            if not line or not line.startswith("data: "):
-                continue
 
-            raw = line[6:].strip()
-            if raw == "[DONE]":
+            if not event.is_data:
+                continue
+            if event.is_done:
                 break
 
             if not success_recorded and credential_manager and credential_name:
@@ -307,14 +305,13 @@ async def antigravity_sse_to_anthropic_sse(
                 )
                 success_recorded = True
 
-            try:
-                data = json.loads(raw)
-            except Exception:
+            # SSE 数据已在过滤阶段解析
+            if event.data is None:
                 continue
 
-            response = data.get("response", {}) or {}
-            candidate = (response.get("candidates", []) or [{}])[0] or {}
-            parts = (candidate.get("content", {}) or {}).get("parts", []) or []
+            response = event.response
+            candidate = event.candidate
+            parts = event.parts
 
             # 在任意 chunk 中尽早捕获 usageMetadata（优先选择字段更完整的一侧）
             if isinstance(response, dict) and isinstance(candidate, dict):
@@ -574,7 +571,7 @@ async def antigravity_sse_to_anthropic_sse(
                         },
                     )
 
-                    input_json = json.dumps(tool_args, ensure_ascii=False, separators=(",", ":"))
+                    input_json = json_codec.dumps(tool_args)
                     evt_delta = _sse_event(
                         "content_block_delta",
                         {
@@ -644,6 +641,18 @@ async def antigravity_sse_to_anthropic_sse(
         )
         yield _sse_event("message_stop", {"type": "message_stop"})
 
+    except (asyncio.CancelledError, GeneratorExit):
+        # 客户端断开：记录已消耗的部分用量，由调用方关闭上游
+        record_partial_usage(
+            "ANTHROPIC",
+            model=model,
+            credential_manager=credential_manager,
+            credential_name=credential_name,
+            input_tokens=state.input_tokens if state.has_input_tokens else initial_input_tokens_int,
+            output_tokens=state.output_tokens,
+        )
+        raise
+
     except Exception as e:
         log.error(f"[ANTHROPIC] 流式转换失败: {e}")
         # 错误场景也尽量保证客户端先收到 message_start（否则部分客户端会直接挂起）。
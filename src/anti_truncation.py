@@ -3,6 +3,7 @@ Anti-Truncation Module - Ensures complete streaming output
 保持一个流式请求内完整输出的反截断模块
 """
 
+import asyncio
 import io
 import json
 import re
@@ -11,6 +12,7 @@ from typing import Any, AsyncGenerator, Dict, List, Tuple
 from fastapi.responses import StreamingResponse
 
 from log import log
+from .stream_cancellation import CancellableStreamingResponse, close_stream
 
 # 反截断配置
 DONE_MARKER = "[done]"
@@ -223,6 +225,7 @@ class AntiTruncationStreamProcessor:
             log.debug(f"Anti-truncation attempt {self.current_attempt}/{self.max_attempts}")
 
             # 发送请求
+            response = None
             try:
                 response = await self.original_request_func(current_payload)
 
@@ -333,6 +336,12 @@ class AntiTruncationStreamProcessor:
                     yield b"data: [DONE]\n\n"
                     return
 
+            except (asyncio.CancelledError, GeneratorExit):
+                # 客户端断开：关闭当前轮次的上游流
+                if isinstance(response, StreamingResponse):
+                    await close_stream(response.body_iterator)
+                raise
+
             except Exception as e:
                 log.error(f"Anti-truncation error in attempt {self.current_attempt}: {str(e)}")
                 if self.current_attempt >= self.max_attempts:
@@ -646,7 +655,7 @@ async def apply_anti_truncation_to_stream(
     )
 
     # 返回包装后的流式响应
-    return StreamingResponse(processor.process_stream(), media_type="text/event-stream")
+    return CancellableStreamingResponse(processor.process_stream(), media_type="text/event-stream")
 
 
 def is_anti_truncation_enabled(request_data: Dict[str, Any]) -> bool:
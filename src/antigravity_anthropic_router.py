@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import asyncio
 import json
 import os
 import time
@@ -8,7 +9,7 @@ from typing import Any, Dict, Optional
 import json
 
 from fastapi import APIRouter, Depends, Request
-from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.responses import JSONResponse
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 
 from log import log
@@ -24,7 +25,7 @@ from .token_estimator import estimate_input_tokens
 from .credential_manager import CredentialManager
 # ✅ [FIX 2026-01-22] 导入客户端检测函数，用于 IDE 增强重试
 from .tool_cleaner import get_client_info
-from .httpx_client import safe_close_client
+from .stream_cancellation import CancellableStreamingResponse, close_stream, close_upstream
 
 # ====================== 全局凭证管理器 ======================
 credential_manager = None
@@ -785,28 +786,28 @@ async def anthropic_messages(
             return _anthropic_error(status_code=500, message="下游请求失败（已尝试所有降级模型）", error_type="api_error")
 
         async def stream_generator():
+            # response 现在是 filtered_lines 生成器，直接使用
+            events = antigravity_sse_to_anthropic_sse(
+                response,
+                model=str(model),
+                message_id=message_id,
+                initial_input_tokens=estimated_tokens,
+                credential_manager=cred_mgr,
+                credential_name=cred_name,
+            )
+            cancelled = False
             try:
-                # response 现在是 filtered_lines 生成器，直接使用
-                async for chunk in antigravity_sse_to_anthropic_sse(
-                    response,
-                    model=str(model),
-                    message_id=message_id,
-                    initial_input_tokens=estimated_tokens,
-                    credential_manager=cred_mgr,
-                    credential_name=cred_name,
-                ):
+                async for chunk in events:
                     yield chunk
+            except (asyncio.CancelledError, GeneratorExit):
+                cancelled = True
+                # 让转换器记录部分用量
+                await close_stream(events)
+                raise
             finally:
-                try:
-                    await stream_ctx.__aexit__(None, None, None)
-                except Exception as e:
-                    log.debug(f"[ANTHROPIC] 关闭 stream_ctx 失败: {e}")
-                try:
-                    await safe_close_client(client)
-                except Exception as e:
-                    log.debug(f"[ANTHROPIC] 关闭 client 失败: {e}")
-
-        return StreamingResponse(
+                await close_upstream(stream_ctx, client, cancelled=cancelled, tag="ANTHROPIC")
+
+        return CancellableStreamingResponse(
             stream_generator(),
             media_type="text/event-stream",
             headers={
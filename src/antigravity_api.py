@@ -7,6 +7,7 @@ import asyncio
 import json
 import os
 import random
+import statistics
 import time
 from datetime import datetime, timezone
 from typing import Any, Dict, List, Optional, Tuple
@@ -23,7 +24,10 @@ from config import (
     get_retry_429_max_retries,
 )
 from log import log
+from . import json_codec
+from .antigravity_events import AntigravityEvent
 from .fallback_manager import get_cross_pool_fallback, get_model_pool, is_quota_exhausted_error
+from .latency_tracker import LatencyTracker
 
 
 class NonRetryableError(Exception):
@@ -70,42 +74,69 @@ class BaseURLHealthManager:
     BaseURL 健康状态管理器
     - 记录每个 URL 的成功/失败次数
     - 记录最后成功时间
-    - 提供智能排序，优先使用健康的 URL
+    - 记录每个 URL 的首字节时间与总耗时（EWMA + 分位数）以及错误率
+    - 按期望延迟（平均延迟 / (1 - 错误率)）排序，同时避开慢的与经常失败的 URL
+
+    记录方法不含 await，在事件循环中天然原子，不需要加锁。
     """
 
+    # 计算首字节时间分位数所需的最少样本数
+    TTFB_MIN_SAMPLES = 5
+
     def __init__(self):
         # {url: {"success_count": int, "failure_count": int, "last_success": float, "last_failure": float}}
         self._health_data: Dict[str, Dict[str, Any]] = {}
-        self._lock = asyncio.Lock()
+        self._latency: Dict[str, LatencyTracker] = {}
+
+    def _data(self, url: str) -> Dict[str, Any]:
+        data = self._health_data.get(url)
+        if data is None:
+            data = self._health_data[url] = {
+                "success_count": 0,
+                "failure_count": 0,
+                "last_success": 0,
+                "last_failure": 0,
+                "total_latency_ms": 0,
+            }
+        return data
+
+    def _tracker(self, url: str) -> LatencyTracker:
+        tracker = self._latency.get(url)
+        if tracker is None:
+            tracker = self._latency[url] = LatencyTracker()
+        return tracker
+
+    def record_ttfb(self, url: str, seconds: float) -> None:
+        """记录流式请求的首字节时间（发出请求到收到首个 SSE 行）"""
+        self._tracker(url).record_ttfb(seconds)
+
+    def record_duration(self, url: str, seconds: float) -> None:
+        """记录请求总耗时（发出请求到响应读取完毕）"""
+        self._tracker(url).record_total(seconds)
+        self._data(url)["total_latency_ms"] += seconds * 1000
+
+    def get_ttfb_percentile(self, url: str, percentile: float) -> Optional[float]:
+        """最近样本的首字节时间分位数（秒），样本不足时返回 None"""
+        tracker = self._latency.get(url)
+        if tracker is None or tracker.ttfb.count < self.TTFB_MIN_SAMPLES:
+            return None
+        return tracker.ttfb.quantile(percentile / 100.0)
 
     async def record_success(self, url: str, latency_ms: float = 0) -> None:
         """记录成功请求"""
-        async with self._lock:
-            if url not in self._health_data:
-                self._health_data[url] = {
-                    "success_count": 0,
-                    "failure_count": 0,
-                    "last_success": 0,
-                    "last_failure": 0,
-                    "total_latency_ms": 0,
-                }
-            self._health_data[url]["success_count"] += 1
-            self._health_data[url]["last_success"] = time.time()
-            self._health_data[url]["total_latency_ms"] += latency_ms
+        data = self._data(url)
+        data["success_count"] += 1
+        data["last_success"] = time.time()
+        self._tracker(url).record_outcome(True)
+        if latency_ms:
+            self.record_duration(url, latency_ms / 1000)
 
     async def record_failure(self, url: str, error_code: int = 0) -> None:
         """记录失败请求"""
-        async with self._lock:
-            if url not in self._health_data:
-                self._health_data[url] = {
-                    "success_count": 0,
-                    "failure_count": 0,
-                    "last_success": 0,
-                    "last_failure": 0,
-                    "total_latency_ms": 0,
-                }
-            self._health_data[url]["failure_count"] += 1
-            self._health_data[url]["last_failure"] = time.time()
+        data = self._data(url)
+        data["failure_count"] += 1
+        data["last_failure"] = time.time()
+        self._tracker(url).record_outcome(False)
 
     def get_health_score(self, url: str) -> float:
         """
@@ -142,32 +173,70 @@ class BaseURLHealthManager:
 
         return min(100, max(0, health_score))
 
+    def get_expected_latency(self, url: str, default: Optional[float] = None) -> Optional[float]:
+        """
+        URL 的期望延迟（秒）= 平均延迟 / (1 - 错误率)
+
+        Args:
+            default: 该 URL 还没有延迟样本时使用的平均延迟
+        """
+        tracker = self._latency.get(url)
+        if tracker is None:
+            return default
+        return tracker.expected_latency(default)
+
     def get_sorted_urls(self, urls: List[str]) -> List[str]:
         """
-        按健康度排序 URL 列表
-        健康度高的排在前面
+        按期望延迟排序 URL 列表，期望延迟低的排在前面
+
+        还没有延迟样本的 URL 按已知 URL 平均延迟的中位数估计（再计入它自己的错误率）；
+        所有 URL 都没有延迟样本时按健康度排序。期望延迟相同时保持原有顺序。
         """
         if not urls:
             return urls
 
-        # 计算每个 URL 的健康度
-        url_scores = [(url, self.get_health_score(url)) for url in urls]
-
-        # 按健康度降序排序
-        url_scores.sort(key=lambda x: x[1], reverse=True)
-
-        sorted_urls = [url for url, _ in url_scores]
+        known = [
+            latency for latency in (
+                self._latency[url].base_latency() for url in urls if url in self._latency
+            ) if latency is not None
+        ]
+        if known:
+            default = statistics.median(known)
+            scores = {url: self.get_expected_latency(url, default) for url in urls}
+            sorted_urls = sorted(urls, key=lambda url: scores[url])
+            label = lambda url: f"{scores[url] * 1000:.0f}ms"
+        else:
+            scores = {url: self.get_health_score(url) for url in urls}
+            sorted_urls = sorted(urls, key=lambda url: scores[url], reverse=True)
+            label = lambda url: f"{scores[url]:.0f}"
 
         # 日志输出排序结果
         if len(urls) > 1:
             log.debug(
                 f"[BaseURL Health] Sorted URLs: "
-                + ", ".join([f"{url.split('//')[-1].split('/')[0]}({self.get_health_score(url):.0f})" for url in sorted_urls[:3]])
+                + ", ".join([f"{url.split('//')[-1].split('/')[0]}({label(url)})" for url in sorted_urls[:3]])
                 + ("..." if len(sorted_urls) > 3 else "")
             )
 
         return sorted_urls
 
+    def get_stats(self, urls: Optional[List[str]] = None) -> Dict[str, Any]:
+        """各 URL 的健康度、延迟与错误率统计（用于管理 API）"""
+        urls = list(urls) if urls is not None else list(dict.fromkeys([*self._health_data, *self._latency]))
+        stats: Dict[str, Any] = {}
+        for url in urls:
+            data = self._health_data.get(url, {})
+            tracker = self._latency.get(url)
+            stats[url] = {
+                "health_score": round(self.get_health_score(url), 1),
+                "success_count": data.get("success_count", 0),
+                "failure_count": data.get("failure_count", 0),
+                "last_success": data.get("last_success", 0),
+                "last_failure": data.get("last_failure", 0),
+                "latency": tracker.to_dict() if tracker is not None else None,
+            }
+        return {"urls": stats, "order": self.get_sorted_urls(urls)}
+
 
 # 全局 BaseURL 健康管理器实例
 _baseurl_health_manager = BaseURLHealthManager()
@@ -254,48 +323,86 @@ async def _resolve_429_cooldown_until(
 
 
 # [FIX 2026-01-21] 使用新的 RateLimiter 模块
-from .rate_limiter import get_global_rate_limiter
+# 令牌桶限流：rate 由最小间隔换算，burst 允许短时突发，等待者按各自的截止时间放行
+from .rate_limiter import KeyedTokenBucketLimiter, TokenBucketLimiter
+
+_credential_rate_limiter: KeyedTokenBucketLimiter | None = None
+_global_rate_limiter: TokenBucketLimiter | None = None
+
+
+def _get_env_seconds(env_name: str, default: float) -> float:
+    try:
+        return float(os.getenv(env_name, str(default)))
+    except Exception:
+        return default
+
+
+def _get_env_burst(env_name: str, default: int = 1) -> int:
+    try:
+        return max(1, int(os.getenv(env_name, str(default))))
+    except Exception:
+        return default
+
+
+def _get_antigravity_rate_limiters() -> Tuple[KeyedTokenBucketLimiter, TokenBucketLimiter]:
+    global _credential_rate_limiter, _global_rate_limiter
+
+    if _global_rate_limiter is None:
+        _global_rate_limiter = TokenBucketLimiter.from_interval(
+            _get_env_seconds("ANTIGRAVITY_GLOBAL_MIN_REQUEST_INTERVAL_SECONDS", 0.0),
+            burst=_get_env_burst("ANTIGRAVITY_GLOBAL_REQUEST_BURST", 1),
+        )
+    if _credential_rate_limiter is None:
+        _credential_rate_limiter = KeyedTokenBucketLimiter.from_interval(
+            _get_env_seconds("ANTIGRAVITY_MIN_REQUEST_INTERVAL_SECONDS", 0.5),
+            burst=_get_env_burst("ANTIGRAVITY_REQUEST_BURST", 1),
+        )
 
-async def _throttle_antigravity_upstream() -> None:
+    return _credential_rate_limiter, _global_rate_limiter
+
+
+async def _throttle_antigravity_upstream(credential_name: str | None = None) -> None:
     """
     对上游请求进行防抖限流
+
+    - 按凭证独立限流（ANTIGRAVITY_MIN_REQUEST_INTERVAL_SECONDS 平均间隔，
+      ANTIGRAVITY_REQUEST_BURST 突发数），不同账号之间互不等待，吞吐随账号池线性增长
+    - 未指定凭证的请求（如模型列表查询）共用一个匿名桶
+    - ANTIGRAVITY_GLOBAL_MIN_REQUEST_INTERVAL_SECONDS（默认 0，不限制）/ ANTIGRAVITY_GLOBAL_REQUEST_BURST
+      可额外设置全局速率上限
     """
-    try:
-        min_interval = float(os.getenv("ANTIGRAVITY_MIN_REQUEST_INTERVAL_SECONDS", "0.5"))
-    except Exception:
-        min_interval = 0.5
+    credential_limiter, global_limiter = _get_antigravity_rate_limiters()
+    await credential_limiter.wait(credential_name or "")
+    if not global_limiter.unlimited:
+        await global_limiter.wait()
+
 
-    # 转换为毫秒
-    min_interval_ms = int(min_interval * 1000)
-    limiter = get_global_rate_limiter(min_interval_ms=min_interval_ms)
-    await limiter.wait()
+def _try_throttle_antigravity_upstream(credential_name: str | None = None) -> bool:
+    """不等待的限流检查：当前有令牌时占用并返回 True（用于对冲请求）"""
+    credential_limiter, global_limiter = _get_antigravity_rate_limiters()
+    if not global_limiter.unlimited and not global_limiter.try_acquire():
+        return False
+    return credential_limiter.try_acquire(credential_name or "")
 
 
 # [FIX 2026-01-22] Quota 查询专用限流器 - 防止短时间内大量查询导致 429
-# [FIX 2026-01-22] 使用独立的 RateLimiter 实例，不使用全局限流器（避免和普通 API 请求冲突）
-from .rate_limiter import RateLimiter as QuotaRateLimiter
-_quota_rate_limiter: QuotaRateLimiter | None = None
+# [FIX 2026-01-22] 使用独立的限流器实例，不使用全局限流器（避免和普通 API 请求冲突）
+_quota_rate_limiter: TokenBucketLimiter | None = None
 
 async def _throttle_quota_query() -> None:
     """
     对 quota 查询进行限流（比普通 API 请求更严格）
 
-    默认最小间隔 2 秒，避免短时间内大量查询
+    默认平均间隔 2 秒（ANTIGRAVITY_QUOTA_MIN_INTERVAL_SECONDS），
+    突发数 ANTIGRAVITY_QUOTA_BURST（默认 1），避免短时间内大量查询
     """
     global _quota_rate_limiter
 
-    try:
-        min_interval = float(os.getenv("ANTIGRAVITY_QUOTA_MIN_INTERVAL_SECONDS", "2.0"))
-    except Exception:
-        min_interval = 2.0
-
-    # 转换为毫秒
-    min_interval_ms = int(min_interval * 1000)
-
     if _quota_rate_limiter is None:
-        # [FIX 2026-01-22] 直接创建独立的 RateLimiter 实例，不使用 get_global_rate_limiter
-        # 因为 quota 查询需要独立的限流器，和普通 API 请求分开
-        _quota_rate_limiter = QuotaRateLimiter(min_interval_ms=min_interval_ms)
+        _quota_rate_limiter = TokenBucketLimiter.from_interval(
+            _get_env_seconds("ANTIGRAVITY_QUOTA_MIN_INTERVAL_SECONDS", 2.0),
+            burst=_get_env_burst("ANTIGRAVITY_QUOTA_BURST", 1),
+        )
 
     await _quota_rate_limiter.wait()
 
@@ -450,6 +557,7 @@ async def _record_success(
 from .credential_manager import CredentialManager
 from .httpx_client import create_streaming_client_with_kwargs, http_client, safe_close_client
 from .models import Model, model_to_dict
+from .models_cache import get_models_cache
 from .api.utils import check_should_auto_ban, handle_auto_ban, parse_and_log_cooldown, record_api_call_error
 from .utils import ANTIGRAVITY_USER_AGENT, parse_quota_reset_timestamp
 
@@ -458,38 +566,36 @@ from .retry_utils import parse_retry_delay_seconds
 from .rate_limit_registry import mark_rate_limited, clear_rate_limit, get_rate_limit_registry
 from .antigravity_retry_policies import determine_retry_strategy, get_retry_delay_from_error
 
-_antigravity_concurrency_semaphore: asyncio.Semaphore | None = None
-
-
-def _get_antigravity_max_concurrency() -> int:
-    try:
-        v = int(os.getenv("ANTIGRAVITY_MAX_CONCURRENCY", "2"))
-    except Exception:
-        v = 2
-    return max(1, v)
-
-
-def _get_antigravity_concurrency_semaphore() -> asyncio.Semaphore:
-    global _antigravity_concurrency_semaphore
-    if _antigravity_concurrency_semaphore is None:
-        _antigravity_concurrency_semaphore = asyncio.Semaphore(_get_antigravity_max_concurrency())
-    return _antigravity_concurrency_semaphore
+from .concurrency_permits import get_antigravity_permit_manager
+from .request_hedging import compute_hedge_delay, get_hedge_stats, hedge_percentile, is_hedging_enabled, run_hedged
 
 
 class _AntigravityPermit:
-    def __init__(self) -> None:
-        self._sem = _get_antigravity_concurrency_semaphore()
+    """
+    单次上游请求的并发额度（凭证 -> 模型 -> 全局），release 幂等
+    """
+
+    def __init__(self, credential: str | None = None, model: str | None = None) -> None:
+        self._manager = get_antigravity_permit_manager()
+        self._credential = credential
+        self._model = model
+        self._handle: Any = None
         self._released = False
 
     async def acquire(self) -> None:
-        await self._sem.acquire()
+        self._handle = await self._manager.acquire(self._credential, self._model)
+
+    async def try_acquire(self) -> bool:
+        """不排队地获取额度，额度已满时返回 False"""
+        self._handle = await self._manager.try_acquire(self._credential, self._model)
+        return self._handle is not None
 
     def release(self) -> None:
-        if self._released:
+        if self._released or self._handle is None:
             return
         self._released = True
         try:
-            self._sem.release()
+            self._manager.release(self._handle)
         except Exception:
             pass
 
@@ -499,9 +605,18 @@ class _StreamCtxWrapper:
     将 permit 的释放绑定到 stream_ctx.__aexit__，以便在流式链路结束时释放并发额度。
     """
 
-    def __init__(self, inner: Any, permit: _AntigravityPermit) -> None:
+    def __init__(
+        self,
+        inner: Any,
+        permit: _AntigravityPermit,
+        url: str | None = None,
+        started: float | None = None,
+    ) -> None:
         self._inner = inner
         self._permit = permit
+        # 流正常结束时记录该 BaseURL 的请求总耗时
+        self._url = url
+        self._started = started
 
     async def __aenter__(self) -> Any:
         return await self._inner.__aenter__()
@@ -511,6 +626,8 @@ class _StreamCtxWrapper:
             return await self._inner.__aexit__(exc_type, exc, tb)
         finally:
             self._permit.release()
+            if exc_type is None and self._url and self._started is not None:
+                get_baseurl_health_manager().record_duration(self._url, time.monotonic() - self._started)
 
 
 _quota_cache_lock: asyncio.Lock | None = None
@@ -683,44 +800,146 @@ def build_antigravity_request_body(
 
 
 async def _filter_thinking_from_stream(lines, return_thoughts: bool):
-    """过滤流式响应中的思维链（如果配置禁用）"""
+    """
+    过滤流式响应中的思维链（如果配置禁用）
+
+    每行只在这里解析一次，输出 AntigravityEvent 交给下游转换器；过滤直接修改事件中的 parts，
+    不重新序列化。
+    """
     async for line in lines:
-        # ✅ [FIX 2026-01-22] 修复类型错误：处理 bytes 和 str 两种类型
-        if isinstance(line, bytes):
-            line = line.decode("utf-8", errors="ignore")
-        
-        if not line or not line.startswith("data: "):
-            yield line
-            continue
+        event = AntigravityEvent.parse(line)
 
-        raw = line[6:].strip()
-        if raw == "[DONE]":
-            yield line
-            continue
+        if not return_thoughts and event.data is not None:
+            parts = event.parts
+            # 过滤掉思维链部分
+            filtered_parts = [part for part in parts if not (isinstance(part, dict) and part.get("thought") is True)]
 
-        if not return_thoughts:
-            try:
-                data = json.loads(raw)
-                response = data.get("response", {}) or {}
-                candidate = (response.get("candidates", []) or [{}])[0] or {}
-                parts = (candidate.get("content", {}) or {}).get("parts", []) or []
+            # 如果过滤后为空，跳过这一行
+            if not filtered_parts and parts:
+                continue
+
+            if len(filtered_parts) != len(parts):
+                event.set_parts(filtered_parts)
 
-                # 过滤掉思维链部分
-                filtered_parts = [part for part in parts if not (isinstance(part, dict) and part.get("thought") is True)]
+        yield event
 
-                # 如果过滤后为空，跳过这一行
-                if not filtered_parts and parts:
-                    continue
 
-                # 更新parts
-                if filtered_parts != parts:
-                    candidate["content"]["parts"] = filtered_parts
-                    yield f"data: {json.dumps(data, ensure_ascii=False, separators=(',', ':'))}\n"
-                    continue
-            except Exception:
-                pass
+class _StreamAttempt:
+    """
+    一次流式上游请求：发送请求并等待首个 SSE 行
+
+    网络错误记录在 error 中而不是直接抛出，便于对冲时比较两个请求；被取消时自行释放资源。
+    """
+
+    def __init__(self, client: Any, url: str, permit: _AntigravityPermit | None) -> None:
+        self.client = client
+        self.url = url
+        self.permit = permit
+        self.stream_ctx: Any = None
+        self.response: Any = None
+        self.raw_iter: Any = None
+        self.first_line: Any = None
+        # 200 但在首 chunk 超时内没有数据（或空流）
+        self.stalled = False
+        self.error: BaseException | None = None
+        self.started: float | None = None
+
+    @property
+    def succeeded(self) -> bool:
+        return (
+            self.error is None
+            and not self.stalled
+            and self.response is not None
+            and self.response.status_code == 200
+        )
+
+    async def run(
+        self, request_body: Dict[str, Any], headers: Dict[str, str], first_chunk_timeout: float
+    ) -> "_StreamAttempt":
+        self.started = started = time.monotonic()
+        try:
+            self.stream_ctx = self.client.stream(
+                "POST",
+                f"{self.url}/v1internal:streamGenerateContent?alt=sse",
+                content=json_codec.dumps_bytes(request_body),
+                headers=headers,
+            )
+            self.response = await self.stream_ctx.__aenter__()
+            if self.response.status_code == 200:
+                self.raw_iter = self.response.aiter_lines()
+                try:
+                    self.first_line = await asyncio.wait_for(
+                        self.raw_iter.__anext__(), timeout=first_chunk_timeout
+                    )
+                except (asyncio.TimeoutError, StopAsyncIteration):
+                    self.stalled = True
+                else:
+                    get_baseurl_health_manager().record_ttfb(self.url, time.monotonic() - started)
+        except asyncio.CancelledError:
+            await self.discard()
+            raise
+        except Exception as e:
+            self.error = e
+        return self
+
+    async def discard(self) -> None:
+        """释放落败（或被取消）的请求：归还额度、关闭响应与客户端"""
+        if self.permit is not None:
+            self.permit.release()
+        try:
+            if self.stream_ctx is not None and self.response is not None:
+                await self.stream_ctx.__aexit__(None, None, None)
+        except Exception:
+            pass
+        await safe_close_client(self.client)
+
+
+async def _open_antigravity_stream(
+    primary: _StreamAttempt,
+    fallback_urls: List[str],
+    current_url_index: int,
+    credential_name: str,
+    model_name: str,
+    request_body: Dict[str, Any],
+    headers: Dict[str, str],
+    first_chunk_timeout: float,
+) -> _StreamAttempt:
+    """
+    发送流式请求并等待首个 SSE 行；启用对冲时，主请求慢于首字节时间 p95 会向下一个 BaseURL
+    发出同样的请求（需要能立即拿到并发额度与限流令牌），采用先产出首个数据块的一方
+    """
+    def run(attempt: _StreamAttempt):
+        return attempt.run(request_body, headers, first_chunk_timeout)
 
-        yield line
+    if not is_hedging_enabled() or len(fallback_urls) < 2:
+        return await run(primary)
+
+    hedge_url = fallback_urls[(current_url_index + 1) % len(fallback_urls)]
+
+    async def make_hedge():
+        permit = _AntigravityPermit(credential_name, model_name)
+        if not await permit.try_acquire():
+            return None
+        if not _try_throttle_antigravity_upstream(credential_name):
+            permit.release()
+            return None
+        try:
+            client = await create_streaming_client_with_kwargs()
+        except BaseException:
+            permit.release()
+            raise
+        log.info(f"[ANTIGRAVITY] 主请求首字节超过对冲延迟，向 {hedge_url} 发出对冲请求 (model={model_name})")
+        return run(_StreamAttempt(client, hedge_url, permit))
+
+    observed = get_baseurl_health_manager().get_ttfb_percentile(primary.url, hedge_percentile())
+    return await run_hedged(
+        run(primary),
+        make_hedge,
+        compute_hedge_delay(observed),
+        is_win=lambda attempt: attempt.succeeded,
+        discard=lambda attempt: attempt.discard(),
+        stats=get_hedge_stats(),
+    )
 
 
 async def send_antigravity_request_stream(
@@ -960,16 +1179,35 @@ async def send_antigravity_request_stream(
 
             try:
                 # 使用stream方法但不在async with块中消费数据
-                await _throttle_antigravity_upstream()
-                permit = _AntigravityPermit()
+                await _throttle_antigravity_upstream(current_file)
+                permit = _AntigravityPermit(current_file, model_name)
                 await permit.acquire()
-                stream_ctx = client.stream(
-                    "POST",
-                    f"{antigravity_url}/v1internal:streamGenerateContent?alt=sse",
-                    json=request_body,
-                    headers=headers,
+
+                # 对齐 gcli2api_official：增加"首 chunk 超时/空流"保护，避免偶发 200 但无内容导致不稳定。
+                # 做法：先从原始 aiter_lines() 里 peek 一个事件行，成功后再接回过滤器。
+                try:
+                    first_chunk_timeout = float(os.getenv("ANTIGRAVITY_STREAM_FIRST_CHUNK_TIMEOUT_SECONDS", "15"))
+                except Exception:
+                    first_chunk_timeout = 15.0
+
+                attempt = await _open_antigravity_stream(
+                    _StreamAttempt(client, antigravity_url, permit),
+                    fallback_urls,
+                    current_url_index,
+                    current_file,
+                    model_name,
+                    request_body,
+                    headers,
+                    first_chunk_timeout,
                 )
-                response = await stream_ctx.__aenter__()
+                # 对冲请求胜出时，后续使用对冲请求的客户端、BaseURL 与并发额度
+                client, permit = attempt.client, attempt.permit
+                stream_ctx, response = attempt.stream_ctx, attempt.response
+                if attempt.url != antigravity_url:
+                    antigravity_url = attempt.url
+                    current_url_index = fallback_urls.index(antigravity_url)
+                if attempt.error is not None:
+                    raise attempt.error
 
                 # 检查响应状态
                 if response.status_code == 200:
@@ -999,22 +1237,14 @@ async def send_antigravity_request_stream(
                     # ✅ [FIX 2026-01-21] 使用辅助函数记录成功
                     await _record_success(baseurl_health_mgr, antigravity_url, model_name, credential_name=current_file)
 
-                    # 对齐 gcli2api_official：增加"首 chunk 超时/空流"保护，避免偶发 200 但无内容导致不稳定。
-                    # 做法：先从原始 aiter_lines() 里 peek 一个事件行，成功后再接回过滤器。
-                    try:
-                        first_chunk_timeout = float(os.getenv("ANTIGRAVITY_STREAM_FIRST_CHUNK_TIMEOUT_SECONDS", "15"))
-                    except Exception:
-                        first_chunk_timeout = 15.0
-
                     try:
                         stall_cd = float(os.getenv("ANTIGRAVITY_STREAM_STALL_COOLDOWN_SECONDS", "5"))
                     except Exception:
                         stall_cd = 5.0
 
-                    raw_iter = response.aiter_lines()
-                    try:
-                        first_line = await asyncio.wait_for(raw_iter.__anext__(), timeout=first_chunk_timeout)
-                    except (asyncio.TimeoutError, StopAsyncIteration):
+                    raw_iter = attempt.raw_iter
+                    first_line = attempt.first_line
+                    if attempt.stalled:
                         log.warning(
                             f"[ANTIGRAVITY] 流式响应首 chunk 超时/空流，触发重试 "
                             f"(timeout={first_chunk_timeout}s, cred={current_file}, model={model_name})"
@@ -1056,7 +1286,7 @@ async def send_antigravity_request_stream(
                     filtered_lines = _filter_thinking_from_stream(raw_iter_with_first(), return_thoughts)
                     # 返回过滤后的行生成器和资源管理对象,让调用者管理资源生命周期
                     if permit is not None:
-                        stream_ctx = _StreamCtxWrapper(stream_ctx, permit)
+                        stream_ctx = _StreamCtxWrapper(stream_ctx, permit, antigravity_url, attempt.started)
                         permit_transferred = True
                     return (filtered_lines, stream_ctx, client), current_file, credential_data
 
@@ -1789,13 +2019,14 @@ async def send_antigravity_request_no_stream(
              
             try:
                 # 使用 streamGenerateContent 代替 generateContent
-                await _throttle_antigravity_upstream()
-                permit = _AntigravityPermit()
+                await _throttle_antigravity_upstream(current_file)
+                permit = _AntigravityPermit(current_file, model_name)
                 await permit.acquire()
+                request_started = time.monotonic()
                 stream_ctx = client.stream(
                     "POST",
                     f"{antigravity_url}/v1internal:streamGenerateContent?alt=sse",
-                    json=request_body,
+                    content=json_codec.dumps_bytes(request_body),
                     headers=headers,
                 )
                 response = await stream_ctx.__aenter__()
@@ -1839,6 +2070,7 @@ async def send_antigravity_request_no_stream(
                             debug=debug_mode,
                         )
                         log.info(f"[ANTIGRAVITY] ✓ SSE collected and converted to JSON (model={model_name})")
+                        baseurl_health_mgr.record_duration(antigravity_url, time.monotonic() - request_started)
                     except asyncio.TimeoutError:
                         log.error(f"[ANTIGRAVITY] SSE collection timeout after {sse_timeout}s (model={model_name})")
                         raise Exception(f"SSE collection timeout after {sse_timeout}s for model {model_name}")
@@ -2262,7 +2494,7 @@ async def fetch_available_models(
 
         # 使用上下文管理器确保正确的资源管理
         async with http_client.get_client(timeout=30.0) as client:
-            await _throttle_antigravity_upstream()
+            await _throttle_antigravity_upstream(current_file)
             response = await client.post(
                 f"{antigravity_url}/v1internal:fetchAvailableModels",
                 json={},  # 空的请求体
@@ -2310,6 +2542,22 @@ async def fetch_available_models(
         return []
 
 
+async def get_available_models(
+    credential_manager: CredentialManager,
+) -> List[Dict[str, Any]]:
+    """
+    带缓存的 fetch_available_models
+
+    并发请求合并为一次上游调用，缓存过期后先返回旧列表再在后台刷新；
+    上游失败（空列表）时不覆盖已缓存的列表。
+    """
+    return await get_models_cache().get(
+        "antigravity",
+        lambda: fetch_available_models(credential_manager),
+        is_valid=bool,
+    )
+
+
 async def fetch_quota_info(
     access_token: str,
     *,
@@ -2370,8 +2618,8 @@ async def fetch_quota_info(
             # [FIX 2026-01-22] Quota 查询限流 - 防止短时间大量请求导致 429
             await _throttle_quota_query()
 
-            await _throttle_antigravity_upstream()
-            permit = _AntigravityPermit()
+            await _throttle_antigravity_upstream(cache_key)
+            permit = _AntigravityPermit(cache_key)
             await permit.acquire()
             try:
                 response = await client.post(
@@ -0,0 +1,101 @@
+"""
+Antigravity 流式事件 - Antigravity Stream Events
+
+上游的每一行 SSE 只解析一次，得到 AntigravityEvent，后续各阶段都在同一个对象上工作：
+- 思维链过滤（antigravity_api._filter_thinking_from_stream）直接修改 parts，不再重新序列化
+- 用量提取、签名捕获与格式转换（OpenAI / Gemini / Anthropic 转换器）读取已解析的数据
+
+转换器仍接受原始行（str / bytes），通过 iter_antigravity_events 统一成事件。
+"""
+
+from typing import Any, AsyncIterator, Dict, List, Optional, Union
+
+from . import json_codec
+
+
+class AntigravityEvent:
+    """
+    一行上游 SSE 及其解析结果
+
+    Attributes:
+        line: 原始文本行（已解码）
+        data: "data: " 行解析出的 JSON 对象；非数据行、[DONE] 或解析失败时为 None
+    """
+
+    __slots__ = ("line", "data", "_modified")
+
+    def __init__(self, line: str, data: Optional[Dict[str, Any]] = None) -> None:
+        self.line = line
+        self.data = data
+        self._modified = False
+
+    @classmethod
+    def parse(cls, line: Union[str, bytes, "AntigravityEvent"]) -> "AntigravityEvent":
+        if isinstance(line, AntigravityEvent):
+            return line
+        if isinstance(line, bytes):
+            line = line.decode("utf-8", errors="ignore")
+        data = None
+        if line.startswith("data: "):
+            raw = line[6:].strip()
+            if raw and raw != "[DONE]":
+                try:
+                    parsed = json_codec.loads(raw)
+                except ValueError:
+                    parsed = None
+                if isinstance(parsed, dict):
+                    data = parsed
+        return cls(line, data)
+
+    @property
+    def is_data(self) -> bool:
+        """是否为 "data: " 行（不论能否解析）"""
+        return self.line.startswith("data: ")
+
+    @property
+    def is_done(self) -> bool:
+        return self.is_data and self.line[6:].strip() == "[DONE]"
+
+    @property
+    def response(self) -> Dict[str, Any]:
+        """Antigravity 包装内的 response 对象（缺失时为空字典）"""
+        response = self.data.get("response") if self.data is not None else None
+        return response if isinstance(response, dict) else {}
+
+    @property
+    def candidate(self) -> Dict[str, Any]:
+        """第一个候选（缺失时为空字典）"""
+        candidates = self.response.get("candidates") or [{}]
+        candidate = candidates[0] if isinstance(candidates, list) else None
+        return candidate if isinstance(candidate, dict) else {}
+
+    @property
+    def parts(self) -> List[Any]:
+        content = self.candidate.get("content") or {}
+        parts = content.get("parts") if isinstance(content, dict) else None
+        return parts if isinstance(parts, list) else []
+
+    @property
+    def usage_metadata(self) -> Dict[str, Any]:
+        usage = self.response.get("usageMetadata")
+        return usage if isinstance(usage, dict) else {}
+
+    def set_parts(self, parts: List[Any]) -> None:
+        """替换第一个候选的 parts（原始行随之失效，需要时由 to_line 重新生成）"""
+        self.candidate["content"]["parts"] = parts
+        self._modified = True
+
+    def to_line(self) -> str:
+        """事件的 SSE 文本行；未被修改时直接返回原始行"""
+        if self._modified and self.data is not None:
+            return f"data: {json_codec.dumps(self.data)}"
+        return self.line
+
+    def __str__(self) -> str:
+        return self.to_line()
+
+
+async def iter_antigravity_events(lines: Any) -> AsyncIterator[AntigravityEvent]:
+    """把行生成器（str / bytes / AntigravityEvent 混合）统一为事件流"""
+    async for line in lines:
+        yield AntigravityEvent.parse(line)
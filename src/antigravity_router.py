@@ -3,6 +3,7 @@ Antigravity Router - Handles OpenAI and Gemini format requests and converts to A
 处理 OpenAI 和 Gemini 格式请求并转换为 Antigravity API 格式
 """
 
+import asyncio
 import json
 import re
 import time
@@ -27,9 +28,13 @@ from .antigravity_api import (
     build_antigravity_request_body,
     send_antigravity_request_no_stream,
     send_antigravity_request_stream,
-    fetch_available_models,
+    get_available_models,
 )
-from .httpx_client import safe_close_client
+from . import json_codec
+from .antigravity_events import iter_antigravity_events
+from .models_cache import etag_json_response
+from .stream_cancellation import CancellableStreamingResponse, close_upstream, record_partial_usage
+from .stream_coalescing import TextDelta, coalesce_stream, get_coalesce_policy
 from .credential_manager import CredentialManager
 from .models import (
     ChatCompletionRequest,
@@ -375,13 +380,15 @@ async def convert_antigravity_stream_to_openai(
     cred_mgr: Optional[Any] = None,  # ✅ 新增：用于 fallback（未来可能使用）
     context_info: Optional[Dict[str, Any]] = None,  # ✅ 新增：上下文信息（token 数、工具结果数量等）
     client_type: str = "unknown",  # [FIX 2026-01-20] 客户端类型，用于决定是否编码签名
-    owner_id: Optional[str] = None  # [FIX 2026-01-22] 新增 owner_id，用于多客户端会话隔离
+    owner_id: Optional[str] = None,  # [FIX 2026-01-22] 新增 owner_id，用于多客户端会话隔离
+    coalesce: bool = False
 ):
     """
     将 Antigravity 流式响应转换为 OpenAI 格式的 SSE 流
 
     Args:
-        lines_generator: 行生成器 (已经过滤的 SSE 行)
+        lines_generator: 事件生成器（_filter_thinking_from_stream 输出的 AntigravityEvent，也接受原始 SSE 行）
+        coalesce: 普通文本以 TextDelta 产出，交给 coalesce_stream 合并后渲染（其他帧不变）
     """
     state = {
         "thinking_started": False,
@@ -424,22 +431,10 @@ async def convert_antigravity_stream_to_openai(
             log.debug(f"[SIGNATURE_CACHE] Generated session_id for stream: {session_id[:16]}...")
 
     created = int(time.time())
+    builder = SSEChunkBuilder(request_id, model, created)
+    cancelled = False
 
     try:
-        def build_content_chunk(content: str) -> str:
-            chunk = {
-                "id": request_id,
-                "object": "chat.completion.chunk",
-                "created": created,
-                "model": model,
-                "choices": [{
-                    "index": 0,
-                    "delta": {"content": content},
-                    "finish_reason": None
-                }]
-            }
-            return f"data: {json.dumps(chunk)}\n\n"
-
         def flush_thinking_buffer() -> Optional[str]:
             if not state["thinking_started"]:
                 return None
@@ -488,12 +483,8 @@ async def convert_antigravity_stream_to_openai(
             state["current_thinking_signature"] = ""
             return thinking_block
 
-        async for line in lines_generator:
-            # ✅ [FIX 2026-01-22] 修复类型错误：处理 bytes 和 str 两种类型
-            if isinstance(line, bytes):
-                line = line.decode("utf-8", errors="ignore")
-            
-            if not line or not line.startswith("data: "):
+        async for event in iter_antigravity_events(lines_generator):
+            if not event.is_data:
                 continue
 
             # 记录第一次成功响应
@@ -502,22 +493,22 @@ async def convert_antigravity_stream_to_openai(
                     await credential_manager.record_api_call_result(credential_name, True, is_antigravity=True)
                 state["success_recorded"] = True
 
-            # 解析 SSE 数据
-            try:
-                data = json.loads(line[6:])  # 去掉 "data: " 前缀
-            except:
+            # SSE 数据已在过滤阶段解析
+            data = event.data
+            if data is None:
                 continue
 
             state["sse_lines_received"] += 1
 
-            # DEBUG: 记录收到的原始数据（用于诊断空响应问题）
-            log.info(f"[ANTIGRAVITY STREAM] SSE line {state['sse_lines_received']}: {json.dumps(data)[:500]}")
-            log.debug(f"[ANTIGRAVITY STREAM] Received data keys: {list(data.keys())}")
+            # DEBUG: 记录收到的原始数据（用于诊断空响应问题），直接截取原始行，不重新序列化
+            log.debug(f"[ANTIGRAVITY STREAM] SSE line {state['sse_lines_received']}: {event.line[6:506]}")
 
             # ✅ 新增：提取 cachedContentTokenCount（如果可用）
             # 这个信息可能在第一个 chunk 就出现，用于判断实际处理的 tokens
-            usage_metadata = data.get("response", {}).get("usageMetadata", {})
+            usage_metadata = event.usage_metadata
             if usage_metadata:
+                # 最近一次上游报告的用量，客户端中途断开时用于记录部分用量
+                state["usage_metadata"] = usage_metadata
                 cached_content_token_count = usage_metadata.get("cachedContentTokenCount", 0)
                 if cached_content_token_count > 0 and "cached_content_token_count" not in state:
                     # 只在第一次提取时保存（避免覆盖）
@@ -542,7 +533,7 @@ async def convert_antigravity_stream_to_openai(
                 log.error(f"[ANTIGRAVITY STREAM] Error in response: {data.get('error')}")
 
             # 提取 candidates 和 parts
-            response = data.get("response", {})
+            response = event.response
             candidates = response.get("candidates", [])
             log.info(f"[ANTIGRAVITY STREAM] Response has {len(candidates)} candidates")
 
@@ -567,7 +558,6 @@ async def convert_antigravity_stream_to_openai(
                 log.debug(f"[ANTIGRAVITY STREAM] Parts count: {len(parts)}, types: {part_types}")
 
             # 检查 finishReason（提前检查以便记录）
-            candidates = data.get("response", {}).get("candidates", [])
             if candidates:
                 candidate = candidates[0]
                 fr = candidate.get("finishReason")
@@ -636,7 +626,7 @@ async def convert_antigravity_stream_to_openai(
                     # 如果之前在思考，先结束思考
                     thinking_block = flush_thinking_buffer()
                     if thinking_block:
-                        yield build_content_chunk(thinking_block)
+                        yield builder.build_content_chunk(thinking_block)
 
                     # 提取图片数据
                     inline_data = part["inlineData"]
@@ -648,25 +638,14 @@ async def convert_antigravity_stream_to_openai(
                     state["content_buffer"] += image_markdown
 
                     # 发送图片块
-                    chunk = {
-                        "id": request_id,
-                        "object": "chat.completion.chunk",
-                        "created": created,
-                        "model": model,
-                        "choices": [{
-                            "index": 0,
-                            "delta": {"content": image_markdown},
-                            "finish_reason": None
-                        }]
-                    }
-                    yield f"data: {json.dumps(chunk)}\n\n"
+                    yield builder.build_content_chunk(image_markdown)
 
                 # 处理普通文本
                 elif "text" in part:
                     # 如果之前在思考，先结束思考
                     thinking_block = flush_thinking_buffer()
                     if thinking_block:
-                        yield build_content_chunk(thinking_block)
+                        yield builder.build_content_chunk(thinking_block)
 
                     # 添加文本内容
                     text = part.get("text", "")
@@ -677,18 +656,10 @@ async def convert_antigravity_stream_to_openai(
                         state["content_buffer"] += text
 
                         # 发送文本块
-                        chunk = {
-                            "id": request_id,
-                            "object": "chat.completion.chunk",
-                            "created": created,
-                            "model": model,
-                            "choices": [{
-                                "index": 0,
-                                "delta": {"content": text},
-                                "finish_reason": None
-                            }]
-                        }
-                        yield f"data: {json.dumps(chunk)}\n\n"
+                        if coalesce:
+                            yield TextDelta(text, builder.build_content_chunk)
+                        else:
+                            yield builder.build_content_chunk(text)
                         state["chunks_sent"] += 1
                         state["has_valid_content"] = True  # 收到了有效的文本内容
                     else:
@@ -709,7 +680,7 @@ async def convert_antigravity_stream_to_openai(
                     # 用户中断对话或重新打开时，缓存中没有这个 signature，触发 400 错误
                     thinking_block = flush_thinking_buffer()
                     if thinking_block:
-                        yield build_content_chunk(thinking_block)
+                        yield builder.build_content_chunk(thinking_block)
 
                     tool_index = len(state["tool_calls"])
                     fc = part["functionCall"]
@@ -751,19 +722,8 @@ async def convert_antigravity_stream_to_openai(
                     # 问题：工具调用被缓冲到 state["tool_calls"]，只有在 finish_reason 时才发送
                     # 导致 Cursor 看不到工具调用，以为卡住了
                     # 解决：收到工具调用时立即发送
-                    tool_chunk = {
-                        "id": request_id,
-                        "object": "chat.completion.chunk",
-                        "created": created,
-                        "model": model,
-                        "choices": [{
-                            "index": 0,
-                            "delta": {"tool_calls": [tool_call]},
-                            "finish_reason": None
-                        }]
-                    }
                     log.info(f"[ANTIGRAVITY STREAM] Immediately sending tool call: {fc.get('name')}")
-                    yield f"data: {json.dumps(tool_chunk)}\n\n"
+                    yield builder.build_tool_calls_chunk([tool_call])
                     state["chunks_sent"] += 1
 
             # 检查是否结束
@@ -783,25 +743,14 @@ async def convert_antigravity_stream_to_openai(
                 error_msg_parts.append("- Do NOT use parameters from previous conversations")
                 error_msg_parts.append("- For terminal/command tools: verify parameter name (may be `command`, `input`, or `cmd`)")
 
-                error_chunk = {
-                    "id": request_id,
-                    "object": "chat.completion.chunk",
-                    "created": created,
-                    "model": model,
-                    "choices": [{
-                        "index": 0,
-                        "delta": {"content": "\n".join(error_msg_parts)},
-                        "finish_reason": None
-                    }]
-                }
-                yield f"data: {json.dumps(error_chunk)}\n\n"
+                yield builder.build_content_chunk("\n".join(error_msg_parts))
                 state["chunks_sent"] += 1
                 state["has_valid_content"] = True  # 标记为有内容（错误消息）
 
             if finish_reason:
                 thinking_block = flush_thinking_buffer()
                 if thinking_block:
-                    yield build_content_chunk(thinking_block)
+                    yield builder.build_content_chunk(thinking_block)
 
                 # [FIX 2026-01-08] 工具调用已在收到时立即发送，这里不再重复发送
                 # 只需要标记工具调用已发送（用于后续 finish_reason 判断）
@@ -856,33 +805,10 @@ async def convert_antigravity_stream_to_openai(
                             "If you see incomplete results, please use `/summarize` to compress conversation history, "
                             "or start a new chat session."
                         )
-                        warning_chunk = {
-                            "id": request_id,
-                            "object": "chat.completion.chunk",
-                            "created": created,
-                            "model": model,
-                            "choices": [{
-                                "index": 0,
-                                "delta": {"content": warning_msg},
-                                "finish_reason": None
-                            }]
-                        }
-                        yield f"data: {json.dumps(warning_chunk)}\n\n"
+                        yield builder.build_content_chunk(warning_msg)
                         state["chunks_sent"] += 1
 
-                chunk = {
-                    "id": request_id,
-                    "object": "chat.completion.chunk",
-                    "created": created,
-                    "model": model,
-                    "choices": [{
-                        "index": 0,
-                        "delta": {},
-                        "finish_reason": openai_finish_reason
-                    }],
-                    "usage": usage
-                }
-                yield f"data: {json.dumps(chunk)}\n\n"
+                yield builder.build_finish_chunk(openai_finish_reason, usage)
 
         # 在流结束前，检查是否有未发送的工具调用
         # 这是一个保底逻辑，用于处理 finishReason 没有被正确检测到的情况
@@ -891,33 +817,11 @@ async def convert_antigravity_stream_to_openai(
             log.info(f"[ANTIGRAVITY STREAM] Sending {len(state['tool_calls'])} tool calls (fallback)")
 
             # 发送工具调用
-            chunk = {
-                "id": request_id,
-                "object": "chat.completion.chunk",
-                "created": created,
-                "model": model,
-                "choices": [{
-                    "index": 0,
-                    "delta": {"tool_calls": state["tool_calls"]},
-                    "finish_reason": None
-                }]
-            }
-            yield f"data: {json.dumps(chunk)}\n\n"
+            yield builder.build_tool_calls_chunk(state["tool_calls"])
             state["chunks_sent"] += 1
 
             # 发送 finish_reason
-            finish_chunk = {
-                "id": request_id,
-                "object": "chat.completion.chunk",
-                "created": created,
-                "model": model,
-                "choices": [{
-                    "index": 0,
-                    "delta": {},
-                    "finish_reason": "tool_calls"
-                }]
-            }
-            yield f"data: {json.dumps(finish_chunk)}\n\n"
+            yield builder.build_finish_chunk("tool_calls")
             state["chunks_sent"] += 1
             state["finish_reason_sent"] = True
 
@@ -964,18 +868,7 @@ async def convert_antigravity_stream_to_openai(
 
                         # 发送工具调用（如果存在）
                         if fallback_tool_calls:
-                            tool_chunk = {
-                                "id": request_id,
-                                "object": "chat.completion.chunk",
-                                "created": created,
-                                "model": model,
-                                "choices": [{
-                                    "index": 0,
-                                    "delta": {"tool_calls": fallback_tool_calls},
-                                    "finish_reason": None
-                                }]
-                            }
-                            yield f"data: {json.dumps(tool_chunk)}\n\n"
+                            yield builder.build_tool_calls_chunk(fallback_tool_calls)
                             state["chunks_sent"] += 1
                             state["has_valid_content"] = True
 
@@ -984,18 +877,7 @@ async def convert_antigravity_stream_to_openai(
                             chunk_size = 100  # 每块约100字符
                             for i in range(0, len(fallback_content), chunk_size):
                                 chunk_text = fallback_content[i:i + chunk_size]
-                                content_chunk = {
-                                    "id": request_id,
-                                    "object": "chat.completion.chunk",
-                                    "created": created,
-                                    "model": model,
-                                    "choices": [{
-                                        "index": 0,
-                                        "delta": {"content": chunk_text},
-                                        "finish_reason": None
-                                    }]
-                                }
-                                yield f"data: {json.dumps(content_chunk)}\n\n"
+                                yield builder.build_content_chunk(chunk_text)
                                 state["chunks_sent"] += 1
                             state["has_valid_content"] = True
 
@@ -1004,18 +886,7 @@ async def convert_antigravity_stream_to_openai(
                         if fallback_tool_calls:
                             finish_reason_fallback = "tool_calls"
 
-                        finish_chunk = {
-                            "id": request_id,
-                            "object": "chat.completion.chunk",
-                            "created": created,
-                            "model": model,
-                            "choices": [{
-                                "index": 0,
-                                "delta": {},
-                                "finish_reason": finish_reason_fallback
-                            }]
-                        }
-                        yield f"data: {json.dumps(finish_chunk)}\n\n"
+                        yield builder.build_finish_chunk(finish_reason_fallback)
                         state["chunks_sent"] += 1
                         state["finish_reason_sent"] = True
                         state["has_valid_content"] = True
@@ -1046,33 +917,11 @@ async def convert_antigravity_stream_to_openai(
             error_msg_parts.append("- For terminal/command tools: verify parameter name (may be `command`, `input`, or `cmd`)")
             error_msg_parts.append("- When in doubt: re-read the tool definition")
 
-            error_chunk = {
-                "id": request_id,
-                "object": "chat.completion.chunk",
-                "created": created,
-                "model": model,
-                "choices": [{
-                    "index": 0,
-                    "delta": {"content": "\n".join(error_msg_parts)},
-                    "finish_reason": None
-                }]
-            }
-            yield f"data: {json.dumps(error_chunk)}\n\n"
+            yield builder.build_content_chunk("\n".join(error_msg_parts))
             state["chunks_sent"] += 1
 
             # 发送 finish_reason
-            finish_chunk = {
-                "id": request_id,
-                "object": "chat.completion.chunk",
-                "created": created,
-                "model": model,
-                "choices": [{
-                    "index": 0,
-                    "delta": {},
-                    "finish_reason": "stop"
-                }]
-            }
-            yield f"data: {json.dumps(finish_chunk)}\n\n"
+            yield builder.build_finish_chunk("stop")
             state["chunks_sent"] += 1
             state["finish_reason_sent"] = True
 
@@ -1161,18 +1010,7 @@ async def convert_antigravity_stream_to_openai(
                         
                         # 发送工具调用（如果存在）
                         if fallback_tool_calls:
-                            tool_chunk = {
-                                "id": request_id,
-                                "object": "chat.completion.chunk",
-                                "created": created,
-                                "model": model,
-                                "choices": [{
-                                    "index": 0,
-                                    "delta": {"tool_calls": fallback_tool_calls},
-                                    "finish_reason": None
-                                }]
-                            }
-                            yield f"data: {json.dumps(tool_chunk)}\n\n"
+                            yield builder.build_tool_calls_chunk(fallback_tool_calls)
                             state["chunks_sent"] += 1
                             state["has_valid_content"] = True
                         
@@ -1182,18 +1020,7 @@ async def convert_antigravity_stream_to_openai(
                             chunk_size = 100  # 每块约100字符
                             for i in range(0, len(fallback_content), chunk_size):
                                 chunk_text = fallback_content[i:i + chunk_size]
-                                content_chunk = {
-                                    "id": request_id,
-                                    "object": "chat.completion.chunk",
-                                    "created": created,
-                                    "model": model,
-                                    "choices": [{
-                                        "index": 0,
-                                        "delta": {"content": chunk_text},
-                                        "finish_reason": None
-                                    }]
-                                }
-                                yield f"data: {json.dumps(content_chunk)}\n\n"
+                                yield builder.build_content_chunk(chunk_text)
                                 state["chunks_sent"] += 1
                             state["has_valid_content"] = True
                         
@@ -1202,18 +1029,7 @@ async def convert_antigravity_stream_to_openai(
                         if fallback_tool_calls:
                             finish_reason_fallback = "tool_calls"
                         
-                        finish_chunk = {
-                            "id": request_id,
-                            "object": "chat.completion.chunk",
-                            "created": created,
-                            "model": model,
-                            "choices": [{
-                                "index": 0,
-                                "delta": {},
-                                "finish_reason": finish_reason_fallback
-                            }]
-                        }
-                        yield f"data: {json.dumps(finish_chunk)}\n\n"
+                        yield builder.build_finish_chunk(finish_reason_fallback)
                         state["chunks_sent"] += 1
                         state["finish_reason_sent"] = True
                         state["has_valid_content"] = True
@@ -1244,18 +1060,7 @@ async def convert_antigravity_stream_to_openai(
                 f"Please use /summarize or compact the conversation to continue."
             )
 
-            error_chunk = {
-                "id": request_id,
-                "object": "chat.completion.chunk",
-                "created": created,
-                "model": model,
-                "choices": [{
-                    "index": 0,
-                    "delta": {"content": error_msg},
-                    "finish_reason": None
-                }]
-            }
-            yield f"data: {json.dumps(error_chunk)}\n\n"
+            yield builder.build_content_chunk(error_msg)
             state["chunks_sent"] += 1
 
             # ✅ 修复：使用 finish_reason: "length" 来触发 Cursor 的 summarize 机制
@@ -1263,24 +1068,13 @@ async def convert_antigravity_stream_to_openai(
             # 这样 Cursor 会识别为"输出被截断"，可能触发自动 summarize
             context_exceeded_finish_reason = "length"  # 关键修复！
 
-            finish_chunk = {
-                "id": request_id,
-                "object": "chat.completion.chunk",
-                "created": created,
-                "model": model,
-                "choices": [{
-                    "index": 0,
-                    "delta": {},
-                    "finish_reason": context_exceeded_finish_reason
-                }],
-                # ✅ 新增：返回准确的 usage 信息，帮助 Cursor 了解上下文大小
-                "usage": {
-                    "prompt_tokens": prompt_token_count if prompt_token_count > 0 else estimated_tokens,
-                    "completion_tokens": 0,
-                    "total_tokens": prompt_token_count if prompt_token_count > 0 else estimated_tokens
-                }
+            # ✅ 新增：返回准确的 usage 信息，帮助 Cursor 了解上下文大小
+            context_usage = {
+                "prompt_tokens": prompt_token_count if prompt_token_count > 0 else estimated_tokens,
+                "completion_tokens": 0,
+                "total_tokens": prompt_token_count if prompt_token_count > 0 else estimated_tokens
             }
-            yield f"data: {json.dumps(finish_chunk)}\n\n"
+            yield builder.build_finish_chunk(context_exceeded_finish_reason, context_usage)
             state["chunks_sent"] += 1
             state["finish_reason_sent"] = True
 
@@ -1293,18 +1087,7 @@ async def convert_antigravity_stream_to_openai(
             log.warning(f"[ANTIGRAVITY STREAM] finish_reason not sent yet, sending now (final fallback)")
             # 确定 finish_reason
             final_finish_reason = "tool_calls" if state["tool_calls"] else "stop"
-            finish_chunk = {
-                "id": request_id,
-                "object": "chat.completion.chunk",
-                "created": created,
-                "model": model,
-                "choices": [{
-                    "index": 0,
-                    "delta": {},
-                    "finish_reason": final_finish_reason
-                }]
-            }
-            yield f"data: {json.dumps(finish_chunk)}\n\n"
+            yield builder.build_finish_chunk(final_finish_reason)
             state["finish_reason_sent"] = True
             state["chunks_sent"] += 1
 
@@ -1364,6 +1147,21 @@ async def convert_antigravity_stream_to_openai(
         log.info(f"[ANTIGRAVITY STREAM] Stream ending. SSE lines: {state['sse_lines_received']}, Chunks sent: {state['chunks_sent']}, Content buffer: {len(state['content_buffer'])}, Tool calls: {len(state['tool_calls'])}, has_valid_content: {state.get('has_valid_content', False)}, empty_parts_count: {state.get('empty_parts_count', 0)}, finish_reason_sent: {state.get('finish_reason_sent', False)}")
         yield "data: [DONE]\n\n"
 
+    except (asyncio.CancelledError, GeneratorExit):
+        # 客户端断开：中止上游读取，记录已消耗的部分用量
+        cancelled = True
+        usage_metadata = state.get("usage_metadata", {})
+        record_partial_usage(
+            "ANTIGRAVITY STREAM",
+            model=model,
+            credential_manager=credential_manager,
+            credential_name=credential_name,
+            input_tokens=usage_metadata.get("promptTokenCount", 0),
+            output_tokens=usage_metadata.get("candidatesTokenCount", 0),
+            chunks_sent=state["chunks_sent"],
+        )
+        raise
+
     except Exception as e:
         log.error(f"[ANTIGRAVITY] Streaming error: {e}")
 
@@ -1384,17 +1182,10 @@ async def convert_antigravity_stream_to_openai(
                 "code": 500
             }
         }
-        yield f"data: {json.dumps(error_response)}\n\n"
+        yield f"data: {json_codec.dumps(error_response)}\n\n"
     finally:
         # 确保清理所有资源
-        try:
-            await stream_ctx.__aexit__(None, None, None)
-        except Exception as e:
-            log.debug(f"[ANTIGRAVITY] Error closing stream context: {e}")
-        try:
-            await safe_close_client(client)
-        except Exception as e:
-            log.debug(f"[ANTIGRAVITY] Error closing client: {e}")
+        await close_upstream(stream_ctx, client, cancelled=cancelled, tag="ANTIGRAVITY")
 
 
 def convert_antigravity_response_to_openai(
@@ -1512,23 +1303,23 @@ async def convert_antigravity_stream_to_gemini(
     stream_ctx: Any,
     client: Any,
     credential_manager: Any,
-    credential_name: str
+    credential_name: str,
+    model: Optional[str] = None,
 ):
     """
     将 Antigravity 流式响应转换为 Gemini 格式的 SSE 流
 
     Args:
-        lines_generator: 行生成器 (已经过滤的 SSE 行)
+        lines_generator: 事件生成器（_filter_thinking_from_stream 输出的 AntigravityEvent，也接受原始 SSE 行）
     """
     success_recorded = False
+    cancelled = False
+    chunks_sent = 0
+    usage_metadata: Dict[str, Any] = {}
 
     try:
-        async for line in lines_generator:
-            # ✅ [FIX 2026-01-22] 修复类型错误：处理 bytes 和 str 两种类型
-            if isinstance(line, bytes):
-                line = line.decode("utf-8", errors="ignore")
-            
-            if not line or not line.startswith("data: "):
+        async for event in iter_antigravity_events(lines_generator):
+            if not event.is_data:
                 continue
 
             # 记录第一次成功响应
@@ -1537,18 +1328,33 @@ async def convert_antigravity_stream_to_gemini(
                     await credential_manager.record_api_call_result(credential_name, True, is_antigravity=True)
                 success_recorded = True
 
-            # 解析 SSE 数据
-            try:
-                data = json.loads(line[6:])  # 去掉 "data: " 前缀
-            except:
+            # SSE 数据已在过滤阶段解析
+            data = event.data
+            if data is None:
                 continue
 
             # Antigravity 流式响应格式: {"response": {...}}
             # Gemini 流式响应格式: {...}
             gemini_data = data.get("response", data)
+            usage_metadata = gemini_data.get("usageMetadata") or usage_metadata
 
             # 发送 Gemini 格式的数据
-            yield f"data: {json.dumps(gemini_data)}\n\n"
+            yield f"data: {json_codec.dumps(gemini_data)}\n\n"
+            chunks_sent += 1
+
+    except (asyncio.CancelledError, GeneratorExit):
+        # 客户端断开：中止上游读取，记录已消耗的部分用量
+        cancelled = True
+        record_partial_usage(
+            "ANTIGRAVITY GEMINI",
+            model=model,
+            credential_manager=credential_manager,
+            credential_name=credential_name,
+            input_tokens=usage_metadata.get("promptTokenCount", 0),
+            output_tokens=usage_metadata.get("candidatesTokenCount", 0),
+            chunks_sent=chunks_sent,
+        )
+        raise
 
     except Exception as e:
         log.error(f"[ANTIGRAVITY GEMINI] Streaming error: {e}")
@@ -1559,17 +1365,10 @@ async def convert_antigravity_stream_to_gemini(
                 "status": "INTERNAL"
             }
         }
-        yield f"data: {json.dumps(error_response)}\n\n"
+        yield f"data: {json_codec.dumps(error_response)}\n\n"
     finally:
         # 确保清理所有资源
-        try:
-            await stream_ctx.__aexit__(None, None, None)
-        except Exception as e:
-            log.debug(f"[ANTIGRAVITY GEMINI] Error closing stream context: {e}")
-        try:
-            await safe_close_client(client)
-        except Exception as e:
-            log.debug(f"[ANTIGRAVITY GEMINI] Error closing client: {e}")
+        await close_upstream(stream_ctx, client, cancelled=cancelled, tag="ANTIGRAVITY GEMINI")
 
 
 @router.get("/antigravity")
@@ -1589,15 +1388,15 @@ async def antigravity_root():
 
 
 @router.get("/antigravity/v1/models", response_model=ModelList)
-async def list_models():
-    """返回 OpenAI 格式的模型列表 - 动态从 Antigravity API 获取"""
+async def list_models(request: Request):
+    """返回 OpenAI 格式的模型列表 - 动态从 Antigravity API 获取（带缓存与 ETag）"""
 
     try:
         # 获取凭证管理器
         cred_mgr = await get_credential_manager()
 
         # 从 Antigravity API 获取模型列表（返回 OpenAI 格式的字典列表）
-        models = await fetch_available_models(cred_mgr)
+        models = await get_available_models(cred_mgr)
 
         if not models:
             # 如果获取失败，直接返回空列表
@@ -1615,7 +1414,7 @@ async def list_models():
             anti_truncation_model["id"] = f"流式抗截断/{model['id']}"
             expanded_models.append(Model(**anti_truncation_model))
 
-        return ModelList(data=expanded_models)
+        return etag_json_response(request, model_to_dict(ModelList(data=expanded_models)))
 
     except Exception as e:
         log.error(f"[ANTIGRAVITY] Error fetching models: {e}")
@@ -1681,7 +1480,7 @@ async def chat_completions(
 
     # 获取原始请求数据
     try:
-        raw_data = await request.json()
+        raw_data = json_codec.loads(await request.body())
     except Exception as e:
         log.error(f"Failed to parse JSON request: {e}")
         raise HTTPException(status_code=400, detail=f"Invalid JSON: {str(e)}")
@@ -2574,6 +2373,9 @@ async def chat_completions(
                 request_body["model"] = attempt_model
 
             if stream:
+                # 文本增量合并策略（按客户端类型，默认关闭）
+                coalesce_policy = get_coalesce_policy(client_type)
+
                 # 处理抗截断功能（仅流式传输时有效）
                 if use_anti_truncation:
                     log.info("[ANTIGRAVITY] 启用流式抗截断功能")
@@ -2588,14 +2390,15 @@ async def chat_completions(
                         )
                         response, stream_ctx, client = resources
                         return StreamingResponse(
-                            convert_antigravity_stream_to_openai(
+                            coalesce_stream(convert_antigravity_stream_to_openai(
                                 response, stream_ctx, client, model, request_id, cred_mgr, cred_name,
                                 request_body=request_body,  # 传递请求体用于 fallback
                                 cred_mgr=cred_mgr,  # 传递凭证管理器用于 fallback
                                 context_info=context_info,  # ✅ 新增：传递上下文信息用于错误消息
                                 client_type=client_type,  # [FIX 2026-01-20] 传递客户端类型用于签名编码决策
-                                owner_id=owner_id  # [FIX 2026-01-22] 传递 owner_id 用于会话隔离
-                            ),
+                                owner_id=owner_id,  # [FIX 2026-01-22] 传递 owner_id 用于会话隔离
+                                coalesce=coalesce_policy.enabled
+                            ), coalesce_policy),
                             media_type="text/event-stream"
                         )
 
@@ -2615,15 +2418,16 @@ async def chat_completions(
                 # 转换并返回流式响应,传递资源管理对象
                 # response 现在是 filtered_lines 生成器
                 # ✅ 新增：传递请求体和凭证管理器用于 fallback，以及上下文信息用于错误消息
-                return StreamingResponse(
-                    convert_antigravity_stream_to_openai(
+                return CancellableStreamingResponse(
+                    coalesce_stream(convert_antigravity_stream_to_openai(
                         response, stream_ctx, client, model, request_id, cred_mgr, cred_name,
                         request_body=request_body,  # 传递请求体用于 fallback
                         cred_mgr=cred_mgr,  # 传递凭证管理器用于 fallback
                         context_info=context_info,  # ✅ 新增：传递上下文信息用于错误消息
                         client_type=client_type,  # [FIX 2026-01-20] 传递客户端类型用于签名编码决策
-                        owner_id=owner_id  # [FIX 2026-01-22] 传递 owner_id 用于会话隔离
-                    ),
+                        owner_id=owner_id,  # [FIX 2026-01-22] 传递 owner_id 用于会话隔离
+                        coalesce=coalesce_policy.enabled
+                    ), coalesce_policy),
                     media_type="text/event-stream"
                 )
             else:
@@ -2692,15 +2496,15 @@ async def chat_completions(
 
 @router.get("/antigravity/v1beta/models")
 @router.get("/antigravity/v1/models")
-async def gemini_list_models(api_key: str = Depends(authenticate_gemini_flexible)):
-    """返回 Gemini 格式的模型列表 - 动态从 Antigravity API 获取"""
+async def gemini_list_models(request: Request, api_key: str = Depends(authenticate_gemini_flexible)):
+    """返回 Gemini 格式的模型列表 - 动态从 Antigravity API 获取（带缓存与 ETag）"""
 
     try:
         # 获取凭证管理器
         cred_mgr = await get_credential_manager()
 
         # 从 Antigravity API 获取模型列表（返回 OpenAI 格式的字典列表）
-        models = await fetch_available_models(cred_mgr)
+        models = await get_available_models(cred_mgr)
 
         if not models:
             # 如果获取失败，返回空列表
@@ -2731,7 +2535,7 @@ async def gemini_list_models(api_key: str = Depends(authenticate_gemini_flexible
                 "supportedGenerationMethods": ["generateContent", "streamGenerateContent"],
             })
 
-        return JSONResponse(content={"models": gemini_models})
+        return etag_json_response(request, {"models": gemini_models})
 
     except Exception as e:
         log.error(f"[ANTIGRAVITY GEMINI] Error fetching models: {e}")
@@ -2751,7 +2555,7 @@ async def gemini_generate_content(
 
     # 获取原始请求数据
     try:
-        request_data = await request.json()
+        request_data = json_codec.loads(await request.body())
     except Exception as e:
         log.error(f"Failed to parse JSON request: {e}")
         raise HTTPException(status_code=400, detail=f"Invalid JSON: {str(e)}")
@@ -2888,7 +2692,7 @@ async def gemini_stream_generate_content(
 
     # 获取原始请求数据
     try:
-        request_data = await request.json()
+        request_data = json_codec.loads(await request.body())
     except Exception as e:
         log.error(f"Failed to parse JSON request: {e}")
         raise HTTPException(status_code=400, detail=f"Invalid JSON: {str(e)}")
@@ -2992,7 +2796,7 @@ async def gemini_stream_generate_content(
                 response, stream_ctx, client = resources
                 return StreamingResponse(
                     convert_antigravity_stream_to_gemini(
-                        response, stream_ctx, client, cred_mgr, cred_name
+                        response, stream_ctx, client, cred_mgr, cred_name, model=actual_model
                     ),
                     media_type="text/event-stream"
                 )
@@ -3012,9 +2816,9 @@ async def gemini_stream_generate_content(
 
         # 转换并返回流式响应
         # response 现在是 filtered_lines 生成器
-        return StreamingResponse(
+        return CancellableStreamingResponse(
             convert_antigravity_stream_to_gemini(
-                response, stream_ctx, client, cred_mgr, cred_name
+                response, stream_ctx, client, cred_mgr, cred_name, model=actual_model
             ),
             media_type="text/event-stream"
         )
@@ -3056,7 +2860,7 @@ async def sdwebui_list_models(_: str = Depends(authenticate_sdwebui_flexible)):
         cred_mgr = await get_credential_manager()
 
         # 从 Antigravity API 获取模型列表
-        models = await fetch_available_models(cred_mgr)
+        models = await get_available_models(cred_mgr)
 
         if not models:
             log.warning("[ANTIGRAVITY SD-WebUI] Failed to fetch models from API, returning empty list")
@@ -3090,7 +2894,7 @@ async def sdwebui_txt2img(request: Request, _: str = Depends(authenticate_sdwebu
     """处理 SD-WebUI 格式的 txt2img 请求，转换为 Antigravity API"""
     # 获取原始请求数据
     try:
-        request_data = await request.json()
+        request_data = json_codec.loads(await request.body())
     except Exception as e:
         log.error(f"Failed to parse JSON request: {e}")
         raise HTTPException(status_code=400, detail=f"Invalid JSON: {str(e)}")
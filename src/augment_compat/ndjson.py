@@ -20,6 +20,8 @@ Node Type 值：
 
 import json
 from typing import Any, AsyncGenerator, Dict, Generator, Optional, Union
+
+from src import json_codec
 from .types import AugmentNode, ChatResultNodeType
 
 
@@ -36,7 +38,7 @@ def ndjson_encode_line(data: Union[Dict[str, Any], AugmentNode]) -> str:
     if isinstance(data, AugmentNode):
         json_str = data.model_dump_json(exclude_none=True)
     else:
-        json_str = json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+        json_str = json_codec.dumps(data)
     return json_str + '\n'
 
 
@@ -54,7 +56,7 @@ def ndjson_decode_line(line: str) -> Optional[Dict[str, Any]]:
     if not line:
         return None
     try:
-        return json.loads(line)
+        return json_codec.loads(line)
     except json.JSONDecodeError:
         return None
 
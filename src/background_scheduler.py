@@ -17,23 +17,7 @@ import time
 from typing import Optional
 from log import log
 
-
-class _AsyncMinIntervalLimiter:
-    def __init__(self, min_interval_seconds: float) -> None:
-        self._min_interval = float(min_interval_seconds)
-        self._lock: Optional[asyncio.Lock] = None
-        self._next_allowed_at: float = 0.0
-
-    async def wait(self) -> None:
-        if self._min_interval <= 0:
-            return
-        if self._lock is None:
-            self._lock = asyncio.Lock()
-        async with self._lock:
-            now = time.time()
-            if now < self._next_allowed_at:
-                await asyncio.sleep(self._next_allowed_at - now)
-            self._next_allowed_at = time.time() + self._min_interval
+from src.rate_limiter import TokenBucketLimiter
 
 
 class BackgroundScheduler:
@@ -52,7 +36,7 @@ class BackgroundScheduler:
         self.refresh_task: Optional[asyncio.Task] = None
         self.is_running = False
         self._cooldown_until: float = 0.0
-        self._quota_refresh_limiter: Optional[_AsyncMinIntervalLimiter] = None
+        self._quota_refresh_limiter: Optional[TokenBucketLimiter] = None
 
     @staticmethod
     def _apply_jitter(base_value: float, jitter_ratio: float) -> float:
@@ -70,14 +54,19 @@ class BackgroundScheduler:
         return base_value * random.uniform(1.0 - jitter_ratio, 1.0 + jitter_ratio)
 
     async def _throttle_quota_refresh(self) -> None:
+        """配额刷新限流（BACKGROUND_REFRESH_MIN_REQUEST_INTERVAL_SECONDS 平均间隔，BACKGROUND_REFRESH_BURST 突发数）"""
         if self._quota_refresh_limiter is None:
             try:
                 v = float(os.getenv("BACKGROUND_REFRESH_MIN_REQUEST_INTERVAL_SECONDS", "0.2"))
             except ValueError:
                 v = 0.2
-            self._quota_refresh_limiter = _AsyncMinIntervalLimiter(min_interval_seconds=v)
+            try:
+                burst = int(os.getenv("BACKGROUND_REFRESH_BURST", "1"))
+            except ValueError:
+                burst = 1
+            self._quota_refresh_limiter = TokenBucketLimiter.from_interval(v, burst=burst)
         await self._quota_refresh_limiter.wait()
-        
+
     async def start_auto_refresh(self, interval_minutes: int = 15):
         """启动后台自动刷新
         
@@ -144,8 +133,13 @@ class BackgroundScheduler:
         log.info("[BackgroundScheduler] ========== 开始批量刷新所有账号配额 ==========")
         
         try:
-            # 获取所有凭证名称
-            all_credentials = await self.credential_manager._storage_adapter.list_credentials()
+            # 获取所有凭证名称（(名称, 是否 antigravity)）
+            storage_adapter = self.credential_manager._storage_adapter
+            all_credentials = [
+                (name, False) for name in await storage_adapter.list_credentials()
+            ] + [
+                (name, True) for name in await storage_adapter.list_credentials(is_antigravity=True)
+            ]
             
             if not all_credentials:
                 log.warning("[BackgroundScheduler] 没有找到任何凭证")
@@ -178,12 +172,12 @@ class BackgroundScheduler:
             except ValueError:
                 cooldown_on_429_seconds = 600
             
-            async def refresh_single(cred_name: str):
+            async def refresh_single(cred_name: str, is_antigravity: bool):
                 """刷新单个凭证"""
                 async with semaphore:
                     try:
                         # 获取凭证数据
-                        cred_data = await self.credential_manager._storage_adapter.get_credential(cred_name)
+                        cred_data = await storage_adapter.get_credential(cred_name, is_antigravity=is_antigravity)
                         
                         if not cred_data:
                             log.warning(f"[BackgroundScheduler] 凭证不存在: {cred_name}")
@@ -200,50 +194,49 @@ class BackgroundScheduler:
                             if time.time() - float(last_ts) < (min_cred_refresh_minutes * 60):
                                 return None
                             
-                        # 刷新凭证（调用现有方法）
-                        from src.credentials import Credentials
-                        credentials = Credentials.from_dict(cred_data)
-                        
-                        # 刷新 token（如果需要）
-                        token_refreshed = await credentials.refresh_if_needed()
-                        
-                        if token_refreshed:
-                            log.info(f"[BackgroundScheduler] Token已刷新: {cred_name}")
-                            # 更新存储
-                            await self.credential_manager._storage_adapter.store_credential(
-                                cred_name,
-                                credentials.to_dict()
+                        # 刷新 token（如果需要，与请求路径共享 single-flight）
+                        if await self.credential_manager._should_refresh_token(cred_data):
+                            refreshed = await self.credential_manager._refresh_token_single_flight(
+                                cred_data, cred_name, is_antigravity=is_antigravity
                             )
+                            if not refreshed:
+                                log.warning(f"[BackgroundScheduler] Token刷新失败: {cred_name}")
+                                return False
+                            log.info(f"[BackgroundScheduler] Token已刷新: {cred_name}")
+                            cred_data = refreshed
                             
                         # 刷新配额信息
                         # [FIX 2026-01-17] 使用 fetch_quota_info 从 Google API 获取配额（使用内存缓存）
                         # 原代码调用了不存在的 fetch_quota_data 函数
-                        # 注意：配额信息不持久化到数据库，只存在于内存缓存中
-                        is_antigravity = cred_data.get("type") == "antigravity"
+                        # 配额结果写入配额快照表，凭证选择只读快照，不在请求路径上访问网络
+                        is_antigravity = is_antigravity or cred_data.get("type") == "antigravity"
                         await self._throttle_quota_refresh()
 
                         if is_antigravity:
                             # Antigravity 凭证刷新配额（使用内存缓存）
                             from src.antigravity_api import fetch_quota_info
+                            access_token = cred_data.get("access_token") or cred_data.get("token")
                             quota_result = await fetch_quota_info(
-                                credentials.access_token,
+                                access_token,
                                 cache_key=cred_name,
                                 force_refresh=True  # 强制刷新缓存
                             )
                             if quota_result.get("success"):
                                 log.info(f"[BackgroundScheduler] ✓ 配额已刷新: {cred_name}")
+                                await self._store_quota_snapshot(cred_name, quota_result)
                             else:
                                 log.warning(f"[BackgroundScheduler] ⚠ 配额刷新失败: {cred_name}")
                         else:
                             # GeminiCLI 凭证 - 目前不支持配额刷新
                             log.debug(f"[BackgroundScheduler] 跳过 GeminiCLI 凭证配额刷新: {cred_name}")
 
-                        # 更新最后刷新时间（不存储配额数据到数据库）
+                        # 更新最后刷新时间
                         cred_data["last_quota_refresh"] = time.time()
 
-                        await self.credential_manager._storage_adapter.store_credential(
+                        await storage_adapter.store_credential(
                             cred_name,
-                            cred_data
+                            cred_data,
+                            is_antigravity=is_antigravity
                         )
 
                         return True
@@ -260,7 +253,7 @@ class BackgroundScheduler:
                         return False
             
             # 并发执行所有刷新任务
-            tasks = [refresh_single(cred_name) for cred_name in all_credentials]
+            tasks = [refresh_single(cred_name, is_ag) for cred_name, is_ag in all_credentials]
             results = await asyncio.gather(*tasks, return_exceptions=True)
             
             # 统计结果
@@ -280,6 +273,17 @@ class BackgroundScheduler:
         except Exception as e:
             log.error(f"[BackgroundScheduler] 批量刷新异常: {e}")
             
+    async def _store_quota_snapshot(self, cred_name: str, quota_result: dict) -> None:
+        """把配额结果写入存储后端的配额快照（后端支持时）"""
+        backend = self.credential_manager._storage_adapter._backend
+        if not hasattr(backend, "store_quota_snapshot"):
+            return
+        from src.storage.quota_snapshot import QuotaSnapshot
+
+        snapshot = QuotaSnapshot.from_quota_result(quota_result)
+        if snapshot is not None:
+            await backend.store_quota_snapshot(cred_name, snapshot)
+
     def stop(self):
         """停止调度器"""
         log.info("[BackgroundScheduler] 停止调度器")
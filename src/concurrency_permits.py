@@ -0,0 +1,271 @@
+"""
+上游并发额度 - Concurrency Permits
+
+原先 antigravity 上游只有一个进程级 Semaphore（ANTIGRAVITY_MAX_CONCURRENCY，默认 2），
+无论账号池有多大，整个网关同一时间最多只有 2 个上游请求。这里改为分层额度：
+- 每个凭证独立的并发额度（同一账号不会被并发打爆）
+- 可选的每个模型并发额度
+- 全局上限，保护本进程与出口网络
+获取顺序为 凭证 -> 模型 -> 全局，释放顺序相反；任意一步被取消时回滚已获取的额度。
+空闲的凭证/模型额度在释放时即被回收，内存只与活跃键数量相关。
+
+配置（环境变量）:
+- ANTIGRAVITY_PER_CREDENTIAL_MAX_CONCURRENCY: 每个凭证的最大并发（默认 2）
+- ANTIGRAVITY_PER_MODEL_MAX_CONCURRENCY: 每个模型的最大并发（默认 0，表示不限制）
+- ANTIGRAVITY_MAX_CONCURRENCY: 全局最大并发（默认 32）
+"""
+
+import asyncio
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from log import log
+
+
+def _get_env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    if value is None or value == "":
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        return default
+
+
+class _Slot:
+    """单个键的并发额度（有等待者或在途请求时才存在）"""
+
+    __slots__ = ("semaphore", "in_flight", "waiters")
+
+    def __init__(self, limit: int):
+        self.semaphore = asyncio.Semaphore(limit)
+        self.in_flight = 0
+        self.waiters = 0
+
+
+class _KeyedSlots:
+    """按键分组的并发额度，空闲键在释放时立即回收"""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self._slots: Dict[str, _Slot] = {}
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def has_free(self, key: str) -> bool:
+        slot = self._slots.get(key)
+        return slot is None or slot.in_flight < self.limit
+
+    def can_acquire_now(self, key: str) -> bool:
+        """acquire() 是否会立即返回（不需要排队）"""
+        slot = self._slots.get(key)
+        return slot is None or not slot.semaphore.locked()
+
+    def in_flight(self, key: str) -> int:
+        slot = self._slots.get(key)
+        return slot.in_flight if slot else 0
+
+    async def acquire(self, key: str) -> None:
+        slot = self._slots.get(key)
+        if slot is None:
+            slot = self._slots[key] = _Slot(self.limit)
+        slot.waiters += 1
+        try:
+            await slot.semaphore.acquire()
+        except BaseException:
+            # 等待期间被取消：没有其他使用者时回收该键
+            slot.waiters -= 1
+            self.forget_if_idle(key)
+            raise
+        slot.waiters -= 1
+        slot.in_flight += 1
+
+    def release(self, key: str) -> None:
+        slot = self._slots.get(key)
+        if slot is None:
+            return
+        slot.in_flight -= 1
+        slot.semaphore.release()
+        self._evict_if_idle(key, slot)
+
+    def forget_if_idle(self, key: str) -> None:
+        slot = self._slots.get(key)
+        if slot is not None:
+            self._evict_if_idle(key, slot)
+
+    def _evict_if_idle(self, key: str, slot: _Slot) -> None:
+        # 仍有等待者时保留：它们持有的是同一个 Semaphore
+        if slot.in_flight <= 0 and slot.waiters <= 0:
+            del self._slots[key]
+
+    def busiest(self, limit: int = 10) -> List[Tuple[str, int, int]]:
+        items = [(key, slot.in_flight, slot.waiters) for key, slot in self._slots.items()]
+        items.sort(key=lambda item: (item[1], item[2]), reverse=True)
+        return items[:limit]
+
+
+@dataclass
+class PermitStats:
+    """并发额度统计"""
+
+    total_acquired: int = 0
+    total_cancelled: int = 0
+    # 因凭证额度已满而等待的次数
+    credential_waits: int = 0
+    # 因全局上限已满而等待的次数
+    global_waits: int = 0
+
+
+class PermitManager:
+    """
+    分层并发额度管理器
+
+    Usage:
+        manager = get_antigravity_permit_manager()
+        permit = await manager.acquire("cred.json", "claude-sonnet-4-5")
+        try:
+            ...
+        finally:
+            manager.release(permit)
+    """
+
+    def __init__(
+        self,
+        per_credential: int = 2,
+        per_model: int = 0,
+        global_limit: int = 32,
+    ):
+        """
+        Args:
+            per_credential: 每个凭证的最大并发
+            per_model: 每个模型的最大并发（<= 0 表示不限制）
+            global_limit: 全局最大并发
+        """
+        self.per_credential = max(1, per_credential)
+        self.per_model = max(0, per_model)
+        self.global_limit = max(1, global_limit)
+
+        self._credentials = _KeyedSlots(self.per_credential)
+        self._models = _KeyedSlots(self.per_model) if self.per_model > 0 else None
+        self._global = asyncio.Semaphore(self.global_limit)
+        self._in_flight = 0
+        self.stats = PermitStats()
+
+    @classmethod
+    def from_env(cls) -> "PermitManager":
+        return cls(
+            per_credential=_get_env_int("ANTIGRAVITY_PER_CREDENTIAL_MAX_CONCURRENCY", 2),
+            per_model=_get_env_int("ANTIGRAVITY_PER_MODEL_MAX_CONCURRENCY", 0),
+            global_limit=_get_env_int("ANTIGRAVITY_MAX_CONCURRENCY", 32),
+        )
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def has_free_permit(self, credential: str) -> bool:
+        """凭证当前是否还有空闲额度（供凭证选择优先使用空闲账号）"""
+        return self._credentials.has_free(credential)
+
+    async def acquire(
+        self, credential: Optional[str] = None, model: Optional[str] = None
+    ) -> Tuple[Optional[str], Optional[str]]:
+        """
+        按 凭证 -> 模型 -> 全局 的顺序获取额度
+
+        Args:
+            credential: 凭证文件名（None 表示只受全局上限约束）
+            model: 模型名（仅在启用每模型额度时生效）
+
+        Returns:
+            需要传给 release() 的额度句柄
+        """
+        model_key = model if (model and self._models is not None) else None
+        acquired: List[Tuple[_KeyedSlots, str]] = []
+        try:
+            if credential:
+                if not self._credentials.has_free(credential):
+                    self.stats.credential_waits += 1
+                await self._credentials.acquire(credential)
+                acquired.append((self._credentials, credential))
+            if model_key:
+                await self._models.acquire(model_key)
+                acquired.append((self._models, model_key))
+            if self._global.locked():
+                self.stats.global_waits += 1
+            await self._global.acquire()
+        except BaseException:
+            # 取消或异常：按相反顺序回滚已获取的额度
+            for slots, key in reversed(acquired):
+                slots.release(key)
+            self.stats.total_cancelled += 1
+            raise
+
+        self._in_flight += 1
+        self.stats.total_acquired += 1
+        return credential, model_key
+
+    async def try_acquire(
+        self, credential: Optional[str] = None, model: Optional[str] = None
+    ) -> Optional[Tuple[Optional[str], Optional[str]]]:
+        """
+        不排队地获取额度（用于对冲请求等可选的额外请求）
+
+        Returns:
+            额度句柄；任意一层额度已满时返回 None
+        """
+        model_key = model if (model and self._models is not None) else None
+        if credential and not self._credentials.can_acquire_now(credential):
+            return None
+        if model_key and not self._models.can_acquire_now(model_key):
+            return None
+        if self._global.locked():
+            return None
+        # 各层都有空闲额度：下面的 acquire 不会挂起，检查与获取之间没有其他协程插入
+        return await self.acquire(credential, model)
+
+    def release(self, handle: Tuple[Optional[str], Optional[str]]) -> None:
+        """按 全局 -> 模型 -> 凭证 的顺序释放额度"""
+        credential, model_key = handle
+        self._in_flight -= 1
+        self._global.release()
+        if model_key and self._models is not None:
+            self._models.release(model_key)
+        if credential:
+            self._credentials.release(credential)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "per_credential_limit": self.per_credential,
+            "per_model_limit": self.per_model,
+            "global_limit": self.global_limit,
+            "in_flight": self._in_flight,
+            "active_credentials": len(self._credentials),
+            "active_models": len(self._models) if self._models is not None else 0,
+            "busiest_credentials": [
+                {"credential": key, "in_flight": in_flight, "waiters": waiters}
+                for key, in_flight, waiters in self._credentials.busiest()
+            ],
+            "total_acquired": self.stats.total_acquired,
+            "total_cancelled": self.stats.total_cancelled,
+            "credential_waits": self.stats.credential_waits,
+            "global_waits": self.stats.global_waits,
+        }
+
+
+_antigravity_permit_manager: Optional[PermitManager] = None
+
+
+def get_antigravity_permit_manager() -> PermitManager:
+    """获取 antigravity 上游的全局并发额度管理器"""
+    global _antigravity_permit_manager
+    if _antigravity_permit_manager is None:
+        _antigravity_permit_manager = PermitManager.from_env()
+        log.debug(
+            f"[Permits] per_credential={_antigravity_permit_manager.per_credential}, "
+            f"per_model={_antigravity_permit_manager.per_model}, "
+            f"global={_antigravity_permit_manager.global_limit}"
+        )
+    return _antigravity_permit_manager
@@ -0,0 +1,282 @@
+"""
+连接预热器 - Connection Pre-warmer
+
+空闲一段时间后的第一个请求（或 BaseURLHealthManager 调整顺序后切到的新 URL）需要完整地
+建立 TCP/TLS 连接。预热器在后台为每个目标保持若干条热连接：
+- antigravity 的所有 fallback BaseURL（通过共享客户端注册表 http_client）
+- 统一网关 BACKENDS 中启用的后端（通过各后端的长连接客户端池）
+
+每一轮对每个目标并发发送 N 个 HEAD 请求：空闲的热连接被复用，已断开的连接由连接池
+自动重新建立，因此稳定状态下每个目标保持 N 条连接。轮次间隔带随机抖动，并且应小于
+连接池的 keep-alive 过期时间（HTTP_POOL_KEEPALIVE_EXPIRY / GATEWAY_POOL_KEEPALIVE_EXPIRY）。
+
+配置（环境变量）:
+- CONNECTION_PREWARM_ENABLED: 是否启用（默认 false）
+- CONNECTION_PREWARM_CONNECTIONS: 每个目标保持的连接数（默认 2）
+- CONNECTION_PREWARM_INTERVAL_SECONDS: 保活间隔（秒，默认 20）
+- CONNECTION_PREWARM_JITTER: 间隔抖动比例（默认 0.2，即 ±20%）
+- CONNECTION_PREWARM_TIMEOUT: 单次保活请求超时（秒，默认 5）
+- CONNECTION_PREWARM_GATEWAY_BACKENDS: 是否预热网关后端（默认 true）
+"""
+
+import asyncio
+import os
+import random
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from log import log
+
+
+def _get_env_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    if value is None or value == "":
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        return default
+
+
+def _get_env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None or value == "":
+        return default
+    return value.lower() in ("true", "1", "yes", "on")
+
+
+@dataclass
+class WarmTarget:
+    """一个预热目标；backend_key 为空时使用共享客户端注册表"""
+
+    name: str
+    url: str
+    backend_key: Optional[str] = None
+    backend_config: Optional[Dict[str, Any]] = None
+
+
+@dataclass
+class WarmTargetStats:
+    """单个目标的预热统计"""
+
+    pings: int = 0
+    failures: int = 0
+    # 预热时新建的连接数（仅能观察到连接池的 httpx 客户端统计）
+    connections_opened: int = 0
+    open_connections: Optional[int] = None
+    last_latency_ms: Optional[float] = None
+    last_error: Optional[str] = None
+    last_ping_at: Optional[float] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "pings": self.pings,
+            "failures": self.failures,
+            "connections_opened": self.connections_opened,
+            "open_connections": self.open_connections,
+            "last_latency_ms": self.last_latency_ms,
+            "last_error": self.last_error,
+            "last_ping_at": self.last_ping_at,
+        }
+
+
+async def collect_default_targets(include_gateway: bool = True) -> List[WarmTarget]:
+    """收集默认预热目标：antigravity fallback URL + 启用的网关后端"""
+    targets: List[WarmTarget] = []
+    try:
+        from config import get_antigravity_fallback_urls
+        for url in await get_antigravity_fallback_urls():
+            targets.append(WarmTarget(name=f"antigravity:{url}", url=url))
+    except Exception as e:
+        log.warning(f"[Prewarm] 获取 antigravity BaseURL 失败: {e}")
+
+    if include_gateway:
+        from src.gateway.config import BACKENDS
+        from src.gateway.routing import get_backend_base_url
+
+        for backend_key, backend_config in BACKENDS.items():
+            # antigravity 后端由本进程直调，不经过网络
+            if backend_key == "antigravity" or not backend_config.get("enabled", True):
+                continue
+            base_url = get_backend_base_url(backend_config)
+            if base_url:
+                targets.append(WarmTarget(
+                    name=f"gateway:{backend_key}",
+                    url=base_url,
+                    backend_key=backend_key,
+                    backend_config=backend_config,
+                ))
+    return targets
+
+
+class ConnectionPrewarmer:
+    """后台连接预热与保活"""
+
+    def __init__(
+        self,
+        connections: int = 2,
+        interval: float = 20.0,
+        jitter: float = 0.2,
+        timeout: float = 5.0,
+        include_gateway: bool = True,
+    ):
+        """
+        Args:
+            connections: 每个目标保持的连接数
+            interval: 保活间隔（秒）
+            jitter: 间隔抖动比例
+            timeout: 单次保活请求超时（秒）
+            include_gateway: 是否预热网关后端
+        """
+        self.connections = max(1, connections)
+        self.interval = max(1.0, interval)
+        self.jitter = min(max(0.0, jitter), 0.9)
+        self.timeout = timeout
+        self.include_gateway = include_gateway
+
+        self.stats: Dict[str, WarmTargetStats] = {}
+        self.rounds = 0
+        self.is_running = False
+        self._task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_env(cls) -> "ConnectionPrewarmer":
+        return cls(
+            connections=int(_get_env_float("CONNECTION_PREWARM_CONNECTIONS", 2)),
+            interval=_get_env_float("CONNECTION_PREWARM_INTERVAL_SECONDS", 20.0),
+            jitter=_get_env_float("CONNECTION_PREWARM_JITTER", 0.2),
+            timeout=_get_env_float("CONNECTION_PREWARM_TIMEOUT", 5.0),
+            include_gateway=_get_env_bool("CONNECTION_PREWARM_GATEWAY_BACKENDS", True),
+        )
+
+    def next_delay(self) -> float:
+        """下一轮的等待时间（带抖动，避免多个实例同时打点）"""
+        return self.interval * random.uniform(1.0 - self.jitter, 1.0 + self.jitter)
+
+    async def collect_targets(self) -> List[WarmTarget]:
+        return await collect_default_targets(self.include_gateway)
+
+    # ============ 单次预热 ============
+
+    async def _ping_shared(self, target: WarmTarget) -> Dict[str, Any]:
+        from src.httpx_client import http_client
+        return await http_client.check_connection(target.url, timeout=self.timeout)
+
+    async def _ping_backend(self, target: WarmTarget) -> Dict[str, Any]:
+        from src.gateway.backend_pool import get_backend_client_pool
+
+        started = time.perf_counter()
+        pool = get_backend_client_pool()
+        lease = None
+        failed = False
+        try:
+            # 与网关流式转发一样通过 acquire() 取后端的长连接客户端，预热的才是实际会复用的连接
+            lease = await pool.acquire(target.backend_key, target.url, target.backend_config)
+            response = await lease.client.head(target.url, timeout=self.timeout)
+        except Exception as e:
+            failed = True
+            return {"ok": False, "latency_ms": round((time.perf_counter() - started) * 1000, 1),
+                    "error": str(e) or type(e).__name__}
+        finally:
+            if lease is not None:
+                pool.release(lease, failed=failed)
+        return {"ok": True, "status_code": response.status_code,
+                "latency_ms": round((time.perf_counter() - started) * 1000, 1), "error": None}
+
+    @staticmethod
+    def _open_connections(target: WarmTarget) -> Optional[int]:
+        if not target.backend_key:
+            return None
+        from src.gateway.backend_pool import get_backend_client_pool
+        return get_backend_client_pool().get_stats(target.backend_key)["connections"]["open"]
+
+    async def warm_target(self, target: WarmTarget) -> WarmTargetStats:
+        """对一个目标并发发送 N 个保活请求，断开的连接由连接池重新建立"""
+        stats = self.stats.get(target.name)
+        if stats is None:
+            stats = self.stats[target.name] = WarmTargetStats()
+
+        ping = self._ping_backend if target.backend_key else self._ping_shared
+        before = self._open_connections(target)
+        results = await asyncio.gather(*(ping(target) for _ in range(self.connections)))
+        after = self._open_connections(target)
+
+        failed = [r for r in results if not r.get("ok")]
+        stats.pings += len(results)
+        stats.failures += len(failed)
+        stats.last_ping_at = time.time()
+        stats.last_latency_ms = max(r.get("latency_ms") or 0.0 for r in results)
+        stats.last_error = failed[-1].get("error") if failed else None
+        if before is not None and after is not None:
+            stats.connections_opened += max(0, after - before)
+            stats.open_connections = after
+        if failed and len(failed) == len(results):
+            log.debug(f"[Prewarm] {target.name} 保活失败: {stats.last_error}")
+        return stats
+
+    async def warm_once(self, targets: Optional[List[WarmTarget]] = None) -> None:
+        """执行一轮预热（所有目标并发）"""
+        if targets is None:
+            targets = await self.collect_targets()
+        await asyncio.gather(*(self.warm_target(target) for target in targets))
+        self.rounds += 1
+
+    # ============ 启停 ============
+
+    async def start(self) -> None:
+        if self.is_running:
+            return
+        self.is_running = True
+        self._task = asyncio.create_task(self._run())
+        log.info(
+            f"[Prewarm] ✓ 启动连接预热 (每个目标 {self.connections} 条连接, 间隔 {self.interval:.0f}s ±{self.jitter:.0%})"
+        )
+
+    async def stop(self) -> None:
+        self.is_running = False
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while self.is_running:
+            try:
+                await self.warm_once()
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                log.warning(f"[Prewarm] 预热轮次出错: {e}")
+            try:
+                await asyncio.sleep(self.next_delay())
+            except asyncio.CancelledError:
+                break
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.is_running,
+            "connections_per_target": self.connections,
+            "interval_seconds": self.interval,
+            "jitter": self.jitter,
+            "rounds": self.rounds,
+            "targets": {name: stats.to_dict() for name, stats in self.stats.items()},
+        }
+
+
+_connection_prewarmer: Optional[ConnectionPrewarmer] = None
+
+
+def get_connection_prewarmer() -> ConnectionPrewarmer:
+    """获取全局连接预热器"""
+    global _connection_prewarmer
+    if _connection_prewarmer is None:
+        _connection_prewarmer = ConnectionPrewarmer.from_env()
+    return _connection_prewarmer
+
+
+def is_connection_prewarm_enabled() -> bool:
+    return _get_env_bool("CONNECTION_PREWARM_ENABLED", False)
@@ -11,6 +11,8 @@ from log import log
 
 from .google_oauth_api import Credentials, fetch_user_email_from_file
 from .storage_adapter import get_storage_adapter
+from .concurrency_permits import get_antigravity_permit_manager
+from .token_refresher import parse_expiry_timestamp
 
 class CredentialManager:
     """
@@ -24,12 +26,17 @@ class CredentialManager:
         self._storage_adapter = None
 
         # 并发控制（简化）
+        # 注意：凭证选择不使用此锁，仅用于增删凭证等管理操作
         self._operation_lock = asyncio.Lock()
+
+        # Token 刷新 single-flight：(is_antigravity, filename) -> 正在进行的刷新任务
+        self._refresh_tasks: Dict[Tuple[bool, str], asyncio.Task] = {}
         
         # 高级防护模块（延迟初始化）
         self._background_scheduler = None
         self._quota_protection = None
         self._smart_warmup = None
+        self._token_refresher = None
 
     async def initialize(self):
         """初始化凭证管理器"""
@@ -52,6 +59,8 @@ class CredentialManager:
             self._background_scheduler.stop()
         if self._smart_warmup:
             self._smart_warmup.stop()
+        if self._token_refresher:
+            self._token_refresher.stop()
             
         self._initialized = False
         log.debug("Credential manager closed")
@@ -69,55 +78,64 @@ class CredentialManager:
                       - antigravity: 模型名称（如 "gemini-2.0-flash-exp"）
                       - gcli: "pro" 或 "flash"
         """
-        async with self._operation_lock:
-            # 使用 SQL 随机查询获取可用凭证
-            if hasattr(self._storage_adapter._backend, 'get_next_available_credential'):
-                # SQLite 后端：直接用智能 SQL（已经是随机选择）
-                # 注意：QuotaProtection 可能拒绝单个账号；此处做小循环尝试“下一个”，避免误判无可用账号
-                max_attempts = 10
-                for _ in range(max_attempts):
-                    result = await self._storage_adapter._backend.get_next_available_credential(
-                        is_antigravity=is_antigravity, model_key=model_key
-                    )
-                    if not result:
-                        return None
+        # 不持有全局锁：凭证池的选择本身是同步的内存操作，加载/权重刷新由后端自行加锁；
+        # 配额保护与 Token 刷新可能涉及网络往返，放在锁外执行，避免一个慢刷新阻塞所有请求
+        if hasattr(self._storage_adapter._backend, 'get_next_available_credential'):
+            # SQLite 后端：从内存凭证池加权随机选择
+            # 注意：QuotaProtection 可能拒绝单个账号；此处做小循环尝试“下一个”，避免误判无可用账号
+            # antigravity：优先选择还有空闲并发额度的凭证，避免请求堆积在已满的账号上
+            select_kwargs: Dict[str, Any] = {}
+            if is_antigravity:
+                select_kwargs["prefer"] = get_antigravity_permit_manager().has_free_permit
+            max_attempts = 10
+            for _ in range(max_attempts):
+                result = await self._storage_adapter._backend.get_next_available_credential(
+                    is_antigravity=is_antigravity, model_key=model_key, **select_kwargs
+                )
+                if not result:
+                    return None
 
-                    filename, credential_data = result
+                filename, credential_data = result
 
-                    # [高级防护] 配额保护检查
-                    if self._quota_protection and is_antigravity:
-                        is_ok = await self._quota_protection.check_and_protect(
-                            filename, credential_data, is_antigravity
-                        )
-                        if not is_ok:
-                            log.warning(f"[QuotaProtection] 凭证 {filename} 被保护，尝试下一个")
-                            continue
+                # [高级防护] 配额保护检查
+                if self._quota_protection and is_antigravity:
+                    is_ok = await self._quota_protection.check_and_protect(
+                        filename, credential_data, is_antigravity
+                    )
+                    if not is_ok:
+                        log.warning(f"[QuotaProtection] 凭证 {filename} 被保护，尝试下一个")
+                        continue
 
-                    # Token 刷新检查
-                    if await self._should_refresh_token(credential_data):
-                        log.debug(f"Token需要刷新 - 文件: {filename} (antigravity={is_antigravity})")
-                        refreshed_data = await self._refresh_token(
-                            credential_data, filename, is_antigravity=is_antigravity
-                        )
-                        if refreshed_data:
-                            credential_data = refreshed_data
-                            log.debug(f"Token刷新成功: {filename} (antigravity={is_antigravity})")
-                        else:
-                            log.error(f"Token刷新失败: {filename} (antigravity={is_antigravity})")
-                            continue
+                # Token 刷新检查（同一凭证的并发刷新合并为一次）
+                # 正常情况下由 TokenRefresher 提前续期，这里只是兜底
+                if await self._should_refresh_token(credential_data):
+                    log.debug(f"Token需要刷新 - 文件: {filename} (antigravity={is_antigravity})")
+                    refreshed_data = await self._refresh_token_single_flight(
+                        credential_data, filename, is_antigravity=is_antigravity
+                    )
+                    if self._token_refresher:
+                        self._token_refresher.record_request_path_refresh(bool(refreshed_data))
+                    if refreshed_data:
+                        credential_data = refreshed_data
+                        log.debug(f"Token刷新成功: {filename} (antigravity={is_antigravity})")
+                    else:
+                        log.error(f"Token刷新失败: {filename} (antigravity={is_antigravity})")
+                        continue
 
-                    return filename, credential_data
+                if self._token_refresher:
+                    self._token_refresher.touch(filename, credential_data, is_antigravity)
+                return filename, credential_data
 
-                log.warning(
-                    f"[CredentialManager] 无可用凭证（尝试{max_attempts}次）"
-                    f" antigravity={is_antigravity}, model_key={model_key}"
-                )
-                return None
-            else:
-                # MongoDB/Postgres 后端：使用传统方法（随机选择）
-                return await self._get_valid_credential_traditional(
-                    is_antigravity=is_antigravity, model_key=model_key
-                )
+            log.warning(
+                f"[CredentialManager] 无可用凭证（尝试{max_attempts}次）"
+                f" antigravity={is_antigravity}, model_key={model_key}"
+            )
+            return None
+        else:
+            # MongoDB/Postgres 后端：使用传统方法（随机选择）
+            return await self._get_valid_credential_traditional(
+                is_antigravity=is_antigravity, model_key=model_key
+            )
 
     async def get_earliest_model_cooldown(
         self,
@@ -134,6 +152,12 @@ class CredentialManager:
             if not model_key:
                 return None
 
+            # SQLite 后端：直接从内存凭证池的冷却堆获取
+            if hasattr(self._storage_adapter._backend, 'get_earliest_model_cooldown'):
+                return await self._storage_adapter._backend.get_earliest_model_cooldown(
+                    model_key, is_antigravity=is_antigravity
+                )
+
             all_creds = await self._storage_adapter.list_credentials(is_antigravity=is_antigravity)
             if not all_creds:
                 return None
@@ -212,12 +236,18 @@ class CredentialManager:
 
                 # Token 刷新
                 if await self._should_refresh_token(credential_data):
-                    refreshed_data = await self._refresh_token(credential_data, filename, is_antigravity=is_antigravity)
+                    refreshed_data = await self._refresh_token_single_flight(
+                        credential_data, filename, is_antigravity=is_antigravity
+                    )
+                    if self._token_refresher:
+                        self._token_refresher.record_request_path_refresh(bool(refreshed_data))
                     if refreshed_data:
                         credential_data = refreshed_data
                     else:
                         continue
 
+                if self._token_refresher:
+                    self._token_refresher.touch(filename, credential_data, is_antigravity)
                 return filename, credential_data
 
             except Exception as e:
@@ -233,6 +263,8 @@ class CredentialManager:
         """
         async with self._operation_lock:
             await self._storage_adapter.store_credential(credential_name, credential_data)
+            if self._token_refresher:
+                self._token_refresher.schedule(credential_name, credential_data)
             log.info(f"Credential added/updated: {credential_name}")
 
     async def add_antigravity_credential(self, credential_name: str, credential_data: Dict[str, Any]):
@@ -242,6 +274,8 @@ class CredentialManager:
         """
         async with self._operation_lock:
             await self._storage_adapter.store_credential(credential_name, credential_data, is_antigravity=True)
+            if self._token_refresher:
+                self._token_refresher.schedule(credential_name, credential_data, is_antigravity=True)
             log.info(f"Antigravity credential added/updated: {credential_name}")
 
     async def remove_credential(self, credential_name: str) -> bool:
@@ -249,6 +283,8 @@ class CredentialManager:
         async with self._operation_lock:
             try:
                 await self._storage_adapter.delete_credential(credential_name)
+                if self._token_refresher:
+                    self._token_refresher.unschedule(credential_name)
                 log.info(f"Credential removed: {credential_name}")
                 return True
             except Exception as e:
@@ -394,6 +430,24 @@ class CredentialManager:
             model_key: 模型键（用于设置模型级冷却）
         """
         try:
+            backend = self._storage_adapter._backend
+            if hasattr(backend, 'record_call_result'):
+                # 只更新内存并入队，数据库写入由后台批量完成，不阻塞首包
+                backend.record_call_result(
+                    credential_name,
+                    success,
+                    error_code=error_code,
+                    model_key=model_key,
+                    cooldown_until=cooldown_until,
+                    is_antigravity=is_antigravity,
+                )
+                if not success and error_code and cooldown_until is not None and model_key:
+                    log.info(
+                        f"设置模型级冷却: {credential_name}, model_key={model_key}, "
+                        f"冷却至: {datetime.fromtimestamp(cooldown_until, timezone.utc).isoformat()}"
+                    )
+                return
+
             state_updates = {}
 
             if success:
@@ -451,48 +505,53 @@ class CredentialManager:
                 log.debug("没有过期时间，需要刷新")
                 return True
 
-            # 解析过期时间
-            try:
-                if isinstance(expiry_str, str):
-                    if "+" in expiry_str:
-                        file_expiry = datetime.fromisoformat(expiry_str)
-                    elif expiry_str.endswith("Z"):
-                        file_expiry = datetime.fromisoformat(expiry_str.replace("Z", "+00:00"))
-                    else:
-                        file_expiry = datetime.fromisoformat(expiry_str)
-                else:
-                    log.debug("过期时间格式无效，需要刷新")
-                    return True
-
-                # 确保时区信息
-                if file_expiry.tzinfo is None:
-                    file_expiry = file_expiry.replace(tzinfo=timezone.utc)
-
-                # 检查是否还有至少5分钟有效期
-                now = datetime.now(timezone.utc)
-                time_left = (file_expiry - now).total_seconds()
-
-                log.debug(
-                    f"Token时间检查: "
-                    f"当前UTC时间={now.isoformat()}, "
-                    f"过期时间={file_expiry.isoformat()}, "
-                    f"剩余时间={int(time_left/60)}分{int(time_left%60)}秒"
-                )
+            # 解析过期时间（按字符串缓存，避免每次选择都重新解析）
+            expiry_ts = parse_expiry_timestamp(expiry_str)
+            if expiry_ts is None:
+                log.warning(f"解析过期时间失败: {expiry_str!r}，需要刷新")
+                return True
 
-                if time_left > 300:  # 5分钟缓冲
-                    return False
-                else:
-                    log.debug(f"Token即将过期（剩余{int(time_left/60)}分钟），需要刷新")
-                    return True
+            # 检查是否还有至少5分钟有效期
+            time_left = expiry_ts - time.time()
+            if time_left > 300:  # 5分钟缓冲
+                return False
 
-            except Exception as e:
-                log.warning(f"解析过期时间失败: {e}，需要刷新")
-                return True
+            log.debug(f"Token即将过期（剩余{int(time_left/60)}分钟），需要刷新")
+            return True
 
         except Exception as e:
             log.error(f"检查token过期时出错: {e}")
             return True
 
+    async def _refresh_token_single_flight(
+        self, credential_data: Dict[str, Any], filename: str, is_antigravity: bool = False
+    ) -> Optional[Dict[str, Any]]:
+        """
+        刷新 token（按凭证 single-flight）
+
+        同一凭证的并发刷新共享同一个任务，只发起一次 OAuth 往返；
+        等待方被取消时不会取消共享的刷新任务。
+        """
+        key = (is_antigravity, filename)
+        task = self._refresh_tasks.get(key)
+        if task is None or task.done():
+            task = asyncio.create_task(
+                self._refresh_token(credential_data, filename, is_antigravity=is_antigravity)
+            )
+            self._refresh_tasks[key] = task
+
+            def _cleanup(t: asyncio.Task, key=key) -> None:
+                if self._refresh_tasks.get(key) is t:
+                    self._refresh_tasks.pop(key, None)
+
+            task.add_done_callback(_cleanup)
+        else:
+            log.debug(f"Token刷新已在进行中，等待共享结果: {filename} (antigravity={is_antigravity})")
+
+        result = await asyncio.shield(task)
+        # 每个调用方拿到独立副本，避免共享可变字典
+        return dict(result) if result else None
+
     async def _refresh_token(
         self, credential_data: Dict[str, Any], filename: str, is_antigravity: bool = False
     ) -> Optional[Dict[str, Any]]:
@@ -529,6 +588,10 @@ class CredentialManager:
             await self._storage_adapter.store_credential(filename, credential_data, is_antigravity=is_antigravity)
             log.info(f"Token刷新成功并已保存: {filename} (antigravity={is_antigravity})")
 
+            # 按新的过期时间重新加入预刷新调度表
+            if self._token_refresher:
+                self._token_refresher.schedule(filename, credential_data, is_antigravity)
+
             return credential_data
 
         except Exception as e:
@@ -640,6 +703,15 @@ class CredentialManager:
             else:
                 log.info("[CredentialManager] 后台刷新未启用")
             
+            # 初始化 Token 预刷新调度器
+            import os
+            if os.getenv("TOKEN_REFRESH_ENABLED", "true").lower() in ("true", "1", "yes", "on"):
+                from .token_refresher import TokenRefresher
+                self._token_refresher = TokenRefresher(self)
+                await self._token_refresher.start()
+            else:
+                log.info("[CredentialManager] Token 预刷新未启用")
+
             # 初始化智能预热模块
             from .smart_warmup import SmartWarmup
             self._smart_warmup = SmartWarmup(self)
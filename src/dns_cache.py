@@ -0,0 +1,359 @@
+"""
+DNS 缓存 - DNS Cache
+
+每个新建的 HTTP 客户端都会重新解析上游主机名（OAuth、googleapis、Antigravity BaseURL、Copilot、Kiro），
+突发流量下 DNS 延迟和解析器压力都会叠加。本模块提供进程内共享的异步 DNS 缓存：
+- 按记录 TTL 缓存（解析器不返回 TTL 时使用默认 TTL），并限制在 [MIN_TTL, MAX_TTL] 内
+- 命中时若已接近过期，在后台提前刷新（refresh-ahead），热点主机不会在请求路径上等待解析
+- 同一主机的并发解析合并为一次（single-flight）
+- 刷新失败时在 MAX_STALE 内继续使用旧地址
+- 命中 / 未命中 / 刷新等计数通过 get_stats() 暴露
+- 解析器可替换（resolve(host) -> (地址列表, TTL)），测试中可注入本地桩解析器
+
+通过 install_dns_cache(client) 接入 httpx 客户端（替换 httpcore 的网络后端），
+所有由本进程创建的 httpx 客户端共享 get_dns_cache() 返回的全局缓存。
+curl_cffi 会话使用 libcurl 自带的会话级 DNS 缓存，不经过本模块。
+
+配置（环境变量）:
+- DNS_CACHE_ENABLED: 是否启用（默认 true）
+- DNS_CACHE_RESOLVER: system（默认，loop.getaddrinfo，遵循 /etc/hosts）或 dnspython（返回记录 TTL，需安装 dnspython）
+- DNS_CACHE_DEFAULT_TTL: 解析器不返回 TTL 时的缓存时长（秒，默认 60）
+- DNS_CACHE_MIN_TTL / DNS_CACHE_MAX_TTL: TTL 上下限（秒，默认 5 / 600）
+- DNS_CACHE_REFRESH_AHEAD: 已用 TTL 比例超过该值时后台刷新（默认 0.8）
+- DNS_CACHE_MAX_STALE: 刷新失败时旧地址的最长可用时间（秒，默认 300）
+"""
+
+import asyncio
+import ipaddress
+import os
+import socket
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Protocol, Tuple
+
+import httpcore
+
+from log import log
+
+
+def _get_env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+def _dns_cache_enabled() -> bool:
+    return os.getenv("DNS_CACHE_ENABLED", "true").lower() in ("true", "1", "yes", "on")
+
+
+class Resolver(Protocol):
+    """解析器接口：返回地址列表与 TTL（秒，未知时为 None）"""
+
+    async def resolve(self, host: str) -> Tuple[List[str], Optional[float]]:
+        ...
+
+
+class SystemResolver:
+    """系统解析器（loop.getaddrinfo），不提供 TTL"""
+
+    async def resolve(self, host: str) -> Tuple[List[str], Optional[float]]:
+        infos = await asyncio.get_running_loop().getaddrinfo(host, None, type=socket.SOCK_STREAM)
+        addresses: List[str] = []
+        for _family, _type, _proto, _canonname, sockaddr in infos:
+            address = sockaddr[0]
+            if address not in addresses:
+                addresses.append(address)
+        return addresses, None
+
+
+class DnspythonResolver:
+    """
+    基于 dnspython 的解析器，返回记录 TTL
+
+    dnspython 不读取 /etc/hosts，查询不到的主机名回退到系统解析器。
+    """
+
+    def __init__(self):
+        import dns.asyncresolver
+
+        self._resolver = dns.asyncresolver.Resolver()
+        self._fallback = SystemResolver()
+
+    async def resolve(self, host: str) -> Tuple[List[str], Optional[float]]:
+        import dns.exception
+
+        addresses: List[str] = []
+        ttls: List[float] = []
+        for rdtype in ("A", "AAAA"):
+            try:
+                answer = await self._resolver.resolve(host, rdtype)
+            except dns.exception.DNSException:
+                continue
+            addresses.extend(record.address for record in answer)
+            ttls.append(float(answer.rrset.ttl))
+        if not addresses:
+            return await self._fallback.resolve(host)
+        return addresses, min(ttls)
+
+
+def _default_resolver() -> Resolver:
+    if os.getenv("DNS_CACHE_RESOLVER", "system").lower() == "dnspython":
+        try:
+            return DnspythonResolver()
+        except ImportError:
+            log.warning("[DNS CACHE] 未安装 dnspython，使用系统解析器")
+    return SystemResolver()
+
+
+@dataclass
+class _DNSEntry:
+    addresses: List[str]
+    ttl: float
+    resolved_at: float
+
+
+@dataclass
+class DNSCacheStats:
+    """DNS 缓存统计"""
+
+    hits: int = 0
+    misses: int = 0
+    # 刷新失败、使用旧地址的次数
+    stale_hits: int = 0
+    refreshes: int = 0
+    refresh_failures: int = 0
+    errors: int = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale_hits": self.stale_hits,
+            "refreshes": self.refreshes,
+            "refresh_failures": self.refresh_failures,
+            "errors": self.errors,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+        }
+
+
+def _is_ip_address(host: str) -> bool:
+    try:
+        ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return True
+
+
+class DNSCache:
+    """带 TTL、后台刷新与 single-flight 的异步 DNS 缓存"""
+
+    def __init__(
+        self,
+        resolver: Optional[Resolver] = None,
+        *,
+        default_ttl: Optional[float] = None,
+        min_ttl: Optional[float] = None,
+        max_ttl: Optional[float] = None,
+        refresh_ahead: Optional[float] = None,
+        max_stale: Optional[float] = None,
+    ):
+        """
+        Args:
+            resolver: 解析器，默认按 DNS_CACHE_RESOLVER 选择
+            其余参数默认读取对应的 DNS_CACHE_* 环境变量
+        """
+        self.resolver = resolver if resolver is not None else _default_resolver()
+        self.default_ttl = default_ttl if default_ttl is not None else _get_env_float("DNS_CACHE_DEFAULT_TTL", 60.0)
+        self.min_ttl = min_ttl if min_ttl is not None else _get_env_float("DNS_CACHE_MIN_TTL", 5.0)
+        self.max_ttl = max_ttl if max_ttl is not None else _get_env_float("DNS_CACHE_MAX_TTL", 600.0)
+        self.refresh_ahead = (
+            refresh_ahead if refresh_ahead is not None else _get_env_float("DNS_CACHE_REFRESH_AHEAD", 0.8)
+        )
+        self.max_stale = max_stale if max_stale is not None else _get_env_float("DNS_CACHE_MAX_STALE", 300.0)
+        self.stats = DNSCacheStats()
+        self._entries: Dict[str, _DNSEntry] = {}
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _check_loop(self) -> None:
+        """解析任务绑定事件循环；循环变化时丢弃进行中的任务（缓存的地址保留）"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._inflight = {}
+            self._loop = loop
+
+    async def resolve(self, host: str) -> List[str]:
+        """
+        解析主机名，返回地址列表（IP 字面量原样返回）
+
+        Raises:
+            OSError: 首次解析失败，或旧地址已超过 MAX_STALE 且刷新失败
+        """
+        if _is_ip_address(host):
+            return [host]
+        self._check_loop()
+        host = host.lower()
+
+        entry = self._entries.get(host)
+        if entry is not None:
+            age = time.monotonic() - entry.resolved_at
+            if age < entry.ttl:
+                self.stats.hits += 1
+                if age >= entry.ttl * self.refresh_ahead:
+                    self._refresh(host)
+                return entry.addresses
+
+        self.stats.misses += 1
+        # 调用方被取消（如连接超时）时不取消共享的解析
+        return await asyncio.shield(self._refresh(host))
+
+    def invalidate(self, host: Optional[str] = None) -> None:
+        if host is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(host.lower(), None)
+
+    def _refresh(self, host: str) -> asyncio.Task:
+        task = self._inflight.get(host)
+        if task is None:
+            task = asyncio.ensure_future(self._load(host))
+            self._inflight[host] = task
+            task.add_done_callback(lambda t: self._on_refresh_done(host, t))
+        return task
+
+    def _on_refresh_done(self, host: str, task: asyncio.Task) -> None:
+        if self._inflight.get(host) is task:
+            del self._inflight[host]
+        # 后台刷新无人等待时也要取走异常，避免 "exception was never retrieved"
+        if not task.cancelled():
+            task.exception()
+
+    async def _load(self, host: str) -> List[str]:
+        previous = self._entries.get(host)
+        if previous is not None:
+            self.stats.refreshes += 1
+        try:
+            addresses, ttl = await self.resolver.resolve(host)
+            if not addresses:
+                raise OSError(f"No addresses for {host}")
+        except Exception as e:
+            if previous is not None and time.monotonic() - previous.resolved_at < previous.ttl + self.max_stale:
+                self.stats.refresh_failures += 1
+                self.stats.stale_hits += 1
+                log.warning(f"[DNS CACHE] Refresh of {host} failed, using cached addresses: {e}")
+                return previous.addresses
+            self.stats.errors += 1
+            if isinstance(e, OSError):
+                raise
+            raise OSError(f"Failed to resolve {host}: {e}") from e
+
+        ttl = self.default_ttl if ttl is None else ttl
+        ttl = min(max(ttl, self.min_ttl), self.max_ttl)
+        self._entries[host] = _DNSEntry(addresses=list(addresses), ttl=ttl, resolved_at=time.monotonic())
+        return self._entries[host].addresses
+
+    def get_stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {
+            "enabled": _dns_cache_enabled(),
+            "resolver": type(self.resolver).__name__,
+            "hosts": {
+                host: {
+                    "addresses": entry.addresses,
+                    "ttl": entry.ttl,
+                    "age_seconds": round(now - entry.resolved_at, 1),
+                }
+                for host, entry in self._entries.items()
+            },
+            **self.stats.to_dict(),
+        }
+
+
+class CachedDNSBackend(httpcore.AsyncNetworkBackend):
+    """
+    使用 DNSCache 解析主机名的 httpcore 网络后端
+
+    按解析结果依次尝试连接各地址；全部失败时使该主机的缓存失效，下次重新解析。
+    TLS 的 SNI 与证书校验使用请求的主机名（由 httpcore 在 start_tls 时传入），不受影响。
+    """
+
+    def __init__(self, cache: DNSCache, inner: Optional[httpcore.AsyncNetworkBackend] = None):
+        self.cache = cache
+        self.inner = inner if inner is not None else httpcore.AnyIOBackend()
+
+    async def connect_tcp(
+        self,
+        host: str,
+        port: int,
+        timeout: Optional[float] = None,
+        local_address: Optional[str] = None,
+        socket_options: Optional[Iterable[Any]] = None,
+    ) -> httpcore.AsyncNetworkStream:
+        try:
+            addresses = await self.cache.resolve(host)
+        except OSError as e:
+            raise httpcore.ConnectError(str(e) or f"Failed to resolve {host}") from e
+
+        socket_options = list(socket_options) if socket_options is not None else None
+        last_error: Optional[Exception] = None
+        for address in addresses:
+            try:
+                return await self.inner.connect_tcp(
+                    address,
+                    port,
+                    timeout=timeout,
+                    local_address=local_address,
+                    socket_options=socket_options,
+                )
+            except (httpcore.ConnectError, httpcore.ConnectTimeout) as e:
+                last_error = e
+        self.cache.invalidate(host)
+        assert last_error is not None
+        raise last_error
+
+    async def connect_unix_socket(
+        self,
+        path: str,
+        timeout: Optional[float] = None,
+        socket_options: Optional[Iterable[Any]] = None,
+    ) -> httpcore.AsyncNetworkStream:
+        return await self.inner.connect_unix_socket(path, timeout=timeout, socket_options=socket_options)
+
+    async def sleep(self, seconds: float) -> None:
+        await self.inner.sleep(seconds)
+
+
+def install_dns_cache(client: Any, cache: Optional["DNSCache"] = None) -> Any:
+    """
+    让 httpx.AsyncClient 的所有传输（含代理挂载）通过共享 DNS 缓存解析主机名
+
+    非 httpx 客户端或 DNS_CACHE_ENABLED=false 时原样返回。
+
+    Returns:
+        传入的客户端
+    """
+    if not _dns_cache_enabled():
+        return client
+    cache = cache if cache is not None else get_dns_cache()
+    transports = [getattr(client, "_transport", None), *getattr(client, "_mounts", {}).values()]
+    for transport in transports:
+        # httpx.AsyncHTTPTransport 把连接委托给 httpcore 连接池（含 HTTP/SOCKS 代理池）
+        pool = getattr(transport, "_pool", None)
+        backend = getattr(pool, "_network_backend", None)
+        if backend is None or isinstance(backend, CachedDNSBackend):
+            continue
+        pool._network_backend = CachedDNSBackend(cache, backend)
+    return client
+
+
+# 全局 DNS 缓存
+_dns_cache: Optional[DNSCache] = None
+
+
+def get_dns_cache() -> DNSCache:
+    global _dns_cache
+    if _dns_cache is None:
+        _dns_cache = DNSCache()
+    return _dns_cache
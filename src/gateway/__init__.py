@@ -12,6 +12,7 @@ Gateway 模块 - 统一网关路由
 - config.py: 后端配置 (BACKENDS, KIRO_GATEWAY_MODELS, RETRY_CONFIG)
 - routing.py: 路由决策 (get_backend_for_model, get_sorted_backends)
 - proxy.py: 代理请求 (proxy_request_to_backend, route_request_with_fallback)
+- backend_pool.py: 后端长连接客户端池 (get_backend_client_pool)
 - normalization.py: 请求规范化 (normalize_request_body, normalize_tools)
 - tool_loop.py: 工具循环 (stream_openai_with_tool_loop)
 - endpoints/: API 端点定义
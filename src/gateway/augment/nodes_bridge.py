@@ -13,6 +13,7 @@ from typing import Dict, Any, List, AsyncGenerator, Optional
 import json
 import time
 
+from ..sse.decoder import iter_sse_events
 from .state import bugment_tool_state_put, bugment_tool_state_get
 
 # 延迟导入 log，避免循环依赖
@@ -301,76 +302,56 @@ async def stream_openai_with_nodes_bridge(
         stream=True,
     )
 
-    buffer = ""
     tool_calls_by_index: Dict[int, Dict[str, Any]] = {}
     saw_tool_calls = False
-    saw_done = False
 
-    async for chunk in sse_stream:
-        if not chunk:
-            continue
-        if isinstance(chunk, bytes):
-            chunk = chunk.decode("utf-8", errors="ignore")
-        buffer += chunk
-
-        while "\n" in buffer:
-            line, buffer = buffer.split("\n", 1)
-            line = line.strip()
-            if not line or not line.startswith("data: "):
-                continue
-
-            json_str = line[6:].strip()
-            if json_str == "[DONE]":
-                buffer = ""
-                saw_done = True
-                break
+    async for event in iter_sse_events(sse_stream):
+        if event.is_done:
+            break
 
-            try:
-                evt = json.loads(json_str)
-            except Exception:
-                continue
+        try:
+            evt = event.json()
+        except Exception:
+            continue
 
-            choices = evt.get("choices") or []
-            if not choices:
-                continue
-            choice0 = choices[0] if isinstance(choices[0], dict) else None
-            if not choice0:
-                continue
+        choices = evt.get("choices") or []
+        if not choices:
+            continue
+        choice0 = choices[0] if isinstance(choices[0], dict) else None
+        if not choice0:
+            continue
 
-            # Text streaming
-            delta = choice0.get("delta") or {}
-            content = delta.get("content")
-            if isinstance(content, str) and content:
-                yield json.dumps({"text": content}, ensure_ascii=False, separators=(",", ":")) + "\n"
-
-            # Tool calls streaming (OpenAI-like)
-            tool_calls = delta.get("tool_calls") or []
-            if isinstance(tool_calls, list) and tool_calls:
-                saw_tool_calls = True
-                for tc in tool_calls:
-                    if not isinstance(tc, dict):
-                        continue
-                    idx = tc.get("index", 0)
-                    if not isinstance(idx, int):
-                        idx = 0
-                    cur = tool_calls_by_index.setdefault(idx, {"id": None, "type": "function", "function": {"name": None, "arguments": ""}})
-                    if isinstance(tc.get("id"), str):
-                        cur["id"] = tc["id"]
-                    if isinstance(tc.get("type"), str):
-                        cur["type"] = tc["type"]
-                    func = tc.get("function")
-                    if isinstance(func, dict):
-                        if isinstance(func.get("name"), str):
-                            cur["function"]["name"] = func["name"]
-                        if isinstance(func.get("arguments"), str):
-                            cur["function"]["arguments"] += func["arguments"]
-
-            finish_reason = choice0.get("finish_reason")
-            if finish_reason in ("tool_calls", "function_call"):
-                saw_tool_calls = True
-
-        if saw_done:
-            break
+        # Text streaming
+        delta = choice0.get("delta") or {}
+        content = delta.get("content")
+        if isinstance(content, str) and content:
+            yield json.dumps({"text": content}, ensure_ascii=False, separators=(",", ":")) + "\n"
+
+        # Tool calls streaming (OpenAI-like)
+        tool_calls = delta.get("tool_calls") or []
+        if isinstance(tool_calls, list) and tool_calls:
+            saw_tool_calls = True
+            for tc in tool_calls:
+                if not isinstance(tc, dict):
+                    continue
+                idx = tc.get("index", 0)
+                if not isinstance(idx, int):
+                    idx = 0
+                cur = tool_calls_by_index.setdefault(idx, {"id": None, "type": "function", "function": {"name": None, "arguments": ""}})
+                if isinstance(tc.get("id"), str):
+                    cur["id"] = tc["id"]
+                if isinstance(tc.get("type"), str):
+                    cur["type"] = tc["type"]
+                func = tc.get("function")
+                if isinstance(func, dict):
+                    if isinstance(func.get("name"), str):
+                        cur["function"]["name"] = func["name"]
+                    if isinstance(func.get("arguments"), str):
+                        cur["function"]["arguments"] += func["arguments"]
+
+        finish_reason = choice0.get("finish_reason")
+        if finish_reason in ("tool_calls", "function_call"):
+            saw_tool_calls = True
 
     if saw_tool_calls and tool_calls_by_index:
         nodes: List[Dict[str, Any]] = []
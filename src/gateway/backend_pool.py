@@ -0,0 +1,306 @@
+"""
+Gateway 后端连接池模块
+
+为 BACKENDS 中的每个后端维护一个长连接 httpx 客户端：
+- 流式与非流式请求、重试、健康检查共享同一个客户端，复用已建立的 keep-alive 连接
+- 连接数与 keep-alive 可按后端配置（max_connections / max_keepalive / keepalive_expiry），
+  未配置时使用环境变量默认值
+- 超时按请求传入，不需要为不同超时新建客户端
+- 全局代理只用于非本机地址的后端（本机的 Kiro / Copilot / Antigravity 不走代理）；
+  代理变化时旧客户端在最后一个请求结束后关闭
+- 非本机后端（如 AnyRouter）的 client() 请求仍借用 http_client 的共享池，保留 curl_cffi TLS 指纹伪装
+  （代理由 http_client 按全局配置处理）；流式请求的 acquire() 与原先一样使用原生 httpx
+
+配置（环境变量）:
+- GATEWAY_POOL_MAX_CONNECTIONS: 每个后端的最大连接数（默认 50）
+- GATEWAY_POOL_MAX_KEEPALIVE: 每个后端保持的空闲连接数（默认 20）
+- GATEWAY_POOL_KEEPALIVE_EXPIRY: 空闲连接保持时间（秒，默认 60）
+"""
+
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, AsyncGenerator, Dict, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+from src.dns_cache import install_dns_cache
+
+try:
+    from log import log
+except ImportError:
+    import logging
+    log = logging.getLogger(__name__)
+
+__all__ = [
+    "BackendClientPool",
+    "BackendPoolStats",
+    "get_backend_client_pool",
+]
+
+_LOOPBACK_HOSTS = ("127.0.0.1", "localhost", "::1", "0.0.0.0")
+
+
+def _get_env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, "") or default)
+    except ValueError:
+        return default
+
+
+def _get_env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, "") or default)
+    except ValueError:
+        return default
+
+
+def _is_loopback(url: str) -> bool:
+    host = (urlsplit(url).hostname or "").lower()
+    return host in _LOOPBACK_HOSTS or host.startswith("127.")
+
+
+async def _resolve_proxy(url: str) -> Optional[str]:
+    """本机后端不走代理；其他后端使用全局代理配置（支持热更新）"""
+    if _is_loopback(url):
+        return None
+    try:
+        from config import get_proxy_config
+    except ImportError:
+        return None
+    return await get_proxy_config() or None
+
+
+@dataclass
+class BackendPoolStats:
+    """单个后端的连接池统计"""
+
+    requests: int = 0
+    errors: int = 0
+    in_flight: int = 0
+    peak_in_flight: int = 0
+    clients_created: int = 0
+    clients_closed: int = 0
+    proxy_rebuilds: int = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "in_flight": self.in_flight,
+            "peak_in_flight": self.peak_in_flight,
+            "clients_created": self.clients_created,
+            "clients_closed": self.clients_closed,
+            "proxy_rebuilds": self.proxy_rebuilds,
+        }
+
+
+@dataclass
+class _BackendEntry:
+    """某个后端当前（或已淘汰）的客户端"""
+
+    backend_key: str
+    proxy: Optional[str]
+    client: httpx.AsyncClient
+    created_at: float = field(default_factory=time.time)
+    # 正在使用该客户端的请求数；被淘汰的客户端在归零后关闭
+    in_flight: int = 0
+    retired: bool = False
+
+
+class BackendClientPool:
+    """
+    按后端划分的长连接客户端池
+
+    Usage:
+        pool = get_backend_client_pool()
+        async with pool.client("copilot", url, BACKENDS["copilot"]) as client:
+            response = await client.post(url, json=body, timeout=60.0)
+
+        # 流式请求需要跨越生成器生命周期时使用 acquire/release
+        lease = await pool.acquire("copilot", url, BACKENDS["copilot"])
+        try:
+            async with lease.client.stream("POST", url, json=body, timeout=timeout) as response:
+                ...
+        finally:
+            pool.release(lease)
+    """
+
+    def __init__(self):
+        self._entries: Dict[str, _BackendEntry] = {}
+        self._stats: Dict[str, BackendPoolStats] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _check_loop(self) -> None:
+        """客户端绑定事件循环；循环变化（如测试中重建循环）时丢弃旧客户端"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._entries = {}
+            self._loop = loop
+
+    def _stats_for(self, backend_key: str) -> BackendPoolStats:
+        stats = self._stats.get(backend_key)
+        if stats is None:
+            stats = self._stats[backend_key] = BackendPoolStats()
+        return stats
+
+    @staticmethod
+    def _limits(config: Optional[Dict[str, Any]]) -> httpx.Limits:
+        config = config or {}
+        return httpx.Limits(
+            max_connections=max(1, int(config.get(
+                "max_connections", _get_env_int("GATEWAY_POOL_MAX_CONNECTIONS", 50)
+            ))),
+            max_keepalive_connections=max(0, int(config.get(
+                "max_keepalive", _get_env_int("GATEWAY_POOL_MAX_KEEPALIVE", 20)
+            ))),
+            keepalive_expiry=float(config.get(
+                "keepalive_expiry", _get_env_float("GATEWAY_POOL_KEEPALIVE_EXPIRY", 60.0)
+            )),
+        )
+
+    async def acquire(
+        self, backend_key: str, url: str, config: Optional[Dict[str, Any]] = None
+    ) -> _BackendEntry:
+        """
+        获取后端的共享客户端，调用方必须在请求结束后调用 release()
+
+        Args:
+            backend_key: 后端标识
+            url: 本次请求的 URL（用于判断是否走代理）
+            config: 后端配置（读取连接数与 keep-alive 设置）
+        """
+        self._check_loop()
+        proxy = await _resolve_proxy(url)
+        stats = self._stats_for(backend_key)
+
+        entry = self._entries.get(backend_key)
+        if entry is not None and entry.proxy != proxy:
+            stats.proxy_rebuilds += 1
+            log.info(f"[GATEWAY POOL] {backend_key} 代理配置已变化，重建客户端")
+            self._retire(entry)
+            entry = None
+        if entry is None:
+            client = install_dns_cache(
+                httpx.AsyncClient(proxy=proxy, limits=self._limits(config), timeout=None)
+            )
+            entry = self._entries[backend_key] = _BackendEntry(backend_key, proxy, client)
+            stats.clients_created += 1
+            log.debug(f"[GATEWAY POOL] 创建后端客户端 {backend_key}")
+
+        entry.in_flight += 1
+        self._begin(backend_key)
+        return entry
+
+    def release(self, entry: _BackendEntry, failed: bool = False) -> None:
+        """归还客户端；failed 表示本次请求以异常结束"""
+        self._end(entry.backend_key, failed)
+        entry.in_flight -= 1
+        if entry.retired and entry.in_flight <= 0:
+            self._close(entry)
+
+    def _begin(self, backend_key: str) -> None:
+        stats = self._stats_for(backend_key)
+        stats.requests += 1
+        stats.in_flight += 1
+        if stats.in_flight > stats.peak_in_flight:
+            stats.peak_in_flight = stats.in_flight
+
+    def _end(self, backend_key: str, failed: bool) -> None:
+        stats = self._stats_for(backend_key)
+        stats.in_flight -= 1
+        if failed:
+            stats.errors += 1
+
+    @asynccontextmanager
+    async def client(
+        self, backend_key: str, url: str, config: Optional[Dict[str, Any]] = None
+    ) -> AsyncGenerator[Any, None]:
+        """
+        在上下文内使用后端的共享客户端（不要关闭它）
+
+        本机后端得到该后端的长连接 httpx 客户端；非本机后端借用 http_client 的共享池
+        （curl_cffi TLS 指纹伪装），请求同样计入该后端的统计
+        """
+        if not _is_loopback(url):
+            from src.httpx_client import http_client
+
+            self._begin(backend_key)
+            failed = False
+            try:
+                async with http_client.get_client() as client:
+                    yield client
+            except BaseException:
+                failed = True
+                raise
+            finally:
+                self._end(backend_key, failed)
+            return
+
+        entry = await self.acquire(backend_key, url, config)
+        failed = False
+        try:
+            yield entry.client
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            self.release(entry, failed=failed)
+
+    def _retire(self, entry: _BackendEntry) -> None:
+        if self._entries.get(entry.backend_key) is entry:
+            del self._entries[entry.backend_key]
+        entry.retired = True
+        if entry.in_flight <= 0:
+            self._close(entry)
+
+    def _close(self, entry: _BackendEntry) -> None:
+        self._stats_for(entry.backend_key).clients_closed += 1
+        asyncio.get_running_loop().create_task(entry.client.aclose())
+
+    async def close_all(self) -> None:
+        """关闭所有后端客户端（应用关闭时调用）"""
+        entries = list(self._entries.values())
+        self._entries = {}
+        for entry in entries:
+            entry.retired = True
+            self._stats_for(entry.backend_key).clients_closed += 1
+            try:
+                await entry.client.aclose()
+            except Exception:
+                pass
+
+    @staticmethod
+    def _connection_counts(client: httpx.AsyncClient) -> Dict[str, int]:
+        connections = getattr(getattr(client._transport, "_pool", None), "connections", None) or []
+        idle = sum(1 for conn in connections if conn.is_idle())
+        return {"open": len(connections), "idle": idle, "active": len(connections) - idle}
+
+    def get_stats(self, backend_key: str) -> Dict[str, Any]:
+        """单个后端的连接池统计（用于 /gateway/health）"""
+        result = self._stats_for(backend_key).to_dict()
+        entry = self._entries.get(backend_key)
+        if entry is not None:
+            result["connections"] = self._connection_counts(entry.client)
+            result["proxy"] = bool(entry.proxy)
+            result["age_seconds"] = round(time.time() - entry.created_at, 1)
+        else:
+            result["connections"] = {"open": 0, "idle": 0, "active": 0}
+        return result
+
+    def get_all_stats(self) -> Dict[str, Dict[str, Any]]:
+        return {backend_key: self.get_stats(backend_key) for backend_key in self._stats}
+
+
+_backend_client_pool: Optional[BackendClientPool] = None
+
+
+def get_backend_client_pool() -> BackendClientPool:
+    """获取网关后端连接池单例"""
+    global _backend_client_pool
+    if _backend_client_pool is None:
+        _backend_client_pool = BackendClientPool()
+    return _backend_client_pool
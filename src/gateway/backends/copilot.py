@@ -16,6 +16,7 @@ import json
 from .interface import GatewayBackend, BackendConfig
 from src.gateway.config import BACKENDS, map_model_for_copilot
 from src.utils import log
+from src.dns_cache import install_dns_cache
 from src.httpx_client import safe_close_client
 
 __all__ = ["CopilotBackend"]
@@ -186,10 +187,10 @@ class CopilotBackend:
             httpx.AsyncClient 实例
         """
         if self._http_client is None:
-            self._http_client = httpx.AsyncClient(
+            self._http_client = install_dns_cache(httpx.AsyncClient(
                 timeout=httpx.Timeout(self._config.timeout),
                 follow_redirects=True,
-            )
+            ))
         return self._http_client
 
     async def _handle_proxy_request(
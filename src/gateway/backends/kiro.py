@@ -23,6 +23,7 @@ from .interface import GatewayBackend, BackendConfig
 from src.gateway.config import BACKENDS, KIRO_GATEWAY_MODELS
 from src.gateway.routing import is_kiro_gateway_supported, KIRO_GATEWAY_SUPPORTED_MODELS
 from src.utils import log
+from src.dns_cache import install_dns_cache
 from src.httpx_client import safe_close_client
 
 __all__ = ["KiroGatewayBackend"]
@@ -176,10 +177,10 @@ class KiroGatewayBackend:
             httpx.AsyncClient 实例
         """
         if self._http_client is None:
-            self._http_client = httpx.AsyncClient(
+            self._http_client = install_dns_cache(httpx.AsyncClient(
                 timeout=httpx.Timeout(self._config.timeout),
                 follow_redirects=True,
-            )
+            ))
         return self._http_client
 
     async def _handle_proxy_request(
@@ -40,6 +40,8 @@ except ImportError:
     async def check_backend_health(backend_key: str) -> bool:
         return False
 
+from ..backend_pool import get_backend_client_pool
+
 router = APIRouter()
 
 __all__ = ["router"]
@@ -51,6 +53,7 @@ __all__ = ["router"]
 async def gateway_health():
     """网关健康检查 - 返回所有后端状态"""
     backend_status = {}
+    pool = get_backend_client_pool()
 
     for backend_key, backend_config in BACKENDS.items():
         is_healthy = await check_backend_health(backend_key)
@@ -60,6 +63,7 @@ async def gateway_health():
             "priority": backend_config.get("priority", 999),
             "enabled": backend_config.get("enabled", True),
             "healthy": is_healthy,
+            "pool": pool.get_stats(backend_key),
         }
 
     all_healthy = any(s["healthy"] for s in backend_status.values()) if backend_status else False
@@ -16,6 +16,7 @@ from fastapi.responses import Response, StreamingResponse, JSONResponse
 
 from ..normalization import normalize_request_body
 from ..proxy import route_request_with_fallback
+from ..sse.decoder import iter_sse_events
 
 # 延迟导入 log，避免循环依赖
 try:
@@ -124,103 +125,72 @@ async def convert_sse_to_augment_ndjson(sse_stream: AsyncGenerator) -> AsyncGene
     Yields:
         Augment NDJSON 格式的字符串（每行一个 {"text": "..."} 对象）
     """
-    buffer = ""
+    async for event in iter_sse_events(sse_stream):
+        # 提取 JSON 数据
+        json_str = event.data.strip()
 
-    async for chunk in sse_stream:
-        if not chunk:
+        # 跳过 [DONE] 标记
+        if json_str == "[DONE]":
             continue
 
-        # 处理字节类型，转换为字符串
-        if isinstance(chunk, bytes):
-            chunk = chunk.decode("utf-8", errors="ignore")
-        elif not isinstance(chunk, str):
-            chunk = str(chunk)
-
-        # 将 chunk 添加到缓冲区
-        buffer += chunk
-
-        # 按行处理缓冲区（SSE 格式以 \n\n 分隔事件）
-        while "\n" in buffer:
-            line, buffer = buffer.split("\n", 1)
-            line = line.strip()
-
-            # 跳过空行
-            if not line:
-                continue
-
-            # 检查是否是 SSE 格式的 data: 行
-            if line.startswith("data: "):
-                # 提取 JSON 数据
-                json_str = line[6:].strip()  # 移除 "data: " 前缀
-
-                # 跳过 [DONE] 标记
-                if json_str == "[DONE]":
+        # 验证是否是有效的 JSON
+        try:
+            # 解析 OpenAI 格式的 JSON
+            json_obj = json.loads(json_str)
+
+            # 提取 content 字段转换为 Augment 格式
+            # OpenAI: {"choices":[{"delta":{"content":"xxx"}}]}
+            # Augment: {"text":"xxx"}
+            if "choices" in json_obj and len(json_obj["choices"]) > 0:
+                choice = json_obj["choices"][0]
+
+                # 处理流式响应的 delta
+                if "delta" in choice:
+                    delta = choice["delta"]
+
+                    # NOTE:
+                    # When upstream chooses to call tools, OpenAI streaming returns `delta.tool_calls`
+                    # (often with no `delta.content`). If we drop these deltas, the VSCode client will
+                    # look like it "ended immediately" when a tool is attempted.
+                    tool_calls = delta.get("tool_calls") if isinstance(delta, dict) else None
+                    if isinstance(tool_calls, list) and tool_calls:
+                        try:
+                            log.warning(
+                                f"[TOOL CALL] Upstream returned tool_calls (count={len(tool_calls)}), "
+                                f"first={json.dumps(tool_calls[0], ensure_ascii=False)[:500]}",
+                                tag="GATEWAY",
+                            )
+                        except Exception:
+                            log.warning("[TOOL CALL] Upstream returned tool_calls (unable to dump)", tag="GATEWAY")
+
+                        # Emit a visible message so the user isn't left with an empty response.
+                        augment_obj = {
+                            "text": (
+                                "\n[Gateway] 上游模型触发了工具调用(tool_calls)，但当前网关尚未实现将 tool_calls "
+                                "转换/执行为 Augment 工具链的逻辑，因此工具步骤无法继续。"
+                            )
+                        }
+                        yield json.dumps(augment_obj, separators=(',', ':'), ensure_ascii=False) + "\n"
+
+                    if "content" in delta and delta["content"] is not None:
+                        augment_obj = {"text": delta["content"]}
+                        yield json.dumps(augment_obj, separators=(',', ':'), ensure_ascii=False) + "\n"
+
+                # 处理完整响应的 message
+                elif "message" in choice:
+                    message = choice["message"]
+                    if "content" in message and message["content"] is not None:
+                        augment_obj = {"text": message["content"]}
+                        yield json.dumps(augment_obj, separators=(',', ':'), ensure_ascii=False) + "\n"
+
+                # 处理 finish_reason
+                if "finish_reason" in choice and choice["finish_reason"] is not None:
+                    # Augment 不需要 finish_reason，跳过
+                    if choice["finish_reason"] in ("tool_calls", "function_call"):
+                        log.warning(f"[TOOL CALL] finish_reason={choice['finish_reason']}", tag="GATEWAY")
                     continue
 
-                # 验证是否是有效的 JSON
-                try:
-                    # 解析 OpenAI 格式的 JSON
-                    json_obj = json.loads(json_str)
-
-                    # 提取 content 字段转换为 Augment 格式
-                    # OpenAI: {"choices":[{"delta":{"content":"xxx"}}]}
-                    # Augment: {"text":"xxx"}
-                    if "choices" in json_obj and len(json_obj["choices"]) > 0:
-                        choice = json_obj["choices"][0]
-
-                        # 处理流式响应的 delta
-                        if "delta" in choice:
-                            delta = choice["delta"]
-
-                            # NOTE:
-                            # When upstream chooses to call tools, OpenAI streaming returns `delta.tool_calls`
-                            # (often with no `delta.content`). If we drop these deltas, the VSCode client will
-                            # look like it "ended immediately" when a tool is attempted.
-                            tool_calls = delta.get("tool_calls") if isinstance(delta, dict) else None
-                            if isinstance(tool_calls, list) and tool_calls:
-                                try:
-                                    log.warning(
-                                        f"[TOOL CALL] Upstream returned tool_calls (count={len(tool_calls)}), "
-                                        f"first={json.dumps(tool_calls[0], ensure_ascii=False)[:500]}",
-                                        tag="GATEWAY",
-                                    )
-                                except Exception:
-                                    log.warning("[TOOL CALL] Upstream returned tool_calls (unable to dump)", tag="GATEWAY")
-
-                                # Emit a visible message so the user isn't left with an empty response.
-                                augment_obj = {
-                                    "text": (
-                                        "\n[Gateway] 上游模型触发了工具调用(tool_calls)，但当前网关尚未实现将 tool_calls "
-                                        "转换/执行为 Augment 工具链的逻辑，因此工具步骤无法继续。"
-                                    )
-                                }
-                                yield json.dumps(augment_obj, separators=(',', ':'), ensure_ascii=False) + "\n"
-
-                            if "content" in delta and delta["content"] is not None:
-                                augment_obj = {"text": delta["content"]}
-                                yield json.dumps(augment_obj, separators=(',', ':'), ensure_ascii=False) + "\n"
-
-                        # 处理完整响应的 message
-                        elif "message" in choice:
-                            message = choice["message"]
-                            if "content" in message and message["content"] is not None:
-                                augment_obj = {"text": message["content"]}
-                                yield json.dumps(augment_obj, separators=(',', ':'), ensure_ascii=False) + "\n"
-
-                        # 处理 finish_reason
-                        if "finish_reason" in choice and choice["finish_reason"] is not None:
-                            # Augment 不需要 finish_reason，跳过
-                            if choice["finish_reason"] in ("tool_calls", "function_call"):
-                                log.warning(f"[TOOL CALL] finish_reason={choice['finish_reason']}", tag="GATEWAY")
-                            continue
-
-                except json.JSONDecodeError:
-                    # 如果不是有效的 JSON，记录警告但继续处理
-                    log.warning(f"Invalid JSON in SSE stream: {json_str[:100]}")
-                    continue
-            elif line.startswith(":"):
-                # SSE 注释行，跳过
-                continue
-            elif line.startswith("event:") or line.startswith("id:") or line.startswith("retry:"):
-                # 其他 SSE 字段，跳过
-                continue
+        except json.JSONDecodeError:
+            # 如果不是有效的 JSON，记录警告但继续处理
+            log.warning(f"Invalid JSON in SSE stream: {json_str[:100]}")
+            continue
@@ -32,11 +32,7 @@ except ImportError:
     import logging
     log = logging.getLogger(__name__)
 
-# 延迟导入 http_client
-try:
-    from src.httpx_client import http_client, safe_close_client
-except ImportError:
-    http_client = None
+from .backend_pool import get_backend_client_pool
 
 __all__ = [
     "proxy_request_to_backend",
@@ -264,56 +260,32 @@ async def proxy_request_to_backend(
             if stream:
                 # 流式请求（带超时）
                 return await proxy_streaming_request_with_timeout(
-                    url, method, request_headers, body, timeout, backend_key
+                    url, method, request_headers, body, timeout, backend_key, backend
                 )
             else:
-                # 非流式请求
-                if http_client is not None:
-                    async with http_client.get_client(timeout=timeout) as client:
-                        if method.upper() == "POST":
-                            response = await client.post(url, json=body, headers=request_headers)
-                        elif method.upper() == "GET":
-                            response = await client.get(url, headers=request_headers)
-                        else:
-                            return False, f"Unsupported method: {method}"
-
-                        last_status_code = response.status_code
-
-                        if response.status_code >= 400:
-                            error_text = response.text
-                            log.warning(f"Backend {backend_key} returned error {response.status_code}: {error_text[:200]}")
-
-                            # 检查是否应该重试
-                            if should_retry(response.status_code, attempt, max_retries):
-                                last_error = f"Backend error: {response.status_code}"
-                                continue
-
-                            return False, f"Backend error: {response.status_code}"
-
-                        return True, response.json()
-                else:
-                    # 没有 http_client，使用 httpx 直接请求
-                    async with httpx.AsyncClient(timeout=timeout) as client:
-                        if method.upper() == "POST":
-                            response = await client.post(url, json=body, headers=request_headers)
-                        elif method.upper() == "GET":
-                            response = await client.get(url, headers=request_headers)
-                        else:
-                            return False, f"Unsupported method: {method}"
-
-                        last_status_code = response.status_code
-
-                        if response.status_code >= 400:
-                            error_text = response.text
-                            log.warning(f"Backend {backend_key} returned error {response.status_code}: {error_text[:200]}")
-
-                            if should_retry(response.status_code, attempt, max_retries):
-                                last_error = f"Backend error: {response.status_code}"
-                                continue
-
-                            return False, f"Backend error: {response.status_code}"
-
-                        return True, response.json()
+                # 非流式请求：复用该后端的长连接客户端
+                async with get_backend_client_pool().client(backend_key, url, backend) as client:
+                    if method.upper() == "POST":
+                        response = await client.post(url, json=body, headers=request_headers, timeout=timeout)
+                    elif method.upper() == "GET":
+                        response = await client.get(url, headers=request_headers, timeout=timeout)
+                    else:
+                        return False, f"Unsupported method: {method}"
+
+                    last_status_code = response.status_code
+
+                    if response.status_code >= 400:
+                        error_text = response.text
+                        log.warning(f"Backend {backend_key} returned error {response.status_code}: {error_text[:200]}")
+
+                        # 检查是否应该重试
+                        if should_retry(response.status_code, attempt, max_retries):
+                            last_error = f"Backend error: {response.status_code}"
+                            continue
+
+                        return False, f"Backend error: {response.status_code}"
+
+                    return True, response.json()
 
         except httpx.TimeoutException:
             log.warning(f"Backend {backend_key} timeout (attempt {attempt + 1}/{max_retries + 1})")
@@ -343,6 +315,7 @@ async def proxy_streaming_request_with_timeout(
     body: Any,
     timeout: float,
     backend_key: str = "unknown",
+    backend_config: Optional[Dict[str, Any]] = None,
 ) -> Tuple[bool, Any]:
     """
     处理流式代理请求（带超时和错误处理）
@@ -353,20 +326,21 @@ async def proxy_streaming_request_with_timeout(
         headers: 请求头
         body: 请求体
         timeout: 超时时间（秒）
-        backend_key: 后端标识（用于日志）
+        backend_key: 后端标识（用于日志和连接池）
+        backend_config: 后端配置（连接池的连接数与 keep-alive 设置）
 
     Returns:
         Tuple[bool, Any]: (成功标志, 流生成器或错误信息)
     """
     try:
-        # 创建带超时的客户端
+        # 按请求设置超时；客户端是该后端的长连接客户端
         timeout_config = httpx.Timeout(
             connect=30.0,      # 连接超时
             read=timeout,      # 读取超时（流式数据）
             write=30.0,        # 写入超时
             pool=30.0,         # 连接池超时
         )
-        client = httpx.AsyncClient(timeout=timeout_config)
+        pool = get_backend_client_pool()
 
         async def stream_generator():
             # 注意：chunk_timeout 检查已移除
@@ -377,9 +351,14 @@ async def proxy_streaming_request_with_timeout(
 
             yielded_any = False
             saw_done = False
+            failed = False
+            # 在生成器内获取：未被消费的生成器不会占用连接池
+            lease = await pool.acquire(backend_key, url, backend_config)
 
             try:
-                async with client.stream(method, url, json=body, headers=headers) as response:
+                async with lease.client.stream(
+                    method, url, json=body, headers=headers, timeout=timeout_config
+                ) as response:
                     if response.status_code >= 400:
                         error_text = await response.aread()
                         log.warning(f"Streaming request to {backend_key} failed: {response.status_code}")
@@ -401,6 +380,7 @@ async def proxy_streaming_request_with_timeout(
                         log.success(f"Streaming completed", tag=backend_key.upper())
 
             except httpx.ReadTimeout:
+                failed = True
                 log.warning(f"Read timeout from {backend_key} after {timeout}s")
                 error_msg = json.dumps({
                     'error': {
@@ -412,6 +392,7 @@ async def proxy_streaming_request_with_timeout(
                 })
                 yield f"data: {error_msg}\n\n"
             except httpx.ConnectTimeout:
+                failed = True
                 log.warning(f"Connect timeout to {backend_key}")
                 error_msg = json.dumps({
                     'error': {
@@ -436,6 +417,7 @@ async def proxy_streaming_request_with_timeout(
                             tag=backend_key.upper(),
                         )
                         return
+                failed = True
                 log.error(f"Streaming protocol error from {backend_key}: {e}")
                 error_msg = json.dumps({'error': str(e)})
                 yield f"data: {error_msg}\n\n"
@@ -444,16 +426,13 @@ async def proxy_streaming_request_with_timeout(
                 # Stop consuming the upstream stream quietly.
                 return
             except Exception as e:
+                failed = True
                 log.error(f"Streaming error from {backend_key}: {e}")
                 error_msg = json.dumps({'error': str(e)})
                 yield f"data: {error_msg}\n\n"
             finally:
-                try:
-                    await safe_close_client(client)
-                except Exception:
-                    # Avoid noisy event-loop "connection_lost" traces on Windows Proactor when the
-                    # peer has already reset the connection.
-                    pass
+                # 只归还连接池，不关闭客户端；未读完的响应已由 stream() 上下文关闭
+                pool.release(lease, failed=failed)
 
         return True, stream_generator()
 
@@ -471,11 +450,12 @@ async def proxy_streaming_request(
 ) -> Tuple[bool, Any]:
     """处理流式代理请求（兼容旧接口）"""
     try:
-        client = httpx.AsyncClient(timeout=None)
+        pool = get_backend_client_pool()
 
         async def stream_generator():
+            lease = await pool.acquire("default", url)
             try:
-                async with client.stream(method, url, json=body, headers=headers) as response:
+                async with lease.client.stream(method, url, json=body, headers=headers) as response:
                     if response.status_code >= 400:
                         error_text = await response.aread()
                         log.warning(f"Streaming request failed: {response.status_code}")
@@ -495,10 +475,7 @@ async def proxy_streaming_request(
             except asyncio.CancelledError:
                 return
             finally:
-                try:
-                    await safe_close_client(client)
-                except Exception:
-                    pass
+                pool.release(lease)
 
         return True, stream_generator()
 
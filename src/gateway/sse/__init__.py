@@ -11,6 +11,9 @@ __all__ = [
     "convert_sse_to_augment_ndjson",
     "parse_sse_line",
     "SSEParser",
+    "SSEDecoder",
+    "SSEEvent",
+    "iter_sse_events",
 ]
 
 
@@ -25,4 +28,7 @@ def __getattr__(name: str):
     if name == "SSEParser":
         from .converter import SSEParser
         return SSEParser
+    if name in ("SSEDecoder", "SSEEvent", "iter_sse_events"):
+        from . import decoder
+        return getattr(decoder, name)
     raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
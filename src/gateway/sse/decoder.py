@@ -0,0 +1,247 @@
+"""
+SSE 增量解码器
+
+按 WHATWG EventSource 规范在字节层面增量解析 SSE 流：
+- 行结束符支持 \\n、\\r\\n 与单独的 \\r（跨 chunk 的 \\r\\n 也能正确识别）
+- 连续多行 data: 以 \\n 拼接为同一事件，空行分发事件
+- 支持 event: / id: / retry: 字段与 : 注释行，字段值只去掉一个前导空格
+
+内部使用 bytearray 缓冲并记录偏移，每个 chunk 只追加一次、每个字节只扫描一次，
+已消费的前缀在 feed 结束时统一丢弃；不再对剩余缓冲反复 split，
+大 chunk（工具结果、大段代码）不会退化为平方复杂度。
+
+与规范的差异：流结束时（flush）未以空行结尾的最后一个事件仍会分发，
+兼容省略结尾空行的上游。
+
+json_lines 模式（SSEParser 与 iter_sse_events 默认启用，面向 JSON 事件的消费方）：
+兼容事件之间省略空行、每行 data 各是一个 JSON 的宽松上游 / 代理（旧的逐行解析行为）：
+- 已缓冲的 data 是完整 JSON（或 [DONE]）时，下一行非空 data 到达前先分发它
+  （完整 JSON 后再拼接任何非空内容都不再是合法 JSON），feed 结束时也立即分发
+- 分发时多行 data 拼接后不是 JSON、但其中有 JSON 行，则每行作为独立事件分发
+符合规范的流在这两处都没有待分发的 data，不会多做解析；多行 JSON 与普通多行文本仍按规范拼接。
+"""
+
+import re
+from typing import Any, AsyncIterator, List, Optional, Union
+
+from src import json_codec
+
+__all__ = [
+    "SSEDecoder",
+    "SSEEvent",
+    "iter_sse_events",
+]
+
+
+_LINE_END = re.compile(rb"[\r\n]")
+_BOM = b"\xef\xbb\xbf"
+
+
+class SSEEvent:
+    """
+    一个已分发的 SSE 事件
+
+    Attributes:
+        data: 所有 data 字段以 \\n 拼接后的文本
+        event: 事件类型（未指定时为 "message"）
+        id: 最近一次 id 字段的值（规范中的 last event ID）
+        retry: retry 字段（毫秒），未出现时为 None
+    """
+
+    __slots__ = ("data", "event", "id", "retry")
+
+    def __init__(self, data: str, event: str = "message", id: Optional[str] = None, retry: Optional[int] = None):
+        self.data = data
+        self.event = event
+        self.id = id
+        self.retry = retry
+
+    @property
+    def is_done(self) -> bool:
+        """OpenAI 风格的流结束标记 data: [DONE]"""
+        return self.data.strip() == "[DONE]"
+
+    def json(self) -> Any:
+        """
+        解析 data 为 JSON
+
+        Raises:
+            json.JSONDecodeError: data 不是合法 JSON
+        """
+        return json_codec.loads(self.data)
+
+    def __repr__(self) -> str:
+        return f"SSEEvent(event={self.event!r}, data={self.data[:80]!r})"
+
+
+class SSEDecoder:
+    """
+    SSE 增量解码器
+
+    用法:
+        decoder = SSEDecoder()
+        for chunk in stream:
+            for event in decoder.feed(chunk):
+                ...
+        for event in decoder.flush():
+            ...
+    """
+
+    def __init__(self, json_lines: bool = False) -> None:
+        self._json_lines = json_lines
+        self._buf = bytearray()
+        self._scan = 0  # 尚未检查过行结束符的起始位置
+        self._after_cr = False  # 上一行以 \r 结束且位于缓冲末尾，下一个 \n 属于同一个换行
+        self._started = False
+        self._data: List[str] = []
+        self._event = ""
+        self._retry: Optional[int] = None
+        self.last_event_id: Optional[str] = None
+
+    def feed(self, chunk: Union[bytes, bytearray, memoryview, str]) -> List[SSEEvent]:
+        """输入数据块，返回其中完整分发的事件"""
+        if isinstance(chunk, str):
+            chunk = chunk.encode("utf-8")
+        buf = self._buf
+        buf += chunk
+
+        if not self._started:
+            if len(buf) < len(_BOM) and _BOM.startswith(bytes(buf)):
+                return []
+            if buf.startswith(_BOM):
+                del buf[:len(_BOM)]
+            self._started = True
+
+        events: List[SSEEvent] = []
+        pos = 0
+        end = len(buf)
+        while True:
+            if self._after_cr:
+                if pos >= end:
+                    break
+                if buf[pos] == 0x0A:
+                    pos += 1
+                self._after_cr = False
+                self._scan = max(self._scan, pos)
+
+            match = _LINE_END.search(buf, max(self._scan, pos))
+            if match is None:
+                self._scan = end
+                break
+            line_end = match.start()
+            if buf[line_end] == 0x0D:
+                if line_end + 1 < end:
+                    next_pos = line_end + 2 if buf[line_end + 1] == 0x0A else line_end + 1
+                else:
+                    next_pos = line_end + 1
+                    self._after_cr = True
+            else:
+                next_pos = line_end + 1
+
+            self._process_line(buf, pos, line_end, events)
+            pos = next_pos
+            self._scan = pos
+
+        if pos:
+            del buf[:pos]
+            self._scan -= pos
+        if self._json_lines and self._data and _is_json("\n".join(self._data)):
+            self._dispatch(events)
+        return events
+
+    def flush(self) -> List[SSEEvent]:
+        """流结束：处理最后一行（没有换行符）并分发未完成的事件"""
+        events: List[SSEEvent] = []
+        buf = self._buf
+        if buf:
+            self._process_line(buf, 0, len(buf), events)
+        self._dispatch(events)
+        self._buf = bytearray()
+        self._scan = 0
+        self._after_cr = False
+        return events
+
+    def _process_line(self, buf: bytearray, start: int, end: int, events: List[SSEEvent]) -> None:
+        if start == end:
+            self._dispatch(events)
+            return
+
+        # 最常见的 data: 行单独处理
+        if buf.startswith(b"data:", start, end):
+            value_start = start + 5
+            if value_start < end and buf[value_start] == 0x20:
+                value_start += 1
+            value = buf[value_start:end].decode("utf-8", errors="replace")
+            if self._json_lines and self._data and value.strip() and _is_json("\n".join(self._data)):
+                self._dispatch(events)
+            self._data.append(value)
+            return
+
+        if buf[start] == 0x3A:  # ":" 注释行
+            return
+
+        colon = buf.find(b":", start, end)
+        if colon == -1:
+            name, value = bytes(buf[start:end]), ""
+        else:
+            name = bytes(buf[start:colon])
+            value_start = colon + 1
+            if value_start < end and buf[value_start] == 0x20:
+                value_start += 1
+            value = buf[value_start:end].decode("utf-8", errors="replace")
+
+        if name == b"data":
+            self._data.append(value)
+        elif name == b"event":
+            self._event = value
+        elif name == b"id":
+            if "\x00" not in value:
+                self.last_event_id = value
+        elif name == b"retry":
+            if value.isdigit():
+                self._retry = int(value)
+
+    def _dispatch(self, events: List[SSEEvent]) -> None:
+        data, event_type, retry = self._data, self._event, self._retry
+        self._data = []
+        self._event = ""
+        self._retry = None
+        if not data:
+            return
+        event_type = event_type or "message"
+        if self._json_lines and len(data) > 1 and _is_json_lines(data):
+            for line in data:
+                events.append(SSEEvent(line, event_type, self.last_event_id, retry))
+            return
+        events.append(SSEEvent("\n".join(data), event_type, self.last_event_id, retry))
+
+
+def _is_json(text: str) -> bool:
+    if text.strip() == "[DONE]":
+        return True
+    try:
+        json_codec.loads(text)
+    except ValueError:
+        return False
+    return True
+
+
+def _is_json_lines(data: List[str]) -> bool:
+    """多行 data 拼接后不是 JSON，但其中有独立的 JSON 行（上游漏掉了事件之间的空行）"""
+    return not _is_json("\n".join(data)) and any(_is_json(line) for line in data)
+
+
+async def iter_sse_events(stream: Any, decoder: Optional[SSEDecoder] = None) -> AsyncIterator[SSEEvent]:
+    """
+    把 bytes / str 块组成的异步流解码为 SSE 事件流（流结束时自动 flush）
+
+    未传入 decoder 时使用 json_lines 模式（消费方都按 JSON 解析事件）
+    """
+    decoder = decoder or SSEDecoder(json_lines=True)
+    async for chunk in stream:
+        if not chunk:
+            continue
+        for event in decoder.feed(chunk):
+            yield event
+    for event in decoder.flush():
+        yield event
@@ -13,6 +13,8 @@ from typing import Dict, Any, List, AsyncGenerator, Optional
 from pathlib import Path
 import json
 
+from .sse.decoder import iter_sse_events
+
 # 延迟导入 log，避免循环依赖
 try:
     from log import log
@@ -181,79 +183,58 @@ async def stream_openai_with_tool_loop(
             stream=True,
         )
 
-        buffer = ""
         tool_calls_by_index: Dict[int, Dict[str, Any]] = {}
         saw_tool_calls = False
-        saw_done = False
-
-        async for chunk in sse_stream:
-            if not chunk:
-                continue
-            if isinstance(chunk, bytes):
-                chunk = chunk.decode("utf-8", errors="ignore")
-            buffer += chunk
-
-            while "\n" in buffer:
-                line, buffer = buffer.split("\n", 1)
-                line = line.strip()
-                if not line:
-                    continue
-                if not line.startswith("data: "):
-                    continue
 
-                json_str = line[6:].strip()
-                if json_str == "[DONE]":
-                    saw_done = True
-                    break
+        async for event in iter_sse_events(sse_stream):
+            if event.is_done:
+                break
 
-                try:
-                    evt = json.loads(json_str)
-                except Exception:
-                    continue
+            try:
+                evt = event.json()
+            except Exception:
+                continue
 
-                choices = evt.get("choices") or []
-                if not choices:
-                    continue
-                choice0 = choices[0] if isinstance(choices[0], dict) else None
-                if not choice0:
-                    continue
+            choices = evt.get("choices") or []
+            if not choices:
+                continue
+            choice0 = choices[0] if isinstance(choices[0], dict) else None
+            if not choice0:
+                continue
 
-                # Text streaming
-                delta = choice0.get("delta") or {}
-                if isinstance(delta, dict) and "content" in delta and delta["content"] is not None:
-                    yield json.dumps({"text": delta["content"]}, separators=(",", ":"), ensure_ascii=False) + "\n"
-
-                # Tool calls streaming
-                tool_calls = delta.get("tool_calls") if isinstance(delta, dict) else None
-                if isinstance(tool_calls, list) and tool_calls:
-                    saw_tool_calls = True
-                    for tc in tool_calls:
-                        if not isinstance(tc, dict):
-                            continue
-                        idx = tc.get("index")
-                        if not isinstance(idx, int):
-                            idx = 0
-                        cur = tool_calls_by_index.setdefault(idx, {"id": None, "type": "function", "function": {"name": None, "arguments": ""}})
-                        if "id" in tc and isinstance(tc["id"], str):
-                            cur["id"] = tc["id"]
-                        if "type" in tc and isinstance(tc["type"], str):
-                            cur["type"] = tc["type"]
-                        func = tc.get("function")
-                        if isinstance(func, dict):
-                            if "name" in func and isinstance(func["name"], str):
-                                cur["function"]["name"] = func["name"]
-                            if "arguments" in func and isinstance(func["arguments"], str):
-                                cur["function"]["arguments"] += func["arguments"]
-
-                finish_reason = choice0.get("finish_reason")
-                if finish_reason in ("tool_calls", "function_call"):
-                    log.warning(
-                        f"[TOOL LOOP] finish_reason={finish_reason} round={round_idx} tool_calls_indexes={list(tool_calls_by_index.keys())}",
-                        tag="GATEWAY",
-                    )
-
-            if saw_done:
-                break
+            # Text streaming
+            delta = choice0.get("delta") or {}
+            if isinstance(delta, dict) and "content" in delta and delta["content"] is not None:
+                yield json.dumps({"text": delta["content"]}, separators=(",", ":"), ensure_ascii=False) + "\n"
+
+            # Tool calls streaming
+            tool_calls = delta.get("tool_calls") if isinstance(delta, dict) else None
+            if isinstance(tool_calls, list) and tool_calls:
+                saw_tool_calls = True
+                for tc in tool_calls:
+                    if not isinstance(tc, dict):
+                        continue
+                    idx = tc.get("index")
+                    if not isinstance(idx, int):
+                        idx = 0
+                    cur = tool_calls_by_index.setdefault(idx, {"id": None, "type": "function", "function": {"name": None, "arguments": ""}})
+                    if "id" in tc and isinstance(tc["id"], str):
+                        cur["id"] = tc["id"]
+                    if "type" in tc and isinstance(tc["type"], str):
+                        cur["type"] = tc["type"]
+                    func = tc.get("function")
+                    if isinstance(func, dict):
+                        if "name" in func and isinstance(func["name"], str):
+                            cur["function"]["name"] = func["name"]
+                        if "arguments" in func and isinstance(func["arguments"], str):
+                            cur["function"]["arguments"] += func["arguments"]
+
+            finish_reason = choice0.get("finish_reason")
+            if finish_reason in ("tool_calls", "function_call"):
+                log.warning(
+                    f"[TOOL LOOP] finish_reason={finish_reason} round={round_idx} tool_calls_indexes={list(tool_calls_by_index.keys())}",
+                    tag="GATEWAY",
+                )
 
         if not saw_tool_calls or not tool_calls_by_index:
             return
@@ -10,6 +10,8 @@
 - 统一接口：无论使用哪个后端，API 保持一致
 - 代理支持：支持动态代理配置
 - 流式请求：支持 SSE 流式响应
+- 连接复用：按 (代理, 伪装目标, HTTP 版本) 复用共享客户端，保持 keep-alive 连接；
+  共享客户端按存活时间 / 请求数定期轮换
 
 版本历史:
 - v1.0: 原始版本，使用原生 httpx
@@ -20,14 +22,20 @@
 """
 
 from contextlib import asynccontextmanager
-from typing import Any, AsyncGenerator, Dict, Optional, Union
+from dataclasses import dataclass, field
+from http.cookiejar import CookieJar, DefaultCookiePolicy
+from typing import Any, AsyncGenerator, Dict, Optional, Tuple, Union
 import asyncio
+import os
+import time
 
 import httpx
 
 from config import get_proxy_config
 from log import log
 
+from .dns_cache import get_dns_cache, install_dns_cache
+
 # 导入 TLS 伪装模块
 from .tls_impersonate import (
     is_tls_impersonate_available,
@@ -43,6 +51,291 @@ else:
     CurlAsyncSession = None
 
 
+# ====================== 连接池配置 ======================
+# HTTP_CLIENT_POOLING_ENABLED: 是否复用客户端连接池（默认 true，false 时每次请求新建客户端）
+# HTTP_POOL_MAX_CONNECTIONS: 每个客户端的最大连接数（默认 100）
+# HTTP_POOL_MAX_KEEPALIVE: 每个客户端保持的空闲连接数（默认 20，仅 httpx）
+# HTTP_POOL_KEEPALIVE_EXPIRY: 空闲连接保持时间（秒，默认 30，仅 httpx）
+# HTTP2_ENABLED: 是否启用 HTTP/2 多路复用（默认 false）
+# HTTP2_FALLBACK_ERRORS: HTTP/2 下连续多少次协议错误后降级到 HTTP/1.1（默认 3）
+# HTTP2_FALLBACK_SECONDS: 降级持续时间（秒，默认 300），到期后重新尝试 HTTP/2
+# HTTP_POOL_CLIENT_MAX_AGE: 共享客户端的最长存活时间（秒，默认 900，0 表示不限），到期后在下一次借用时轮换
+# HTTP_POOL_CLIENT_MAX_REQUESTS: 共享客户端的最大请求数（默认 0，不限），达到后在下一次借用时轮换
+
+def _get_env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+def _get_env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+def _pooling_enabled() -> bool:
+    return os.getenv("HTTP_CLIENT_POOLING_ENABLED", "true").lower() in ("true", "1", "yes", "on")
+
+
+def _http2_enabled() -> bool:
+    return os.getenv("HTTP2_ENABLED", "false").lower() in ("true", "1", "yes", "on")
+
+
+def _httpx_http2_available() -> bool:
+    """httpx 的 HTTP/2 支持依赖可选的 h2 包"""
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+# HTTP 版本标识：curl_cffi 在未启用 HTTP/2 模式时沿用伪装目标自带的协议协商
+HTTP_VERSION_DEFAULT = "default"
+HTTP_VERSION_1_1 = "1.1"
+HTTP_VERSION_2 = "2"
+
+
+# 连接池键：(代理, 伪装目标, HTTP 版本)；httpx 后端的伪装目标为 None
+ClientKey = Tuple[Optional[str], Optional[str], str]
+
+
+def _no_cookie_jar() -> CookieJar:
+    """共享客户端不保存任何 Cookie，避免不同凭证/请求之间串 Cookie"""
+    return CookieJar(policy=DefaultCookiePolicy(allowed_domains=[]))
+
+
+@dataclass
+class _PoolEntry:
+    """注册表中的一个共享客户端"""
+
+    key: ClientKey
+    client: Any
+    created_at: float = field(default_factory=time.time)
+    # 当前借出的视图数量；被淘汰的客户端在归零后关闭
+    leases: int = 0
+    requests: int = 0
+    retired: bool = False
+
+
+@dataclass
+class ClientPoolStats:
+    """客户端连接池统计"""
+
+    clients_created: int = 0
+    clients_closed: int = 0
+    dedicated_clients: int = 0
+    leases: int = 0
+    requests: int = 0
+    proxy_rebuilds: int = 0
+    # 因存活时间 / 请求数到达上限而轮换的共享客户端数
+    recycled: int = 0
+    # 流式请求的首字节时间（发出请求到收到响应头）
+    ttfb_count: int = 0
+    ttfb_total: float = 0.0
+    ttfb_max: float = 0.0
+
+    def record_ttfb(self, seconds: float) -> None:
+        self.ttfb_count += 1
+        self.ttfb_total += seconds
+        if seconds > self.ttfb_max:
+            self.ttfb_max = seconds
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "clients_created": self.clients_created,
+            "clients_closed": self.clients_closed,
+            "dedicated_clients": self.dedicated_clients,
+            "leases": self.leases,
+            "requests": self.requests,
+            "reuse_ratio": (1 - self.clients_created / self.leases) if self.leases else 0.0,
+            "proxy_rebuilds": self.proxy_rebuilds,
+            "recycled": self.recycled,
+            "ttfb_count": self.ttfb_count,
+            "ttfb_avg_ms": (self.ttfb_total / self.ttfb_count * 1000) if self.ttfb_count else 0.0,
+            "ttfb_max_ms": self.ttfb_max * 1000,
+        }
+
+
+def _is_protocol_error(exc: BaseException) -> bool:
+    """是否为 HTTP 协议层错误（HTTP/2 帧错误、连接被异常关闭等）"""
+    if isinstance(exc, (httpx.RemoteProtocolError, httpx.LocalProtocolError)):
+        return True
+    # curl_cffi: CURLE_HTTP2 (16) / CURLE_HTTP2_STREAM (92)
+    return getattr(exc, "code", None) in (16, 92)
+
+
+class Http2Health:
+    """
+    HTTP/2 连接健康状态
+
+    HTTP/2 模式下连续出现 fallback_errors 次协议错误时，降级到 HTTP/1.1 持续
+    fallback_seconds 秒，到期后重新尝试 HTTP/2；任意一次成功响应清零连续错误计数。
+    """
+
+    def __init__(self, fallback_errors: int = 3, fallback_seconds: float = 300.0):
+        self.fallback_errors = max(1, fallback_errors)
+        self.fallback_seconds = fallback_seconds
+        self.consecutive_errors = 0
+        self.fallback_until = 0.0
+        self.protocol_errors = 0
+        self.fallbacks = 0
+        # 按实际协商到的协议统计响应数
+        self.responses: Dict[str, int] = {}
+
+    def in_fallback(self, now: Optional[float] = None) -> bool:
+        return (time.time() if now is None else now) < self.fallback_until
+
+    def record_response(self, response: Any) -> None:
+        self.consecutive_errors = 0
+        version = str(getattr(response, "http_version", "") or "unknown")
+        self.responses[version] = self.responses.get(version, 0) + 1
+
+    def record_error(self, exc: BaseException, http_version: str) -> bool:
+        """
+        记录一次请求异常
+
+        Returns:
+            是否因此触发了降级
+        """
+        if http_version != HTTP_VERSION_2 or not _is_protocol_error(exc):
+            return False
+        self.protocol_errors += 1
+        self.consecutive_errors += 1
+        if self.consecutive_errors < self.fallback_errors:
+            return False
+        self.consecutive_errors = 0
+        self.fallback_until = time.time() + self.fallback_seconds
+        self.fallbacks += 1
+        log.warning(
+            f"[HttpxClient] HTTP/2 连续协议错误，降级到 HTTP/1.1 {self.fallback_seconds:.0f}s: {exc}"
+        )
+        return True
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "enabled": _http2_enabled(),
+            "in_fallback": self.in_fallback(),
+            "fallback_remaining_seconds": max(0.0, round(self.fallback_until - time.time(), 1)),
+            "protocol_errors": self.protocol_errors,
+            "fallbacks": self.fallbacks,
+            "responses_by_version": dict(self.responses),
+        }
+
+
+class _TimedStreamContext:
+    """包装 client.stream()，在 __aenter__ 返回时记录首字节时间"""
+
+    def __init__(self, inner: Any, client: "PooledClient") -> None:
+        self._inner = inner
+        self._client = client
+
+    async def __aenter__(self) -> Any:
+        started = time.perf_counter()
+        try:
+            response = await self._inner.__aenter__()
+        except Exception as e:
+            self._client._record_error(e)
+            raise
+        self._client._manager.pool_stats.record_ttfb(time.perf_counter() - started)
+        self._client._manager.http2_health.record_response(response)
+        return response
+
+    async def __aexit__(self, exc_type, exc, tb) -> Any:
+        return await self._inner.__aexit__(exc_type, exc, tb)
+
+
+class PooledClient:
+    """
+    共享客户端的借出视图
+
+    - 每次请求注入借出时指定的默认超时与请求头（请求参数中显式传入的优先）
+    - close()/aclose() 只归还借用，不关闭底层连接池（独占客户端除外）
+    - 其余属性透传给底层 httpx.AsyncClient / curl_cffi.AsyncSession
+    """
+
+    def __init__(
+        self,
+        manager: "HttpxClientManager",
+        entry: _PoolEntry,
+        timeout: Any,
+        headers: Optional[Dict[str, str]] = None,
+        dedicated: bool = False,
+    ) -> None:
+        self._manager = manager
+        self._entry = entry
+        self._timeout = timeout
+        self._headers = headers or None
+        self._dedicated = dedicated
+        self._released = False
+
+    @property
+    def client(self) -> Any:
+        """底层客户端"""
+        return self._entry.client
+
+    def _prepare(self, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        kwargs.setdefault("timeout", self._timeout)
+        if self._headers:
+            kwargs["headers"] = {**self._headers, **(kwargs.get("headers") or {})}
+        self._entry.requests += 1
+        self._manager.pool_stats.requests += 1
+        return kwargs
+
+    def _record_error(self, exc: BaseException) -> None:
+        if self._manager.http2_health.record_error(exc, self._entry.key[2]) and not self._dedicated:
+            # 降级后后续借用会拿到 HTTP/1.1 客户端，当前客户端在归还后关闭
+            self._manager._retire_entry(self._entry)
+
+    async def request(self, method: str, url: str, **kwargs) -> Any:
+        try:
+            response = await self._entry.client.request(method, url, **self._prepare(kwargs))
+        except Exception as e:
+            self._record_error(e)
+            raise
+        self._manager.http2_health.record_response(response)
+        return response
+
+    async def get(self, url: str, **kwargs) -> Any:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> Any:
+        return await self.request("POST", url, **kwargs)
+
+    async def put(self, url: str, **kwargs) -> Any:
+        return await self.request("PUT", url, **kwargs)
+
+    async def patch(self, url: str, **kwargs) -> Any:
+        return await self.request("PATCH", url, **kwargs)
+
+    async def delete(self, url: str, **kwargs) -> Any:
+        return await self.request("DELETE", url, **kwargs)
+
+    async def head(self, url: str, **kwargs) -> Any:
+        return await self.request("HEAD", url, **kwargs)
+
+    def stream(self, method: str, url: str, **kwargs) -> _TimedStreamContext:
+        inner = self._entry.client.stream(method, url, **self._prepare(kwargs))
+        return _TimedStreamContext(inner, self)
+
+    async def aclose(self) -> None:
+        if self._released:
+            return
+        self._released = True
+        if self._dedicated:
+            await safe_close_client(self._entry.client)
+        else:
+            await self._manager._release(self._entry)
+
+    close = aclose
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._entry.client, name)
+
+
 class HttpxClientManager:
     """
     通用HTTP客户端管理器 v2.0
@@ -52,6 +345,13 @@ class HttpxClientManager:
     使用优先级:
     1. curl_cffi (如果可用且启用) - 提供 TLS 指纹伪装
     2. httpx (降级模式) - 原生 Python HTTP 客户端
+
+    客户端按 (代理, 伪装目标, HTTP 版本) 注册并长期复用，请求之间共享 keep-alive 连接；
+    超时与请求头按请求注入，不需要为此新建客户端。代理配置变化时旧客户端被淘汰，
+    在最后一个借用归还后关闭。
+
+    HTTP2_ENABLED 时使用 HTTP/2，同一主机的并发流复用少量连接；连续协议错误时
+    自动降级到 HTTP/1.1 一段时间（见 Http2Health）。
     """
 
     def __init__(self):
@@ -59,6 +359,15 @@ class HttpxClientManager:
         self._use_curl_cffi = is_tls_impersonate_available()
         self._logged_init = False
 
+        self._pool: Dict[ClientKey, _PoolEntry] = {}
+        self._pool_lock: Optional[asyncio.Lock] = None
+        self._pool_loop: Optional[asyncio.AbstractEventLoop] = None
+        self.pool_stats = ClientPoolStats()
+        self.http2_health = Http2Health(
+            fallback_errors=_get_env_int("HTTP2_FALLBACK_ERRORS", 3),
+            fallback_seconds=_get_env_float("HTTP2_FALLBACK_SECONDS", 300.0),
+        )
+
     def _log_init_once(self):
         """只在第一次使用时记录初始化日志"""
         if not self._logged_init:
@@ -89,12 +398,213 @@ class HttpxClientManager:
 
         return client_kwargs
 
+    # ---------------------- 连接池注册表 ----------------------
+
+    def _http_version(self) -> str:
+        """当前应使用的 HTTP 版本（HTTP/2 模式下降级期间为 1.1）"""
+        if _http2_enabled() and not self.http2_health.in_fallback():
+            if self._use_curl_cffi or _httpx_http2_available():
+                return HTTP_VERSION_2
+            log.warning("[HttpxClient] 未安装 h2，httpx 后端无法启用 HTTP/2，使用 HTTP/1.1")
+        if self._use_curl_cffi and not self.http2_health.in_fallback():
+            return HTTP_VERSION_DEFAULT
+        return HTTP_VERSION_1_1
+
+    def _client_key(self, proxy: Optional[str]) -> ClientKey:
+        target = get_impersonate_target() if self._use_curl_cffi else None
+        return (proxy, target, self._http_version())
+
+    def _create_client(self, key: ClientKey, **client_kwargs) -> Any:
+        """
+        按连接池键创建客户端
+
+        共享客户端不设置默认超时（超时按请求注入）；client_kwargs 用于独占客户端的额外参数。
+        """
+        proxy, target, http_version = key
+        max_connections = max(1, _get_env_int("HTTP_POOL_MAX_CONNECTIONS", 100))
+        if self._use_curl_cffi:
+            from curl_cffi import CurlHttpVersion, CurlOpt
+
+            session_kwargs: Dict[str, Any] = {}
+            if http_version == HTTP_VERSION_2:
+                # HTTPS 上通过 ALPN 协商 HTTP/2；PIPEWAIT 让并发请求等待已有连接完成协商后
+                # 复用它（多路复用），而不是各自新建连接
+                session_kwargs["http_version"] = CurlHttpVersion.V2TLS
+                session_kwargs["curl_options"] = {CurlOpt.PIPEWAIT: 1}
+            elif http_version == HTTP_VERSION_1_1:
+                session_kwargs["http_version"] = CurlHttpVersion.V1_1
+            session_kwargs.update(client_kwargs)
+            return CurlAsyncSession(
+                impersonate=target,
+                proxies={"http": proxy, "https": proxy} if proxy else None,
+                max_clients=max_connections,
+                discard_cookies=True,
+                **session_kwargs
+            )
+        limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max(0, _get_env_int("HTTP_POOL_MAX_KEEPALIVE", 20)),
+            keepalive_expiry=_get_env_float("HTTP_POOL_KEEPALIVE_EXPIRY", 30.0),
+        )
+        client_kwargs.setdefault("limits", limits)
+        client_kwargs.setdefault("http2", http_version == HTTP_VERSION_2)
+        return install_dns_cache(httpx.AsyncClient(proxy=proxy, cookies=_no_cookie_jar(), **client_kwargs))
+
+    def _check_loop(self) -> None:
+        """客户端绑定事件循环；循环变化（如测试中重建循环）时丢弃旧注册表"""
+        loop = asyncio.get_running_loop()
+        if self._pool_loop is not loop:
+            self._pool = {}
+            self._pool_lock = asyncio.Lock()
+            self._pool_loop = loop
+
+    async def _lease(
+        self, timeout: Any, headers: Optional[Dict[str, str]] = None, **kwargs
+    ) -> PooledClient:
+        """
+        借出一个客户端视图
+
+        额外的客户端级参数（如 verify、follow_redirects）无法在共享客户端上按请求设置，
+        此时退回为本次借用单独创建客户端（与旧行为一致）。
+        """
+        self._log_init_once()
+        self._check_loop()
+        proxy = await get_proxy_config()
+        self.pool_stats.leases += 1
+
+        if kwargs or not _pooling_enabled():
+            self.pool_stats.dedicated_clients += 1
+            key = self._client_key(proxy)
+            client = self._create_client(key, timeout=timeout, headers=headers or None, **kwargs)
+            entry = _PoolEntry(key=key, client=client)
+            return PooledClient(self, entry, timeout, dedicated=True)
+
+        async with self._pool_lock:
+            key = self._client_key(proxy)
+            entry = self._pool.get(key)
+            if entry is not None and self._should_recycle(entry):
+                # 借出中的旧客户端在归还后关闭，新借用拿到新客户端
+                self._retire_entry(entry)
+                self.pool_stats.recycled += 1
+                log.debug(f"[HttpxClient] 轮换共享客户端 key={key} requests={entry.requests}")
+                entry = None
+            if entry is None:
+                # 代理、伪装目标或 HTTP 版本变化：淘汰旧客户端
+                self._retire_stale(key)
+                entry = _PoolEntry(key=key, client=self._create_client(key))
+                self._pool[key] = entry
+                self.pool_stats.clients_created += 1
+                log.debug(f"[HttpxClient] 创建共享客户端 key={key}")
+            entry.leases += 1
+        return PooledClient(self, entry, timeout, headers)
+
+    @staticmethod
+    def _should_recycle(entry: _PoolEntry) -> bool:
+        """
+        共享客户端是否到达存活时间或请求数上限
+
+        长期存活的 curl_cffi 会话会累积连接、DNS 与 TLS 会话缓存，定期轮换让这些状态得到刷新，
+        同时把新建会话（libcurl multi 句柄与伪装配置初始化）的开销摊到大量请求上。
+        """
+        max_age = _get_env_float("HTTP_POOL_CLIENT_MAX_AGE", 900.0)
+        if max_age > 0 and time.time() - entry.created_at >= max_age:
+            return True
+        max_requests = _get_env_int("HTTP_POOL_CLIENT_MAX_REQUESTS", 0)
+        return max_requests > 0 and entry.requests >= max_requests
+
+    def _retire_stale(self, key: ClientKey) -> None:
+        """淘汰与当前连接池键不一致的客户端（空闲的立即关闭，借出中的在归还后关闭）"""
+        stale = [entry for entry_key, entry in self._pool.items() if entry_key != key]
+        for entry in stale:
+            self._retire_entry(entry)
+        if any(entry.key[0] != key[0] for entry in stale):
+            self.pool_stats.proxy_rebuilds += 1
+            log.info(f"[HttpxClient] 代理配置已变化，淘汰 {len(stale)} 个共享客户端")
+
+    def _retire_entry(self, entry: _PoolEntry) -> None:
+        if entry.retired:
+            return
+        if self._pool.get(entry.key) is entry:
+            del self._pool[entry.key]
+        entry.retired = True
+        if entry.leases == 0:
+            self._schedule_close(entry)
+
+    def _schedule_close(self, entry: _PoolEntry) -> None:
+        self.pool_stats.clients_closed += 1
+        asyncio.get_running_loop().create_task(safe_close_client(entry.client))
+
+    async def _release(self, entry: _PoolEntry) -> None:
+        entry.leases -= 1
+        if entry.retired and entry.leases <= 0:
+            self.pool_stats.clients_closed += 1
+            await safe_close_client(entry.client)
+
+    async def close_all(self) -> None:
+        """关闭所有共享客户端（应用关闭时调用）"""
+        entries = list(self._pool.values())
+        self._pool = {}
+        for entry in entries:
+            entry.retired = True
+            self.pool_stats.clients_closed += 1
+            await safe_close_client(entry.client)
+
+    async def check_connection(self, url: str, timeout: float = 5.0) -> Dict[str, Any]:
+        """
+        连接健康检查：通过共享客户端发送一个 HEAD 请求
+
+        任何 HTTP 状态码都表示连接可用；协议错误计入 HTTP/2 健康状态。
+
+        Returns:
+            {"ok", "status_code", "http_version", "latency_ms", "error"}
+        """
+        started = time.perf_counter()
+        try:
+            async with self.get_client(timeout=timeout) as client:
+                response = await client.head(url)
+        except Exception as e:
+            return {
+                "ok": False,
+                "status_code": None,
+                "http_version": None,
+                "latency_ms": round((time.perf_counter() - started) * 1000, 1),
+                "error": str(e) or type(e).__name__,
+            }
+        return {
+            "ok": True,
+            "status_code": response.status_code,
+            "http_version": str(getattr(response, "http_version", "") or ""),
+            "latency_ms": round((time.perf_counter() - started) * 1000, 1),
+            "error": None,
+        }
+
+    def get_pool_status(self) -> Dict[str, Any]:
+        return {
+            "pooling_enabled": _pooling_enabled(),
+            "clients": [
+                {
+                    "proxy": bool(entry.key[0]),
+                    "impersonate": entry.key[1],
+                    "http_version": entry.key[2],
+                    "leases": entry.leases,
+                    "requests": entry.requests,
+                    "age_seconds": round(time.time() - entry.created_at, 1),
+                }
+                for entry in self._pool.values()
+            ],
+            **self.pool_stats.to_dict(),
+            "http2": self.http2_health.to_dict(),
+            "dns": get_dns_cache().get_stats(),
+        }
+
+    # ---------------------- 借用接口 ----------------------
+
     @asynccontextmanager
     async def get_client(
         self, timeout: float = 30.0, use_go_headers: bool = False, **kwargs
-    ) -> AsyncGenerator[Union[httpx.AsyncClient, "CurlAsyncSession"], None]:
+    ) -> AsyncGenerator[PooledClient, None]:
         """
-        获取配置好的异步HTTP客户端
+        获取配置好的异步HTTP客户端（共享连接池的借出视图）
 
         Args:
             timeout: 请求超时时间（秒）
@@ -102,60 +612,23 @@ class HttpxClientManager:
             **kwargs: 其他参数
 
         Yields:
-            HTTP 客户端实例（curl_cffi.AsyncSession 或 httpx.AsyncClient）
+            PooledClient（接口与 curl_cffi.AsyncSession / httpx.AsyncClient 一致）
         """
-        self._log_init_once()
-
-        if self._use_curl_cffi:
-            # 使用 curl_cffi 的 AsyncSession
-            async for client in self._get_curl_client(timeout, use_go_headers, **kwargs):
-                yield client
-        else:
-            # 降级到原生 httpx
-            async for client in self._get_httpx_client(timeout, **kwargs):
-                yield client
-
-    async def _get_curl_client(
-        self, timeout: float, use_go_headers: bool, **kwargs
-    ) -> AsyncGenerator["CurlAsyncSession", None]:
-        """获取 curl_cffi 客户端"""
-        # 获取代理配置
-        proxy_config = await get_proxy_config()
-
-        # curl_cffi 的代理格式
-        proxies = None
-        if proxy_config:
-            proxies = {"http": proxy_config, "https": proxy_config}
-
-        # 准备请求头
-        headers = kwargs.pop("headers", {})
-        if use_go_headers:
-            go_headers = get_go_style_headers()
+        headers = kwargs.pop("headers", None) or {}
+        if use_go_headers and self._use_curl_cffi:
             # Go 风格头部优先级较低，允许被覆盖
-            headers = {**go_headers, **headers}
-
-        async with CurlAsyncSession(
-            impersonate=get_impersonate_target(),
-            timeout=timeout,
-            proxies=proxies,
-            headers=headers,
-            **kwargs
-        ) as session:
-            yield session
-
-    async def _get_httpx_client(
-        self, timeout: float, **kwargs
-    ) -> AsyncGenerator[httpx.AsyncClient, None]:
-        """获取原生 httpx 客户端（降级模式）"""
-        client_kwargs = await self.get_client_kwargs(timeout=timeout, **kwargs)
-
-        async with httpx.AsyncClient(**client_kwargs) as client:
+            headers = {**get_go_style_headers(), **headers}
+
+        client = await self._lease(timeout, headers, **kwargs)
+        try:
             yield client
+        finally:
+            await client.aclose()
 
     @asynccontextmanager
     async def get_streaming_client(
         self, timeout: float = 600.0, **kwargs
-    ) -> AsyncGenerator[Union[httpx.AsyncClient, "CurlAsyncSession"], None]:
+    ) -> AsyncGenerator[PooledClient, None]:
         """
         获取用于流式请求的HTTP客户端
 
@@ -167,35 +640,14 @@ class HttpxClientManager:
             **kwargs: 其他参数
 
         Yields:
-            HTTP 客户端实例
+            PooledClient
         """
-        self._log_init_once()
-
-        if self._use_curl_cffi:
-            # curl_cffi 流式客户端
-            proxy_config = await get_proxy_config()
-            proxies = None
-            if proxy_config:
-                proxies = {"http": proxy_config, "https": proxy_config}
-
-            session = CurlAsyncSession(
-                impersonate=get_impersonate_target(),
-                timeout=timeout,
-                proxies=proxies,
-                **kwargs
-            )
-            try:
-                yield session
-            finally:
-                await session.close()
-        else:
-            # httpx 流式客户端
-            client_kwargs = await self.get_client_kwargs(timeout=timeout, **kwargs)
-            client = httpx.AsyncClient(**client_kwargs)
-            try:
-                yield client
-            finally:
-                await safe_close_client(client)
+        headers = kwargs.pop("headers", None)
+        client = await self._lease(timeout, headers, **kwargs)
+        try:
+            yield client
+        finally:
+            await client.aclose()
 
 
 # 全局HTTP客户端管理器实例
@@ -368,35 +820,19 @@ async def get_streaming_post_context(
         yield streaming_context
 
 
-async def create_streaming_client_with_kwargs(**kwargs) -> Union[httpx.AsyncClient, "CurlAsyncSession"]:
+async def create_streaming_client_with_kwargs(**kwargs) -> PooledClient:
     """
-    创建用于流式处理的独立客户端实例（手动管理生命周期）
+    借出用于流式处理的客户端视图（手动管理生命周期）
 
-    警告：调用者必须确保调用 safe_close_client() 来释放资源
+    警告：调用者必须确保调用 safe_close_client() 来归还借用
     建议使用 get_streaming_client() 上下文管理器代替此方法
 
     默认超时 600 秒（10分钟），适合 thinking 模型的长时间思考
     如果调用方需要无限等待，可以显式传入 timeout=None
     """
     timeout = kwargs.pop('timeout', 600.0)
-
-    if http_client._use_curl_cffi:
-        # curl_cffi 客户端
-        proxy_config = await get_proxy_config()
-        proxies = None
-        if proxy_config:
-            proxies = {"http": proxy_config, "https": proxy_config}
-
-        return CurlAsyncSession(
-            impersonate=get_impersonate_target(),
-            timeout=timeout,
-            proxies=proxies,
-            **kwargs
-        )
-    else:
-        # httpx 客户端
-        client_kwargs = await http_client.get_client_kwargs(timeout=timeout, **kwargs)
-        return httpx.AsyncClient(**client_kwargs)
+    headers = kwargs.pop('headers', None)
+    return await http_client._lease(timeout, headers, **kwargs)
 
 
 async def safe_close_client(client: Union[httpx.AsyncClient, "CurlAsyncSession", Any]) -> None:
@@ -511,4 +947,5 @@ def get_http_client_status() -> Dict[str, Any]:
     return {
         "backend": "curl_cffi" if http_client._use_curl_cffi else "httpx",
         "tls_impersonate": tls_status,
+        "client_pool": http_client.get_pool_status(),
     }
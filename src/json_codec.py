@@ -0,0 +1,186 @@
+"""
+JSON 编解码 - JSON Codec
+
+流式 chunk、NDJSON 行与请求体等热路径统一使用本模块编解码：
+- 已安装 orjson 时使用 orjson，其次 msgspec，都没有时使用标准库 json
+- JSON_CODEC 环境变量可强制指定后端（orjson / msgspec / stdlib），指定的后端不可用时按默认顺序选择
+
+标准库能编码的输入，编码输出与 json.dumps(obj, ensure_ascii=False, separators=(",", ":")) 逐字节一致
+（即 Anthropic SSE、Augment NDJSON 与 httpx json= 请求体原本使用的格式）。
+以下输入退回标准库编码，结果与错误都与标准库相同：
+- 快速后端无法处理的输入（超出 64 位的整数、孤立代理字符）
+- 传入 default 的调用（快速后端对 UUID / Enum 等类型不会调用 default，键的处理也不同）
+- orjson：非字符串键、datetime / dataclass 等 JSON 以外的类型（直通后由 default 拒绝）
+已知差异：
+- 指数形式的浮点数写法不同（1e-7 与 1e-07），数值相同
+- NaN / Infinity 编码为 null（标准库输出的 NaN / Infinity 不是合法 JSON）
+- 孤立代理字符转义为 \\udXXX（与 ensure_ascii=True 相同），否则结果无法编码为 UTF-8 写出
+- 标准库会抛 TypeError 的少数类型（未传 default 时），快速后端会直接编码而不报错：
+  orjson 的 UUID / Enum，msgspec 的 datetime / UUID / Enum / dataclass / set / bytes 等
+
+解码接受 str / bytes；快速后端解析失败时交给标准库重试，因此可接受的输入与标准库一致，
+解析错误统一抛出 json.JSONDecodeError。
+"""
+
+import json
+import os
+import re
+from typing import Any, Callable, Optional, Union
+
+from log import log
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+
+BACKEND_ORJSON = "orjson"
+BACKEND_MSGSPEC = "msgspec"
+BACKEND_STDLIB = "stdlib"
+
+_available = {
+    BACKEND_ORJSON: orjson is not None,
+    BACKEND_MSGSPEC: msgspec is not None,
+    BACKEND_STDLIB: True,
+}
+
+
+_SURROGATES = re.compile("[\ud800-\udfff]")
+
+
+def _escape_surrogate(match: "re.Match[str]") -> str:
+    return "\\u%04x" % ord(match.group())
+
+
+def _stdlib_dumps(obj: Any, default: Optional[Callable[[Any], Any]] = None) -> str:
+    text = json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=default)
+    # 代理字符只会出现在字符串字面量内，逐个转义后仍是同一个 JSON 值
+    if _SURROGATES.search(text) is not None:
+        text = _SURROGATES.sub(_escape_surrogate, text)
+    return text
+
+
+def _reject(obj: Any) -> Any:
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _select_backend() -> str:
+    requested = os.getenv("JSON_CODEC", "").strip().lower()
+    if requested:
+        if _available.get(requested):
+            return requested
+        log.warning(f"[JSON CODEC] JSON_CODEC={requested} 不可用，使用默认后端")
+    for name in (BACKEND_ORJSON, BACKEND_MSGSPEC):
+        if _available[name]:
+            return name
+    return BACKEND_STDLIB
+
+
+def _build(backend: str):
+    """按后端生成 (dumps_bytes, loads) 两个函数"""
+    if backend == BACKEND_ORJSON:
+        fast_errors = (TypeError, orjson.JSONEncodeError)
+        # datetime / dataclass 直通给 _reject，非字符串键直接报错，都交给标准库处理
+        options = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+
+        def dumps_bytes(obj: Any, default: Optional[Callable[[Any], Any]] = None) -> bytes:
+            if default is not None:
+                return _stdlib_dumps(obj, default).encode("utf-8")
+            try:
+                return orjson.dumps(obj, default=_reject, option=options)
+            except fast_errors:
+                return _stdlib_dumps(obj, default).encode("utf-8")
+
+        def loads(data: Union[str, bytes, bytearray, memoryview]) -> Any:
+            try:
+                return orjson.loads(data)
+            except orjson.JSONDecodeError:
+                if isinstance(data, memoryview):
+                    data = bytes(data)
+                return json.loads(data)
+
+        return dumps_bytes, loads
+
+    if backend == BACKEND_MSGSPEC:
+        encoder = msgspec.json.Encoder()
+        fast_errors = (TypeError, UnicodeEncodeError, msgspec.EncodeError)
+
+        def dumps_bytes(obj: Any, default: Optional[Callable[[Any], Any]] = None) -> bytes:
+            if default is not None:
+                return _stdlib_dumps(obj, default).encode("utf-8")
+            try:
+                return encoder.encode(obj)
+            except fast_errors:
+                return _stdlib_dumps(obj, default).encode("utf-8")
+
+        def loads(data: Union[str, bytes, bytearray, memoryview]) -> Any:
+            try:
+                return msgspec.json.decode(data)
+            except msgspec.DecodeError:
+                if isinstance(data, memoryview):
+                    data = bytes(data)
+                return json.loads(data)
+
+        return dumps_bytes, loads
+
+    def dumps_bytes(obj: Any, default: Optional[Callable[[Any], Any]] = None) -> bytes:
+        return _stdlib_dumps(obj, default).encode("utf-8")
+
+    def loads(data: Union[str, bytes, bytearray, memoryview]) -> Any:
+        if isinstance(data, memoryview):
+            data = bytes(data)
+        return json.loads(data)
+
+    return dumps_bytes, loads
+
+
+backend = _select_backend()
+_dumps_bytes, _loads = _build(backend)
+
+
+def dumps_bytes(obj: Any, default: Optional[Callable[[Any], Any]] = None) -> bytes:
+    """编码为 UTF-8 字节（紧凑格式，不转义非 ASCII 字符）"""
+    return _dumps_bytes(obj, default)
+
+
+def dumps(obj: Any, default: Optional[Callable[[Any], Any]] = None) -> str:
+    """编码为字符串，与 json.dumps(obj, ensure_ascii=False, separators=(",", ":")) 一致"""
+    if backend == BACKEND_STDLIB:
+        return _stdlib_dumps(obj, default)
+    return _dumps_bytes(obj, default).decode("utf-8")
+
+
+def loads(data: Union[str, bytes, bytearray, memoryview]) -> Any:
+    """
+    解码 JSON 文本或 UTF-8 字节
+
+    Raises:
+        json.JSONDecodeError: 输入不是合法 JSON
+    """
+    return _loads(data)
+
+
+def set_backend(name: str) -> str:
+    """
+    切换后端（测试与基准测试使用）
+
+    Returns:
+        切换前的后端名称
+    """
+    global backend, _dumps_bytes, _loads
+    if not _available.get(name):
+        raise ValueError(f"JSON codec backend not available: {name}")
+    previous = backend
+    backend = name
+    _dumps_bytes, _loads = _build(name)
+    return previous
+
+
+def get_codec_status() -> dict:
+    return {"backend": backend, "available": [name for name, ok in _available.items() if ok]}
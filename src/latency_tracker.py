@@ -0,0 +1,205 @@
+"""
+延迟追踪 - Latency Tracker
+
+为每个上游地址记录首字节时间（TTFB）与总耗时：
+- EWMA：对最近请求敏感的平均延迟，用于排序
+- 分位数草图：对数分桶的流式分位数估计（相对误差约 2%），O(1) 记录、内存与样本数无关；
+  按时间窗口轮换，分位数反映最近一到两个窗口的样本
+- 错误率 EWMA：成功记 0、失败记 1
+
+期望延迟 = 平均延迟 / (1 - 错误率)，即考虑失败重试后拿到一次成功响应的期望耗时，
+因此排序会同时避开慢的地址和经常失败的地址。
+
+所有记录方法都是同步的、不含 await，在事件循环中天然原子，不需要加锁。
+"""
+
+import math
+import time
+from typing import Any, Dict, Iterable, Optional
+
+
+class QuantileSketch:
+    """
+    对数分桶的流式分位数估计
+
+    值 v 落入下标为 ceil(log_gamma(v)) 的桶，gamma = (1 + a) / (1 - a)，
+    桶内任意值相对桶代表值的误差不超过 a。
+    """
+
+    def __init__(self, relative_accuracy: float = 0.02, min_value: float = 1e-4):
+        self.relative_accuracy = relative_accuracy
+        self.min_value = min_value
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self._buckets: Dict[int, int] = {}
+        self.count = 0
+
+    def add(self, value: float) -> None:
+        index = math.ceil(math.log(max(value, self.min_value)) / self._log_gamma)
+        self._buckets[index] = self._buckets.get(index, 0) + 1
+        self.count += 1
+
+    def clear(self) -> None:
+        self._buckets = {}
+        self.count = 0
+
+    def quantile(self, q: float, others: Iterable["QuantileSketch"] = ()) -> Optional[float]:
+        """
+        分位数估计（可与其他同参数的草图合并计算），没有样本时返回 None
+
+        Args:
+            q: 分位数（0-1）
+            others: 一起参与计算的其他草图
+        """
+        buckets = dict(self._buckets)
+        count = self.count
+        for other in others:
+            for index, n in other._buckets.items():
+                buckets[index] = buckets.get(index, 0) + n
+            count += other.count
+        if count == 0:
+            return None
+
+        rank = min(max(q, 0.0), 1.0) * (count - 1)
+        seen = 0
+        for index in sorted(buckets):
+            seen += buckets[index]
+            if seen > rank:
+                return 2 * self._gamma ** index / (self._gamma + 1)
+        return 2 * self._gamma ** max(buckets) / (self._gamma + 1)
+
+
+class WindowedSketch:
+    """
+    按时间窗口轮换的分位数草图
+
+    保留当前与上一个窗口，分位数基于两者合并计算，使旧样本在一到两个窗口后淘汰。
+    """
+
+    def __init__(self, window_seconds: float = 300.0, relative_accuracy: float = 0.02):
+        self.window_seconds = window_seconds
+        self._current = QuantileSketch(relative_accuracy)
+        self._previous = QuantileSketch(relative_accuracy)
+        self._window_started = time.monotonic()
+
+    def _rotate(self, now: float) -> None:
+        elapsed = now - self._window_started
+        if elapsed < self.window_seconds:
+            return
+        if elapsed >= 2 * self.window_seconds:
+            # 两个窗口内都没有样本：上一个窗口也已过期
+            self._previous.clear()
+        else:
+            self._previous, self._current = self._current, self._previous
+        self._current.clear()
+        self._window_started = now
+
+    def add(self, value: float) -> None:
+        self._rotate(time.monotonic())
+        self._current.add(value)
+
+    @property
+    def count(self) -> int:
+        self._rotate(time.monotonic())
+        return self._current.count + self._previous.count
+
+    def quantile(self, q: float) -> Optional[float]:
+        self._rotate(time.monotonic())
+        return self._current.quantile(q, (self._previous,))
+
+
+class Ewma:
+    """指数加权移动平均，第一次记录时直接取样本值"""
+
+    def __init__(self, alpha: float):
+        self.alpha = alpha
+        self.value: Optional[float] = None
+
+    def update(self, sample: float) -> None:
+        if self.value is None:
+            self.value = sample
+        else:
+            self.value += self.alpha * (sample - self.value)
+
+
+class LatencyTracker:
+    """单个上游地址的延迟与错误率追踪"""
+
+    # 错误率上限，避免持续失败时期望延迟变为无穷大
+    MAX_ERROR_RATE = 0.95
+
+    def __init__(
+        self,
+        alpha: float = 0.2,
+        error_alpha: float = 0.2,
+        window_seconds: float = 300.0,
+        relative_accuracy: float = 0.02,
+    ):
+        """
+        Args:
+            alpha: 延迟 EWMA 的平滑系数
+            error_alpha: 错误率 EWMA 的平滑系数
+            window_seconds: 分位数草图的轮换窗口（秒）
+            relative_accuracy: 分位数的相对误差
+        """
+        self.ttfb_ewma = Ewma(alpha)
+        self.total_ewma = Ewma(alpha)
+        self.error_rate = Ewma(error_alpha)
+        self.ttfb = WindowedSketch(window_seconds, relative_accuracy)
+        self.total = WindowedSketch(window_seconds, relative_accuracy)
+        self.ttfb_samples = 0
+        self.total_samples = 0
+
+    def record_ttfb(self, seconds: float) -> None:
+        self.ttfb_ewma.update(seconds)
+        self.ttfb.add(seconds)
+        self.ttfb_samples += 1
+
+    def record_total(self, seconds: float) -> None:
+        self.total_ewma.update(seconds)
+        self.total.add(seconds)
+        self.total_samples += 1
+
+    def record_outcome(self, ok: bool) -> None:
+        self.error_rate.update(0.0 if ok else 1.0)
+
+    def base_latency(self) -> Optional[float]:
+        """排序使用的平均延迟：优先 TTFB（与模型输出长度无关），否则总耗时"""
+        if self.ttfb_ewma.value is not None:
+            return self.ttfb_ewma.value
+        return self.total_ewma.value
+
+    def expected_latency(self, default: Optional[float] = None) -> Optional[float]:
+        """
+        考虑错误率的期望延迟（秒）
+
+        Args:
+            default: 还没有延迟样本时使用的平均延迟
+        """
+        base = self.base_latency()
+        if base is None:
+            base = default
+        if base is None:
+            return None
+        error_rate = min(self.error_rate.value or 0.0, self.MAX_ERROR_RATE)
+        return base / (1.0 - error_rate)
+
+    def to_dict(self) -> Dict[str, Any]:
+        def ms(value: Optional[float]) -> Optional[float]:
+            return round(value * 1000, 1) if value is not None else None
+
+        expected = self.expected_latency()
+        return {
+            "ttfb_samples": self.ttfb_samples,
+            "total_samples": self.total_samples,
+            "ttfb_ewma_ms": ms(self.ttfb_ewma.value),
+            "total_ewma_ms": ms(self.total_ewma.value),
+            "ttfb_p50_ms": ms(self.ttfb.quantile(0.50)),
+            "ttfb_p95_ms": ms(self.ttfb.quantile(0.95)),
+            "ttfb_p99_ms": ms(self.ttfb.quantile(0.99)),
+            "total_p50_ms": ms(self.total.quantile(0.50)),
+            "total_p95_ms": ms(self.total.quantile(0.95)),
+            "total_p99_ms": ms(self.total.quantile(0.99)),
+            "error_rate": round(self.error_rate.value or 0.0, 4),
+            "expected_latency_ms": ms(expected),
+        }
@@ -0,0 +1,168 @@
+"""
+模型列表缓存 - Models Cache
+
+IDE 会频繁轮询模型列表端点，每次都向上游取模型列表既慢又浪费凭证：
+- TTL 内直接返回缓存
+- 过期后先返回旧数据，同时在后台刷新（stale-while-revalidate）
+- 同一个键的并发刷新合并为一次上游调用（single-flight）
+- 响应带 ETag，GET 请求的 If-None-Match 命中时返回 304
+
+配置（环境变量）:
+- MODELS_CACHE_TTL_SECONDS: 缓存有效期（默认 60）
+- MODELS_CACHE_MAX_STALE_SECONDS: 过期后仍可直接返回旧数据的时长（默认 3600），超过后等待刷新
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from fastapi import Request, Response
+
+from log import log
+
+
+def _get_env_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    if value is None or value == "":
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        return default
+
+
+@dataclass
+class _Entry:
+    value: Any
+    fetched_at: float
+
+
+class SingleFlightCache:
+    """带 single-flight 与 stale-while-revalidate 的 TTL 缓存"""
+
+    def __init__(self, ttl: Optional[float] = None, max_stale: Optional[float] = None):
+        """
+        Args:
+            ttl: 缓存有效期（秒），默认读取 MODELS_CACHE_TTL_SECONDS
+            max_stale: 过期后仍可直接返回旧数据的时长（秒），默认读取 MODELS_CACHE_MAX_STALE_SECONDS
+        """
+        self.ttl = ttl if ttl is not None else _get_env_float("MODELS_CACHE_TTL_SECONDS", 60.0)
+        self.max_stale = (
+            max_stale if max_stale is not None else _get_env_float("MODELS_CACHE_MAX_STALE_SECONDS", 3600.0)
+        )
+        self._entries: Dict[str, _Entry] = {}
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+    async def get(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+        is_valid: Optional[Callable[[Any], bool]] = None,
+    ) -> Any:
+        """
+        读取缓存，必要时调用 loader 刷新
+
+        Args:
+            key: 缓存键
+            loader: 取数函数，同一时刻每个键最多只有一个在执行
+            is_valid: 判断结果是否可缓存（如空列表视为上游失败），不可缓存时保留旧数据
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            age = time.monotonic() - entry.fetched_at
+            if age < self.ttl:
+                return entry.value
+            if age < self.ttl + self.max_stale:
+                self._refresh(key, loader, is_valid)
+                return entry.value
+        # 调用方被取消时不取消共享的刷新
+        return await asyncio.shield(self._refresh(key, loader, is_valid))
+
+    def invalidate(self, key: Optional[str] = None) -> None:
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+
+    def _refresh(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+        is_valid: Optional[Callable[[Any], bool]],
+    ) -> asyncio.Task:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._load(key, loader, is_valid))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return task
+
+    async def _load(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+        is_valid: Optional[Callable[[Any], bool]],
+    ) -> Any:
+        previous = self._entries.get(key)
+        try:
+            value = await loader()
+        except Exception as e:
+            if previous is None:
+                raise
+            log.warning(f"[MODELS CACHE] Refresh of {key} failed, serving stale data: {e}")
+            return previous.value
+
+        if is_valid is not None and not is_valid(value):
+            if previous is not None:
+                log.warning(f"[MODELS CACHE] Refresh of {key} returned no data, serving stale data")
+                return previous.value
+            return value
+
+        self._entries[key] = _Entry(value=value, fetched_at=time.monotonic())
+        return value
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def etag_json_response(request: Request, content: Any, max_age: Optional[float] = None) -> Response:
+    """
+    带 ETag 的 JSON 响应，GET/HEAD 请求的 If-None-Match 命中时返回 304
+
+    Args:
+        max_age: Cache-Control 的 max-age（秒），默认使用模型列表缓存的 TTL
+    """
+    body = json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    etag = f'"{hashlib.sha1(body).hexdigest()[:20]}"'
+    if max_age is None:
+        max_age = get_models_cache().ttl
+    headers = {"ETag": etag, "Cache-Control": f"private, max-age={int(max_age)}"}
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and request.method in ("GET", "HEAD") and _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+# 全局模型列表缓存
+_models_cache: Optional[SingleFlightCache] = None
+
+
+def get_models_cache() -> SingleFlightCache:
+    global _models_cache
+    if _models_cache is None:
+        _models_cache = SingleFlightCache()
+    return _models_cache
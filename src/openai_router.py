@@ -5,7 +5,6 @@ OpenAI Router - Handles OpenAI format API requests
 
 import asyncio
 import json
-import time
 import uuid
 
 from fastapi import APIRouter, Depends, HTTPException, Request
@@ -33,6 +32,7 @@ from .openai_transfer import (
     gemini_stream_chunk_to_openai,
     openai_request_to_gemini_payload,
 )
+from .stream_error_handler import SSEChunkBuilder
 from .task_manager import create_managed_task
 
 # 创建路由器
@@ -208,6 +208,7 @@ async def fake_stream_response(api_payload: dict, cred_mgr: CredentialManager) -
     """处理假流式响应"""
 
     async def stream_generator():
+        builder = SSEChunkBuilder(str(uuid.uuid4()), "gcli2api-streaming")
         try:
             # 发送心跳
             heartbeat = {
@@ -307,71 +308,20 @@ async def fake_stream_response(api_payload: dict, cred_mgr: CredentialManager) -
                     # 转换usageMetadata为OpenAI格式
                     usage = _convert_usage_metadata(response_data.get("usageMetadata"))
 
-                    # 构建完整的OpenAI格式的流式响应块
-                    content_chunk = {
-                        "id": str(uuid.uuid4()),
-                        "object": "chat.completion.chunk",
-                        "created": int(time.time()),
-                        "model": "gcli2api-streaming",
-                        "choices": [{"index": 0, "delta": delta, "finish_reason": "stop"}],
-                    }
-
-                    # 只有在有usage数据时才添加usage字段（确保在最后一个chunk中）
-                    if usage:
-                        content_chunk["usage"] = usage
-
-                    yield f"data: {json.dumps(content_chunk)}\n\n".encode()
+                    # 构建完整的OpenAI格式的流式响应块（只有在有usage数据时才添加usage字段）
+                    yield builder.build_delta_chunk(delta, "stop", usage).encode()
                 else:
                     log.warning(f"No content found in response: {response_data}")
                     # 如果完全没有内容，提供默认回复
-                    error_chunk = {
-                        "id": str(uuid.uuid4()),
-                        "object": "chat.completion.chunk",
-                        "created": int(time.time()),
-                        "model": "gcli2api-streaming",
-                        "choices": [
-                            {
-                                "index": 0,
-                                "delta": {"role": "assistant", "content": "[响应为空，请重新尝试]"},
-                                "finish_reason": "stop",
-                            }
-                        ],
-                    }
-                    yield f"data: {json.dumps(error_chunk)}\n\n".encode()
+                    yield builder.build_delta_chunk({"role": "assistant", "content": "[响应为空，请重新尝试]"}, "stop").encode()
             except json.JSONDecodeError:
-                error_chunk = {
-                    "id": str(uuid.uuid4()),
-                    "object": "chat.completion.chunk",
-                    "created": int(time.time()),
-                    "model": "gcli2api-streaming",
-                    "choices": [
-                        {
-                            "index": 0,
-                            "delta": {"role": "assistant", "content": body_str},
-                            "finish_reason": "stop",
-                        }
-                    ],
-                }
-                yield f"data: {json.dumps(error_chunk)}\n\n".encode()
+                yield builder.build_delta_chunk({"role": "assistant", "content": body_str}, "stop").encode()
 
             yield "data: [DONE]\n\n".encode()
 
         except Exception as e:
             log.error(f"Fake streaming error: {e}")
-            error_chunk = {
-                "id": str(uuid.uuid4()),
-                "object": "chat.completion.chunk",
-                "created": int(time.time()),
-                "model": "gcli2api-streaming",
-                "choices": [
-                    {
-                        "index": 0,
-                        "delta": {"role": "assistant", "content": f"Error: {str(e)}"},
-                        "finish_reason": "stop",
-                    }
-                ],
-            }
-            yield f"data: {json.dumps(error_chunk)}\n\n".encode()
+            yield builder.build_delta_chunk({"role": "assistant", "content": f"Error: {str(e)}"}, "stop").encode()
             yield "data: [DONE]\n\n".encode()
 
     return StreamingResponse(stream_generator(), media_type="text/event-stream")
@@ -380,6 +330,7 @@ async def fake_stream_response(api_payload: dict, cred_mgr: CredentialManager) -
 async def convert_streaming_response(gemini_response, model: str) -> StreamingResponse:
     """转换流式响应为OpenAI格式"""
     response_id = str(uuid.uuid4())
+    builder = SSEChunkBuilder(response_id, model)
 
     async def openai_stream_generator():
         try:
@@ -423,21 +374,9 @@ async def convert_streaming_response(gemini_response, model: str) -> StreamingRe
                                         if synthetic_tool:
                                             # 发送合成工具调用！
                                             log.info(f"[SSOP] Emitting synthetic tool call: {synthetic_tool['id']}")
-                                            ssop_chunk = {
-                                                "id": response_id,
-                                                "object": "chat.completion.chunk",
-                                                "created": int(time.time()),
-                                                "model": model,
-                                                "choices": [{
-                                                    "index": 0,
-                                                    "delta": {
-                                                        "role": "assistant",
-                                                        "tool_calls": [synthetic_tool]
-                                                    },
-                                                    "finish_reason": None
-                                                }]
-                                            }
-                                            yield f"data: {json.dumps(ssop_chunk)}\n\n".encode()
+                                            yield builder.build_delta_chunk(
+                                                {"role": "assistant", "tool_calls": [synthetic_tool]}
+                                            ).encode()
 
                         openai_chunk = gemini_stream_chunk_to_openai(
                             gemini_chunk, model, response_id
@@ -447,46 +386,20 @@ async def convert_streaming_response(gemini_response, model: str) -> StreamingRe
                         if openai_chunk.get("choices", [{}])[0].get("delta", {}).get("tool_calls"):
                              has_emitted_native_tool = True
                              
-                        yield f"data: {json.dumps(openai_chunk, separators=(',', ':'))}\n\n".encode()
+                        yield builder.build_choices_chunk(openai_chunk["choices"], openai_chunk.get("usage")).encode()
                     except json.JSONDecodeError:
                         continue
             else:
                 # 其他类型的响应，尝试直接处理
                 log.warning(f"Unexpected response type: {type(gemini_response)}")
-                error_chunk = {
-                    "id": response_id,
-                    "object": "chat.completion.chunk",
-                    "created": int(time.time()),
-                    "model": model,
-                    "choices": [
-                        {
-                            "index": 0,
-                            "delta": {"role": "assistant", "content": "Response type error"},
-                            "finish_reason": "stop",
-                        }
-                    ],
-                }
-                yield f"data: {json.dumps(error_chunk)}\n\n".encode()
+                yield builder.build_delta_chunk({"role": "assistant", "content": "Response type error"}, "stop").encode()
 
             # 发送结束标记
             yield "data: [DONE]\n\n".encode()
 
         except Exception as e:
             log.error(f"Stream conversion error: {e}")
-            error_chunk = {
-                "id": response_id,
-                "object": "chat.completion.chunk",
-                "created": int(time.time()),
-                "model": model,
-                "choices": [
-                    {
-                        "index": 0,
-                        "delta": {"role": "assistant", "content": f"Stream error: {str(e)}"},
-                        "finish_reason": "stop",
-                    }
-                ],
-            }
-            yield f"data: {json.dumps(error_chunk)}\n\n".encode()
+            yield builder.build_delta_chunk({"role": "assistant", "content": f"Stream error: {str(e)}"}, "stop").encode()
             yield "data: [DONE]\n\n".encode()
 
     return StreamingResponse(openai_stream_generator(), media_type="text/event-stream")
@@ -1,11 +1,18 @@
 """
-Rate Limiter - 请求最小间隔防抖模块
+Rate Limiter - 请求限流模块
 
 [FIX 2026-01-21] 对齐 Antigravity-Manager 的 rate_limiter.rs 实现：
 - 确保对同一上游通道的调用至少间隔 N ms
 - 主动削峰，避免瞬时并发过高触发限流
 
 参考实现：Antigravity-Manager/src-tauri/src/proxy/common/rate_limiter.rs
+
+令牌桶（GCRA）实现：
+- 每个桶只保存一个“理论到达时间”（TAT），按键分组时每个键 O(1) 内存
+- 获取额度时直接计算出本次调用的放行时间并预留，不持有锁；
+  等待者各自 sleep 到自己的截止时间，同一时刻可以放行多个等待者
+- rate 控制平均速率，burst 控制允许的突发数量；burst=1 时等价于最小间隔限流
+- 桶“满”（TAT 早于当前时间）时与新建桶等价，可以无损回收
 """
 
 import asyncio
@@ -15,11 +22,192 @@ from typing import Dict, Optional
 from log import log
 
 
-class RateLimiter:
+class TokenBucketLimiter:
+    """
+    令牌桶限流器（GCRA）
+
+    Usage:
+        limiter = TokenBucketLimiter(rate=5, burst=10)  # 平均每秒 5 次，最多突发 10 次
+        await limiter.wait()
+        if limiter.try_acquire():
+            ...
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        """
+        初始化令牌桶
+
+        Args:
+            rate: 平均速率（次/秒），<= 0 表示不限流
+            burst: 允许的最大突发次数（桶容量）
+        """
+        self.rate = float(rate)
+        self.burst = max(1, int(burst))
+        self._interval = 1.0 / self.rate if self.rate > 0 else 0.0
+        self._tolerance = self._interval * (self.burst - 1)
+        self._tat = 0.0
+
+    @classmethod
+    def from_interval(cls, min_interval_seconds: float, burst: int = 1) -> "TokenBucketLimiter":
+        """按平均间隔（秒）创建，<= 0 表示不限流"""
+        return cls(rate=1.0 / min_interval_seconds if min_interval_seconds > 0 else 0.0, burst=burst)
+
+    @property
+    def unlimited(self) -> bool:
+        return self._interval <= 0
+
+    def reserve(self, now: Optional[float] = None) -> float:
+        """
+        预留一次调用额度
+
+        Returns:
+            需要等待的秒数（0 表示可以立即调用）
+        """
+        if self._interval <= 0:
+            return 0.0
+        now = time.monotonic() if now is None else now
+        tat = max(self._tat, now)
+        self._tat = tat + self._interval
+        return max(0.0, tat - self._tolerance - now)
+
+    def try_acquire(self, now: Optional[float] = None) -> bool:
+        """有可用额度时立即占用并返回 True，否则不占用并返回 False"""
+        if self._interval <= 0:
+            return True
+        now = time.monotonic() if now is None else now
+        tat = max(self._tat, now)
+        if tat - self._tolerance > now:
+            return False
+        self._tat = tat + self._interval
+        return True
+
+    async def wait(self) -> None:
+        """等待直到可以进行下一次调用"""
+        delay = self.reserve()
+        if delay <= 0:
+            return
+        reserved_tat = self._tat
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            # 被取消的是最后一个预留时归还额度；否则后续等待者已经按它排好了截止时间
+            if self._tat == reserved_tat:
+                self._tat -= self._interval
+            raise
+
+    def reset(self) -> None:
+        """重置限制器状态（用于测试或特殊情况）"""
+        self._tat = 0.0
+
+
+class KeyedTokenBucketLimiter:
+    """
+    按键分组的令牌桶限流器
+
+    每个键只保存一个浮点数（TAT）；桶恢复满额后即可回收，
+    wait() 时每隔 sweep_interval 秒顺带清理一次，不需要额外的后台任务。
+
+    Usage:
+        limiter = KeyedTokenBucketLimiter(rate=2, burst=4)
+        await limiter.wait("account1")
+        await limiter.wait("account2")  # 不受 account1 影响
+    """
+
+    def __init__(self, rate: float, burst: int = 1, sweep_interval: float = 60.0):
+        """
+        初始化按键分组的令牌桶
+
+        Args:
+            rate: 每个键的平均速率（次/秒），<= 0 表示不限流
+            burst: 每个键允许的最大突发次数
+            sweep_interval: 自动清理空闲键的间隔（秒）
+        """
+        self.rate = float(rate)
+        self.burst = max(1, int(burst))
+        self.sweep_interval = sweep_interval
+        self._interval = 1.0 / self.rate if self.rate > 0 else 0.0
+        self._tolerance = self._interval * (self.burst - 1)
+        self._tats: Dict[str, float] = {}
+        self._next_sweep = 0.0
+
+    @classmethod
+    def from_interval(
+        cls, min_interval_seconds: float, burst: int = 1, sweep_interval: float = 60.0
+    ) -> "KeyedTokenBucketLimiter":
+        """按平均间隔（秒）创建，<= 0 表示不限流"""
+        rate = 1.0 / min_interval_seconds if min_interval_seconds > 0 else 0.0
+        return cls(rate=rate, burst=burst, sweep_interval=sweep_interval)
+
+    def __len__(self) -> int:
+        return len(self._tats)
+
+    def reserve(self, key: str, now: Optional[float] = None) -> float:
+        """预留指定键的一次调用额度，返回需要等待的秒数"""
+        if self._interval <= 0:
+            return 0.0
+        now = time.monotonic() if now is None else now
+        if now >= self._next_sweep:
+            self.evict_idle(now=now)
+            self._next_sweep = now + self.sweep_interval
+        tat = max(self._tats.get(key, now), now)
+        self._tats[key] = tat + self._interval
+        return max(0.0, tat - self._tolerance - now)
+
+    def try_acquire(self, key: str, now: Optional[float] = None) -> bool:
+        """指定键有可用额度时立即占用并返回 True，否则返回 False"""
+        if self._interval <= 0:
+            return True
+        now = time.monotonic() if now is None else now
+        tat = max(self._tats.get(key, now), now)
+        if tat - self._tolerance > now:
+            return False
+        self._tats[key] = tat + self._interval
+        return True
+
+    async def wait(self, key: str) -> None:
+        """
+        等待直到指定键可以进行下一次调用
+
+        Args:
+            key: 限制器键（如账号名、模型名）
+        """
+        delay = self.reserve(key)
+        if delay <= 0:
+            return
+        reserved_tat = self._tats.get(key)
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            if self._tats.get(key) == reserved_tat:
+                self._tats[key] = reserved_tat - self._interval
+            raise
+
+    def evict_idle(self, idle_seconds: float = 0.0, now: Optional[float] = None) -> int:
+        """
+        回收空闲键（桶已恢复满额且空闲超过 idle_seconds 的键）
+
+        Returns:
+            回收的键数量
+        """
+        now = time.monotonic() if now is None else now
+        threshold = now - idle_seconds
+        idle = [key for key, tat in self._tats.items() if tat <= threshold]
+        for key in idle:
+            del self._tats[key]
+        if idle:
+            log.debug(f"[RATE_LIMITER] Cleaned up {len(idle)} idle limiters")
+        return len(idle)
+
+    def reset(self) -> None:
+        self._tats.clear()
+        self._next_sweep = 0.0
+
+
+class RateLimiter(TokenBucketLimiter):
     """
     请求速率限制器
 
-    确保调用之间至少间隔指定的时间，用于：
+    确保调用之间至少间隔指定的时间（burst=1 的令牌桶），用于：
     - 防止瞬时并发过高
     - 主动削峰，减少 429 错误
     - 保护上游服务
@@ -37,40 +225,15 @@ class RateLimiter:
         Args:
             min_interval_ms: 最小调用间隔（毫秒），默认 500ms
         """
-        self._min_interval = max(0, min_interval_ms) / 1000.0  # 转换为秒
-        self._last_call: Optional[float] = None
-        self._lock = asyncio.Lock()
-
-    async def wait(self) -> None:
-        """
-        等待直到可以进行下一次调用
-
-        如果距离上次调用未超过 min_interval，则 sleep 剩余时间。
-        """
-        if self._min_interval <= 0:
-            return
-
-        async with self._lock:
-            now = time.monotonic()
-
-            if self._last_call is not None:
-                elapsed = now - self._last_call
-                if elapsed < self._min_interval:
-                    sleep_time = self._min_interval - elapsed
-                    await asyncio.sleep(sleep_time)
+        interval = max(0, min_interval_ms) / 1000.0
+        super().__init__(rate=1.0 / interval if interval > 0 else 0.0, burst=1)
 
-            self._last_call = time.monotonic()
 
-    def reset(self) -> None:
-        """重置限制器状态（用于测试或特殊情况）"""
-        self._last_call = None
-
-
-class KeyedRateLimiter:
+class KeyedRateLimiter(KeyedTokenBucketLimiter):
     """
     按键分组的速率限制器
 
-    为不同的键（如账号、模型）维护独立的速率限制。
+    为不同的键（如账号、模型）维护独立的最小间隔限制（burst=1 的令牌桶）。
 
     Usage:
         limiter = KeyedRateLimiter(min_interval_ms=500)
@@ -86,23 +249,8 @@ class KeyedRateLimiter:
         Args:
             min_interval_ms: 每个键的最小调用间隔（毫秒）
         """
-        self._min_interval_ms = min_interval_ms
-        self._limiters: Dict[str, RateLimiter] = {}
-        self._lock = asyncio.Lock()
-
-    async def wait(self, key: str) -> None:
-        """
-        等待直到指定键可以进行下一次调用
-
-        Args:
-            key: 限制器键（如账号名、模型名）
-        """
-        async with self._lock:
-            if key not in self._limiters:
-                self._limiters[key] = RateLimiter(self._min_interval_ms)
-            limiter = self._limiters[key]
-
-        await limiter.wait()
+        interval = max(0, min_interval_ms) / 1000.0
+        super().__init__(rate=1.0 / interval if interval > 0 else 0.0, burst=1)
 
     async def cleanup_idle(self, idle_seconds: float = 300) -> int:
         """
@@ -114,22 +262,7 @@ class KeyedRateLimiter:
         Returns:
             清理的限制器数量
         """
-        now = time.monotonic()
-        threshold = now - idle_seconds
-
-        async with self._lock:
-            to_remove = []
-            for key, limiter in self._limiters.items():
-                if limiter._last_call is not None and limiter._last_call < threshold:
-                    to_remove.append(key)
-
-            for key in to_remove:
-                del self._limiters[key]
-
-            if to_remove:
-                log.debug(f"[RATE_LIMITER] Cleaned up {len(to_remove)} idle limiters")
-
-            return len(to_remove)
+        return self.evict_idle(idle_seconds)
 
 
 class AdaptiveRateLimiter:
@@ -0,0 +1,202 @@
+"""
+对冲请求 - Hedged Requests
+
+主请求在对冲延迟内没有产出首个数据块时，向下一个 BaseURL 发出同样的请求，
+采用先产出首个数据块的一方，取消另一方。对冲延迟取主请求所用 URL 的首字节时间 p95，
+因此只有明显慢于常态的请求才会触发对冲，额外流量约为 5%。
+
+对冲请求只在能够立即获得并发额度与限流令牌时发出，不会排队，也不会挤占正常请求。
+
+配置（环境变量）:
+- ANTIGRAVITY_HEDGING_ENABLED: 是否启用（默认 false）
+- ANTIGRAVITY_HEDGE_PERCENTILE: 对冲延迟使用的首字节时间分位数（默认 95）
+- ANTIGRAVITY_HEDGE_DEFAULT_DELAY_SECONDS: 还没有延迟样本时的对冲延迟（默认 3）
+- ANTIGRAVITY_HEDGE_MIN_DELAY_SECONDS / ANTIGRAVITY_HEDGE_MAX_DELAY_SECONDS: 对冲延迟上下限（默认 0.5 / 10）
+"""
+
+import asyncio
+import os
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, TypeVar
+
+from log import log
+
+T = TypeVar("T")
+
+
+def _get_env_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    if value is None or value == "":
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        return default
+
+
+def is_hedging_enabled() -> bool:
+    return os.getenv("ANTIGRAVITY_HEDGING_ENABLED", "false").lower() in ("true", "1", "yes", "on")
+
+
+def hedge_percentile() -> float:
+    return min(99.9, max(50.0, _get_env_float("ANTIGRAVITY_HEDGE_PERCENTILE", 95.0)))
+
+
+def compute_hedge_delay(observed: Optional[float]) -> float:
+    """
+    根据观测到的首字节时间分位数计算对冲延迟
+
+    Args:
+        observed: 主请求 URL 的首字节时间分位数（秒），没有样本时为 None
+    """
+    if observed is None:
+        observed = _get_env_float("ANTIGRAVITY_HEDGE_DEFAULT_DELAY_SECONDS", 3.0)
+    low = _get_env_float("ANTIGRAVITY_HEDGE_MIN_DELAY_SECONDS", 0.5)
+    high = _get_env_float("ANTIGRAVITY_HEDGE_MAX_DELAY_SECONDS", 10.0)
+    return min(high, max(low, observed))
+
+
+@dataclass
+class HedgeStats:
+    """对冲请求统计"""
+
+    # 经过对冲判定的请求数
+    requests: int = 0
+    # 实际发出的对冲请求数
+    hedges_fired: int = 0
+    # 对冲请求先产出首个数据块
+    hedge_wins: int = 0
+    # 已发出对冲，但主请求仍然先完成
+    primary_wins: int = 0
+    # 两边都失败，按主请求的结果处理
+    both_failed: int = 0
+    # 需要对冲但没有空闲额度/令牌或没有备用 URL
+    hedges_skipped: int = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "hedges_fired": self.hedges_fired,
+            "hedge_wins": self.hedge_wins,
+            "primary_wins": self.primary_wins,
+            "both_failed": self.both_failed,
+            "hedges_skipped": self.hedges_skipped,
+            "hedge_rate": (self.hedges_fired / self.requests) if self.requests else 0.0,
+            "hedge_win_rate": (self.hedge_wins / self.hedges_fired) if self.hedges_fired else 0.0,
+        }
+
+
+async def run_hedged(
+    primary: Awaitable[T],
+    make_hedge: Callable[[], Awaitable[Optional[Awaitable[T]]]],
+    delay: float,
+    is_win: Callable[[T], bool],
+    discard: Callable[[T], Awaitable[None]],
+    stats: Optional[HedgeStats] = None,
+) -> T:
+    """
+    运行主请求，超过 delay 仍未完成时发出对冲请求，返回先成功的一方
+
+    两个请求都不应抛出业务异常，而是把失败记录在结果对象中（由 is_win 判断）；
+    被取消的请求需要自行清理资源。
+
+    Args:
+        primary: 主请求
+        make_hedge: 创建对冲请求；无法对冲（额度不足等）时返回 None，抛出异常时同样按跳过处理
+        delay: 对冲延迟（秒）
+        is_win: 结果是否成功
+        discard: 释放落败一方的结果
+        stats: 统计对象
+
+    Returns:
+        成功一方的结果；都失败时返回主请求的结果
+    """
+    stats = stats if stats is not None else get_hedge_stats()
+    stats.requests += 1
+    primary_task = asyncio.ensure_future(primary)
+    hedge_task: Optional[asyncio.Future] = None
+    winner: Optional[asyncio.Future] = None
+    try:
+        done, _ = await asyncio.wait({primary_task}, timeout=delay)
+        if done:
+            winner = primary_task
+            return primary_task.result()
+
+        try:
+            hedge = await make_hedge()
+        except Exception as e:
+            # 对冲只是可选的加速手段，创建失败时继续等待主请求
+            log.warning(f"[HEDGE] 创建对冲请求失败，继续等待主请求: {e}")
+            hedge = None
+        if hedge is None:
+            stats.hedges_skipped += 1
+            await asyncio.wait({primary_task})
+            winner = primary_task
+            return primary_task.result()
+
+        stats.hedges_fired += 1
+        hedge_task = asyncio.ensure_future(hedge)
+        pending = {primary_task, hedge_task}
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            # 同时完成时优先主请求
+            for task in sorted(done, key=lambda t: t is not primary_task):
+                try:
+                    result = task.result()
+                except Exception as e:
+                    # 异常结束的一方视为失败，继续等待另一方（都失败时按主请求的结果处理）
+                    name = "主请求" if task is primary_task else "对冲请求"
+                    log.warning(f"[HEDGE] {name}异常结束: {e}")
+                    continue
+                if is_win(result):
+                    if task is primary_task:
+                        stats.primary_wins += 1
+                    else:
+                        stats.hedge_wins += 1
+                        log.info(f"[HEDGE] 对冲请求先返回首个数据块 (delay={delay:.2f}s)")
+                    winner = task
+                    return result
+
+        stats.both_failed += 1
+        winner = primary_task
+        return primary_task.result()
+    finally:
+        # 除返回的一方外全部释放：未完成的取消，已完成的 discard 结果
+        # （调用方被取消时主请求可能恰好已完成，结果里持有上游流和并发额度）
+        losers = [t for t in (primary_task, hedge_task) if t is not None and t is not winner]
+        if losers:
+            cleanup = asyncio.ensure_future(
+                asyncio.gather(*(_drop(t, discard) for t in losers), return_exceptions=True)
+            )
+            _cleanups.add(cleanup)
+            cleanup.add_done_callback(_cleanups.discard)
+            # shield：调用方在清理期间再次被取消时，清理仍在后台完成
+            for error in await asyncio.shield(cleanup):
+                if error is not None:
+                    log.warning(f"[HEDGE] 释放落败请求失败: {error}")
+
+
+async def _drop(task: asyncio.Future, discard: Callable[[Any], Awaitable[None]]) -> None:
+    if not task.done():
+        task.cancel()
+    try:
+        result = await task
+    except asyncio.CancelledError:
+        return
+    except Exception as e:
+        log.debug(f"[HEDGE] 落败请求异常结束: {e}")
+        return
+    # 取消前已经完成：结果需要释放
+    await discard(result)
+
+
+# 进行中的清理任务（保持引用，避免被调用方取消后任务被回收）
+_cleanups: Set[asyncio.Future] = set()
+
+
+_hedge_stats = HedgeStats()
+
+
+def get_hedge_stats() -> HedgeStats:
+    """获取全局对冲请求统计"""
+    return _hedge_stats
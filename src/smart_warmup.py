@@ -649,6 +649,7 @@ class SmartWarmup:
             from src.antigravity_api import build_antigravity_headers, _throttle_antigravity_upstream
             from config import get_antigravity_api_url
             import httpx
+            from src.dns_cache import install_dns_cache
             import random
 
             access_token = cred_data.get("access_token") or cred_data.get("token")
@@ -658,8 +659,8 @@ class SmartWarmup:
                 log.warning(f"[SmartWarmup] {cred_name} 没有 access_token")
                 return "failed"
 
-            # 使用全局节流器
-            await _throttle_antigravity_upstream()
+            # 使用凭证级节流器
+            await _throttle_antigravity_upstream(cred_name)
 
             # 构建请求
             api_url = await get_antigravity_api_url()
@@ -689,7 +690,7 @@ class SmartWarmup:
             # [v7.2] 使用随机超时（8-15秒），避免固定模式
             timeout = random.uniform(8.0, 15.0)
 
-            async with httpx.AsyncClient(timeout=timeout) as client:
+            async with install_dns_cache(httpx.AsyncClient(timeout=timeout)) as client:
                 response = await client.post(
                     target_url,
                     headers=headers,
@@ -23,11 +23,20 @@ class SSOPScanner:
     def __init__(self):
         self.emitted_tool_call_ids = set()
         self.buffer = ""
+        # Incremental scan state: position in buffer, brace depth, start of the open block,
+        # and closed top-level blocks that have not been examined yet.
+        self._scan_pos = 0
+        self._depth = 0
+        self._start_idx = 0
+        self._pending_cmds: List[str] = []
     
     def scan(self, new_text: str) -> Optional[Dict[str, Any]]:
         """
         Scan the updated buffer for potential tool calls.
         Returns an OpenAI-compatible tool_call dict if found and not yet emitted.
+
+        Only the newly appended text is scanned; closed blocks are examined once
+        (a block that was skipped, or already emitted, would be skipped again).
         """
         self.buffer += new_text
         
@@ -35,12 +44,12 @@ class SSOPScanner:
         # loop chars, track depth.
         
         chars = self.buffer
-        depth = 0
-        start_idx = 0
-        potential_cmds = []
+        depth = self._depth
+        start_idx = self._start_idx
 
-        # Find all top-level JSON objects
-        for i, char in enumerate(chars):
+        # Find all top-level JSON objects closed by the new text
+        for i in range(self._scan_pos, len(chars)):
+            char = chars[i]
             if char == '{':
                 if depth == 0:
                     start_idx = i
@@ -50,10 +59,14 @@ class SSOPScanner:
                     depth -= 1
                     if depth == 0:
                         # Found a closed JSON block
-                        json_str = chars[start_idx : i+1]
-                        potential_cmds.append(json_str)
-        
-        for json_str in potential_cmds:
+                        self._pending_cmds.append(chars[start_idx : i+1])
+        self._scan_pos = len(chars)
+        self._depth = depth
+        self._start_idx = start_idx
+
+        potential_cmds = self._pending_cmds
+        while potential_cmds:
+            json_str = potential_cmds.pop(0)
             try:
                 data = json.loads(json_str)
                 if not isinstance(data, dict):
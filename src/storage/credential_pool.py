@@ -0,0 +1,578 @@
+"""
+凭证池内存索引 - Credential Pool
+
+为 SQLiteManager 提供常驻内存的凭证索引，避免每次选择凭证都读数据库：
+- 启动后从数据库加载一次，之后由 store_credential / update_credential_state /
+  set_model_cooldown 等写入方法同步更新
+- 凭证数据和 model_cooldowns 预先解析，选择时不再 json.loads
+- 每个 model_key 维护一棵权重树（Fenwick Tree），加权随机选择为 O(log n)
+- 每个 model_key 维护一个冷却最小堆（惰性删除），最早冷却截止时间查询为均摊 O(log n)
+- 健康度统计常驻内存，由 record_request_result 增量更新，批量评分无需逐个查询
+"""
+
+import heapq
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from log import log
+
+# 默认健康度（与 get_credential_health_score 无数据时的取值保持一致）
+DEFAULT_HEALTH_SCORE = 50.0
+
+# 最近错误统计窗口（秒）与保留条数
+RECENT_ERROR_WINDOW_SECONDS = 300
+RECENT_ERRORS_KEEP = 10
+
+
+def compute_health_score(
+    success_count: int,
+    failure_count: int,
+    total_latency_ms: float,
+    recent_errors: List[Dict[str, Any]],
+    now: Optional[float] = None,
+) -> float:
+    """
+    计算凭证的健康度评分 (0-100)
+
+    health_score = 成功率 * 0.5 + 延迟评分 * 0.3 + 最近错误评分 * 0.2
+    （配额权重在选择时单独处理）
+    """
+    now = time.time() if now is None else now
+    success_count = success_count or 0
+    failure_count = failure_count or 0
+    total_latency_ms = total_latency_ms or 0
+
+    # 1. 成功率 (0-100)
+    total_requests = success_count + failure_count
+    if total_requests > 0:
+        success_rate = (success_count / total_requests) * 100
+    else:
+        success_rate = 100  # 没有请求记录，假设完美
+
+    # 2. 延迟权重 (0-100)，延迟越低分数越高
+    if success_count > 0:
+        avg_latency = total_latency_ms / success_count
+        # 假设 1000ms 是基准，超过 5000ms 得 0 分
+        latency_score = max(0, 100 - (avg_latency / 50))
+    else:
+        latency_score = 50  # 没有数据，给中等分
+
+    # 3. 最近错误权重 (0-100)，错误越少分数越高
+    recent_error_count = sum(
+        1 for e in recent_errors
+        if now - e.get("time", 0) < RECENT_ERROR_WINDOW_SECONDS
+    )
+    recent_error_score = max(0, 100 - (recent_error_count * 20))
+
+    health_score = (
+        success_rate * 0.5 +
+        latency_score * 0.3 +
+        recent_error_score * 0.2
+    )
+    return min(100, max(0, health_score))
+
+
+@dataclass
+class HealthStats:
+    """单个凭证的健康度统计（与数据库中的 success_count 等列对应）"""
+
+    success_count: int = 0
+    failure_count: int = 0
+    total_latency_ms: float = 0.0
+    recent_errors: List[Dict[str, Any]] = field(default_factory=list)
+
+    def score(self, now: Optional[float] = None) -> float:
+        return compute_health_score(
+            self.success_count, self.failure_count, self.total_latency_ms, self.recent_errors, now
+        )
+
+    def record(
+        self,
+        success: bool,
+        latency_ms: float = 0,
+        error_code: Optional[int] = None,
+        now: Optional[float] = None,
+    ) -> None:
+        now = time.time() if now is None else now
+        if success:
+            self.success_count += 1
+            self.total_latency_ms += latency_ms
+            return
+        self.failure_count += 1
+        self.recent_errors.append({"code": error_code, "time": now})
+        if len(self.recent_errors) > RECENT_ERRORS_KEEP:
+            self.recent_errors = self.recent_errors[-RECENT_ERRORS_KEEP:]
+
+
+@dataclass
+class PoolEntry:
+    """凭证池中的单个凭证（已解析）"""
+
+    filename: str
+    credential_data: Dict[str, Any]
+    slot: int
+    disabled: bool = False
+    model_cooldowns: Dict[str, float] = field(default_factory=dict)
+    stats: HealthStats = field(default_factory=HealthStats)
+    health: float = DEFAULT_HEALTH_SCORE
+
+
+class _WeightTree:
+    """
+    Fenwick Tree（树状数组）实现的权重表
+
+    - set: O(log n)
+    - total: O(1)
+    - find: O(log n)，按前缀和定位随机数落在哪个槽位
+    """
+
+    def __init__(self, size: int = 0):
+        self._weights: List[float] = [0.0] * size
+        self._tree: List[float] = [0.0] * (size + 1)
+        self._total = 0.0
+
+    def __len__(self) -> int:
+        return len(self._weights)
+
+    @property
+    def total(self) -> float:
+        return self._total
+
+    def get(self, index: int) -> float:
+        if index >= len(self._weights):
+            return 0.0
+        return self._weights[index]
+
+    def ensure_size(self, size: int) -> None:
+        """扩容（容量翻倍后整体重建，均摊 O(1)）"""
+        if size <= len(self._weights):
+            return
+        new_size = max(size, len(self._weights) * 2, 8)
+        weights = self._weights + [0.0] * (new_size - len(self._weights))
+        self.rebuild(weights)
+
+    def rebuild(self, weights: List[float]) -> None:
+        """O(n) 整体重建，同时消除浮点累计误差"""
+        n = len(weights)
+        tree = [0.0] * (n + 1)
+        for i, w in enumerate(weights):
+            tree[i + 1] += w
+            parent = (i + 1) + ((i + 1) & -(i + 1))
+            if parent <= n:
+                tree[parent] += tree[i + 1]
+        self._weights = list(weights)
+        self._tree = tree
+        self._total = sum(weights)
+
+    def set(self, index: int, weight: float) -> None:
+        self.ensure_size(index + 1)
+        weight = max(0.0, float(weight))
+        delta = weight - self._weights[index]
+        if delta == 0:
+            return
+        self._weights[index] = weight
+        self._total += delta
+        i = index + 1
+        n = len(self._weights)
+        while i <= n:
+            self._tree[i] += delta
+            i += i & -i
+
+    def find(self, value: float) -> int:
+        """返回前缀和首次超过 value 的槽位"""
+        n = len(self._weights)
+        pos = 0
+        step = 1 << n.bit_length()
+        while step:
+            nxt = pos + step
+            if nxt <= n and self._tree[nxt] <= value:
+                pos = nxt
+                value -= self._tree[nxt]
+            step >>= 1
+        return min(pos, n - 1)
+
+
+class CredentialPool:
+    """
+    单张凭证表（gcli 或 antigravity）的内存索引
+
+    所有方法均为同步方法，在事件循环内调用即可保证一致性；
+    需要 await 的加载/刷新由调用方（SQLiteManager）负责加锁。
+    """
+
+    def __init__(self, name: str = ""):
+        self.name = name
+        self.loaded = False
+
+        self._entries: Dict[str, PoolEntry] = {}
+        self._slots: List[Optional[str]] = []
+        self._free_slots: List[int] = []
+
+        # 启用凭证列表（无 model_key 时均匀随机选择，O(1) 增删）
+        self._enabled: List[str] = []
+        self._enabled_pos: Dict[str, int] = {}
+
+        # model_key -> 权重树 / 配额信息 / 权重过期时间
+        self._trees: Dict[str, _WeightTree] = {}
+        self._quotas: Dict[str, Dict[str, Tuple[bool, float]]] = {}
+        self._weights_expire_at: Dict[str, float] = {}
+
+        # model_key -> [(cooldown_until, filename)]（惰性删除的最小堆）
+        self._cooldown_heaps: Dict[str, List[Tuple[float, str]]] = {}
+
+    # ============ 加载与失效 ============
+
+    def load(
+        self,
+        rows: Iterable[Tuple[str, Dict[str, Any], bool, Dict[str, float], Optional[HealthStats]]],
+    ) -> None:
+        """
+        用数据库中的全部凭证重建索引
+
+        Args:
+            rows: (filename, credential_data, disabled, model_cooldowns, stats) 迭代器
+        """
+        self.clear()
+        for filename, credential_data, disabled, model_cooldowns, stats in rows:
+            self._insert(filename, credential_data, disabled, model_cooldowns, stats)
+        self.loaded = True
+        log.debug(f"[CredentialPool:{self.name}] loaded {len(self._entries)} credentials")
+
+    def clear(self) -> None:
+        """清空索引（下次访问时由调用方重新加载）"""
+        self.loaded = False
+        self._entries.clear()
+        self._slots.clear()
+        self._free_slots.clear()
+        self._enabled.clear()
+        self._enabled_pos.clear()
+        self._trees.clear()
+        self._quotas.clear()
+        self._weights_expire_at.clear()
+        self._cooldown_heaps.clear()
+
+    def invalidate(self) -> None:
+        """标记索引失效（例如 basename 模糊匹配更新了未知行）"""
+        if self.loaded:
+            log.debug(f"[CredentialPool:{self.name}] invalidated")
+        self.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, filename: str) -> bool:
+        return filename in self._entries
+
+    @property
+    def enabled_count(self) -> int:
+        return len(self._enabled)
+
+    def get(self, filename: str) -> Optional[PoolEntry]:
+        return self._entries.get(filename)
+
+    def enabled_entries(self) -> List[PoolEntry]:
+        return [self._entries[f] for f in self._enabled]
+
+    # ============ 写入同步 ============
+
+    def upsert(self, filename: str, credential_data: Dict[str, Any]) -> None:
+        """新增或更新凭证数据（保留状态）"""
+        if not self.loaded:
+            return
+        entry = self._entries.get(filename)
+        if entry is not None:
+            entry.credential_data = dict(credential_data)
+            return
+        self._insert(filename, credential_data, False, {}, None)
+        # 新凭证没有配额信息，所有模型的权重需要重新计算
+        self.expire_weights()
+
+    def remove(self, filename: str) -> None:
+        entry = self._entries.pop(filename, None)
+        if entry is None:
+            return
+        self._set_enabled(filename, False)
+        for tree in self._trees.values():
+            tree.set(entry.slot, 0.0)
+        for quotas in self._quotas.values():
+            quotas.pop(filename, None)
+        self._slots[entry.slot] = None
+        self._free_slots.append(entry.slot)
+
+    def apply_state(self, filename: str, state_updates: Dict[str, Any]) -> None:
+        """同步 update_credential_state 的状态字段"""
+        entry = self._entries.get(filename)
+        if entry is None:
+            return
+
+        if "model_cooldowns" in state_updates:
+            entry.model_cooldowns = dict(state_updates["model_cooldowns"] or {})
+            self._push_cooldowns(entry)
+
+        if "disabled" in state_updates:
+            disabled = bool(state_updates["disabled"])
+            if disabled != entry.disabled:
+                entry.disabled = disabled
+                self._set_enabled(filename, not disabled)
+                if disabled:
+                    for tree in self._trees.values():
+                        tree.set(entry.slot, 0.0)
+                else:
+                    self._push_cooldowns(entry)
+                    self._refresh_entry_weights(entry)
+
+    def set_model_cooldown(self, filename: str, model_key: str, cooldown_until: Optional[float]) -> None:
+        entry = self._entries.get(filename)
+        if entry is None:
+            return
+        if cooldown_until is None:
+            entry.model_cooldowns.pop(model_key, None)
+            return
+        entry.model_cooldowns[model_key] = cooldown_until
+        heap = self._cooldown_heaps.setdefault(model_key, [])
+        heapq.heappush(heap, (cooldown_until, filename))
+
+        # 惰性删除会留下过期元素，堆明显大于凭证数时整体压缩
+        if len(heap) > 2 * len(self._entries) + 64:
+            self._cooldown_heaps[model_key] = [
+                (e.model_cooldowns[model_key], e.filename)
+                for e in self._entries.values()
+                if not e.disabled and model_key in e.model_cooldowns
+            ]
+            heapq.heapify(self._cooldown_heaps[model_key])
+
+    def clear_model_cooldowns(self, filename: str) -> None:
+        entry = self._entries.get(filename)
+        if entry is not None:
+            entry.model_cooldowns = {}
+
+    def clear_expired_cooldowns(self, now: Optional[float] = None) -> None:
+        now = time.time() if now is None else now
+        for entry in self._entries.values():
+            if entry.model_cooldowns:
+                entry.model_cooldowns = {k: v for k, v in entry.model_cooldowns.items() if v > now}
+
+    def set_health(self, filename: str, health: float) -> None:
+        """更新单个凭证的健康度，并同步到所有模型的权重树"""
+        entry = self._entries.get(filename)
+        if entry is None:
+            return
+        entry.health = float(health)
+        self._refresh_entry_weights(entry)
+
+    # ============ 健康度 ============
+
+    def record_result(
+        self,
+        filename: str,
+        success: bool,
+        latency_ms: float = 0,
+        error_code: Optional[int] = None,
+        now: Optional[float] = None,
+    ) -> None:
+        """同步 record_request_result：增量更新统计并刷新该凭证的权重"""
+        entry = self._entries.get(filename)
+        if entry is None:
+            return
+        now = time.time() if now is None else now
+        entry.stats.record(success, latency_ms, error_code, now)
+        self.set_health(filename, entry.stats.score(now))
+
+    def refresh_health(self, now: Optional[float] = None) -> None:
+        """
+        按当前时间重新计算所有凭证的健康度（最近错误会随时间淡出窗口）
+
+        只更新 entry.health，权重树由随后的 set_model_weights 重建。
+        """
+        now = time.time() if now is None else now
+        for entry in self._entries.values():
+            entry.health = entry.stats.score(now)
+
+    def health_scores(
+        self, filenames: Optional[Iterable[str]] = None, now: Optional[float] = None
+    ) -> Dict[str, float]:
+        """批量获取健康度评分（不存在的凭证返回默认分）"""
+        now = time.time() if now is None else now
+        if filenames is None:
+            return {f: e.stats.score(now) for f, e in self._entries.items()}
+        scores: Dict[str, float] = {}
+        for filename in filenames:
+            entry = self._entries.get(filename)
+            scores[filename] = entry.stats.score(now) if entry else DEFAULT_HEALTH_SCORE
+        return scores
+
+    # ============ 模型权重 ============
+
+    def weights_stale(self, model_key: str, now: Optional[float] = None) -> bool:
+        now = time.time() if now is None else now
+        return model_key not in self._trees or now >= self._weights_expire_at.get(model_key, 0.0)
+
+    def set_model_weights(
+        self,
+        model_key: str,
+        quotas: Dict[str, Tuple[bool, float]],
+        ttl_seconds: float,
+        now: Optional[float] = None,
+    ) -> None:
+        """
+        设置某个模型下所有凭证的配额信息并重建权重树
+
+        Args:
+            model_key: 模型键
+            quotas: {filename: (是否可用, 配额百分比)}
+            ttl_seconds: 权重有效期（过期后由调用方重新计算）
+        """
+        now = time.time() if now is None else now
+        self._quotas[model_key] = dict(quotas)
+        weights = [0.0] * len(self._slots)
+        for filename, entry in self._entries.items():
+            weights[entry.slot] = self._compute_weight(entry, model_key)
+        tree = self._trees.get(model_key) or _WeightTree()
+        tree.rebuild(weights)
+        self._trees[model_key] = tree
+        self._weights_expire_at[model_key] = now + max(0.0, ttl_seconds)
+
+    def _compute_weight(self, entry: PoolEntry, model_key: str) -> float:
+        if entry.disabled:
+            return 0.0
+        quota = self._quotas.get(model_key, {}).get(entry.filename)
+        if quota is None:
+            return 0.0
+        available, percentage = quota
+        if not available:
+            return 0.0
+        # 综合权重 = 配额 * 0.6 + 健康度 * 0.4
+        return max(percentage, 1.0) * 0.6 + max(entry.health, 1.0) * 0.4
+
+    def _refresh_entry_weights(self, entry: PoolEntry) -> None:
+        for model_key, tree in self._trees.items():
+            if entry.filename not in self._quotas.get(model_key, {}):
+                # 该模型下还没有这个凭证的配额信息，等待整体刷新
+                self._weights_expire_at[model_key] = 0.0
+                continue
+            tree.set(entry.slot, self._compute_weight(entry, model_key))
+
+    def expire_weights(self) -> None:
+        """让所有模型的权重在下次选择时重新计算（例如配额快照更新后）"""
+        for model_key in self._weights_expire_at:
+            self._weights_expire_at[model_key] = 0.0
+
+    # ============ 选择 ============
+
+    def pick_uniform(self) -> Optional[PoolEntry]:
+        """在所有启用凭证中均匀随机选择（O(1)）"""
+        if not self._enabled:
+            return None
+        return self._entries[random.choice(self._enabled)]
+
+    def pick_weighted(self, model_key: str) -> Optional[Tuple[PoolEntry, float, float]]:
+        """
+        按模型权重加权随机选择（O(log n)）
+
+        Returns:
+            (entry, 权重, 选中概率) 或 None（无可用凭证）
+        """
+        tree = self._trees.get(model_key)
+        if tree is None or tree.total <= 0:
+            return None
+
+        for _ in range(3):
+            index = tree.find(random.random() * tree.total)
+            weight = tree.get(index)
+            filename = self._slots[index] if index < len(self._slots) else None
+            if weight > 0 and filename is not None:
+                return self._entries[filename], weight, weight / tree.total
+
+        # 浮点累计误差导致落空时，重建后线性兜底
+        weights = [tree.get(i) for i in range(len(tree))]
+        tree.rebuild(weights)
+        for index, weight in enumerate(weights):
+            if weight > 0 and index < len(self._slots) and self._slots[index] is not None:
+                return self._entries[self._slots[index]], weight, weight / tree.total
+        return None
+
+    def quota_of(self, model_key: str, filename: str) -> Optional[Tuple[bool, float]]:
+        return self._quotas.get(model_key, {}).get(filename)
+
+    # ============ 冷却 ============
+
+    def earliest_cooldown(self, model_key: str, now: Optional[float] = None) -> Optional[float]:
+        """
+        获取指定模型在所有启用凭证中的最早冷却截止时间
+
+        过期、已被覆盖或属于禁用凭证的堆顶元素会被惰性弹出。
+        """
+        heap = self._cooldown_heaps.get(model_key)
+        if not heap:
+            return None
+        now = time.time() if now is None else now
+        while heap:
+            until, filename = heap[0]
+            entry = self._entries.get(filename)
+            if (
+                entry is None
+                or entry.disabled
+                or until <= now
+                or entry.model_cooldowns.get(model_key) != until
+            ):
+                heapq.heappop(heap)
+                continue
+            return until
+        return None
+
+    # ============ 内部方法 ============
+
+    def _insert(
+        self,
+        filename: str,
+        credential_data: Dict[str, Any],
+        disabled: bool,
+        model_cooldowns: Dict[str, float],
+        stats: Optional[HealthStats],
+    ) -> None:
+        if self._free_slots:
+            slot = self._free_slots.pop()
+            self._slots[slot] = filename
+        else:
+            slot = len(self._slots)
+            self._slots.append(filename)
+
+        entry = PoolEntry(
+            filename=filename,
+            credential_data=dict(credential_data),
+            slot=slot,
+            disabled=bool(disabled),
+            model_cooldowns=dict(model_cooldowns or {}),
+            stats=stats or HealthStats(),
+        )
+        entry.health = entry.stats.score()
+        self._entries[filename] = entry
+        for tree in self._trees.values():
+            tree.ensure_size(len(self._slots))
+        if not entry.disabled:
+            self._set_enabled(filename, True)
+            self._push_cooldowns(entry)
+
+    def _set_enabled(self, filename: str, enabled: bool) -> None:
+        if enabled:
+            if filename not in self._enabled_pos:
+                self._enabled_pos[filename] = len(self._enabled)
+                self._enabled.append(filename)
+            return
+
+        pos = self._enabled_pos.pop(filename, None)
+        if pos is None:
+            return
+        last = self._enabled.pop()
+        if last != filename:
+            self._enabled[pos] = last
+            self._enabled_pos[last] = pos
+
+    def _push_cooldowns(self, entry: PoolEntry) -> None:
+        for model_key, until in entry.model_cooldowns.items():
+            try:
+                heapq.heappush(self._cooldown_heaps.setdefault(model_key, []), (float(until), entry.filename))
+            except (TypeError, ValueError):
+                continue
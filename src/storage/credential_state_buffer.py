@@ -0,0 +1,215 @@
+"""
+凭证状态写回缓冲 - Credential State Write-Behind Buffer
+
+record_api_call_result 位于流式响应的首包路径上，原先每次调用都要执行
+set_model_cooldown + update_credential_state 两个独立的 SQLite 事务。
+这里把状态变更先合并到内存，再由后台任务定期批量落盘：
+- 同一凭证的多次变更合并为一个增量（last_success、error_codes、成功/失败计数、模型冷却）
+- 每隔 flush_interval 秒在一个事务中批量写入，关闭时强制刷新
+- 落盘失败的增量会合并回缓冲区，下次刷新时重试
+
+内存凭证池由调用方在入队时同步更新，因此凭证选择不受写回延迟影响。
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from log import log
+
+from .credential_pool import RECENT_ERRORS_KEEP
+
+# 与 record_api_call_result 原有逻辑保持一致的错误码保留条数
+ERROR_CODES_KEEP = 10
+
+
+@dataclass
+class CredentialStateDelta:
+    """单个凭证待落盘的状态增量（按时间顺序合并）"""
+
+    filename: str
+    is_antigravity: bool = False
+    last_success: Optional[float] = None
+    # True 表示先清空已有错误码，再追加 error_codes_added
+    error_codes_reset: bool = False
+    error_codes_added: List[int] = field(default_factory=list)
+    success_count: int = 0
+    failure_count: int = 0
+    recent_errors: List[Dict[str, Any]] = field(default_factory=list)
+    # model_key -> 冷却截止时间（None 表示清除）
+    model_cooldowns: Dict[str, Optional[float]] = field(default_factory=dict)
+
+    @property
+    def key(self) -> Tuple[bool, str]:
+        return (self.is_antigravity, self.filename)
+
+    def merge(self, newer: "CredentialStateDelta") -> None:
+        """把更新的增量合并到当前增量之后"""
+        if newer.last_success is not None:
+            self.last_success = newer.last_success
+        if newer.error_codes_reset:
+            self.error_codes_reset = True
+            self.error_codes_added = list(newer.error_codes_added)
+        else:
+            for code in newer.error_codes_added:
+                if code not in self.error_codes_added:
+                    self.error_codes_added.append(code)
+        self.success_count += newer.success_count
+        self.failure_count += newer.failure_count
+        self.recent_errors = (self.recent_errors + newer.recent_errors)[-RECENT_ERRORS_KEEP:]
+        self.model_cooldowns.update(newer.model_cooldowns)
+
+    def apply_error_codes(self, current: List[int]) -> Optional[List[int]]:
+        """
+        计算落盘后的 error_codes
+
+        Returns:
+            新的错误码列表；没有错误码变更时返回 None
+        """
+        if not self.error_codes_reset and not self.error_codes_added:
+            return None
+        error_codes = [] if self.error_codes_reset else list(current)
+        for code in self.error_codes_added:
+            if code not in error_codes:
+                error_codes.append(code)
+        return error_codes[-ERROR_CODES_KEEP:]
+
+
+@dataclass
+class StateBufferStats:
+    """写回缓冲统计"""
+
+    total_recorded: int = 0
+    total_coalesced: int = 0
+    total_flushed: int = 0
+    total_failed: int = 0
+    batch_count: int = 0
+    last_flush_time: Optional[float] = None
+    last_error: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "total_recorded": self.total_recorded,
+            "total_coalesced": self.total_coalesced,
+            "total_flushed": self.total_flushed,
+            "total_failed": self.total_failed,
+            "batch_count": self.batch_count,
+            "avg_batch_size": (self.total_flushed / self.batch_count) if self.batch_count else 0.0,
+            "last_flush_time": self.last_flush_time,
+            "last_error": self.last_error,
+        }
+
+
+class CredentialStateBuffer:
+    """按凭证合并状态增量，并定期批量写回存储"""
+
+    def __init__(
+        self,
+        flush_func: Callable[[List[CredentialStateDelta]], Awaitable[None]],
+        flush_interval: float = 0.25,
+    ):
+        """
+        Args:
+            flush_func: 批量落盘函数（应在单个事务中写入所有增量）
+            flush_interval: 刷新间隔（秒）
+        """
+        self._flush_func = flush_func
+        self.flush_interval = flush_interval
+        self.stats = StateBufferStats()
+
+        self._pending: Dict[Tuple[bool, str], CredentialStateDelta] = {}
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._stopping: Optional[asyncio.Event] = None
+
+    @property
+    def pending_count(self) -> int:
+        return len(self._pending)
+
+    def record(self, delta: CredentialStateDelta) -> None:
+        """入队一个状态增量（不触发任何 I/O）"""
+        self.stats.total_recorded += 1
+        existing = self._pending.get(delta.key)
+        if existing is None:
+            self._pending[delta.key] = delta
+        else:
+            existing.merge(delta)
+            self.stats.total_coalesced += 1
+
+    def discard(self, filename: str, is_antigravity: bool = False) -> None:
+        """丢弃凭证的全部待写增量（凭证被删除时调用）"""
+        self._pending.pop((is_antigravity, filename), None)
+
+    def discard_cooldowns(
+        self, filename: str, is_antigravity: bool = False, model_key: Optional[str] = None
+    ) -> None:
+        """
+        丢弃凭证待写的模型冷却（冷却被直接写入数据库时调用，避免旧值在刷新时覆盖新值）
+
+        Args:
+            model_key: 只丢弃该模型的冷却；None 表示全部
+        """
+        delta = self._pending.get((is_antigravity, filename))
+        if delta is None:
+            return
+        if model_key is None:
+            delta.model_cooldowns.clear()
+        else:
+            delta.model_cooldowns.pop(model_key, None)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._stopping = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """停止后台任务并刷新剩余增量（不取消进行中的写入，避免事务被中途打断）"""
+        if self._task:
+            self._stopping.set()
+            await self._task
+            self._task = None
+        await self.flush()
+
+    async def flush(self) -> int:
+        """
+        立即把所有待写增量批量落盘
+
+        Returns:
+            本次写入的增量数量
+        """
+        async with self._flush_lock:
+            if not self._pending:
+                return 0
+
+            batch = list(self._pending.values())
+            self._pending = {}
+            try:
+                await self._flush_func(batch)
+            except Exception as e:
+                # 合并回缓冲区（失败的增量更早，排在新增量之前）
+                for delta in batch:
+                    newer = self._pending.get(delta.key)
+                    if newer is not None:
+                        delta.merge(newer)
+                    self._pending[delta.key] = delta
+                self.stats.total_failed += len(batch)
+                self.stats.last_error = str(e)
+                log.error(f"[StateBuffer] 批量写回 {len(batch)} 个凭证状态失败: {e}")
+                return 0
+
+            self.stats.total_flushed += len(batch)
+            self.stats.batch_count += 1
+            self.stats.last_flush_time = time.time()
+            return len(batch)
+
+    async def _run(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            try:
+                await self.flush()
+            except Exception as e:
+                log.error(f"[StateBuffer] 写回任务错误: {e}")
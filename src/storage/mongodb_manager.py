@@ -3,7 +3,7 @@ MongoDB 存储管理器
 """
 
 import time
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional
 
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
 
@@ -125,7 +125,10 @@ class MongoDBManager:
     # ============ SQL 方法 ============
 
     async def get_next_available_credential(
-        self, is_antigravity: bool = False, model_key: Optional[str] = None
+        self,
+        is_antigravity: bool = False,
+        model_key: Optional[str] = None,
+        prefer: Optional[Callable[[str], bool]] = None,
     ) -> Optional[tuple[str, Dict[str, Any]]]:
         """
         随机获取一个可用凭证（负载均衡）
@@ -136,6 +139,7 @@ class MongoDBManager:
         Args:
             is_antigravity: 是否获取 antigravity 凭证（默认 False）
             model_key: 模型键（用于模型级冷却检查，antigravity 用模型名，gcli 用 pro/flash）
+            prefer: 可选的偏好判断；优先返回满足条件的凭证，都不满足时返回第一个可用凭证
 
         Note:
             - 对于 antigravity: model_key 是具体模型名（如 "gemini-2.0-flash-exp"）
@@ -159,24 +163,21 @@ class MongoDBManager:
 
             docs = await collection.aggregate(pipeline).to_list(length=100)
 
-            # 如果没有提供 model_key，使用第一个可用凭证
-            if not model_key:
-                if docs:
-                    doc = docs[0]
-                    return doc["filename"], doc.get("credential_data")
-                return None
+            # 如果提供了 model_key，过滤掉该模型仍在冷却中的凭证
+            if model_key:
+                docs = [
+                    doc for doc in docs
+                    if (doc.get("model_cooldowns", {}).get(model_key) is None
+                        or current_time >= doc["model_cooldowns"][model_key])
+                ]
 
-            # 如果提供了 model_key，检查模型级冷却
-            for doc in docs:
-                model_cooldowns = doc.get("model_cooldowns", {})
-
-                # 检查该模型是否在冷却中
-                model_cooldown = model_cooldowns.get(model_key)
-                if model_cooldown is None or current_time >= model_cooldown:
-                    # 该模型未冷却或冷却已过期
-                    return doc["filename"], doc.get("credential_data")
+            if not docs:
+                return None
 
-            return None
+            doc = docs[0]
+            if prefer is not None:
+                doc = next((d for d in docs if prefer(d["filename"])), doc)
+            return doc["filename"], doc.get("credential_data")
 
         except Exception as e:
             log.error(f"Error getting next available credential (antigravity={is_antigravity}, model_key={model_key}): {e}")
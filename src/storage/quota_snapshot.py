@@ -0,0 +1,134 @@
+"""
+配额快照 - Quota Snapshot
+
+凭证选择需要知道 antigravity 凭证在各模型上的剩余配额。原先选择时逐个 await
+fetch_quota_info，冷缓存时会在请求路径上串行访问网络。这里改为：
+- 配额快照持久化在 antigravity_quota_snapshots 表中，并常驻内存，选择时 O(1) 读取
+- 快照由后台调度器（BackgroundScheduler）和 QuotaSnapshotRefresher 维护
+- 快照过期后继续使用旧值（stale-while-refresh），同时在后台触发一次刷新
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from log import log
+
+
+@dataclass
+class QuotaSnapshot:
+    """单个凭证的配额快照"""
+
+    # model_id -> 剩余配额比例 (0.0 ~ 1.0)
+    models: Dict[str, float]
+    fetched_at: float
+
+    @classmethod
+    def from_quota_result(
+        cls, quota_result: Dict[str, Any], fetched_at: Optional[float] = None
+    ) -> Optional["QuotaSnapshot"]:
+        """从 fetch_quota_info 的返回值构建快照，失败结果返回 None"""
+        if not quota_result.get("success"):
+            return None
+        models = {}
+        for model_id, model_data in (quota_result.get("models") or {}).items():
+            if isinstance(model_data, dict):
+                try:
+                    models[model_id] = float(model_data.get("remaining", 0) or 0)
+                except (TypeError, ValueError):
+                    models[model_id] = 0.0
+        return cls(models=models, fetched_at=time.time() if fetched_at is None else fetched_at)
+
+    def is_stale(self, ttl_seconds: float, now: Optional[float] = None) -> bool:
+        now = time.time() if now is None else now
+        return now - self.fetched_at > ttl_seconds
+
+    def resolve(self, model_key: str, threshold: float) -> Tuple[bool, Optional[str], float]:
+        """
+        查找目标模型的配额（支持前缀匹配）
+
+        Returns:
+            (是否可用, 匹配到的模型ID, 配额百分比)；没有匹配的模型时返回 (False, None, 100.0)
+        """
+        key = model_key.lower()
+        for model_id, remaining in self.models.items():
+            model_id_lower = model_id.lower()
+            if model_id_lower.startswith(key) or key.startswith(model_id_lower):
+                percentage = remaining * 100
+                return percentage >= threshold, model_id, percentage
+        return False, None, 100.0
+
+
+class QuotaSnapshotRefresher:
+    """
+    后台配额快照刷新器
+
+    同一时间只运行一个刷新任务，按请求顺序逐个刷新；
+    同一凭证在 retry_seconds 内不会重复尝试，避免失败时反复打上游。
+    """
+
+    def __init__(
+        self,
+        fetch_func: Callable[[str], Awaitable[Optional[QuotaSnapshot]]],
+        store_func: Callable[[str, QuotaSnapshot], Awaitable[Any]],
+        retry_seconds: float = 60.0,
+    ):
+        """
+        Args:
+            fetch_func: 拉取单个凭证配额的函数（网络 I/O 只发生在这里）
+            store_func: 保存快照的函数
+            retry_seconds: 同一凭证两次尝试的最小间隔
+        """
+        self._fetch_func = fetch_func
+        self._store_func = store_func
+        self.retry_seconds = retry_seconds
+
+        self._pending: Dict[str, None] = {}
+        self._last_attempt: Dict[str, float] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def request(self, filenames: Iterable[str]) -> None:
+        """请求刷新一批凭证的快照（立即返回，不等待刷新完成）"""
+        now = time.time()
+        for filename in filenames:
+            if now - self._last_attempt.get(filename, 0.0) >= self.retry_seconds:
+                self._pending[filename] = None
+        if self._pending and not self.running:
+            self._task = asyncio.create_task(self._drain())
+
+    def forget(self, filename: str) -> None:
+        self._pending.pop(filename, None)
+        self._last_attempt.pop(filename, None)
+
+    async def stop(self) -> None:
+        self._pending.clear()
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _drain(self) -> None:
+        refreshed: List[str] = []
+        while self._pending:
+            filename = next(iter(self._pending))
+            del self._pending[filename]
+            self._last_attempt[filename] = time.time()
+            try:
+                snapshot = await self._fetch_func(filename)
+                if snapshot is not None:
+                    await self._store_func(filename, snapshot)
+                    refreshed.append(filename)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log.warning(f"[QuotaSnapshot] 刷新配额快照失败 {filename}: {e}")
+        if refreshed:
+            log.debug(f"[QuotaSnapshot] 后台刷新了 {len(refreshed)} 个配额快照")
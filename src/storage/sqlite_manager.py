@@ -6,12 +6,105 @@ import asyncio
 import json
 import os
 import time
-from typing import Any, Dict, List, Optional, Tuple
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
 
 import aiosqlite
 
 from log import log
 
+from .credential_pool import (
+    DEFAULT_HEALTH_SCORE,
+    RECENT_ERRORS_KEEP,
+    CredentialPool,
+    HealthStats,
+    compute_health_score,
+)
+from .credential_state_buffer import CredentialStateBuffer, CredentialStateDelta
+from .quota_snapshot import QuotaSnapshot, QuotaSnapshotRefresher
+
+
+class SQLiteConnectionPool:
+    """
+    持久化 SQLite 连接池：1 个写连接 + N 个读连接（WAL 模式）
+
+    - 连接只在 open() 时建立一次，PRAGMA 只设置一次，不再每次调用都新建连接线程
+    - 连接常驻，sqlite3 的语句缓存（cached_statements）得以跨调用复用预编译语句
+    - 写连接由锁串行化；退出时回滚未提交的事务，避免残留事务被下一个调用方提交
+    """
+
+    def __init__(self, db_path: str, readers: int = 4, cached_statements: int = 256):
+        """
+        Args:
+            db_path: 数据库文件路径
+            readers: 读连接数量
+            cached_statements: 每个连接的预编译语句缓存大小
+        """
+        self._db_path = db_path
+        self._reader_count = max(1, readers)
+        self._cached_statements = cached_statements
+        self._writer: Optional[aiosqlite.Connection] = None
+        self._readers: Optional[asyncio.Queue] = None
+        self._all_readers: List[aiosqlite.Connection] = []
+        self._write_lock = asyncio.Lock()
+
+    async def _connect(self, query_only: bool = False) -> aiosqlite.Connection:
+        db = await aiosqlite.connect(self._db_path, cached_statements=self._cached_statements)
+        await db.execute("PRAGMA journal_mode=WAL")
+        await db.execute("PRAGMA synchronous=NORMAL")
+        await db.execute("PRAGMA foreign_keys=ON")
+        await db.execute("PRAGMA busy_timeout=5000")
+        if query_only:
+            await db.execute("PRAGMA query_only=ON")
+        return db
+
+    async def open(self) -> None:
+        self._writer = await self._connect()
+        self._readers = asyncio.Queue()
+        for _ in range(self._reader_count):
+            db = await self._connect(query_only=True)
+            self._all_readers.append(db)
+            self._readers.put_nowait(db)
+
+    async def close(self) -> None:
+        connections = self._all_readers + ([self._writer] if self._writer else [])
+        self._writer = None
+        self._readers = None
+        self._all_readers = []
+        for db in connections:
+            try:
+                await db.close()
+            except Exception as e:
+                log.warning(f"Error closing SQLite connection: {e}")
+
+    @asynccontextmanager
+    async def reader(self) -> AsyncIterator[aiosqlite.Connection]:
+        """借出一个只读连接"""
+        readers = self._readers
+        if readers is None:
+            raise RuntimeError("SQLite connection pool is closed")
+        db = await readers.get()
+        try:
+            yield db
+        finally:
+            readers.put_nowait(db)
+
+    @asynccontextmanager
+    async def writer(self) -> AsyncIterator[aiosqlite.Connection]:
+        """独占写连接（调用方负责 commit）"""
+        async with self._write_lock:
+            db = self._writer
+            if db is None:
+                raise RuntimeError("SQLite connection pool is closed")
+            try:
+                yield db
+            finally:
+                if db.in_transaction:
+                    try:
+                        await db.rollback()
+                    except Exception as e:
+                        log.warning(f"Error rolling back SQLite transaction: {e}")
+
 
 class SQLiteManager:
     """SQLite 数据库管理器"""
@@ -25,6 +118,12 @@ class SQLiteManager:
         "model_cooldowns",
     }
 
+    # 配额阈值：低于此百分比的凭证不参与该模型的选择
+    QUOTA_THRESHOLD = 20
+
+    # 选中凭证不满足 prefer 条件时的重新抽取次数
+    PREFER_RETRY_PICKS = 3
+
     # 所有必需的列定义（用于自动校验和修复）
     REQUIRED_COLUMNS = {
         "credentials": [
@@ -67,10 +166,27 @@ class SQLiteManager:
         self._initialized = False
         self._lock = asyncio.Lock()
 
+        # 持久化连接池 - 初始化时建立，close() 时释放
+        self._conn_pool: Optional[SQLiteConnectionPool] = None
+
+        # 请求结果写回缓冲 - record_call_result 只更新内存，由后台批量落盘
+        self._state_buffer: Optional[CredentialStateBuffer] = None
+
+        # antigravity 配额快照 - 初始化时加载，选择时只读内存，过期后由后台刷新
+        self._quota_snapshots: Dict[str, QuotaSnapshot] = {}
+        self._quota_refresher: Optional[QuotaSnapshotRefresher] = None
+
         # 内存配置缓存 - 初始化时加载一次
         self._config_cache: Dict[str, Any] = {}
         self._config_loaded = False
 
+        # 内存凭证池 - 首次选择时加载，之后由写入方法同步更新
+        self._pools: Dict[bool, CredentialPool] = {
+            False: CredentialPool("gcli"),
+            True: CredentialPool("antigravity"),
+        }
+        self._pool_lock = asyncio.Lock()
+
     async def initialize(self) -> None:
         """初始化 SQLite 数据库"""
         if self._initialized:
@@ -88,30 +204,59 @@ class SQLiteManager:
                 # 确保目录存在
                 os.makedirs(self._credentials_dir, exist_ok=True)
 
-                # 创建数据库和表
-                async with aiosqlite.connect(self._db_path) as db:
-                    # 启用 WAL 模式（提升并发性能）
-                    await db.execute("PRAGMA journal_mode=WAL")
-                    await db.execute("PRAGMA foreign_keys=ON")
+                # 建立连接池（写连接启用 WAL 模式，提升并发性能）
+                self._conn_pool = SQLiteConnectionPool(
+                    self._db_path, readers=self._get_reader_count()
+                )
+                await self._conn_pool.open()
 
+                # 创建数据库和表
+                async with self._conn_pool.writer() as db:
                     # 检查并自动修复数据库结构
                     await self._ensure_schema_compatibility(db)
 
                     # 创建表
                     await self._create_tables(db)
 
+                    # 迁移旧的 model_cooldowns JSON 列到冷却表
+                    await self._migrate_model_cooldowns(db)
+
                     await db.commit()
 
-                # 加载配置到内存
+                # 加载配置和配额快照到内存
                 await self._load_config_cache()
+                await self._load_quota_snapshots()
+                self._quota_refresher = QuotaSnapshotRefresher(
+                    self._fetch_quota_snapshot, self.store_quota_snapshot
+                )
+
+                self._state_buffer = CredentialStateBuffer(
+                    self._apply_state_deltas, flush_interval=self._get_state_flush_interval()
+                )
+                self._state_buffer.start()
 
                 self._initialized = True
                 log.info(f"SQLite storage initialized at {self._db_path}")
 
             except Exception as e:
                 log.error(f"Error initializing SQLite: {e}")
+                if self._conn_pool:
+                    await self._conn_pool.close()
+                    self._conn_pool = None
                 raise
 
+    def _get_reader_count(self) -> int:
+        try:
+            return max(1, int(os.getenv("SQLITE_READ_CONNECTIONS", "4")))
+        except ValueError:
+            return 4
+
+    def _get_state_flush_interval(self) -> float:
+        try:
+            return max(10.0, float(os.getenv("CREDENTIAL_STATE_FLUSH_MS", "250"))) / 1000
+        except ValueError:
+            return 0.25
+
     async def _ensure_schema_compatibility(self, db: aiosqlite.Connection) -> None:
         """
         确保数据库结构兼容，自动修复缺失的列
@@ -165,7 +310,7 @@ class SQLiteManager:
                 last_success REAL,
                 user_email TEXT,
 
-                -- 模型级 CD 支持 (JSON: {model_key: cooldown_timestamp})
+                -- 旧版模型级 CD (JSON: {model_key: cooldown_timestamp})，已迁移到 credential_cooldowns
                 model_cooldowns TEXT DEFAULT '{}',
 
                 -- 轮换相关
@@ -197,7 +342,7 @@ class SQLiteManager:
                 last_success REAL,
                 user_email TEXT,
 
-                -- 模型级 CD 支持 (JSON: {model_name: cooldown_timestamp})
+                -- 旧版模型级 CD (JSON: {model_name: cooldown_timestamp})，已迁移到 antigravity_credential_cooldowns
                 model_cooldowns TEXT DEFAULT '{}',
 
                 -- 轮换相关
@@ -236,6 +381,35 @@ class SQLiteManager:
             ON antigravity_credentials(rotation_order)
         """)
 
+        # 模型级冷却表（取代凭证表中的 model_cooldowns JSON 列）
+        for cooldown_table, table_name, index_prefix in (
+            ("credential_cooldowns", "credentials", "idx"),
+            ("antigravity_credential_cooldowns", "antigravity_credentials", "idx_ag"),
+        ):
+            await db.execute(f"""
+                CREATE TABLE IF NOT EXISTS {cooldown_table} (
+                    filename TEXT NOT NULL REFERENCES {table_name}(filename) ON DELETE CASCADE,
+                    model_key TEXT NOT NULL,
+                    cooldown_until REAL NOT NULL,
+                    PRIMARY KEY (filename, model_key)
+                )
+            """)
+            await db.execute(f"""
+                CREATE INDEX IF NOT EXISTS {index_prefix}_cooldowns_model_until
+                ON {cooldown_table}(model_key, cooldown_until)
+            """)
+
+        # antigravity 配额快照表（由后台刷新维护，选择时只读）
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS antigravity_quota_snapshots (
+                filename TEXT PRIMARY KEY
+                    REFERENCES antigravity_credentials(filename) ON DELETE CASCADE,
+                -- JSON: {model_id: remaining_fraction}
+                models TEXT NOT NULL DEFAULT '{}',
+                fetched_at REAL NOT NULL
+            )
+        """)
+
         # 配置表
         await db.execute("""
             CREATE TABLE IF NOT EXISTS config (
@@ -247,13 +421,55 @@ class SQLiteManager:
 
         log.debug("SQLite tables and indexes created")
 
+    async def _migrate_model_cooldowns(self, db: aiosqlite.Connection) -> None:
+        """
+        把凭证表中 model_cooldowns JSON 列的内容迁移到冷却表（幂等，每次启动执行）
+
+        迁移后 JSON 列被置为 '{}'，列本身保留以兼容旧版本。
+        """
+        now = time.time()
+        for is_antigravity in (False, True):
+            table_name = self._get_table_name(is_antigravity)
+            cooldown_table = self._get_cooldown_table_name(is_antigravity)
+
+            async with db.execute(f"""
+                SELECT filename, model_cooldowns FROM {table_name}
+                WHERE model_cooldowns IS NOT NULL AND model_cooldowns NOT IN ('', '{{}}')
+            """) as cursor:
+                rows = await cursor.fetchall()
+            if not rows:
+                continue
+
+            cooldown_rows = []
+            for filename, model_cooldowns_json in rows:
+                try:
+                    model_cooldowns = json.loads(model_cooldowns_json)
+                except json.JSONDecodeError:
+                    continue
+                for model_key, until in model_cooldowns.items():
+                    if isinstance(until, (int, float)) and until > now:
+                        cooldown_rows.append((filename, model_key, float(until)))
+
+            await db.executemany(f"""
+                INSERT OR REPLACE INTO {cooldown_table} (filename, model_key, cooldown_until)
+                VALUES (?, ?, ?)
+            """, cooldown_rows)
+            await db.executemany(f"""
+                UPDATE {table_name} SET model_cooldowns = '{{}}' WHERE filename = ?
+            """, [(row[0],) for row in rows])
+
+            log.info(
+                f"Migrated {len(cooldown_rows)} model cooldowns from {len(rows)} credentials "
+                f"to {cooldown_table}"
+            )
+
     async def _load_config_cache(self):
         """加载配置到内存缓存（仅在初始化时调用一次）"""
         if self._config_loaded:
             return
 
         try:
-            async with aiosqlite.connect(self._db_path) as db:
+            async with self._conn_pool.reader() as db:
                 async with db.execute("SELECT key, value FROM config") as cursor:
                     rows = await cursor.fetchall()
 
@@ -273,6 +489,20 @@ class SQLiteManager:
     async def close(self) -> None:
         """关闭数据库连接"""
         self._initialized = False
+        if self._quota_refresher:
+            await self._quota_refresher.stop()
+            self._quota_refresher = None
+        self._quota_snapshots = {}
+        if self._state_buffer:
+            # 先把缓冲中的请求结果落盘，再关闭连接
+            await self._state_buffer.stop()
+            self._state_buffer = None
+        if self._conn_pool:
+            await self._conn_pool.close()
+            self._conn_pool = None
+        self._config_loaded = False
+        for pool in self._pools.values():
+            pool.clear()
         log.debug("SQLite storage closed")
 
     def _ensure_initialized(self):
@@ -284,6 +514,54 @@ class SQLiteManager:
         """判断是否为 antigravity 凭证"""
         return filename.startswith("ag_")
 
+    def _get_cooldown_table_name(self, is_antigravity: bool) -> str:
+        """根据 is_antigravity 返回对应的冷却表名"""
+        return "antigravity_credential_cooldowns" if is_antigravity else "credential_cooldowns"
+
+    async def _load_active_cooldowns(
+        self,
+        db: aiosqlite.Connection,
+        is_antigravity: bool,
+        filename: Optional[str] = None,
+        now: Optional[float] = None,
+    ) -> Dict[str, Dict[str, float]]:
+        """
+        读取未过期的模型冷却
+
+        Args:
+            filename: 只读取该凭证；None 表示全部
+
+        Returns:
+            {filename: {model_key: cooldown_until}}
+        """
+        now = time.time() if now is None else now
+        cooldown_table = self._get_cooldown_table_name(is_antigravity)
+        query = f"SELECT filename, model_key, cooldown_until FROM {cooldown_table} WHERE cooldown_until > ?"
+        params: List[Any] = [now]
+        if filename is not None:
+            query += " AND filename = ?"
+            params.append(filename)
+
+        cooldowns: Dict[str, Dict[str, float]] = {}
+        async with db.execute(query, params) as cursor:
+            async for fn, model_key, until in cursor:
+                cooldowns.setdefault(fn, {})[model_key] = until
+        return cooldowns
+
+    async def _replace_cooldowns(
+        self, db: aiosqlite.Connection, is_antigravity: bool, filename: str, model_cooldowns: Dict[str, Any]
+    ) -> None:
+        """用给定的 {model_key: cooldown_until} 整体替换某个凭证的冷却（调用方负责 commit）"""
+        cooldown_table = self._get_cooldown_table_name(is_antigravity)
+        await db.execute(f"DELETE FROM {cooldown_table} WHERE filename = ?", (filename,))
+        await db.executemany(f"""
+            INSERT INTO {cooldown_table} (filename, model_key, cooldown_until) VALUES (?, ?, ?)
+        """, [
+            (filename, model_key, float(until))
+            for model_key, until in (model_cooldowns or {}).items()
+            if until is not None
+        ])
+
     def _get_table_name(self, is_antigravity: bool) -> str:
         """根据 is_antigravity 标志获取对应的表名"""
         return "antigravity_credentials" if is_antigravity else "credentials"
@@ -291,17 +569,23 @@ class SQLiteManager:
     # ============ SQL 方法 ============
 
     async def get_next_available_credential(
-        self, is_antigravity: bool = False, model_key: Optional[str] = None
+        self,
+        is_antigravity: bool = False,
+        model_key: Optional[str] = None,
+        prefer: Optional[Callable[[str], bool]] = None,
     ) -> Optional[Tuple[str, Dict[str, Any]]]:
         """
         加权随机获取一个可用凭证（智能负载均衡）
         - 未禁用
         - 如果提供了 model_key，检查配额并按配额加权选择
         - [FIX 2026-01-21] 加权负载均衡：配额高的凭证更容易被选中
+        - 从内存凭证池中选择，热路径不读数据库（权重过期时才重新计算）
 
         Args:
             is_antigravity: 是否获取 antigravity 凭证（默认 False）
             model_key: 模型键（用于模型级冷却检查，antigravity 用模型名，gcli 用 pro/flash）
+            prefer: 可选的偏好判断（如“凭证还有空闲并发额度”）；选中的凭证不满足时
+                    重新抽取最多 PREFER_RETRY_PICKS 次，都不满足则返回第一次的结果
 
         Note:
             - 对于 antigravity: model_key 是具体模型名（如 "gemini-2.0-flash-exp"）
@@ -310,167 +594,267 @@ class SQLiteManager:
         self._ensure_initialized()
 
         try:
-            table_name = self._get_table_name(is_antigravity)
-            async with aiosqlite.connect(self._db_path) as db:
-                current_time = time.time()
+            pool = await self._get_pool(is_antigravity)
+
+            log.debug(f"[SQLite] get_next_available_credential: is_antigravity={is_antigravity}, model_key={model_key}, found {pool.enabled_count} credentials")
+
+            if pool.enabled_count == 0:
+                log.warning(f"[SQLite] No credentials found")
+                return None
+
+            # 如果没有提供 model_key，随机选择一个
+            if not model_key:
+                entry = pool.pick_uniform()
+                if prefer is not None and not prefer(entry.filename):
+                    for _ in range(self.PREFER_RETRY_PICKS):
+                        candidate = pool.pick_uniform()
+                        if prefer(candidate.filename):
+                            entry = candidate
+                            break
+                log.debug(f"[SQLite] Returning credential without model_key check: {entry.filename}")
+                return entry.filename, dict(entry.credential_data)
+
+            # [FIX 2026-01-21] 加权负载均衡实现
+            # 权重（配额 * 0.6 + 健康度 * 0.4）缓存在凭证池的权重树中，过期后重新计算
+            if pool.weights_stale(model_key):
+                await self._refresh_pool_weights(pool, model_key, is_antigravity)
+
+            picked = pool.pick_weighted(model_key)
+            if picked is None:
+                log.warning(f"[SQLite] All {pool.enabled_count} credentials have insufficient quota (<{self.QUOTA_THRESHOLD}%) for model_key={model_key}")
+                return None
+
+            if prefer is not None and not prefer(picked[0].filename):
+                for _ in range(self.PREFER_RETRY_PICKS):
+                    candidate = pool.pick_weighted(model_key)
+                    if candidate is not None and prefer(candidate[0].filename):
+                        picked = candidate
+                        break
+
+            entry, weight, probability = picked
+
+            # 记录冷却信息（仅用于日志，不影响可用性判定）
+            model_cooldown = entry.model_cooldowns.get(model_key)
+            current_time = time.time()
+            if model_cooldown and current_time < model_cooldown:
+                remaining = model_cooldown - current_time
+                log.debug(f"[SQLite] ℹ {entry.filename}: model_key={model_key} is cooling ({remaining:.1f}s remaining), but still available due to sufficient quota")
+
+            _, quota = pool.quota_of(model_key, entry.filename) or (True, 100.0)
+            log.debug(
+                f"[SQLite] Weighted selection: {entry.filename} (quota={quota:.1f}%, health={entry.health:.1f}, "
+                f"combined={weight:.1f}, probability={probability*100:.1f}%, "
+                f"candidates={pool.enabled_count})"
+            )
+            return entry.filename, dict(entry.credential_data)
+
+        except Exception as e:
+            log.error(f"Error getting next available credential (antigravity={is_antigravity}, model_key={model_key}): {e}")
+            return None
+
+    # ============ 内存凭证池 ============
 
-                # 获取所有候选凭证（未禁用）
+    async def _get_pool(self, is_antigravity: bool) -> CredentialPool:
+        """获取已加载的凭证池（首次访问或失效后从数据库加载一次）"""
+        pool = self._pools[is_antigravity]
+        if pool.loaded:
+            return pool
+
+        async with self._pool_lock:
+            if pool.loaded:
+                return pool
+
+            table_name = self._get_table_name(is_antigravity)
+            async with self._conn_pool.reader() as db:
                 async with db.execute(f"""
-                    SELECT filename, credential_data, model_cooldowns
+                    SELECT filename, credential_data, disabled,
+                           success_count, failure_count, total_latency_ms, recent_errors
                     FROM {table_name}
-                    WHERE disabled = 0
                 """) as cursor:
                     rows = await cursor.fetchall()
+                cooldowns = await self._load_active_cooldowns(db, is_antigravity)
+
+            pool.load(
+                (
+                    row[0],
+                    json.loads(row[1]),
+                    bool(row[2]),
+                    cooldowns.get(row[0], {}),
+                    HealthStats(
+                        success_count=row[3] or 0,
+                        failure_count=row[4] or 0,
+                        total_latency_ms=row[5] or 0,
+                        recent_errors=json.loads(row[6] or '[]'),
+                    ),
+                )
+                for row in rows
+            )
+            return pool
 
-                    # [DEBUG 2026-01-17] 添加调试日志
-                    log.debug(f"[SQLite] get_next_available_credential: is_antigravity={is_antigravity}, model_key={model_key}, found {len(rows)} credentials")
-
-                    if not rows:
-                        log.warning(f"[SQLite] No credentials found")
-                        return None
-
-                    # 如果没有提供 model_key，随机选择一个
-                    if not model_key:
-                        import random
-                        filename, credential_json, _ = random.choice(rows)
-                        credential_data = json.loads(credential_json)
-                        log.debug(f"[SQLite] Returning credential without model_key check: {filename}")
-                        return filename, credential_data
-
-                    # [FIX 2026-01-21] 加权负载均衡实现
-                    # 1. 收集所有可用凭证及其配额
-                    # 2. 按配额加权随机选择
-                    QUOTA_THRESHOLD = 20  # 配额阈值：20%
-
-                    # 导入 fetch_quota_info（使用内存缓存）
-                    from ..antigravity_api import fetch_quota_info
-                    import random
-
-                    # 收集可用凭证及其权重
-                    available_credentials: list[tuple[str, dict, float]] = []  # (filename, credential_data, weight)
-
-                    for filename, credential_json, model_cooldowns_json in rows:
-                        credential_data = json.loads(credential_json)
-                        model_cooldowns = json.loads(model_cooldowns_json or '{}')
-
-                        # 检查该模型的配额百分比
-                        model_available = False
-                        model_percentage = 100.0  # 默认权重
-
-                        # 仅对 antigravity 凭证检查配额
-                        if is_antigravity:
-                            try:
-                                # 获取 access_token
-                                access_token = credential_data.get("access_token") or credential_data.get("token")
-                                if access_token:
-                                    # 调用 fetch_quota_info（会自动使用内存缓存）
-                                    quota_result = await fetch_quota_info(access_token, cache_key=filename)
-
-                                    if quota_result.get("success"):
-                                        models = quota_result.get("models", {})
-
-                                        # 在配额信息中查找目标模型
-                                        for model_id, model_data in models.items():
-                                            # 支持前缀匹配
-                                            if model_id.lower().startswith(model_key.lower()) or model_key.lower().startswith(model_id.lower()):
-                                                remaining_fraction = model_data.get("remaining", 0)
-                                                model_percentage = remaining_fraction * 100  # 转换为百分比
-
-                                                # 配额阈值：20%（低于此值换号，避免被谷歌盯上）
-                                                if model_percentage >= QUOTA_THRESHOLD:
-                                                    model_available = True
-                                                    log.debug(f"[SQLite] ✓ {filename}: model={model_id}, quota={model_percentage:.1f}% >= {QUOTA_THRESHOLD}%, available")
-                                                else:
-                                                    log.debug(f"[SQLite] ✗ {filename}: model={model_id}, quota={model_percentage:.1f}% < {QUOTA_THRESHOLD}%, unavailable (换号)")
-                                                break
-                                    else:
-                                        # 获取配额失败，默认可用（避免误判）
-                                        log.debug(f"[SQLite] ⚠ {filename}: Failed to fetch quota, assuming available")
-                                        model_available = True
-                                        model_percentage = 50.0  # 未知配额给中等权重
-                                else:
-                                    # 没有 access_token，默认可用
-                                    log.debug(f"[SQLite] ⚠ {filename}: No access_token, assuming available")
-                                    model_available = True
-                                    model_percentage = 50.0
-                            except Exception as e:
-                                # 异常情况，默认可用（避免误判）
-                                log.warning(f"[SQLite] ⚠ {filename}: Exception while checking quota: {e}, assuming available")
-                                model_available = True
-                                model_percentage = 50.0
-                        else:
-                            # 非 antigravity 凭证，默认可用（不检查配额）
-                            model_available = True
-
-                        # 如果模型可用，加入候选列表
-                        if model_available:
-                            # 记录冷却信息（仅用于日志，不影响可用性判定）
-                            model_cooldown = model_cooldowns.get(model_key)
-                            if model_cooldown and current_time < model_cooldown:
-                                remaining = model_cooldown - current_time
-                                log.debug(f"[SQLite] ℹ {filename}: model_key={model_key} is cooling ({remaining:.1f}s remaining), but still available due to sufficient quota")
-
-                            # [FIX 2026-01-21] 获取健康度评分
-                            health_score = await self.get_credential_health_score(filename, is_antigravity)
-
-                            available_credentials.append((filename, credential_data, model_percentage, health_score))
-
-                    # 如果没有可用凭证
-                    if not available_credentials:
-                        log.warning(f"[SQLite] All {len(rows)} credentials have insufficient quota (<{QUOTA_THRESHOLD}%) for model_key={model_key}")
-                        return None
-
-                    # [FIX 2026-01-21] 加权随机选择
-                    # 综合权重 = 配额百分比 * 0.6 + 健康度评分 * 0.4
-                    if len(available_credentials) == 1:
-                        # 只有一个可用，直接返回
-                        filename, credential_data, quota, health = available_credentials[0]
-                        log.debug(f"[SQLite] Only one available credential: {filename} (quota={quota:.1f}%, health={health:.1f})")
-                        return filename, credential_data
-
-                    # 计算综合权重
-                    weights = []
-                    for cred in available_credentials:
-                        quota_weight = max(cred[2], 1.0)  # 配额权重
-                        health_weight = max(cred[3], 1.0)  # 健康度权重
-                        # 综合权重 = 配额 * 0.6 + 健康度 * 0.4
-                        combined_weight = quota_weight * 0.6 + health_weight * 0.4
-                        weights.append(combined_weight)
-
-                    total_weight = sum(weights)
-
-                    # 使用 random.choices 进行加权随机选择
-                    selected = random.choices(available_credentials, weights=weights, k=1)[0]
-                    filename, credential_data, quota, health = selected
-                    selected_weight = quota * 0.6 + health * 0.4
-
-                    log.debug(
-                        f"[SQLite] Weighted selection: {filename} (quota={quota:.1f}%, health={health:.1f}, "
-                        f"combined={selected_weight:.1f}, probability={selected_weight/total_weight*100:.1f}%, "
-                        f"candidates={len(available_credentials)})"
-                    )
-                    return filename, credential_data
+    async def get_enabled_credentials(self, is_antigravity: bool = False) -> Dict[str, Dict[str, Any]]:
+        """获取所有启用凭证的数据（来自内存凭证池，返回副本）"""
+        self._ensure_initialized()
 
+        try:
+            pool = await self._get_pool(is_antigravity)
+            return {entry.filename: dict(entry.credential_data) for entry in pool.enabled_entries()}
         except Exception as e:
-            log.error(f"Error getting next available credential (antigravity={is_antigravity}, model_key={model_key}): {e}")
+            log.error(f"Error getting enabled credentials: {e}")
+            return {}
+
+    def _get_pool_weight_ttl(self) -> float:
+        try:
+            return max(0.0, float(os.getenv("CREDENTIAL_POOL_WEIGHT_TTL_SECONDS", "30")))
+        except ValueError:
+            return 30.0
+
+    async def _refresh_pool_weights(self, pool: CredentialPool, model_key: str, is_antigravity: bool) -> None:
+        """重新计算某个模型下所有启用凭证的配额与健康度，并重建权重树（不做任何网络 I/O）"""
+        async with self._pool_lock:
+            if not pool.weights_stale(model_key):
+                return
+
+            quotas: Dict[str, Tuple[bool, float]] = {}
+            stale: List[str] = []
+            now = time.time()
+            ttl = self._get_quota_snapshot_ttl()
+            for entry in pool.enabled_entries():
+                if is_antigravity:
+                    snapshot = self._quota_snapshots.get(entry.filename)
+                    if snapshot is None or snapshot.is_stale(ttl, now):
+                        stale.append(entry.filename)
+                    quotas[entry.filename] = self._resolve_quota_weight(entry.filename, snapshot, model_key)
+                else:
+                    # 非 antigravity 凭证，默认可用（不检查配额）
+                    quotas[entry.filename] = (True, 100.0)
+
+            # 过期或缺失的快照继续使用旧值/默认值，由后台刷新
+            if stale and self._quota_refresher:
+                self._quota_refresher.request(stale)
+
+            # [FIX 2026-01-21] 健康度评分：来自内存中的统计聚合，无需逐个查询
+            pool.refresh_health()
+            pool.set_model_weights(model_key, quotas, self._get_pool_weight_ttl())
+
+    def _resolve_quota_weight(
+        self, filename: str, snapshot: Optional[QuotaSnapshot], model_key: str
+    ) -> Tuple[bool, float]:
+        """
+        根据配额快照判断 antigravity 凭证在指定模型上是否可用
+
+        Returns:
+            (是否可用, 配额百分比)
+        """
+        if snapshot is None:
+            # 还没有快照，默认可用（避免误判），未知配额给中等权重
+            log.debug(f"[SQLite] ⚠ {filename}: No quota snapshot yet, assuming available")
+            return True, 50.0
+
+        available, model_id, model_percentage = snapshot.resolve(model_key, self.QUOTA_THRESHOLD)
+        if model_id is None:
+            return False, model_percentage
+
+        # 配额阈值：20%（低于此值换号，避免被谷歌盯上）
+        if available:
+            log.debug(f"[SQLite] ✓ {filename}: model={model_id}, quota={model_percentage:.1f}% >= {self.QUOTA_THRESHOLD}%, available")
+        else:
+            log.debug(f"[SQLite] ✗ {filename}: model={model_id}, quota={model_percentage:.1f}% < {self.QUOTA_THRESHOLD}%, unavailable (换号)")
+        return available, model_percentage
+
+    # ============ 配额快照 ============
+
+    def _get_quota_snapshot_ttl(self) -> float:
+        try:
+            return max(0.0, float(os.getenv("QUOTA_SNAPSHOT_TTL_SECONDS", "600")))
+        except ValueError:
+            return 600.0
+
+    async def _load_quota_snapshots(self) -> None:
+        """加载配额快照到内存（初始化时调用一次）"""
+        try:
+            async with self._conn_pool.reader() as db:
+                async with db.execute(
+                    "SELECT filename, models, fetched_at FROM antigravity_quota_snapshots"
+                ) as cursor:
+                    rows = await cursor.fetchall()
+            self._quota_snapshots = {
+                filename: QuotaSnapshot(models=json.loads(models or '{}'), fetched_at=fetched_at)
+                for filename, models, fetched_at in rows
+            }
+            log.debug(f"Loaded {len(self._quota_snapshots)} quota snapshots into cache")
+        except Exception as e:
+            log.error(f"Error loading quota snapshots: {e}")
+            self._quota_snapshots = {}
+
+    def get_quota_snapshot(self, filename: str) -> Optional[QuotaSnapshot]:
+        """获取 antigravity 凭证的配额快照（内存读取）"""
+        return self._quota_snapshots.get(filename)
+
+    async def store_quota_snapshot(self, filename: str, snapshot: QuotaSnapshot) -> bool:
+        """保存 antigravity 凭证的配额快照，并让相关权重在下次选择时重新计算"""
+        self._ensure_initialized()
+
+        try:
+            async with self._conn_pool.writer() as db:
+                result = await db.execute("""
+                    INSERT INTO antigravity_quota_snapshots (filename, models, fetched_at)
+                    SELECT filename, ?, ? FROM antigravity_credentials WHERE filename = ?
+                    ON CONFLICT(filename) DO UPDATE SET
+                        models = excluded.models,
+                        fetched_at = excluded.fetched_at
+                """, (json.dumps(snapshot.models), snapshot.fetched_at, filename))
+                stored = result.rowcount > 0
+                await db.commit()
+
+            if stored:
+                self._quota_snapshots[filename] = snapshot
+                self._pools[True].expire_weights()
+            return stored
+
+        except Exception as e:
+            log.error(f"Error storing quota snapshot for {filename}: {e}")
+            return False
+
+    async def _fetch_quota_snapshot(self, filename: str) -> Optional[QuotaSnapshot]:
+        """拉取单个 antigravity 凭证的配额（仅由后台刷新器调用）"""
+        from ..antigravity_api import fetch_quota_info
+
+        entry = self._pools[True].get(filename)
+        credential_data = entry.credential_data if entry else await self.get_credential(filename, is_antigravity=True)
+        if not credential_data:
+            return None
+        access_token = credential_data.get("access_token") or credential_data.get("token")
+        if not access_token:
             return None
 
-    async def get_available_credentials_list(self) -> List[str]:
+        quota_result = await fetch_quota_info(access_token, cache_key=filename)
+        return QuotaSnapshot.from_quota_result(quota_result)
+
+    async def get_available_credentials_list(self, model_key: Optional[str] = None) -> List[str]:
         """
         获取所有可用凭证列表
         - 未禁用
+        - 指定 model_key 时排除该模型冷却中的凭证（冷却表索引查询）
         - 按轮换顺序排序
         """
         self._ensure_initialized()
 
         try:
-            async with aiosqlite.connect(self._db_path) as db:
-                async with db.execute("""
-                    SELECT filename
-                    FROM credentials
-                    WHERE disabled = 0
-                    ORDER BY rotation_order ASC
-                """) as cursor:
+            query = "SELECT filename FROM credentials WHERE disabled = 0"
+            params: List[Any] = []
+            if model_key:
+                query += """
+                    AND NOT EXISTS (
+                        SELECT 1 FROM credential_cooldowns c
+                        WHERE c.model_key = ? AND c.cooldown_until > ?
+                          AND c.filename = credentials.filename
+                    )
+                """
+                params.extend([model_key, time.time()])
+            query += " ORDER BY rotation_order ASC"
+
+            async with self._conn_pool.reader() as db:
+                async with db.execute(query, params) as cursor:
                     rows = await cursor.fetchall()
                     return [row[0] for row in rows]
 
@@ -505,7 +889,7 @@ class SQLiteManager:
 
         try:
             table_name = self._get_table_name(is_antigravity)
-            async with aiosqlite.connect(self._db_path) as db:
+            async with self._conn_pool.writer() as db:
                 if success:
                     # 成功：增加成功计数，累加延迟
                     await db.execute(f"""
@@ -547,7 +931,10 @@ class SQLiteManager:
                     """, (json.dumps(recent_errors), current_time, filename))
 
                 await db.commit()
-                return True
+
+            # 同步内存中的健康度聚合（权重树随之更新）
+            self._pools[is_antigravity].record_result(filename, success, latency_ms, error_code)
+            return True
 
         except Exception as e:
             log.error(f"Error recording request result for {filename}: {e}")
@@ -562,67 +949,61 @@ class SQLiteManager:
         计算凭证的健康度评分
 
         评分公式：
-        health_score = (成功率 * 0.4) + (配额权重 * 0.3) + (延迟权重 * 0.2) + (最近错误权重 * 0.1)
+        health_score = (成功率 * 0.5) + (延迟权重 * 0.3) + (最近错误权重 * 0.2)
 
         Returns:
             健康度评分 (0-100)
         """
+        scores = await self.get_credential_health_scores([filename], is_antigravity)
+        return scores.get(filename, DEFAULT_HEALTH_SCORE)
+
+    async def get_credential_health_scores(
+        self,
+        filenames: Optional[List[str]] = None,
+        is_antigravity: bool = False,
+    ) -> Dict[str, float]:
+        """
+        批量计算凭证的健康度评分
+
+        凭证池已加载时直接使用 record_request_result 维护的内存聚合；
+        否则用一条查询取回所有候选凭证的统计数据。
+
+        Args:
+            filenames: 需要评分的凭证文件名（None 表示全部）
+            is_antigravity: 是否为 antigravity 凭证
+
+        Returns:
+            {filename: 健康度评分 (0-100)}，不存在的凭证返回默认分
+        """
         self._ensure_initialized()
 
+        pool = self._pools[is_antigravity]
+        if pool.loaded:
+            return pool.health_scores(filenames)
+
         try:
             table_name = self._get_table_name(is_antigravity)
-            async with aiosqlite.connect(self._db_path) as db:
+            async with self._conn_pool.reader() as db:
                 async with db.execute(f"""
-                    SELECT success_count, failure_count, total_latency_ms, recent_errors
+                    SELECT filename, success_count, failure_count, total_latency_ms, recent_errors
                     FROM {table_name}
-                    WHERE filename = ?
-                """, (filename,)) as cursor:
-                    row = await cursor.fetchone()
-                    if not row:
-                        return 50.0  # 默认中等分数
-
-                    success_count = row[0] or 0
-                    failure_count = row[1] or 0
-                    total_latency_ms = row[2] or 0
-                    recent_errors = json.loads(row[3] or '[]')
-
-                    # 1. 成功率 (0-100)
-                    total_requests = success_count + failure_count
-                    if total_requests > 0:
-                        success_rate = (success_count / total_requests) * 100
-                    else:
-                        success_rate = 100  # 没有请求记录，假设完美
-
-                    # 2. 延迟权重 (0-100)，延迟越低分数越高
-                    if success_count > 0:
-                        avg_latency = total_latency_ms / success_count
-                        # 假设 1000ms 是基准，超过 5000ms 得 0 分
-                        latency_score = max(0, 100 - (avg_latency / 50))
-                    else:
-                        latency_score = 50  # 没有数据，给中等分
-
-                    # 3. 最近错误权重 (0-100)，错误越少分数越高
-                    # 只考虑最近 5 分钟内的错误
-                    current_time = time.time()
-                    recent_error_count = sum(
-                        1 for e in recent_errors
-                        if current_time - e.get("time", 0) < 300
-                    )
-                    recent_error_score = max(0, 100 - (recent_error_count * 20))
-
-                    # 4. 综合评分（配额权重在选择时单独处理）
-                    # 这里只计算基于历史数据的健康度
-                    health_score = (
-                        success_rate * 0.5 +
-                        latency_score * 0.3 +
-                        recent_error_score * 0.2
-                    )
+                """) as cursor:
+                    rows = await cursor.fetchall()
 
-                    return min(100, max(0, health_score))
+            now = time.time()
+            all_scores = {
+                row[0]: compute_health_score(row[1], row[2], row[3], json.loads(row[4] or '[]'), now)
+                for row in rows
+            }
+            if filenames is None:
+                return all_scores
+            return {f: all_scores.get(f, DEFAULT_HEALTH_SCORE) for f in filenames}
 
         except Exception as e:
-            log.error(f"Error calculating health score for {filename}: {e}")
-            return 50.0  # 出错时返回中等分数
+            log.error(f"Error calculating health scores: {e}")
+            if filenames is None:
+                return {}
+            return {f: DEFAULT_HEALTH_SCORE for f in filenames}  # 出错时返回中等分数
 
     async def check_and_clear_cooldowns(self) -> int:
         """
@@ -642,6 +1023,128 @@ class SQLiteManager:
             log.error(f"Error clearing cooldowns: {e}")
             return 0
 
+    # ============ 请求结果写回缓冲 ============
+
+    def record_call_result(
+        self,
+        filename: str,
+        success: bool,
+        error_code: Optional[int] = None,
+        model_key: Optional[str] = None,
+        cooldown_until: Optional[float] = None,
+        is_antigravity: bool = False,
+    ) -> None:
+        """
+        记录一次 API 调用结果（不触发数据库 I/O）
+
+        内存凭证池立即更新（冷却与健康度对下一次选择生效），
+        last_success / error_codes / 计数 / 模型冷却由写回缓冲批量落盘。
+
+        Args:
+            filename: 凭证文件名
+            success: 是否成功
+            error_code: 错误码（失败时）
+            model_key: 模型键（成功时清除该模型冷却，失败时配合 cooldown_until 设置冷却）
+            cooldown_until: 冷却截止时间戳
+            is_antigravity: 是否为 antigravity 凭证
+        """
+        self._ensure_initialized()
+
+        now = time.time()
+        delta = CredentialStateDelta(filename=filename, is_antigravity=is_antigravity)
+        if success:
+            delta.last_success = now
+            delta.error_codes_reset = True
+            delta.success_count = 1
+            if model_key:
+                delta.model_cooldowns[model_key] = None
+        elif error_code:
+            delta.error_codes_added.append(error_code)
+            delta.failure_count = 1
+            delta.recent_errors.append({"code": error_code, "time": now})
+            if cooldown_until is not None and model_key:
+                delta.model_cooldowns[model_key] = cooldown_until
+        else:
+            return
+
+        pool = self._pools[is_antigravity]
+        for key, until in delta.model_cooldowns.items():
+            pool.set_model_cooldown(filename, key, until)
+        pool.record_result(filename, success, 0, error_code, now)
+
+        self._state_buffer.record(delta)
+
+    async def flush_state_buffer(self) -> int:
+        """立即落盘写回缓冲中的请求结果，返回写入的凭证数"""
+        self._ensure_initialized()
+        return await self._state_buffer.flush()
+
+    async def _apply_state_deltas(self, deltas: List[CredentialStateDelta]) -> None:
+        """在一个事务中批量写入状态增量（写回缓冲的落盘函数）"""
+        async with self._conn_pool.writer() as db:
+            for is_antigravity in (False, True):
+                group = [d for d in deltas if d.is_antigravity == is_antigravity]
+                if not group:
+                    continue
+                table_name = self._get_table_name(is_antigravity)
+
+                cooldown_table = self._get_cooldown_table_name(is_antigravity)
+
+                placeholders = ",".join("?" * len(group))
+                async with db.execute(f"""
+                    SELECT filename, error_codes, recent_errors
+                    FROM {table_name} WHERE filename IN ({placeholders})
+                """, [d.filename for d in group]) as cursor:
+                    current = {row[0]: row[1:] for row in await cursor.fetchall()}
+
+                updates = []
+                cooldown_sets = []
+                cooldown_clears = []
+                for delta in group:
+                    row = current.get(delta.filename)
+                    if row is None:
+                        continue
+                    error_codes = delta.apply_error_codes(json.loads(row[0] or '[]'))
+
+                    recent_errors = json.loads(row[1] or '[]')
+                    if delta.recent_errors:
+                        recent_errors = (recent_errors + delta.recent_errors)[-RECENT_ERRORS_KEEP:]
+
+                    for key, until in delta.model_cooldowns.items():
+                        if until is None:
+                            cooldown_clears.append((delta.filename, key))
+                        else:
+                            cooldown_sets.append((delta.filename, key, until))
+
+                    updates.append((
+                        delta.last_success,
+                        json.dumps(error_codes) if error_codes is not None else None,
+                        delta.success_count,
+                        delta.failure_count,
+                        json.dumps(recent_errors),
+                        delta.filename,
+                    ))
+
+                await db.executemany(f"""
+                    UPDATE {table_name}
+                    SET last_success = COALESCE(?, last_success),
+                        error_codes = COALESCE(?, error_codes),
+                        success_count = success_count + ?,
+                        failure_count = failure_count + ?,
+                        recent_errors = ?,
+                        updated_at = unixepoch()
+                    WHERE filename = ?
+                """, updates)
+                await db.executemany(f"""
+                    DELETE FROM {cooldown_table} WHERE filename = ? AND model_key = ?
+                """, cooldown_clears)
+                await db.executemany(f"""
+                    INSERT OR REPLACE INTO {cooldown_table} (filename, model_key, cooldown_until)
+                    VALUES (?, ?, ?)
+                """, cooldown_sets)
+
+            await db.commit()
+
     # ============ StorageBackend 协议方法 ============
 
     async def store_credential(self, filename: str, credential_data: Dict[str, Any], is_antigravity: bool = False) -> bool:
@@ -650,7 +1153,7 @@ class SQLiteManager:
 
         try:
             table_name = self._get_table_name(is_antigravity)
-            async with aiosqlite.connect(self._db_path) as db:
+            async with self._conn_pool.writer() as db:
                 # 检查凭证是否存在
                 async with db.execute(f"""
                     SELECT disabled, error_codes, last_success, user_email,
@@ -682,8 +1185,10 @@ class SQLiteManager:
                     """, (filename, json.dumps(credential_data), next_order, time.time()))
 
                 await db.commit()
-                log.debug(f"Stored credential: {filename} (antigravity={is_antigravity})")
-                return True
+
+            self._pools[is_antigravity].upsert(filename, credential_data)
+            log.debug(f"Stored credential: {filename} (antigravity={is_antigravity})")
+            return True
 
         except Exception as e:
             log.error(f"Error storing credential {filename}: {e}")
@@ -695,7 +1200,7 @@ class SQLiteManager:
 
         try:
             table_name = self._get_table_name(is_antigravity)
-            async with aiosqlite.connect(self._db_path) as db:
+            async with self._conn_pool.reader() as db:
                 # 首先尝试精确匹配
                 async with db.execute(f"""
                     SELECT credential_data FROM {table_name} WHERE filename = ?
@@ -726,7 +1231,7 @@ class SQLiteManager:
 
         try:
             table_name = self._get_table_name(is_antigravity)
-            async with aiosqlite.connect(self._db_path) as db:
+            async with self._conn_pool.reader() as db:
                 async with db.execute(f"""
                     SELECT filename FROM {table_name} ORDER BY rotation_order
                 """) as cursor:
@@ -743,7 +1248,7 @@ class SQLiteManager:
 
         try:
             table_name = self._get_table_name(is_antigravity)
-            async with aiosqlite.connect(self._db_path) as db:
+            async with self._conn_pool.writer() as db:
                 # 首先尝试精确匹配删除
                 result = await db.execute(f"""
                     DELETE FROM {table_name} WHERE filename = ?
@@ -756,6 +1261,13 @@ class SQLiteManager:
                         DELETE FROM {table_name} WHERE filename LIKE '%' || ?
                     """, (filename,))
                     deleted_count = result.rowcount
+                    if deleted_count > 0:
+                        self._pools[is_antigravity].invalidate()
+                else:
+                    self._pools[is_antigravity].remove(filename)
+                    self._state_buffer.discard(filename, is_antigravity)
+                    if is_antigravity:
+                        self._quota_snapshots.pop(filename, None)
 
                 await db.commit()
 
@@ -786,19 +1298,20 @@ class SQLiteManager:
                         set_clauses.append(f"{key} = ?")
                         values.append(json.dumps(value))
                     elif key == "model_cooldowns":
-                        set_clauses.append(f"{key} = ?")
-                        values.append(json.dumps(value))
+                        # 模型冷却存放在独立的冷却表中，下面单独替换
+                        continue
                     else:
                         set_clauses.append(f"{key} = ?")
                         values.append(value)
 
-            if not set_clauses:
+            model_cooldowns = state_updates.get("model_cooldowns")
+            if not set_clauses and model_cooldowns is None:
                 return True
 
             set_clauses.append("updated_at = unixepoch()")
             values.append(filename)
 
-            async with aiosqlite.connect(self._db_path) as db:
+            async with self._conn_pool.writer() as db:
                 # 首先尝试精确匹配更新
                 result = await db.execute(f"""
                     UPDATE {table_name}
@@ -815,6 +1328,22 @@ class SQLiteManager:
                         WHERE filename LIKE '%' || ?
                     """, values)
                     updated_count = result.rowcount
+                    if updated_count > 0:
+                        self._pools[is_antigravity].invalidate()
+                    matched = []
+                    if model_cooldowns is not None and updated_count > 0:
+                        async with db.execute(f"""
+                            SELECT filename FROM {table_name} WHERE filename LIKE '%' || ?
+                        """, (filename,)) as cursor:
+                            matched = [row[0] for row in await cursor.fetchall()]
+                else:
+                    matched = [filename]
+                    self._pools[is_antigravity].apply_state(filename, state_updates)
+
+                if model_cooldowns is not None:
+                    for matched_filename in matched:
+                        await self._replace_cooldowns(db, is_antigravity, matched_filename, model_cooldowns)
+                        self._state_buffer.discard_cooldowns(matched_filename, is_antigravity)
 
                 await db.commit()
                 return updated_count > 0
@@ -829,42 +1358,32 @@ class SQLiteManager:
 
         try:
             table_name = self._get_table_name(is_antigravity)
-            async with aiosqlite.connect(self._db_path) as db:
+            async with self._conn_pool.reader() as db:
                 # 首先尝试精确匹配
                 async with db.execute(f"""
-                    SELECT disabled, error_codes, last_success, user_email, model_cooldowns
+                    SELECT disabled, error_codes, last_success, user_email, filename
                     FROM {table_name} WHERE filename = ?
                 """, (filename,)) as cursor:
                     row = await cursor.fetchone()
 
-                    if row:
-                        error_codes_json = row[1] or '[]'
-                        model_cooldowns_json = row[4] or '{}'
-                        return {
-                            "disabled": bool(row[0]),
-                            "error_codes": json.loads(error_codes_json),
-                            "last_success": row[2] or time.time(),
-                            "user_email": row[3],
-                            "model_cooldowns": json.loads(model_cooldowns_json),
-                        }
-
                 # 如果精确匹配失败，尝试basename匹配
-                async with db.execute(f"""
-                    SELECT disabled, error_codes, last_success, user_email, model_cooldowns
-                    FROM {table_name} WHERE filename LIKE '%' || ?
-                """, (filename,)) as cursor:
-                    row = await cursor.fetchone()
+                if not row:
+                    async with db.execute(f"""
+                        SELECT disabled, error_codes, last_success, user_email, filename
+                        FROM {table_name} WHERE filename LIKE '%' || ?
+                    """, (filename,)) as cursor:
+                        row = await cursor.fetchone()
 
-                    if row:
-                        error_codes_json = row[1] or '[]'
-                        model_cooldowns_json = row[4] or '{}'
-                        return {
-                            "disabled": bool(row[0]),
-                            "error_codes": json.loads(error_codes_json),
-                            "last_success": row[2] or time.time(),
-                            "user_email": row[3],
-                            "model_cooldowns": json.loads(model_cooldowns_json),
-                        }
+                if row:
+                    error_codes_json = row[1] or '[]'
+                    cooldowns = await self._load_active_cooldowns(db, is_antigravity, filename=row[4])
+                    return {
+                        "disabled": bool(row[0]),
+                        "error_codes": json.loads(error_codes_json),
+                        "last_success": row[2] or time.time(),
+                        "user_email": row[3],
+                        "model_cooldowns": cooldowns.get(row[4], {}),
+                    }
 
                 # 返回默认状态
                 return {
@@ -885,39 +1404,30 @@ class SQLiteManager:
 
         try:
             table_name = self._get_table_name(is_antigravity)
-            async with aiosqlite.connect(self._db_path) as db:
+            async with self._conn_pool.reader() as db:
                 async with db.execute(f"""
-                    SELECT filename, disabled, error_codes, last_success,
-                           user_email, model_cooldowns
+                    SELECT filename, disabled, error_codes, last_success, user_email
                     FROM {table_name}
                 """) as cursor:
                     rows = await cursor.fetchall()
 
-                    states = {}
-                    current_time = time.time()
-
-                    for row in rows:
-                        filename = row[0]
-                        error_codes_json = row[2] or '[]'
-                        model_cooldowns_json = row[5] or '{}'
-                        model_cooldowns = json.loads(model_cooldowns_json)
-
-                        # 自动过滤掉已过期的模型CD
-                        if model_cooldowns:
-                            model_cooldowns = {
-                                k: v for k, v in model_cooldowns.items()
-                                if v > current_time
-                            }
-
-                        states[filename] = {
-                            "disabled": bool(row[1]),
-                            "error_codes": json.loads(error_codes_json),
-                            "last_success": row[3] or time.time(),
-                            "user_email": row[4],
-                            "model_cooldowns": model_cooldowns,
-                        }
+                # 已过期的模型CD在查询时即被过滤
+                current_time = time.time()
+                cooldowns = await self._load_active_cooldowns(db, is_antigravity, now=current_time)
+
+                states = {}
+                for row in rows:
+                    filename = row[0]
+                    error_codes_json = row[2] or '[]'
+                    states[filename] = {
+                        "disabled": bool(row[1]),
+                        "error_codes": json.loads(error_codes_json),
+                        "last_success": row[3] or current_time,
+                        "user_email": row[4],
+                        "model_cooldowns": cooldowns.get(filename, {}),
+                    }
 
-                    return states
+                return states
 
         except Exception as e:
             log.error(f"Error getting all credential states: {e}")
@@ -952,7 +1462,7 @@ class SQLiteManager:
             # 根据 is_antigravity 选择表名
             table_name = self._get_table_name(is_antigravity)
 
-            async with aiosqlite.connect(self._db_path) as db:
+            async with self._conn_pool.reader() as db:
                 # 先计算全局统计数据（不受筛选条件影响）
                 global_stats = {"total": 0, "normal": 0, "disabled": 0}
                 async with db.execute(f"""
@@ -975,6 +1485,17 @@ class SQLiteManager:
                 elif status_filter == "disabled":
                     where_clauses.append("disabled = 1")
 
+                # 冷却筛选：由冷却表的 EXISTS 子查询完成
+                current_time = time.time()
+                cooldown_table = self._get_cooldown_table_name(is_antigravity)
+                if cooldown_filter in ("in_cooldown", "no_cooldown"):
+                    negate = "NOT " if cooldown_filter == "no_cooldown" else ""
+                    where_clauses.append(f"""{negate}EXISTS (
+                        SELECT 1 FROM {cooldown_table} c
+                        WHERE c.filename = {table_name}.filename AND c.cooldown_until > ?
+                    )""")
+                    count_params.append(current_time)
+
                 filter_value = None
                 filter_int = None
                 if error_code_filter and str(error_code_filter).strip().lower() != "all":
@@ -989,34 +1510,27 @@ class SQLiteManager:
                 if where_clauses:
                     where_clause = "WHERE " + " AND ".join(where_clauses)
 
-                # 先获取所有数据（用于冷却筛选，因为需要在Python中判断）
+                # 先获取所有数据（错误码筛选需要在Python中判断）
                 all_query = f"""
                     SELECT filename, disabled, error_codes, last_success,
-                           user_email, rotation_order, model_cooldowns
+                           user_email, rotation_order
                     FROM {table_name}
                     {where_clause}
                     ORDER BY rotation_order
                 """
 
+                # 已过期的模型CD在查询时即被过滤
+                cooldowns = await self._load_active_cooldowns(db, is_antigravity, now=current_time)
+
                 async with db.execute(all_query, count_params) as cursor:
                     all_rows = await cursor.fetchall()
 
-                    current_time = time.time()
                     all_summaries = []
 
                     for row in all_rows:
                         filename = row[0]
                         error_codes_json = row[2] or '[]'
-                        model_cooldowns_json = row[6] or '{}'
-                        model_cooldowns = json.loads(model_cooldowns_json)
-
-                        # 自动过滤掉已过期的模型CD
-                        active_cooldowns = {}
-                        if model_cooldowns:
-                            active_cooldowns = {
-                                k: v for k, v in model_cooldowns.items()
-                                if v > current_time
-                            }
+                        active_cooldowns = cooldowns.get(filename, {})
 
                         error_codes = json.loads(error_codes_json)
                         if filter_value:
@@ -1044,19 +1558,7 @@ class SQLiteManager:
                             "rotation_order": row[5],
                             "model_cooldowns": active_cooldowns,
                         }
-
-                        # 应用冷却筛选
-                        if cooldown_filter == "in_cooldown":
-                            # 只保留有冷却的凭证
-                            if active_cooldowns:
-                                all_summaries.append(summary)
-                        elif cooldown_filter == "no_cooldown":
-                            # 只保留没有冷却的凭证
-                            if not active_cooldowns:
-                                all_summaries.append(summary)
-                        else:
-                            # 不筛选冷却状态
-                            all_summaries.append(summary)
+                        all_summaries.append(summary)
 
                     # 应用分页
                     total_count = len(all_summaries)
@@ -1090,7 +1592,7 @@ class SQLiteManager:
         self._ensure_initialized()
 
         try:
-            async with aiosqlite.connect(self._db_path) as db:
+            async with self._conn_pool.writer() as db:
                 await db.execute("""
                     INSERT INTO config (key, value, updated_at)
                     VALUES (?, ?, unixepoch())
@@ -1130,7 +1632,7 @@ class SQLiteManager:
         self._ensure_initialized()
 
         try:
-            async with aiosqlite.connect(self._db_path) as db:
+            async with self._conn_pool.writer() as db:
                 await db.execute("DELETE FROM config WHERE key = ?", (key,))
                 await db.commit()
 
@@ -1167,41 +1669,67 @@ class SQLiteManager:
 
         try:
             table_name = self._get_table_name(is_antigravity)
-            async with aiosqlite.connect(self._db_path) as db:
-                # 获取当前的 model_cooldowns
+            cooldown_table = self._get_cooldown_table_name(is_antigravity)
+            async with self._conn_pool.writer() as db:
                 async with db.execute(f"""
-                    SELECT model_cooldowns FROM {table_name} WHERE filename = ?
+                    SELECT 1 FROM {table_name} WHERE filename = ?
                 """, (filename,)) as cursor:
-                    row = await cursor.fetchone()
-
-                    if not row:
+                    if not await cursor.fetchone():
                         log.warning(f"Credential {filename} not found")
                         return False
 
-                    model_cooldowns = json.loads(row[0] or '{}')
-
-                    # 更新或删除指定模型的冷却时间
-                    if cooldown_until is None:
-                        model_cooldowns.pop(model_key, None)
-                    else:
-                        model_cooldowns[model_key] = cooldown_until
-
-                    # 写回数据库
+                # 更新或删除指定模型的冷却时间
+                if cooldown_until is None:
                     await db.execute(f"""
-                        UPDATE {table_name}
-                        SET model_cooldowns = ?,
-                            updated_at = unixepoch()
-                        WHERE filename = ?
-                    """, (json.dumps(model_cooldowns), filename))
-                    await db.commit()
+                        DELETE FROM {cooldown_table} WHERE filename = ? AND model_key = ?
+                    """, (filename, model_key))
+                else:
+                    await db.execute(f"""
+                        INSERT OR REPLACE INTO {cooldown_table} (filename, model_key, cooldown_until)
+                        VALUES (?, ?, ?)
+                    """, (filename, model_key, cooldown_until))
+                await db.commit()
 
-                    log.debug(f"Set model cooldown: {filename}, model_key={model_key}, cooldown_until={cooldown_until}")
-                    return True
+            self._pools[is_antigravity].set_model_cooldown(filename, model_key, cooldown_until)
+            self._state_buffer.discard_cooldowns(filename, is_antigravity, model_key)
+            log.debug(f"Set model cooldown: {filename}, model_key={model_key}, cooldown_until={cooldown_until}")
+            return True
 
         except Exception as e:
             log.error(f"Error setting model cooldown for {filename}: {e}")
             return False
 
+    async def get_earliest_model_cooldown(self, model_key: str, is_antigravity: bool = False) -> Optional[float]:
+        """
+        获取指定模型在所有启用凭证中的最早冷却截止时间
+
+        凭证池已加载时读取内存冷却堆，否则走 (model_key, cooldown_until) 索引查询。
+
+        Returns:
+            最早冷却截止时间戳，没有冷却中的凭证时返回 None
+        """
+        self._ensure_initialized()
+
+        try:
+            pool = self._pools[is_antigravity]
+            if pool.loaded:
+                return pool.earliest_cooldown(model_key)
+
+            table_name = self._get_table_name(is_antigravity)
+            cooldown_table = self._get_cooldown_table_name(is_antigravity)
+            async with self._conn_pool.reader() as db:
+                async with db.execute(f"""
+                    SELECT MIN(c.cooldown_until)
+                    FROM {cooldown_table} c JOIN {table_name} t ON t.filename = c.filename
+                    WHERE c.model_key = ? AND c.cooldown_until > ? AND t.disabled = 0
+                """, (model_key, time.time())) as cursor:
+                    row = await cursor.fetchone()
+                    return row[0] if row else None
+
+        except Exception as e:
+            log.error(f"Error getting earliest model cooldown for {model_key}: {e}")
+            return None
+
     async def clear_all_model_cooldowns(
         self,
         filename: str,
@@ -1223,19 +1751,15 @@ class SQLiteManager:
         self._ensure_initialized()
 
         try:
-            table_name = self._get_table_name(is_antigravity)
-            async with aiosqlite.connect(self._db_path) as db:
-                # 直接将 model_cooldowns 设置为空字典
-                await db.execute(f"""
-                    UPDATE {table_name}
-                    SET model_cooldowns = '{{}}',
-                        updated_at = unixepoch()
-                    WHERE filename = ?
-                """, (filename,))
+            cooldown_table = self._get_cooldown_table_name(is_antigravity)
+            async with self._conn_pool.writer() as db:
+                await db.execute(f"DELETE FROM {cooldown_table} WHERE filename = ?", (filename,))
                 await db.commit()
 
-                log.info(f"[SQLite] Cleared all model cooldowns for credential: {filename} (is_antigravity={is_antigravity})")
-                return True
+            self._pools[is_antigravity].clear_model_cooldowns(filename)
+            self._state_buffer.discard_cooldowns(filename, is_antigravity)
+            log.info(f"[SQLite] Cleared all model cooldowns for credential: {filename} (is_antigravity={is_antigravity})")
+            return True
 
         except Exception as e:
             log.error(f"Error clearing all model cooldowns for {filename}: {e}")
@@ -1254,39 +1778,17 @@ class SQLiteManager:
         self._ensure_initialized()
 
         try:
-            table_name = self._get_table_name(is_antigravity)
+            cooldown_table = self._get_cooldown_table_name(is_antigravity)
             current_time = time.time()
-            cleared_count = 0
 
-            async with aiosqlite.connect(self._db_path) as db:
-                # 获取所有凭证的 model_cooldowns
-                async with db.execute(f"""
-                    SELECT filename, model_cooldowns FROM {table_name}
-                    WHERE model_cooldowns != '{{}}'
-                """) as cursor:
-                    rows = await cursor.fetchall()
-
-                    for filename, model_cooldowns_json in rows:
-                        model_cooldowns = json.loads(model_cooldowns_json or '{}')
-                        original_len = len(model_cooldowns)
-
-                        # 过滤掉已过期的冷却
-                        model_cooldowns = {
-                            k: v for k, v in model_cooldowns.items()
-                            if v > current_time
-                        }
-
-                        # 如果有变化，更新数据库
-                        if len(model_cooldowns) < original_len:
-                            await db.execute(f"""
-                                UPDATE {table_name}
-                                SET model_cooldowns = ?,
-                                    updated_at = unixepoch()
-                                WHERE filename = ?
-                            """, (json.dumps(model_cooldowns), filename))
-                            cleared_count += (original_len - len(model_cooldowns))
+            async with self._conn_pool.writer() as db:
+                result = await db.execute(f"""
+                    DELETE FROM {cooldown_table} WHERE cooldown_until <= ?
+                """, (current_time,))
+                cleared_count = result.rowcount
+                await db.commit()
 
-                    await db.commit()
+            self._pools[is_antigravity].clear_expired_cooldowns(current_time)
 
             if cleared_count > 0:
                 log.debug(f"Cleared {cleared_count} expired model cooldowns")
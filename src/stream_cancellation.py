@@ -0,0 +1,184 @@
+"""
+流式请求取消 - Stream Cancellation
+
+客户端（IDE）在流式响应中途断开时，把取消一路传到上游：
+- CancellableStreamingResponse：与响应并行监听 http.disconnect，断开后立即取消正在读取上游的生成器，
+  并确保生成器被关闭（即使它停在 yield 上），不等到下一次发送才发现断开
+- close_upstream：关闭上游 stream_ctx 与客户端，在取消中也会执行完（shield），
+  以取消状态退出 stream_ctx，使 _StreamCtxWrapper 释放并发额度且不把不完整的流计入 BaseURL 耗时
+- record_partial_usage：记录被取消请求已消耗的 token（部分用量）
+"""
+
+import asyncio
+from typing import Any, Optional, Set
+
+from fastapi.responses import StreamingResponse
+
+from log import log
+
+# 保存后台任务的引用，避免任务在完成前被回收
+_background_tasks: Set[asyncio.Task] = set()
+
+
+async def _wait_for_disconnect(receive: Any) -> None:
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return
+
+
+async def close_stream(stream: Any) -> None:
+    """关闭异步生成器（若支持 aclose），忽略关闭时的错误"""
+    aclose = getattr(stream, "aclose", None)
+    if aclose is None:
+        return
+    try:
+        await aclose()
+    except Exception as e:
+        log.debug(f"[STREAM CANCEL] Error closing stream: {e}")
+
+
+class CancellableStreamingResponse(StreamingResponse):
+    """
+    客户端断开时取消上游读取的 StreamingResponse
+
+    与 StreamingResponse 用法相同。断开后正在等待上游数据的生成器会收到 CancelledError，
+    停在 yield 上的生成器会被 aclose()，两种情况下生成器的 finally 都会立即执行。
+    """
+
+    async def __call__(self, scope: Any, receive: Any, send: Any) -> None:
+        stream_task = asyncio.ensure_future(self.stream_response(send))
+        disconnect_task = asyncio.ensure_future(_wait_for_disconnect(receive))
+        disconnected = False
+        try:
+            await asyncio.wait({stream_task, disconnect_task}, return_when=asyncio.FIRST_COMPLETED)
+            disconnected = not stream_task.done()
+        finally:
+            disconnect_task.cancel()
+            if disconnect_task.done() and not disconnect_task.cancelled():
+                disconnect_task.exception()
+            if not stream_task.done():
+                stream_task.cancel()
+            # 自身被取消（如外层中间件取消）时清理仍在后台执行完
+            await asyncio.shield(self._finish(stream_task))
+
+        if disconnected:
+            log.info("[STREAM CANCEL] Client disconnected, upstream stream cancelled")
+        elif not stream_task.cancelled():
+            error = stream_task.exception()
+            # 发送时发现连接已断开：与断开同样处理
+            if error is not None and not isinstance(error, OSError):
+                raise error
+
+        if self.background is not None:
+            await self.background()
+
+    async def _finish(self, stream_task: "asyncio.Future[Any]") -> None:
+        try:
+            await stream_task
+        except BaseException:
+            pass
+        await close_stream(self.body_iterator)
+
+
+async def close_upstream(
+    stream_ctx: Any,
+    client: Any = None,
+    *,
+    cancelled: bool = False,
+    tag: str = "ANTIGRAVITY",
+) -> None:
+    """
+    关闭上游流与客户端
+
+    Args:
+        stream_ctx: send_antigravity_request_stream 返回的流上下文
+        client: 随流返回的客户端
+        cancelled: 流是否因客户端断开而中止（以 CancelledError 退出 stream_ctx）
+        tag: 日志标签
+    """
+    from .httpx_client import safe_close_client
+
+    async def _close() -> None:
+        try:
+            if cancelled:
+                error = asyncio.CancelledError()
+                await stream_ctx.__aexit__(type(error), error, None)
+            else:
+                await stream_ctx.__aexit__(None, None, None)
+        except BaseException as e:
+            log.debug(f"[{tag}] Error closing stream context: {e!r}")
+        try:
+            await safe_close_client(client)
+        except Exception as e:
+            log.debug(f"[{tag}] Error closing client: {e}")
+
+    await asyncio.shield(_close())
+
+
+def record_partial_usage(
+    source: str,
+    *,
+    model: Optional[str] = None,
+    credential_manager: Any = None,
+    credential_name: Optional[str] = None,
+    input_tokens: int = 0,
+    output_tokens: int = 0,
+    chunks_sent: Optional[int] = None,
+) -> None:
+    """
+    记录被客户端取消的流式请求的部分用量
+
+    写入 token 统计在后台进行，不阻塞取消流程。
+
+    Args:
+        source: 来源标识（用于日志）
+        input_tokens / output_tokens: 取消前上游已报告的 token 数
+        chunks_sent: 取消前已发送给客户端的 chunk 数
+    """
+    progress = f" after {chunks_sent} chunks" if chunks_sent is not None else ""
+    log.info(
+        f"[STREAM CANCEL] {source}: client disconnected{progress} "
+        f"(model={model}, credential={credential_name}, in={input_tokens}, out={output_tokens})"
+    )
+    if not model or not (input_tokens or output_tokens):
+        return
+    try:
+        task = asyncio.get_running_loop().create_task(
+            _write_partial_usage(model, credential_manager, credential_name, input_tokens, output_tokens)
+        )
+    except RuntimeError:
+        return
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+async def _write_partial_usage(
+    model: str,
+    credential_manager: Any,
+    credential_name: Optional[str],
+    input_tokens: int,
+    output_tokens: int,
+) -> None:
+    try:
+        from src import token_stats
+
+        account_email = "unknown"
+        if credential_manager and credential_name:
+            try:
+                cred_data = await credential_manager.get_credential_data(credential_name)
+                if cred_data:
+                    account_email = cred_data.get("email", "unknown")
+            except Exception:
+                pass
+
+        await token_stats.record_usage(
+            account_email=account_email,
+            model=model,
+            input_tokens=input_tokens,
+            output_tokens=output_tokens,
+            credential_file=credential_name,
+            is_antigravity=True,
+        )
+    except Exception as e:
+        log.warning(f"[TOKEN_STATS] Failed to record partial usage: {e}")
@@ -0,0 +1,217 @@
+"""
+流式文本合并 - Stream Coalescing
+
+上游（尤其是 Gemini / Antigravity）经常以很小的粒度吐出文本，一个 token 一个 SSE 帧，
+每帧都是一次 send/write 系统调用和一次客户端解析。这里在转换器和 StreamingResponse
+之间加一层可选的合并：短时间内连续到达的文本增量合并为一个 chunk 再发出。
+
+刷新规则：
+- 流的第一段文本立即发出，不影响首字延迟
+- 距上一段文本到达已超过合并窗口（上游本身就慢）时立即发出，不额外增加延迟
+- 否则最多等待一个窗口（从第一段待发文本开始计时）或累计到字符上限后发出
+- 工具调用、思考块边界、finish、[DONE] 等其他帧到达时，先发出待合并文本再原样透传
+
+等待期间上游的 __anext__ 在独立任务中继续运行，超时只触发刷新，不会取消上游生成器；
+客户端断开时取消在途任务并关闭上游，行为与未合并时一致。
+
+转换器只在启用合并时产出 TextDelta（文本 + 渲染函数），其他帧仍是已渲染的字符串，
+未启用时输出与原来逐字节一致。
+
+配置（环境变量）:
+- STREAM_COALESCE_ENABLED: 是否启用（默认 false）
+- STREAM_COALESCE_WINDOW_MS: 合并窗口毫秒数（默认 15，0 表示关闭）
+- STREAM_COALESCE_MAX_CHARS: 单个合并 chunk 的字符上限（默认 1024）
+- STREAM_COALESCE_CLIENTS: 只对这些客户端类型启用，逗号分隔（默认为空，表示所有客户端）
+- STREAM_COALESCE_WINDOW_MS_<CLIENT_TYPE>: 按客户端覆盖窗口，如 STREAM_COALESCE_WINDOW_MS_CURSOR=20，
+  设为 0 可对单个客户端关闭
+"""
+
+import asyncio
+import os
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Callable, List, Optional
+
+from log import log
+
+from .stream_cancellation import close_stream
+
+
+def _get_env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    if value is None or value == "":
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        return default
+
+
+def _get_env_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    if value is None or value == "":
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        return default
+
+
+def is_coalescing_enabled() -> bool:
+    return os.getenv("STREAM_COALESCE_ENABLED", "false").lower() in ("true", "1", "yes", "on")
+
+
+@dataclass(frozen=True)
+class CoalescePolicy:
+    """单个流的合并策略"""
+
+    window_ms: float = 0.0
+    max_chars: int = 1024
+
+    @property
+    def enabled(self) -> bool:
+        return self.window_ms > 0 and self.max_chars > 0
+
+
+DISABLED = CoalescePolicy()
+
+
+def get_coalesce_policy(client_type: Optional[str] = None) -> CoalescePolicy:
+    """按客户端类型解析合并策略（每个请求调用一次，读取当前环境变量）"""
+    if not is_coalescing_enabled():
+        return DISABLED
+
+    client_type = (client_type or "unknown").lower()
+    clients = {c.strip().lower() for c in os.getenv("STREAM_COALESCE_CLIENTS", "").split(",") if c.strip()}
+    if clients and client_type not in clients:
+        return DISABLED
+
+    window_ms = _get_env_float("STREAM_COALESCE_WINDOW_MS", 15.0)
+    window_ms = _get_env_float(f"STREAM_COALESCE_WINDOW_MS_{client_type.upper()}", window_ms)
+    max_chars = _get_env_int("STREAM_COALESCE_MAX_CHARS", 1024)
+    return CoalescePolicy(window_ms=max(0.0, window_ms), max_chars=max_chars)
+
+
+class TextDelta:
+    """
+    可合并的文本增量帧
+
+    Attributes:
+        text: 文本内容
+        render: 把（合并后的）文本渲染为最终 SSE 帧的函数，如 SSEChunkBuilder.build_content_chunk
+    """
+
+    __slots__ = ("text", "render")
+
+    def __init__(self, text: str, render: Callable[[str], Any]):
+        self.text = text
+        self.render = render
+
+    def __repr__(self) -> str:
+        return f"TextDelta({self.text[:40]!r})"
+
+
+def coalesce_stream(frames: AsyncIterator[Any], policy: CoalescePolicy) -> AsyncIterator[Any]:
+    """
+    为帧流加上文本合并阶段
+
+    Args:
+        frames: 转换器输出（TextDelta 或已渲染的帧）
+        policy: 合并策略，未启用时原样返回 frames
+
+    Returns:
+        只包含已渲染帧的异步迭代器
+    """
+    if not policy.enabled:
+        return frames
+    return _coalesce(frames, policy)
+
+
+async def _coalesce(frames: AsyncIterator[Any], policy: CoalescePolicy) -> AsyncIterator[Any]:
+    loop = asyncio.get_running_loop()
+    window = policy.window_ms / 1000.0
+    iterator = frames.__aiter__()
+
+    pending: List[str] = []
+    pending_chars = 0
+    render: Optional[Callable[[str], Any]] = None
+    deadline = 0.0
+    last_arrival: Optional[float] = None
+    next_task: Optional["asyncio.Future[Any]"] = None
+    text_deltas = 0
+    sent_frames = 0
+
+    def take() -> Any:
+        nonlocal pending, pending_chars, render
+        text = pending[0] if len(pending) == 1 else "".join(pending)
+        frame = render(text)
+        pending, pending_chars, render = [], 0, None
+        return frame
+
+    try:
+        while True:
+            # 有待发文本时上游读取放在独立任务中，超时只刷新、不取消上游
+            if pending:
+                if next_task is None:
+                    next_task = asyncio.ensure_future(iterator.__anext__())
+                timeout = deadline - loop.time()
+                if timeout > 0:
+                    await asyncio.wait((next_task,), timeout=timeout)
+                if not next_task.done():
+                    sent_frames += 1
+                    yield take()
+                    continue
+
+            try:
+                if next_task is not None:
+                    task, next_task = next_task, None
+                    frame = await task
+                else:
+                    frame = await iterator.__anext__()
+            except StopAsyncIteration:
+                break
+
+            if not isinstance(frame, TextDelta):
+                if pending:
+                    sent_frames += 1
+                    yield take()
+                sent_frames += 1
+                yield frame
+                continue
+
+            # 间隔只按文本帧计算：思考块、role 等帧紧挨着首段文本时不应把它扣下
+            now = loop.time()
+            gap = None if last_arrival is None else now - last_arrival
+            last_arrival = now
+
+            text_deltas += 1
+            if pending and frame.render != render:
+                sent_frames += 1
+                yield take()
+            if not pending:
+                # 首段文本、上游间隔已超过窗口：立即发出
+                if text_deltas == 1 or gap >= window:
+                    sent_frames += 1
+                    yield frame.render(frame.text)
+                    continue
+                render = frame.render
+                deadline = now + window
+            pending.append(frame.text)
+            pending_chars += len(frame.text)
+            if pending_chars >= policy.max_chars:
+                sent_frames += 1
+                yield take()
+
+        if pending:
+            sent_frames += 1
+            yield take()
+    finally:
+        if next_task is not None:
+            next_task.cancel()
+            try:
+                await next_task
+            except (asyncio.CancelledError, StopAsyncIteration, Exception):
+                pass
+        await close_stream(iterator)
+        if text_deltas:
+            log.debug(f"[STREAM COALESCE] {text_deltas} text deltas -> {sent_frames} frames "
+                      f"(window={policy.window_ms}ms)")
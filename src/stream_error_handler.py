@@ -5,11 +5,27 @@ Stream Error Handler - 流式响应错误处理和 Fallback 逻辑
 这是自定义功能模块，原版 gcli2api 不包含此功能
 """
 
-import json
+import re
 import time
+from json.encoder import encode_basestring, encode_basestring_ascii
 from typing import Any, Dict, List, Optional
 
 from log import log
+from . import json_codec
+
+_SURROGATES = re.compile("[\ud800-\udfff]")
+
+
+def _surrogate_escape(match: "re.Match[str]") -> str:
+    return encode_basestring_ascii(match.group())[1:-1]
+
+
+def _encode_text(text: str) -> str:
+    """转义 delta 文本；孤立代理字符无法编码为 UTF-8，与 json_codec 一样转义为 \\udXXX"""
+    text = encode_basestring(text)
+    if _SURROGATES.search(text) is not None:
+        text = _SURROGATES.sub(_surrogate_escape, text)
+    return text
 
 
 # ====================== 错误消息模板 ======================
@@ -135,59 +151,71 @@ def build_streaming_error_message(error: Exception) -> str:
 # ====================== SSE Chunk 构建器 ======================
 
 class SSEChunkBuilder:
-    """SSE Chunk 构建器 - 简化流式响应的构建"""
+    """
+    SSE Chunk 构建器 - 简化流式响应的构建
+
+    同一个流内 id / object / created / model 不变，构造时把 chunk 的固定前缀
+    （"data: {...,"choices":[{"index":0,"delta":"）预先渲染好；文本增量只转义 delta 文本本身，
+    不再为每个 chunk 构造嵌套字典再整体序列化。
+
+    输出与 json_codec.dumps(chunk) 生成的紧凑 JSON 逐字节一致（键顺序 id, object, created,
+    model, choices[, usage]）。
+    """
 
     def __init__(self, request_id: str, model: str, created: Optional[int] = None):
         self.request_id = request_id
         self.model = model
         self.created = created or int(time.time())
 
-    def build_content_chunk(self, content: str, finish_reason: Optional[str] = None) -> str:
-        """构建内容 chunk"""
-        chunk = {
+        head = json_codec.dumps({
             "id": self.request_id,
             "object": "chat.completion.chunk",
             "created": self.created,
             "model": self.model,
-            "choices": [{
-                "index": 0,
-                "delta": {"content": content},
-                "finish_reason": finish_reason
-            }]
-        }
-        return f"data: {json.dumps(chunk)}\n\n"
+        })
+        # 去掉结尾的 "}"，后面接 choices
+        self._choices_prefix = f'data: {head[:-1]},"choices":'
+        self._delta_prefix = self._choices_prefix + '[{"index":0,"delta":'
+        self._content_prefix = self._delta_prefix + '{"content":'
+        self._content_suffix = '},"finish_reason":null}]}\n\n'
+
+    def _finish_suffix(self, finish_reason: Optional[str], usage: Optional[Dict[str, Any]] = None) -> str:
+        if finish_reason is None and not usage:
+            return ',"finish_reason":null}]}\n\n'
+        suffix = f',"finish_reason":{json_codec.dumps(finish_reason)}}}]'
+        if usage:
+            suffix += f',"usage":{json_codec.dumps(usage)}'
+        return suffix + "}\n\n"
+
+    def build_content_chunk(self, content: str, finish_reason: Optional[str] = None) -> str:
+        """构建内容 chunk"""
+        if finish_reason is None:
+            return self._content_prefix + _encode_text(content) + self._content_suffix
+        return self._content_prefix + _encode_text(content) + "}" + self._finish_suffix(finish_reason)
+
+    def build_delta_chunk(
+        self,
+        delta: Dict[str, Any],
+        finish_reason: Optional[str] = None,
+        usage: Optional[Dict[str, Any]] = None,
+    ) -> str:
+        """构建任意 delta 的 chunk（role、reasoning_content 等组合字段）"""
+        return self._delta_prefix + json_codec.dumps(delta) + self._finish_suffix(finish_reason, usage)
 
     def build_tool_calls_chunk(self, tool_calls: List[Dict[str, Any]], finish_reason: Optional[str] = None) -> str:
         """构建工具调用 chunk"""
-        chunk = {
-            "id": self.request_id,
-            "object": "chat.completion.chunk",
-            "created": self.created,
-            "model": self.model,
-            "choices": [{
-                "index": 0,
-                "delta": {"tool_calls": tool_calls},
-                "finish_reason": finish_reason
-            }]
-        }
-        return f"data: {json.dumps(chunk)}\n\n"
+        return self.build_delta_chunk({"tool_calls": tool_calls}, finish_reason)
 
     def build_finish_chunk(self, finish_reason: str, usage: Optional[Dict[str, int]] = None) -> str:
         """构建结束 chunk"""
-        chunk = {
-            "id": self.request_id,
-            "object": "chat.completion.chunk",
-            "created": self.created,
-            "model": self.model,
-            "choices": [{
-                "index": 0,
-                "delta": {},
-                "finish_reason": finish_reason
-            }]
-        }
+        return self._delta_prefix + "{}" + self._finish_suffix(finish_reason, usage)
+
+    def build_choices_chunk(self, choices: List[Dict[str, Any]], usage: Optional[Dict[str, Any]] = None) -> str:
+        """构建带完整 choices 列表的 chunk（多候选或已转换好的 choices）"""
+        chunk = self._choices_prefix + json_codec.dumps(choices)
         if usage:
-            chunk["usage"] = usage
-        return f"data: {json.dumps(chunk)}\n\n"
+            chunk += f',"usage":{json_codec.dumps(usage)}'
+        return chunk + "}\n\n"
 
     def build_error_chunk(self, error_message: str) -> str:
         """构建错误 chunk"""
@@ -198,7 +226,7 @@ class SSEChunkBuilder:
                 "code": 500
             }
         }
-        return f"data: {json.dumps(error_response)}\n\n"
+        return f"data: {json_codec.dumps(error_response)}\n\n"
 
     @staticmethod
     def build_done_marker() -> str:
@@ -150,6 +150,9 @@ def get_curl_async_session(**kwargs) -> Optional["CurlAsyncSession"]:
     """
     获取 curl_cffi 的 AsyncSession 实例
 
+    每次调用都会新建会话（初始化 libcurl multi 句柄与伪装配置），调用方负责关闭。
+    发往上游的请求应使用 httpx_client.http_client 借出共享会话。
+
     Args:
         **kwargs: 传递给 AsyncSession 的参数
 
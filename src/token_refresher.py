@@ -0,0 +1,342 @@
+"""
+Token 预刷新调度器 - Proactive Token Refresher
+
+在 access_token 过期前由后台主动续期，请求路径上的同步刷新只作为兜底：
+- 按过期时间维护最小堆，只在最早到期的凭证临近过期时唤醒
+- 有界并发刷新，结果通过 CredentialManager._refresh_token 写回存储适配器
+- 只续期最近被使用过的凭证，避免给闲置账号制造 OAuth 流量
+- 统计提前刷新与请求路径刷新次数，便于观察兜底路径是否仍被频繁触发
+
+配置（环境变量）:
+- TOKEN_REFRESH_ENABLED: 是否启用（默认 true）
+- TOKEN_REFRESH_LEAD_SECONDS: 提前多少秒续期（默认 600，需大于请求路径的 300 秒阈值）
+- TOKEN_REFRESH_MAX_CONCURRENT: 最大并发刷新数（默认 4）
+- TOKEN_REFRESH_ACTIVE_WINDOW_SECONDS: 最近多少秒内被选中过的凭证才预刷新（默认 7200，0 表示全部）
+- TOKEN_REFRESH_RETRY_SECONDS: 刷新失败后的重试间隔（默认 60）
+- TOKEN_REFRESH_RESYNC_SECONDS: 从存储全量同步调度表的间隔（默认 600）
+"""
+
+import asyncio
+import heapq
+import os
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from log import log
+
+
+def _get_env_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    if value is None or value == "":
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        return default
+
+
+@lru_cache(maxsize=4096)
+def _parse_expiry_str(expiry_str: str) -> Optional[float]:
+    if "+" in expiry_str:
+        expiry = datetime.fromisoformat(expiry_str)
+    elif expiry_str.endswith("Z"):
+        expiry = datetime.fromisoformat(expiry_str.replace("Z", "+00:00"))
+    else:
+        expiry = datetime.fromisoformat(expiry_str)
+
+    # 确保时区信息
+    if expiry.tzinfo is None:
+        expiry = expiry.replace(tzinfo=timezone.utc)
+    return expiry.timestamp()
+
+
+def parse_expiry_timestamp(expiry: Any) -> Optional[float]:
+    """
+    解析凭证中的 expiry 字段为 Unix 时间戳（结果按字符串缓存，避免每次选择都解析）
+
+    Returns:
+        时间戳；缺失或格式无效时返回 None
+    """
+    if not isinstance(expiry, str) or not expiry:
+        return None
+    try:
+        return _parse_expiry_str(expiry)
+    except ValueError:
+        return None
+
+
+@dataclass
+class TokenRefreshStats:
+    """Token 刷新统计"""
+
+    proactive_refreshes: int = 0
+    proactive_failures: int = 0
+    request_path_refreshes: int = 0
+    request_path_failures: int = 0
+    last_proactive_refresh_at: Optional[float] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        total = self.proactive_refreshes + self.request_path_refreshes
+        return {
+            "proactive_refreshes": self.proactive_refreshes,
+            "proactive_failures": self.proactive_failures,
+            "request_path_refreshes": self.request_path_refreshes,
+            "request_path_failures": self.request_path_failures,
+            "last_proactive_refresh_at": self.last_proactive_refresh_at,
+            "proactive_ratio": (self.proactive_refreshes / total) if total else None,
+        }
+
+
+class TokenRefresher:
+    """按过期时间排序的后台 Token 续期调度器"""
+
+    def __init__(self, credential_manager):
+        """
+        Args:
+            credential_manager: 凭证管理器实例
+        """
+        self.credential_manager = credential_manager
+        self.stats = TokenRefreshStats()
+        self.is_running = False
+
+        self.lead_seconds = max(0.0, _get_env_float("TOKEN_REFRESH_LEAD_SECONDS", 600))
+        self.max_concurrent = max(1, int(_get_env_float("TOKEN_REFRESH_MAX_CONCURRENT", 4)))
+        self.active_window_seconds = max(0.0, _get_env_float("TOKEN_REFRESH_ACTIVE_WINDOW_SECONDS", 7200))
+        self.retry_seconds = max(1.0, _get_env_float("TOKEN_REFRESH_RETRY_SECONDS", 60))
+        self.resync_seconds = max(10.0, _get_env_float("TOKEN_REFRESH_RESYNC_SECONDS", 600))
+
+        # [(expiry_ts, is_antigravity, filename)]，惰性删除：以 _scheduled 中的值为准
+        self._heap: List[Tuple[float, bool, str]] = []
+        self._scheduled: Dict[Tuple[bool, str], float] = {}
+        self._last_used: Dict[Tuple[bool, str], float] = {}
+        self._inflight: Set[Tuple[bool, str]] = set()
+        self._tasks: Set[asyncio.Task] = set()
+
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._next_resync_at = 0.0
+
+    # ============ 调度表维护 ============
+
+    def schedule(self, filename: str, credential_data: Dict[str, Any], is_antigravity: bool = False) -> None:
+        """根据凭证的 expiry 加入（或更新）调度表"""
+        key = (is_antigravity, filename)
+        if not credential_data.get("refresh_token"):
+            # 没有 refresh_token 无法续期，交给请求路径处理（会自动禁用）
+            self._scheduled.pop(key, None)
+            return
+
+        expiry_ts = parse_expiry_timestamp(credential_data.get("expiry"))
+        if expiry_ts is None:
+            expiry_ts = time.time()
+
+        if self._scheduled.get(key) == expiry_ts:
+            return
+        self._scheduled[key] = expiry_ts
+        heapq.heappush(self._heap, (expiry_ts, is_antigravity, filename))
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def unschedule(self, filename: str, is_antigravity: bool = False) -> None:
+        key = (is_antigravity, filename)
+        self._scheduled.pop(key, None)
+        self._last_used.pop(key, None)
+
+    def touch(self, filename: str, credential_data: Dict[str, Any], is_antigravity: bool = False) -> None:
+        """记录凭证被请求路径选中（只有活跃凭证才会被预刷新），不在调度表中时重新入表"""
+        key = (is_antigravity, filename)
+        self._last_used[key] = time.time()
+        if key not in self._scheduled and key not in self._inflight:
+            self.schedule(filename, credential_data, is_antigravity)
+
+    def record_request_path_refresh(self, success: bool) -> None:
+        if success:
+            self.stats.request_path_refreshes += 1
+        else:
+            self.stats.request_path_failures += 1
+
+    def next_due_at(self) -> Optional[float]:
+        """最早需要续期的时间（已扣除提前量），调度表为空时返回 None"""
+        while self._heap:
+            expiry_ts, is_antigravity, filename = self._heap[0]
+            if self._scheduled.get((is_antigravity, filename)) != expiry_ts:
+                heapq.heappop(self._heap)
+                continue
+            return expiry_ts - self.lead_seconds
+        return None
+
+    def get_stats(self) -> Dict[str, Any]:
+        data = self.stats.to_dict()
+        data.update({
+            "running": self.is_running,
+            "scheduled": len(self._scheduled),
+            "inflight": len(self._inflight),
+            "next_due_at": self.next_due_at(),
+            "lead_seconds": self.lead_seconds,
+        })
+        return data
+
+    # ============ 启停 ============
+
+    async def start(self) -> None:
+        if self.is_running:
+            log.warning("[TokenRefresher] 已在运行，跳过重复启动")
+            return
+        self.is_running = True
+        self._wakeup = asyncio.Event()
+        self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        self._task = asyncio.create_task(self._run())
+        log.info(
+            f"[TokenRefresher] ✓ 启动 Token 预刷新 (提前 {self.lead_seconds:.0f}s, 并发 {self.max_concurrent})"
+        )
+
+    def stop(self) -> None:
+        log.info("[TokenRefresher] 停止 Token 预刷新")
+        self.is_running = False
+        if self._task:
+            self._task.cancel()
+        for task in list(self._tasks):
+            task.cancel()
+
+    # ============ 主循环 ============
+
+    async def _run(self) -> None:
+        while self.is_running:
+            try:
+                now = time.time()
+                if now >= self._next_resync_at:
+                    await self._resync()
+                    self._next_resync_at = time.time() + self.resync_seconds
+
+                self._dispatch_due(time.time())
+
+                now = time.time()
+                wake_at = self._next_resync_at
+                next_due = self.next_due_at()
+                if next_due is not None:
+                    wake_at = min(wake_at, next_due)
+
+                self._wakeup.clear()
+                timeout = max(0.05, wake_at - now)
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    pass
+
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                log.error(f"[TokenRefresher] 调度循环错误: {e}")
+                await asyncio.sleep(self.retry_seconds)
+
+    def _dispatch_due(self, now: float) -> None:
+        """弹出所有已到期的凭证并发起刷新（并发数由信号量限制）"""
+        while self._heap:
+            expiry_ts, is_antigravity, filename = self._heap[0]
+            key = (is_antigravity, filename)
+            if self._scheduled.get(key) != expiry_ts:
+                heapq.heappop(self._heap)
+                continue
+            if expiry_ts - self.lead_seconds > now:
+                break
+            heapq.heappop(self._heap)
+            del self._scheduled[key]
+
+            if key in self._inflight:
+                continue
+            if self.active_window_seconds > 0:
+                last_used = self._last_used.get(key, 0.0)
+                if now - last_used > self.active_window_seconds:
+                    # 闲置凭证不预刷新；下次被选中时由请求路径兜底并重新入表
+                    continue
+
+            self._inflight.add(key)
+            task = asyncio.create_task(self._refresh_one(filename, is_antigravity))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _refresh_one(self, filename: str, is_antigravity: bool) -> None:
+        key = (is_antigravity, filename)
+        adapter = self.credential_manager._storage_adapter
+        try:
+            async with self._semaphore:
+                state = await adapter.get_credential_state(filename, is_antigravity=is_antigravity)
+                if state.get("disabled", False):
+                    return
+
+                credential_data = await adapter.get_credential(filename, is_antigravity=is_antigravity)
+                if not credential_data:
+                    return
+
+                # 请求路径可能已经刷新过
+                expiry_ts = parse_expiry_timestamp(credential_data.get("expiry"))
+                if expiry_ts is not None and expiry_ts - self.lead_seconds > time.time():
+                    self.schedule(filename, credential_data, is_antigravity)
+                    return
+
+                refreshed = await self.credential_manager._refresh_token_single_flight(
+                    credential_data, filename, is_antigravity=is_antigravity
+                )
+
+            if refreshed:
+                self.stats.proactive_refreshes += 1
+                self.stats.last_proactive_refresh_at = time.time()
+                log.debug(f"[TokenRefresher] ✓ 提前续期成功: {filename} (antigravity={is_antigravity})")
+                # _refresh_token 成功后已重新入表
+                return
+
+            self.stats.proactive_failures += 1
+            self._schedule_retry(filename, is_antigravity)
+
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.stats.proactive_failures += 1
+            log.warning(f"[TokenRefresher] 续期失败 {filename}: {e}")
+            self._schedule_retry(filename, is_antigravity)
+        finally:
+            self._inflight.discard(key)
+
+    def _schedule_retry(self, filename: str, is_antigravity: bool) -> None:
+        key = (is_antigravity, filename)
+        if key in self._scheduled:
+            return
+        retry_at = time.time() + self.retry_seconds + self.lead_seconds
+        self._scheduled[key] = retry_at
+        heapq.heappush(self._heap, (retry_at, is_antigravity, filename))
+
+    async def _resync(self) -> None:
+        """从存储全量同步调度表（捕获外部新增/修改的凭证）"""
+        backend = self.credential_manager._storage_adapter._backend
+        adapter = self.credential_manager._storage_adapter
+        count = 0
+
+        for is_antigravity in (False, True):
+            if hasattr(backend, "get_enabled_credentials"):
+                credentials = await backend.get_enabled_credentials(is_antigravity=is_antigravity)
+            else:
+                credentials = {}
+                states = await adapter.get_all_credential_states(is_antigravity=is_antigravity)
+                for filename, state in states.items():
+                    if state.get("disabled", False):
+                        continue
+                    data = await adapter.get_credential(filename, is_antigravity=is_antigravity)
+                    if data:
+                        credentials[filename] = data
+
+            known = {k for k in self._scheduled if k[0] == is_antigravity}
+            for filename, credential_data in credentials.items():
+                key = (is_antigravity, filename)
+                known.discard(key)
+                if key not in self._inflight:
+                    self.schedule(filename, credential_data, is_antigravity)
+                    count += 1
+            # 已删除或禁用的凭证移出调度表
+            for key in known:
+                self._scheduled.pop(key, None)
+
+        log.debug(f"[TokenRefresher] 调度表已同步: {count} 个凭证")
@@ -22,7 +22,11 @@ from fastapi.responses import JSONResponse, StreamingResponse
 from starlette.responses import StreamingResponse as StarletteStreamingResponse
 
 from log import log
-from src.httpx_client import http_client, safe_close_client
+from src.gateway.backend_pool import get_backend_client_pool
+from src.models_cache import etag_json_response, get_models_cache
+from src.stream_cancellation import CancellableStreamingResponse, close_stream, record_partial_usage
+from src.gateway.sse.decoder import iter_sse_events
+from src.stream_error_handler import SSEChunkBuilder
 from src.utils import authenticate_bearer, authenticate_bearer_allow_local_dummy
 
 # Augment Compatibility Layer - Bugment Tool Loop & Nodes Bridge
@@ -1631,76 +1635,56 @@ async def stream_openai_with_nodes_bridge(
         stream=True,
     )
 
-    buffer = ""
     tool_calls_by_index: Dict[int, Dict[str, Any]] = {}
     saw_tool_calls = False
-    saw_done = False
 
-    async for chunk in sse_stream:
-        if not chunk:
-            continue
-        if isinstance(chunk, bytes):
-            chunk = chunk.decode("utf-8", errors="ignore")
-        buffer += chunk
-
-        while "\n" in buffer:
-            line, buffer = buffer.split("\n", 1)
-            line = line.strip()
-            if not line or not line.startswith("data: "):
-                continue
-
-            json_str = line[6:].strip()
-            if json_str == "[DONE]":
-                buffer = ""
-                saw_done = True
-                break
-
-            try:
-                evt = json.loads(json_str)
-            except Exception:
-                continue
-
-            choices = evt.get("choices") or []
-            if not choices:
-                continue
-            choice0 = choices[0] if isinstance(choices[0], dict) else None
-            if not choice0:
-                continue
-
-            # Text streaming
-            delta = choice0.get("delta") or {}
-            content = delta.get("content")
-            if isinstance(content, str) and content:
-                yield json.dumps({"text": content}, ensure_ascii=False, separators=(",", ":")) + "\n"
+    async for event in iter_sse_events(sse_stream):
+        if event.is_done:
+            break
 
-            # Tool calls streaming (OpenAI-like)
-            tool_calls = delta.get("tool_calls") or []
-            if isinstance(tool_calls, list) and tool_calls:
-                saw_tool_calls = True
-                for tc in tool_calls:
-                    if not isinstance(tc, dict):
-                        continue
-                    idx = tc.get("index", 0)
-                    if not isinstance(idx, int):
-                        idx = 0
-                    cur = tool_calls_by_index.setdefault(idx, {"id": None, "type": "function", "function": {"name": None, "arguments": ""}})
-                    if isinstance(tc.get("id"), str):
-                        cur["id"] = tc["id"]
-                    if isinstance(tc.get("type"), str):
-                        cur["type"] = tc["type"]
-                    func = tc.get("function")
-                    if isinstance(func, dict):
-                        if isinstance(func.get("name"), str):
-                            cur["function"]["name"] = func["name"]
-                        if isinstance(func.get("arguments"), str):
-                            cur["function"]["arguments"] += func["arguments"]
+        try:
+            evt = event.json()
+        except Exception:
+            continue
 
-            finish_reason = choice0.get("finish_reason")
-            if finish_reason in ("tool_calls", "function_call"):
-                saw_tool_calls = True
+        choices = evt.get("choices") or []
+        if not choices:
+            continue
+        choice0 = choices[0] if isinstance(choices[0], dict) else None
+        if not choice0:
+            continue
 
-        if saw_done:
-            break
+        # Text streaming
+        delta = choice0.get("delta") or {}
+        content = delta.get("content")
+        if isinstance(content, str) and content:
+            yield json.dumps({"text": content}, ensure_ascii=False, separators=(",", ":")) + "\n"
+
+        # Tool calls streaming (OpenAI-like)
+        tool_calls = delta.get("tool_calls") or []
+        if isinstance(tool_calls, list) and tool_calls:
+            saw_tool_calls = True
+            for tc in tool_calls:
+                if not isinstance(tc, dict):
+                    continue
+                idx = tc.get("index", 0)
+                if not isinstance(idx, int):
+                    idx = 0
+                cur = tool_calls_by_index.setdefault(idx, {"id": None, "type": "function", "function": {"name": None, "arguments": ""}})
+                if isinstance(tc.get("id"), str):
+                    cur["id"] = tc["id"]
+                if isinstance(tc.get("type"), str):
+                    cur["type"] = tc["type"]
+                func = tc.get("function")
+                if isinstance(func, dict):
+                    if isinstance(func.get("name"), str):
+                        cur["function"]["name"] = func["name"]
+                    if isinstance(func.get("arguments"), str):
+                        cur["function"]["arguments"] += func["arguments"]
+
+        finish_reason = choice0.get("finish_reason")
+        if finish_reason in ("tool_calls", "function_call"):
+            saw_tool_calls = True
 
     if saw_tool_calls and tool_calls_by_index:
         nodes: List[Dict[str, Any]] = []
@@ -1872,78 +1856,60 @@ async def stream_openai_with_tool_loop(
             stream=True,
         )
 
-        buffer = ""
         tool_calls_by_index: Dict[int, Dict[str, Any]] = {}
         saw_tool_calls = False
-        saw_done = False
 
-        async for chunk in sse_stream:
-            if not chunk:
+        async for event in iter_sse_events(sse_stream):
+            if event.is_done:
+                break
+
+            try:
+                evt = event.json()
+            except Exception:
                 continue
-            if isinstance(chunk, bytes):
-                chunk = chunk.decode("utf-8", errors="ignore")
-            buffer += chunk
-
-            while "\n" in buffer:
-                line, buffer = buffer.split("\n", 1)
-                line = line.strip()
-                if not line:
-                    continue
-                if not line.startswith("data: "):
-                    continue
 
-                json_str = line[6:].strip()
-                if json_str == "[DONE]":
-                    saw_done = True
-                    break
+            choices = evt.get("choices") or []
+            if not choices:
+                continue
+            choice0 = choices[0] if isinstance(choices[0], dict) else None
+            if not choice0:
+                continue
 
-                try:
-                    evt = json.loads(json_str)
-                except Exception:
-                    continue
+            # Text streaming
+            delta = choice0.get("delta") or {}
+            if isinstance(delta, dict) and "content" in delta and delta["content"] is not None:
+                yield json.dumps({"text": delta["content"]}, separators=(",", ":"), ensure_ascii=False) + "\n"
 
-                choices = evt.get("choices") or []
-                if not choices:
-                    continue
-                choice0 = choices[0] if isinstance(choices[0], dict) else None
-                if not choice0:
-                    continue
+            # Tool calls streaming
+            tool_calls = delta.get("tool_calls") if isinstance(delta, dict) else None
+            if isinstance(tool_calls, list) and tool_calls:
+                saw_tool_calls = True
+                for tc in tool_calls:
+                    if not isinstance(tc, dict):
+                        continue
+                    idx = tc.get("index")
+                    if not isinstance(idx, int):
+                        idx = 0
+                    cur = tool_calls_by_index.setdefault(idx, {"id": None, "type": "function", "function": {"name": None, "arguments": ""}})
+                    if "id" in tc and isinstance(tc["id"], str):
+                        cur["id"] = tc["id"]
+                    if "type" in tc and isinstance(tc["type"], str):
+                        cur["type"] = tc["type"]
+                    func = tc.get("function")
+                    if isinstance(func, dict):
+                        if "name" in func and isinstance(func["name"], str):
+                            cur["function"]["name"] = func["name"]
+                        if "arguments" in func and isinstance(func["arguments"], str):
+                            cur["function"]["arguments"] += func["arguments"]
 
-                # Text streaming
-                delta = choice0.get("delta") or {}
-                if isinstance(delta, dict) and "content" in delta and delta["content"] is not None:
-                    yield json.dumps({"text": delta["content"]}, separators=(",", ":"), ensure_ascii=False) + "\n"
-
-                # Tool calls streaming
-                tool_calls = delta.get("tool_calls") if isinstance(delta, dict) else None
-                if isinstance(tool_calls, list) and tool_calls:
-                    saw_tool_calls = True
-                    for tc in tool_calls:
-                        if not isinstance(tc, dict):
-                            continue
-                        idx = tc.get("index")
-                        if not isinstance(idx, int):
-                            idx = 0
-                        cur = tool_calls_by_index.setdefault(idx, {"id": None, "type": "function", "function": {"name": None, "arguments": ""}})
-                        if "id" in tc and isinstance(tc["id"], str):
-                            cur["id"] = tc["id"]
-                        if "type" in tc and isinstance(tc["type"], str):
-                            cur["type"] = tc["type"]
-                        func = tc.get("function")
-                        if isinstance(func, dict):
-                            if "name" in func and isinstance(func["name"], str):
-                                cur["function"]["name"] = func["name"]
-                            if "arguments" in func and isinstance(func["arguments"], str):
-                                cur["function"]["arguments"] += func["arguments"]
-
-                finish_reason = choice0.get("finish_reason")
-                if finish_reason in ("tool_calls", "function_call"):
-                    # Some upstreams keep streaming tool arguments after emitting finish_reason. We only
-                    # finalize tool execution after [DONE] to avoid running with partial JSON.
-                    log.warning(
-                        f"[TOOL LOOP] finish_reason={finish_reason} round={round_idx} tool_calls_indexes={list(tool_calls_by_index.keys())}",
-                        tag="GATEWAY",
-                    )
+            finish_reason = choice0.get("finish_reason")
+            if finish_reason in ("tool_calls", "function_call"):
+                # Some upstreams keep streaming tool arguments after emitting finish_reason. We only
+                # finalize tool execution after [DONE] to avoid running with partial JSON.
+                log.warning(
+                    f"[TOOL LOOP] finish_reason={finish_reason} round={round_idx} tool_calls_indexes={list(tool_calls_by_index.keys())}",
+                    tag="GATEWAY",
+                )
 
             # If a finish_reason tool_calls was hit, break out of async-for to run tools.
             if saw_tool_calls and tool_calls_by_index:
@@ -1951,9 +1917,6 @@ async def stream_openai_with_tool_loop(
                 # but further deltas are tool args.
                 pass
 
-            if saw_done:
-                break
-
         if not saw_tool_calls or not tool_calls_by_index:
             return
 
@@ -2991,9 +2954,14 @@ async def check_backend_health(backend_key: str) -> bool:
     if not backend or not backend.get("enabled", True):
         return False
 
+    base_url = get_backend_base_url(backend)
+    if not base_url:
+        return False
+
     try:
-        async with http_client.get_client(timeout=5.0) as client:
-            response = await client.get(f"{backend['base_url']}/models")
+        url = f"{base_url}/models"
+        async with get_backend_client_pool().client(backend_key, url, backend) as client:
+            response = await client.get(url, timeout=5.0)
             return response.status_code == 200
     except Exception as e:
         log.warning(f"Backend {backend_key} health check failed: {e}")
@@ -3342,171 +3310,94 @@ async def _convert_anthropic_stream_to_openai(byte_iterator) -> AsyncIterator[st
     """
     import time
 
-    buffer = ""
     message_id = f"chatcmpl-kiro-{int(time.time())}"
     model = "claude-sonnet-4.5"
+    builder = SSEChunkBuilder(message_id, model)
     current_tool_call_index = -1
     tool_call_id = ""
     tool_call_name = ""
 
-    async for chunk in byte_iterator:
-        if not chunk:
+    async for event in iter_sse_events(byte_iterator):
+        event_type = event.event
+        try:
+            event_data = event.json()
+        except json.JSONDecodeError:
             continue
 
-        buffer += chunk.decode("utf-8", errors="ignore")
-
-        # 解析 SSE 事件
-        while "\n\n" in buffer:
-            event_str, buffer = buffer.split("\n\n", 1)
-            lines = event_str.strip().split("\n")
-
-            event_type = None
-            event_data = None
-
-            for line in lines:
-                if line.startswith("event:"):
-                    event_type = line[6:].strip()
-                elif line.startswith("data:"):
-                    data_str = line[5:].strip()
-                    if data_str:
-                        try:
-                            event_data = json.loads(data_str)
-                        except json.JSONDecodeError:
-                            continue
-
-            if not event_data:
-                continue
+        if not event_data:
+            continue
 
-            # 根据事件类型转换
-            if event_type == "message_start":
-                # 提取消息信息
-                message = event_data.get("message", {})
-                message_id = f"chatcmpl-{message.get('id', 'unknown')}"
-                model = message.get("model", "claude-sonnet-4.5")
-
-                # 发送初始 chunk
-                openai_chunk = {
-                    "id": message_id,
-                    "object": "chat.completion.chunk",
-                    "created": int(time.time()),
-                    "model": model,
-                    "choices": [{
-                        "index": 0,
-                        "delta": {"role": "assistant", "content": ""},
-                        "finish_reason": None
-                    }]
-                }
-                yield f"data: {json.dumps(openai_chunk)}\n\n"
-
-            elif event_type == "content_block_start":
-                content_block = event_data.get("content_block", {})
-                block_type = content_block.get("type", "")
-
-                if block_type == "tool_use":
-                    # 工具调用开始
-                    current_tool_call_index += 1
-                    tool_call_id = content_block.get("id", "")
-                    tool_call_name = content_block.get("name", "")
-
-                    openai_chunk = {
-                        "id": message_id,
-                        "object": "chat.completion.chunk",
-                        "created": int(time.time()),
-                        "model": model,
-                        "choices": [{
-                            "index": 0,
-                            "delta": {
-                                "tool_calls": [{
-                                    "index": current_tool_call_index,
-                                    "id": tool_call_id,
-                                    "type": "function",
-                                    "function": {
-                                        "name": tool_call_name,
-                                        "arguments": ""
-                                    }
-                                }]
-                            },
-                            "finish_reason": None
-                        }]
+        # 根据事件类型转换
+        if event_type == "message_start":
+            # 提取消息信息
+            message = event_data.get("message", {})
+            message_id = f"chatcmpl-{message.get('id', 'unknown')}"
+            model = message.get("model", "claude-sonnet-4.5")
+            builder = SSEChunkBuilder(message_id, model)
+
+            # 发送初始 chunk
+            yield builder.build_delta_chunk({"role": "assistant", "content": ""})
+
+        elif event_type == "content_block_start":
+            content_block = event_data.get("content_block", {})
+            block_type = content_block.get("type", "")
+
+            if block_type == "tool_use":
+                # 工具调用开始
+                current_tool_call_index += 1
+                tool_call_id = content_block.get("id", "")
+                tool_call_name = content_block.get("name", "")
+
+                yield builder.build_tool_calls_chunk([{
+                    "index": current_tool_call_index,
+                    "id": tool_call_id,
+                    "type": "function",
+                    "function": {
+                        "name": tool_call_name,
+                        "arguments": ""
                     }
-                    yield f"data: {json.dumps(openai_chunk)}\n\n"
-
-            elif event_type == "content_block_delta":
-                delta = event_data.get("delta", {})
-                delta_type = delta.get("type", "")
-
-                if delta_type == "text_delta":
-                    # 文本增量
-                    text = delta.get("text", "")
-                    if text:
-                        openai_chunk = {
-                            "id": message_id,
-                            "object": "chat.completion.chunk",
-                            "created": int(time.time()),
-                            "model": model,
-                            "choices": [{
-                                "index": 0,
-                                "delta": {"content": text},
-                                "finish_reason": None
-                            }]
-                        }
-                        yield f"data: {json.dumps(openai_chunk)}\n\n"
-
-                elif delta_type == "input_json_delta":
-                    # 工具调用参数增量
-                    partial_json = delta.get("partial_json", "")
-                    if partial_json:
-                        openai_chunk = {
-                            "id": message_id,
-                            "object": "chat.completion.chunk",
-                            "created": int(time.time()),
-                            "model": model,
-                            "choices": [{
-                                "index": 0,
-                                "delta": {
-                                    "tool_calls": [{
-                                        "index": current_tool_call_index,
-                                        "function": {
-                                            "arguments": partial_json
-                                        }
-                                    }]
-                                },
-                                "finish_reason": None
-                            }]
+                }])
+
+        elif event_type == "content_block_delta":
+            delta = event_data.get("delta", {})
+            delta_type = delta.get("type", "")
+
+            if delta_type == "text_delta":
+                # 文本增量
+                text = delta.get("text", "")
+                if text:
+                    yield builder.build_content_chunk(text)
+
+            elif delta_type == "input_json_delta":
+                # 工具调用参数增量
+                partial_json = delta.get("partial_json", "")
+                if partial_json:
+                    yield builder.build_tool_calls_chunk([{
+                        "index": current_tool_call_index,
+                        "function": {
+                            "arguments": partial_json
                         }
-                        yield f"data: {json.dumps(openai_chunk)}\n\n"
-
-            elif event_type == "message_delta":
-                # 消息增量（包含 stop_reason）
-                delta = event_data.get("delta", {})
-                stop_reason = delta.get("stop_reason")
-
-                if stop_reason:
-                    # 转换 stop_reason
-                    stop_reason_mapping = {
-                        "end_turn": "stop",
-                        "stop_sequence": "stop",
-                        "max_tokens": "length",
-                        "tool_use": "tool_calls"
-                    }
-                    finish_reason = stop_reason_mapping.get(stop_reason, "stop")
-
-                    openai_chunk = {
-                        "id": message_id,
-                        "object": "chat.completion.chunk",
-                        "created": int(time.time()),
-                        "model": model,
-                        "choices": [{
-                            "index": 0,
-                            "delta": {},
-                            "finish_reason": finish_reason
-                        }]
-                    }
-                    yield f"data: {json.dumps(openai_chunk)}\n\n"
+                    }])
+
+        elif event_type == "message_delta":
+            # 消息增量（包含 stop_reason）
+            delta = event_data.get("delta", {})
+            stop_reason = delta.get("stop_reason")
+
+            if stop_reason:
+                # 转换 stop_reason
+                stop_reason_mapping = {
+                    "end_turn": "stop",
+                    "stop_sequence": "stop",
+                    "max_tokens": "length",
+                    "tool_use": "tool_calls"
+                }
+                finish_reason = stop_reason_mapping.get(stop_reason, "stop")
+                yield builder.build_finish_chunk(finish_reason)
 
-            elif event_type == "message_stop":
-                # 消息结束
-                yield "data: [DONE]\n\n"
+        elif event_type == "message_stop":
+            # 消息结束
+            yield "data: [DONE]\n\n"
 
 
 async def proxy_request_to_backend(
@@ -3701,15 +3592,15 @@ async def proxy_request_to_backend(
             if stream:
                 # 流式请求（带超时）
                 return await proxy_streaming_request_with_timeout(
-                    url, method, request_headers, body, timeout, backend_key, endpoint
+                    url, method, request_headers, body, timeout, backend_key, endpoint, backend
                 )
             else:
-                # 非流式请求
-                async with http_client.get_client(timeout=timeout) as client:
+                # 非流式请求：复用该后端的长连接客户端，重试时连接仍是热的
+                async with get_backend_client_pool().client(backend_key, url, backend) as client:
                     if method.upper() == "POST":
-                        response = await client.post(url, json=body, headers=request_headers)
+                        response = await client.post(url, json=body, headers=request_headers, timeout=timeout)
                     elif method.upper() == "GET":
-                        response = await client.get(url, headers=request_headers)
+                        response = await client.get(url, headers=request_headers, timeout=timeout)
                     else:
                         return False, f"Unsupported method: {method}"
 
@@ -3783,6 +3674,7 @@ async def proxy_streaming_request_with_timeout(
     timeout: float,
     backend_key: str = "unknown",
     endpoint: str = "",
+    backend_config: Optional[Dict[str, Any]] = None,
 ) -> Tuple[bool, Any]:
     """
     处理流式代理请求（带超时和错误处理）
@@ -3793,19 +3685,20 @@ async def proxy_streaming_request_with_timeout(
         headers: 请求头
         body: 请求体
         timeout: 超时时间（秒）
-        backend_key: 后端标识（用于日志）
+        backend_key: 后端标识（用于日志和连接池）
+        backend_config: 后端配置（连接池的连接数与 keep-alive 设置）
     """
     try:
         import asyncio
 
-        # 创建带超时的客户端
+        # 按请求设置超时；客户端是该后端的长连接客户端
         timeout_config = httpx.Timeout(
             connect=30.0,      # 连接超时
             read=timeout,      # 读取超时（流式数据）
             write=30.0,        # 写入超时
             pool=30.0,         # 连接池超时
         )
-        client = httpx.AsyncClient(timeout=timeout_config)
+        pool = get_backend_client_pool()
 
         async def stream_generator():
             # 注意：chunk_timeout 检查已移除
@@ -3814,9 +3707,14 @@ async def proxy_streaming_request_with_timeout(
             # 但只要最终收到了数据，就不应该超时。
             # httpx 的 read=timeout 配置已经处理了真正的读取超时。
 
+            failed = False
+            # 在生成器内获取：未被消费的生成器不会占用连接池
+            lease = await pool.acquire(backend_key, url, backend_config)
 
             try:
-                async with client.stream(method, url, json=body, headers=headers) as response:
+                async with lease.client.stream(
+                    method, url, json=body, headers=headers, timeout=timeout_config
+                ) as response:
                     if response.status_code >= 400:
                         error_text = await response.aread()
                         log.warning(f"Streaming request to {backend_key} failed: {response.status_code}")
@@ -3859,6 +3757,7 @@ async def proxy_streaming_request_with_timeout(
                     log.success(f"Streaming completed", tag=backend_key.upper())
 
             except httpx.ReadTimeout:
+                failed = True
                 log.warning(f"Read timeout from {backend_key} after {timeout}s")
                 error_msg = json.dumps({
                     'error': {
@@ -3870,6 +3769,7 @@ async def proxy_streaming_request_with_timeout(
                 })
                 yield f"data: {error_msg}\n\n"
             except httpx.ConnectTimeout:
+                failed = True
                 log.warning(f"Connect timeout to {backend_key}")
                 error_msg = json.dumps({
                     'error': {
@@ -3897,6 +3797,7 @@ async def proxy_streaming_request_with_timeout(
                             return
                 except Exception:
                     pass
+                failed = True
                 log.error(f"Streaming protocol error from {backend_key}: {e}")
                 error_msg = json.dumps({'error': str(e)})
                 yield f"data: {error_msg}\n\n"
@@ -3905,16 +3806,13 @@ async def proxy_streaming_request_with_timeout(
                 # Stop consuming the upstream stream quietly.
                 return
             except Exception as e:
+                failed = True
                 log.error(f"Streaming error from {backend_key}: {e}")
                 error_msg = json.dumps({'error': str(e)})
                 yield f"data: {error_msg}\n\n"
             finally:
-                try:
-                    await safe_close_client(client)
-                except Exception:
-                    # Avoid noisy event-loop "connection_lost" traces on Windows Proactor when the
-                    # peer has already reset the connection.
-                    pass
+                # 只归还连接池，不关闭客户端；未读完的响应已由 stream() 上下文关闭
+                pool.release(lease, failed=failed)
 
         return True, stream_generator()
 
@@ -3934,11 +3832,12 @@ async def proxy_streaming_request(
     try:
         import asyncio
 
-        client = httpx.AsyncClient(timeout=None)
+        pool = get_backend_client_pool()
 
         async def stream_generator():
+            lease = await pool.acquire("default", url)
             try:
-                async with client.stream(method, url, json=body, headers=headers) as response:
+                async with lease.client.stream(method, url, json=body, headers=headers) as response:
                     if response.status_code >= 400:
                         error_text = await response.aread()
                         log.warning(f"Streaming request failed: {response.status_code}")
@@ -3958,10 +3857,7 @@ async def proxy_streaming_request(
             except asyncio.CancelledError:
                 return
             finally:
-                try:
-                    await safe_close_client(client)
-                except Exception:
-                    pass
+                pool.release(lease)
 
         return True, stream_generator()
 
@@ -4193,8 +4089,16 @@ async def route_request_with_fallback(
 @router.get("/v1/models")
 @router.get("/models")  # 别名路由，兼容不同客户端配置
 async def list_models(request: Request):
-    """获取所有后端的模型列表（合并去重）"""
+    """获取所有后端的模型列表（合并去重，带缓存与 ETag）"""
     log.debug(f"Models request received", tag="GATEWAY")
+    content = await get_models_cache().get(
+        "gateway:models", _fetch_gateway_models, is_valid=lambda result: bool(result["data"])
+    )
+    return etag_json_response(request, content)
+
+
+async def _fetch_gateway_models() -> Dict[str, Any]:
+    """从所有后端获取模型列表（合并去重）"""
     all_models = set()
 
     for backend_key, backend_config in get_sorted_backends():
@@ -4205,10 +4109,12 @@ async def list_models(request: Request):
                 log.debug(f"Skipping {backend_key}: no base_url configured", tag="GATEWAY")
                 continue
 
-            async with http_client.get_client(timeout=10.0) as client:
+            url = f"{base_url}/models"
+            async with get_backend_client_pool().client(backend_key, url, backend_config) as client:
                 response = await client.get(
-                    f"{base_url}/models",
-                    headers={"Authorization": "Bearer dummy"}
+                    url,
+                    headers={"Authorization": "Bearer dummy"},
+                    timeout=10.0,
                 )
                 if response.status_code == 200:
                     data = response.json()
@@ -4229,8 +4135,14 @@ async def list_models(request: Request):
 @router.get("/usage/api/get-models")  # Augment Code 兼容路由 - 返回对象数组
 @router.get("/v1/usage/api/get-models")  # Augment Code 兼容路由（带版本号）- 返回对象数组
 async def list_models_for_augment(request: Request):
-    """获取所有后端的模型列表（合并去重）- Augment Code 格式（对象数组）"""
+    """获取所有后端的模型列表（合并去重）- Augment Code 格式（对象数组，带缓存与 ETag）"""
     log.debug(f"Augment models request received from {request.url.path}", tag="GATEWAY")
+    model_list = await get_models_cache().get("gateway:augment-models", _fetch_augment_models, is_valid=bool)
+    return etag_json_response(request, model_list)
+
+
+async def _fetch_augment_models() -> List[Dict[str, Any]]:
+    """从所有后端获取模型列表（合并去重）- Augment Code 格式"""
     # 使用字典存储模型信息，key 是 model_id，value 是完整的模型对象
     all_models_dict = {}
 
@@ -4242,10 +4154,12 @@ async def list_models_for_augment(request: Request):
                 log.debug(f"Skipping {backend_key}: no base_url configured", tag="GATEWAY")
                 continue
 
-            async with http_client.get_client(timeout=10.0) as client:
+            url = f"{base_url}/models"
+            async with get_backend_client_pool().client(backend_key, url, backend_config) as client:
                 response = await client.get(
-                    f"{base_url}/models",
-                    headers={"Authorization": "Bearer dummy"}
+                    url,
+                    headers={"Authorization": "Bearer dummy"},
+                    timeout=10.0,
                 )
                 if response.status_code == 200:
                     data = response.json()
@@ -4351,7 +4265,7 @@ def _build_bugment_get_models_result() -> Dict[str, Any]:
 async def get_models_for_bugment(request: Request, token: str = Depends(authenticate_bearer_allow_local_dummy)):
     """Bugment/VSCode: returns BackGetModelsResult (POST /get-models)."""
     log.debug(f"Bugment get-models request received from {request.url.path}", tag="GATEWAY")
-    return _build_bugment_get_models_result()
+    return etag_json_response(request, _build_bugment_get_models_result())
 
 
 @router.post("/bugment/conversation/set-model")
@@ -4529,10 +4443,12 @@ async def _wrap_stream_with_writeback(
     stream_completed = False
     has_error = False
     has_text_content = False  # 标记是否有文本内容
+    chunks_sent = 0
 
     try:
         async for chunk in stream:
             yield chunk
+            chunks_sent += 1
 
             # 尝试解析 chunk 提取内容
             try:
@@ -4598,7 +4514,15 @@ async def _wrap_stream_with_writeback(
             except Exception:
                 pass  # 解析失败不影响流传输
 
+    except (asyncio.CancelledError, GeneratorExit):
+        # 客户端断开：不回写不完整的消息
+        record_partial_usage("GATEWAY", chunks_sent=chunks_sent)
+        raise
+
     finally:
+        # 停在 yield 上被关闭时，上游流不会自行结束，需要显式关闭
+        await close_stream(stream)
+
         # 流结束后执行回写（只在成功完成时）
         if stream_completed and not has_error and scid and state_manager:
             try:
@@ -4987,7 +4911,7 @@ async def chat_completions(
                 result, scid, state_manager, body.get("messages", [])
             )
 
-        return StreamingResponse(
+        return CancellableStreamingResponse(
             result,
             media_type="text/event-stream",
             headers={
@@ -5025,106 +4949,75 @@ async def convert_sse_to_augment_ndjson(sse_stream: AsyncGenerator) -> AsyncGene
     Yields:
         Augment NDJSON 格式的字符串（每行一个 {"text": "..."} 对象）
     """
-    buffer = ""
-    
-    async for chunk in sse_stream:
-        if not chunk:
-            continue
+    async for event in iter_sse_events(sse_stream):
+        # 提取 JSON 数据
+        json_str = event.data.strip()
         
-        # 处理字节类型，转换为字符串
-        if isinstance(chunk, bytes):
-            chunk = chunk.decode("utf-8", errors="ignore")
-        elif not isinstance(chunk, str):
-            chunk = str(chunk)
-            
-        # 将 chunk 添加到缓冲区
-        buffer += chunk
+        # 跳过 [DONE] 标记
+        if json_str == "[DONE]":
+            continue
         
-        # 按行处理缓冲区（SSE 格式以 \n\n 分隔事件）
-        while "\n" in buffer:
-            line, buffer = buffer.split("\n", 1)
-            line = line.strip()
-            
-            # 跳过空行
-            if not line:
-                continue
+        # 验证是否是有效的 JSON
+        try:
+            # 解析 OpenAI 格式的 JSON
+            json_obj = json.loads(json_str)
             
-            # 检查是否是 SSE 格式的 data: 行
-            if line.startswith("data: "):
-                # 提取 JSON 数据
-                json_str = line[6:].strip()  # 移除 "data: " 前缀
+            # 提取 content 字段转换为 Augment 格式
+            # OpenAI: {"choices":[{"delta":{"content":"xxx"}}]}
+            # Augment: {"text":"xxx"}
+            if "choices" in json_obj and len(json_obj["choices"]) > 0:
+                choice = json_obj["choices"][0]
                 
-                # 跳过 [DONE] 标记
-                if json_str == "[DONE]":
-                    continue
+                # 处理流式响应的 delta
+                if "delta" in choice:
+                    delta = choice["delta"]
+
+                    # NOTE:
+                    # When upstream chooses to call tools, OpenAI streaming returns `delta.tool_calls`
+                    # (often with no `delta.content`). If we drop these deltas, the VSCode client will
+                    # look like it "ended immediately" when a tool is attempted.
+                    tool_calls = delta.get("tool_calls") if isinstance(delta, dict) else None
+                    if isinstance(tool_calls, list) and tool_calls:
+                        try:
+                            log.warning(
+                                f"[TOOL CALL] Upstream returned tool_calls (count={len(tool_calls)}), "
+                                f"first={json.dumps(tool_calls[0], ensure_ascii=False)[:500]}",
+                                tag="GATEWAY",
+                            )
+                        except Exception:
+                            log.warning("[TOOL CALL] Upstream returned tool_calls (unable to dump)", tag="GATEWAY")
+
+                        # Emit a visible message so the user isn't left with an empty response.
+                        augment_obj = {
+                            "text": (
+                                "\n[Gateway] 上游模型触发了工具调用(tool_calls)，但当前网关尚未实现将 tool_calls "
+                                "转换/执行为 Augment 工具链的逻辑，因此工具步骤无法继续。"
+                            )
+                        }
+                        yield json.dumps(augment_obj, separators=(',', ':'), ensure_ascii=False) + "\n"
+
+                    if "content" in delta and delta["content"] is not None:
+                        augment_obj = {"text": delta["content"]}
+                        yield json.dumps(augment_obj, separators=(',', ':'), ensure_ascii=False) + "\n"
                 
-                # 验证是否是有效的 JSON
-                try:
-                    # 解析 OpenAI 格式的 JSON
-                    json_obj = json.loads(json_str)
-                    
-                    # 提取 content 字段转换为 Augment 格式
-                    # OpenAI: {"choices":[{"delta":{"content":"xxx"}}]}
-                    # Augment: {"text":"xxx"}
-                    if "choices" in json_obj and len(json_obj["choices"]) > 0:
-                        choice = json_obj["choices"][0]
-                        
-                        # 处理流式响应的 delta
-                        if "delta" in choice:
-                            delta = choice["delta"]
-
-                            # NOTE:
-                            # When upstream chooses to call tools, OpenAI streaming returns `delta.tool_calls`
-                            # (often with no `delta.content`). If we drop these deltas, the VSCode client will
-                            # look like it "ended immediately" when a tool is attempted.
-                            tool_calls = delta.get("tool_calls") if isinstance(delta, dict) else None
-                            if isinstance(tool_calls, list) and tool_calls:
-                                try:
-                                    log.warning(
-                                        f"[TOOL CALL] Upstream returned tool_calls (count={len(tool_calls)}), "
-                                        f"first={json.dumps(tool_calls[0], ensure_ascii=False)[:500]}",
-                                        tag="GATEWAY",
-                                    )
-                                except Exception:
-                                    log.warning("[TOOL CALL] Upstream returned tool_calls (unable to dump)", tag="GATEWAY")
-
-                                # Emit a visible message so the user isn't left with an empty response.
-                                augment_obj = {
-                                    "text": (
-                                        "\n[Gateway] 上游模型触发了工具调用(tool_calls)，但当前网关尚未实现将 tool_calls "
-                                        "转换/执行为 Augment 工具链的逻辑，因此工具步骤无法继续。"
-                                    )
-                                }
-                                yield json.dumps(augment_obj, separators=(',', ':'), ensure_ascii=False) + "\n"
-
-                            if "content" in delta and delta["content"] is not None:
-                                augment_obj = {"text": delta["content"]}
-                                yield json.dumps(augment_obj, separators=(',', ':'), ensure_ascii=False) + "\n"
-                        
-                        # 处理完整响应的 message
-                        elif "message" in choice:
-                            message = choice["message"]
-                            if "content" in message and message["content"] is not None:
-                                augment_obj = {"text": message["content"]}
-                                yield json.dumps(augment_obj, separators=(',', ':'), ensure_ascii=False) + "\n"
-                        
-                        # 处理 finish_reason
-                        if "finish_reason" in choice and choice["finish_reason"] is not None:
-                            # Augment 不需要 finish_reason，跳过
-                            if choice["finish_reason"] in ("tool_calls", "function_call"):
-                                log.warning(f"[TOOL CALL] finish_reason={choice['finish_reason']}", tag="GATEWAY")
-                            continue
-                    
-                except json.JSONDecodeError:
-                    # 如果不是有效的 JSON，记录警告但继续处理
-                    log.warning(f"Invalid JSON in SSE stream: {json_str[:100]}")
+                # 处理完整响应的 message
+                elif "message" in choice:
+                    message = choice["message"]
+                    if "content" in message and message["content"] is not None:
+                        augment_obj = {"text": message["content"]}
+                        yield json.dumps(augment_obj, separators=(',', ':'), ensure_ascii=False) + "\n"
+                
+                # 处理 finish_reason
+                if "finish_reason" in choice and choice["finish_reason"] is not None:
+                    # Augment 不需要 finish_reason，跳过
+                    if choice["finish_reason"] in ("tool_calls", "function_call"):
+                        log.warning(f"[TOOL CALL] finish_reason={choice['finish_reason']}", tag="GATEWAY")
                     continue
-            elif line.startswith(":"):
-                # SSE 注释行，跳过
-                continue
-            elif line.startswith("event:") or line.startswith("id:") or line.startswith("retry:"):
-                # 其他 SSE 字段，跳过
-                continue
+            
+        except json.JSONDecodeError:
+            # 如果不是有效的 JSON，记录警告但继续处理
+            log.warning(f"Invalid JSON in SSE stream: {json_str[:100]}")
+            continue
 
 
 @router.post("/chat-stream")
@@ -5350,7 +5243,7 @@ async def chat_stream(
         else:
             # Legacy fallback (server-side tool loop; client will not see TOOL_USE nodes)
             ndjson_stream = stream_openai_with_tool_loop(headers=headers, body=body, model=model)
-        return StreamingResponse(
+        return CancellableStreamingResponse(
             ndjson_stream,
             media_type="application/x-ndjson",
             headers={
@@ -5551,7 +5444,7 @@ async def anthropic_messages(
     )
 
     if stream and hasattr(result, "__anext__"):
-        return StreamingResponse(
+        return CancellableStreamingResponse(
             result,
             media_type="text/event-stream",
             headers={
@@ -5622,15 +5515,17 @@ async def anthropic_messages_count_tokens(
 async def gateway_health():
     """网关健康检查 - 返回所有后端状态"""
     backend_status = {}
+    pool = get_backend_client_pool()
 
     for backend_key, backend_config in BACKENDS.items():
         is_healthy = await check_backend_health(backend_key)
         backend_status[backend_key] = {
             "name": backend_config["name"],
-            "url": backend_config["base_url"],
+            "url": get_backend_base_url(backend_config),
             "priority": backend_config["priority"],
             "enabled": backend_config.get("enabled", True),
             "healthy": is_healthy,
+            "pool": pool.get_stats(backend_key),
         }
 
     all_healthy = any(s["healthy"] for s in backend_status.values())
@@ -5677,7 +5572,7 @@ async def augment_list_models(request: Request):
 async def augment_get_models_for_bugment(request: Request, token: str = Depends(authenticate_bearer_allow_local_dummy)):
     """Bugment/VSCode: returns BackGetModelsResult (POST /get-models) without /gateway prefix."""
     log.debug(f"Bugment get-models request received from {request.url.path}", tag="GATEWAY")
-    return _build_bugment_get_models_result()
+    return etag_json_response(request, _build_bugment_get_models_result())
 
 
 @augment_router.post("/bugment/conversation/set-model")
@@ -2209,6 +2209,10 @@ async def get_protection_status(token: str = Depends(verify_panel_token)):
     - background_refresh: 后台刷新状态
     - quota_protection: 配额保护状态
     - smart_warmup: 智能预热状态
+    - token_refresher: Token 预刷新统计
+    - antigravity_permits: antigravity 上游并发额度统计
+    - connection_prewarm: 连接预热统计
+    - antigravity_hedging: 对冲请求统计
     """
     try:
         from config import (
@@ -2220,6 +2224,9 @@ async def get_protection_status(token: str = Depends(verify_panel_token)):
             get_smart_warmup_enabled,
             get_warmup_models
         )
+        from .concurrency_permits import get_antigravity_permit_manager
+        from .connection_prewarmer import get_connection_prewarmer
+        from .request_hedging import get_hedge_stats, is_hedging_enabled
         
         status = {
             "background_refresh": {
@@ -2234,7 +2241,15 @@ async def get_protection_status(token: str = Depends(verify_panel_token)):
             "smart_warmup": {
                 "enabled": await get_smart_warmup_enabled(),
                 "monitored_models": await get_warmup_models()
-            }
+            },
+            "token_refresher": (
+                credential_manager._token_refresher.get_stats()
+                if credential_manager._token_refresher
+                else {"enabled": False}
+            ),
+            "antigravity_permits": get_antigravity_permit_manager().get_stats(),
+            "connection_prewarm": get_connection_prewarmer().get_stats(),
+            "antigravity_hedging": {"enabled": is_hedging_enabled(), **get_hedge_stats().to_dict()},
         }
         
         return JSONResponse(content={
@@ -2249,6 +2264,32 @@ async def get_protection_status(token: str = Depends(verify_panel_token)):
         )
 
 
+@router.get("/protection/baseurl-latency")
+async def get_baseurl_latency(token: str = Depends(verify_panel_token)):
+    """
+    获取 antigravity 各 BaseURL 的延迟统计
+
+    返回:
+    - urls: 每个 URL 的健康度、成功/失败次数、TTFB 与总耗时的 EWMA 和 p50/p95/p99、错误率、期望延迟
+    - order: 当前按期望延迟排序后的 URL 顺序
+    """
+    try:
+        from config import get_antigravity_fallback_urls
+        from .antigravity_api import get_baseurl_health_manager
+
+        urls = await get_antigravity_fallback_urls()
+        return JSONResponse(content={
+            "success": True,
+            "data": get_baseurl_health_manager().get_stats(urls)
+        })
+    except Exception as e:
+        log.error(f"获取 BaseURL 延迟统计失败: {e}")
+        return JSONResponse(
+            status_code=500,
+            content={"success": False, "error": str(e)}
+        )
+
+
 @router.post("/protection/refresh-quotas")
 async def trigger_refresh_quotas(token: str = Depends(verify_panel_token)):
     """
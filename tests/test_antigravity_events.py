@@ -0,0 +1,146 @@
+"""
+Antigravity 流式事件管线测试
+
+- 每行上游 SSE 在过滤 + 转换全流程中只 json.loads 一次
+- 思维链过滤直接修改事件，未修改的事件保留原始行
+- 转换器同时接受事件与原始行
+- SSOP 增量扫描只检查新增文本
+"""
+
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import src.antigravity_events as antigravity_events
+from src.anthropic_streaming import antigravity_sse_to_anthropic_sse
+from src.antigravity_api import _filter_thinking_from_stream
+from src.antigravity_events import AntigravityEvent
+from src.antigravity_router import convert_antigravity_stream_to_gemini, convert_antigravity_stream_to_openai
+from src.ssop import SSOPScanner
+
+
+def _line(parts, output_tokens=1) -> str:
+    data = {
+        "response": {
+            "candidates": [{"content": {"role": "model", "parts": parts}}],
+            "usageMetadata": {"promptTokenCount": 10, "candidatesTokenCount": output_tokens},
+        }
+    }
+    return f"data: {json.dumps(data)}"
+
+
+_UPSTREAM = [
+    _line([{"text": "hmm", "thought": True}]).encode(),
+    b"",
+    _line([{"text": "thinking", "thought": True}, {"text": "Hello"}], 2).encode(),
+    b"",
+    _line([{"text": " world"}], 3),
+    "data: [DONE]",
+]
+
+
+async def _aiter(items):
+    for item in items:
+        yield item
+
+
+class _NullCtx:
+    async def __aexit__(self, *args):
+        return None
+
+
+@pytest.fixture
+def loads_counter(monkeypatch):
+    calls = []
+    real_loads = antigravity_events.json_codec.loads
+
+    def counting_loads(raw):
+        calls.append(raw)
+        return real_loads(raw)
+
+    monkeypatch.setattr(antigravity_events.json_codec, "loads", counting_loads)
+    return calls
+
+
+def _converters():
+    return {
+        "openai": lambda lines: convert_antigravity_stream_to_openai(
+            lines, _NullCtx(), None, "gemini-2.5-pro", "chatcmpl-1", None, None
+        ),
+        "gemini": lambda lines: convert_antigravity_stream_to_gemini(lines, _NullCtx(), None, None, None),
+        "anthropic": lambda lines: antigravity_sse_to_anthropic_sse(lines, model="gemini-2.5-pro", message_id="msg_1"),
+    }
+
+
+async def _collect(stream) -> str:
+    out = []
+    async for chunk in stream:
+        out.append(chunk.decode() if isinstance(chunk, bytes) else chunk)
+    return "".join(out)
+
+
+class TestFilterStage:
+
+    async def test_thought_parts_are_filtered_in_place(self):
+        events = [e async for e in _filter_thinking_from_stream(_aiter(_UPSTREAM), return_thoughts=False)]
+        data_events = [e for e in events if e.data is not None]
+
+        # 只有思维链的行被整体丢弃；混合行只保留正文
+        assert [e.parts for e in data_events] == [[{"text": "Hello"}], [{"text": " world"}]]
+        assert json.loads(data_events[0].to_line()[6:])["response"]["candidates"][0]["content"]["parts"] == [
+            {"text": "Hello"}
+        ]
+        # 未修改的事件直接返回原始行
+        assert data_events[1].to_line() == _UPSTREAM[4]
+        assert events[-1].is_done
+
+    async def test_return_thoughts_keeps_all_parts(self):
+        events = [e async for e in _filter_thinking_from_stream(_aiter(_UPSTREAM), return_thoughts=True)]
+        assert sum(1 for e in events if e.data is not None) == 3
+
+    def test_unparsable_data_line(self):
+        event = AntigravityEvent.parse(b"data: {not json")
+        assert event.is_data and event.data is None
+        assert event.parts == [] and event.usage_metadata == {}
+
+
+class TestSingleParse:
+
+    @pytest.mark.parametrize("name", ["openai", "gemini", "anthropic"])
+    async def test_each_line_parsed_once(self, name, loads_counter):
+        convert = _converters()[name]
+        output = await _collect(convert(_filter_thinking_from_stream(_aiter(_UPSTREAM), return_thoughts=False)))
+
+        assert len(loads_counter) == 3
+        assert "Hello" in output and " world" in output
+        assert "thinking" not in output
+
+    @pytest.mark.parametrize("name", ["openai", "gemini", "anthropic"])
+    async def test_converters_accept_raw_lines(self, name):
+        convert = _converters()[name]
+        output = await _collect(convert(_aiter(_UPSTREAM)))
+        assert "Hello" in output and " world" in output
+
+
+class TestSSOPScanner:
+
+    def test_split_tool_call_detected_once(self):
+        scanner = SSOPScanner()
+        text = 'Sure: {"name": "read_file", "arguments": {"path": "a.py"}} done {"x": 1}'
+        results = [scanner.scan(text[i:i + 7]) for i in range(0, len(text), 7)]
+        tool_calls = [r for r in results if r is not None]
+
+        assert len(tool_calls) == 1
+        assert tool_calls[0]["function"]["name"] == "read_file"
+        assert scanner.scan(" again") is None
+
+    def test_two_calls_in_one_chunk_are_returned_in_order(self):
+        scanner = SSOPScanner()
+        text = '{"name": "a", "arguments": {"n": 1}} {"name": "b", "arguments": {"n": 2}}'
+        assert scanner.scan(text)["function"]["name"] == "a"
+        assert scanner.scan("")["function"]["name"] == "b"
+        assert scanner.scan("") is None
@@ -0,0 +1,150 @@
+"""
+PermitManager 单元测试
+
+- 每个凭证独立的并发额度，凭证之间互不阻塞
+- 全局上限与可选的每模型额度
+- 等待期间被取消时回滚已获取的额度，空闲键被回收
+- try_acquire 在任意一层额度已满时立即返回 None
+- 凭证选择优先使用还有空闲额度的凭证
+"""
+
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.concurrency_permits import PermitManager
+from src.storage.sqlite_manager import SQLiteManager
+
+
+async def _is_blocked(coro) -> bool:
+    task = asyncio.create_task(coro)
+    await asyncio.sleep(0.01)
+    blocked = not task.done()
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+    return blocked
+
+
+class TestPermitManager:
+
+    async def test_per_credential_limit_is_independent(self):
+        manager = PermitManager(per_credential=2, global_limit=32)
+        handles = [await manager.acquire("a.json"), await manager.acquire("a.json")]
+
+        assert not manager.has_free_permit("a.json")
+        assert manager.has_free_permit("b.json")
+        assert await _is_blocked(manager.acquire("a.json"))
+        # 其他凭证不受影响
+        other = await asyncio.wait_for(manager.acquire("b.json"), timeout=0.1)
+
+        for handle in handles + [other]:
+            manager.release(handle)
+        assert manager.in_flight == 0
+        assert manager.get_stats()["active_credentials"] == 0
+
+    async def test_global_ceiling(self):
+        manager = PermitManager(per_credential=4, global_limit=2)
+        first = await manager.acquire("a.json")
+        second = await manager.acquire("b.json")
+
+        waiter = asyncio.create_task(manager.acquire("c.json"))
+        await asyncio.sleep(0.01)
+        assert not waiter.done()
+
+        manager.release(first)
+        third = await asyncio.wait_for(waiter, timeout=0.1)
+        assert manager.in_flight == 2
+
+        manager.release(second)
+        manager.release(third)
+        assert manager.get_stats()["global_waits"] == 1
+
+    async def test_per_model_limit(self):
+        manager = PermitManager(per_credential=4, per_model=1, global_limit=32)
+        handle = await manager.acquire("a.json", "claude-sonnet")
+
+        assert await _is_blocked(manager.acquire("b.json", "claude-sonnet"))
+        other = await asyncio.wait_for(manager.acquire("b.json", "gemini-flash"), timeout=0.1)
+
+        manager.release(handle)
+        manager.release(other)
+        assert manager.get_stats()["active_models"] == 0
+
+    async def test_cancelled_acquire_rolls_back(self):
+        manager = PermitManager(per_credential=2, global_limit=1)
+        holder = await manager.acquire("a.json")
+
+        # 已拿到凭证额度、卡在全局上限时被取消：凭证额度必须归还
+        waiter = asyncio.create_task(manager.acquire("b.json"))
+        await asyncio.sleep(0.01)
+        assert manager._credentials.in_flight("b.json") == 1
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+
+        assert manager._credentials.in_flight("b.json") == 0
+        assert manager.get_stats()["active_credentials"] == 1
+        assert manager.stats.total_cancelled == 1
+
+        manager.release(holder)
+        handle = await asyncio.wait_for(manager.acquire("b.json"), timeout=0.1)
+        manager.release(handle)
+        assert manager.in_flight == 0
+
+    async def test_try_acquire_never_waits(self):
+        manager = PermitManager(per_credential=1, global_limit=2)
+        handle = await manager.try_acquire("a.json")
+        assert handle is not None
+
+        # 凭证额度已满：立即返回 None，不排队
+        assert await manager.try_acquire("a.json") is None
+        other = await manager.try_acquire("b.json")
+        # 全局额度已满
+        assert await manager.try_acquire("c.json") is None
+
+        manager.release(handle)
+        manager.release(other)
+        assert manager.in_flight == 0
+        assert manager.get_stats()["global_waits"] == 0
+
+
+class TestPreferFreePermit:
+
+    @pytest.fixture
+    async def storage(self, tmp_path, monkeypatch):
+        monkeypatch.setenv("CREDENTIALS_DIR", str(tmp_path))
+        storage = SQLiteManager()
+        await storage.initialize()
+        yield storage
+        await storage.close()
+
+    async def test_selection_skips_busy_credential(self, storage):
+        for name in ("a.json", "b.json"):
+            await storage.store_credential(name, {"access_token": name})
+
+        manager = PermitManager(per_credential=1)
+        handle = await manager.acquire("a.json")
+
+        picks = []
+        for _ in range(40):
+            filename, _ = await storage.get_next_available_credential(
+                model_key="pro", prefer=manager.has_free_permit
+            )
+            picks.append(filename)
+        # 抽中已满的 a.json 时重新抽取，4 次都抽中 a.json 的概率只有 1/16
+        assert picks.count("b.json") >= 30
+
+        # 所有凭证都已满时仍然返回结果
+        busy = await manager.acquire("b.json")
+        filename, _ = await storage.get_next_available_credential(prefer=manager.has_free_permit)
+        assert filename in ("a.json", "b.json")
+
+        manager.release(handle)
+        manager.release(busy)
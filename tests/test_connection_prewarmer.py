@@ -0,0 +1,154 @@
+"""
+ConnectionPrewarmer 测试
+
+- 每个目标保持 N 条热连接，后续保活复用而不是新建
+- 服务端断开连接后，下一轮保活重新建立
+- 共享客户端目标的失败计入统计；保活间隔带抖动
+"""
+
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import src.gateway.backend_pool as backend_pool
+import src.httpx_client as httpx_client
+from src.connection_prewarmer import ConnectionPrewarmer, WarmTarget
+
+
+class _Server:
+    """本地 keep-alive 服务器，可主动断开所有连接"""
+
+    def __init__(self):
+        self.connections = 0
+        self.server = None
+        self._writers = set()
+
+    async def start(self) -> str:
+        self.server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        return f"http://127.0.0.1:{self.server.sockets[0].getsockname()[1]}"
+
+    def drop_all(self) -> None:
+        for writer in list(self._writers):
+            writer.close()
+
+    async def stop(self) -> None:
+        self.server.close()
+        self.drop_all()
+        await self.server.wait_closed()
+
+    async def _handle(self, reader, writer):
+        self.connections += 1
+        self._writers.add(writer)
+        try:
+            while True:
+                await reader.readuntil(b"\r\n\r\n")
+                # 稍作停顿，让同一轮的并发保活请求各自占用一条连接
+                await asyncio.sleep(0.02)
+                writer.write(b"HTTP/1.1 200 OK\r\nContent-Length: 0\r\n\r\n")
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+
+@pytest.fixture
+async def server():
+    srv = _Server()
+    srv.url = await srv.start()
+    yield srv
+    await srv.stop()
+
+
+@pytest.fixture
+async def pool(monkeypatch):
+    pool = backend_pool.BackendClientPool()
+    monkeypatch.setattr(backend_pool, "_backend_client_pool", pool)
+    yield pool
+    await pool.close_all()
+
+
+class TestConnectionPrewarmer:
+
+    async def test_keeps_connections_warm_and_reopens(self, server, pool):
+        prewarmer = ConnectionPrewarmer(connections=3)
+        target = WarmTarget(name="gateway:kiro", url=server.url, backend_key="kiro")
+
+        await prewarmer.warm_once([target])
+        assert server.connections == 3
+        await prewarmer.warm_once([target])
+        # 热连接被复用
+        assert server.connections == 3
+
+        server.drop_all()
+        await asyncio.sleep(0.05)
+        await prewarmer.warm_once([target])
+        assert server.connections == 6
+
+        stats = prewarmer.get_stats()["targets"]["gateway:kiro"]
+        assert stats["pings"] == 9
+        assert stats["failures"] == 0
+        assert stats["open_connections"] == 3
+        assert prewarmer.rounds == 3
+        await pool.close_all()
+
+    async def test_remote_backend_warms_streaming_client(self, server, pool, monkeypatch):
+        async def no_proxy(url):
+            return None
+
+        def no_shared_client():
+            raise AssertionError("remote backends must warm the per-backend client used for streaming")
+
+        # 视为远程后端（Copilot / AnyRouter 等）：网关流式转发走 acquire() 得到的客户端
+        monkeypatch.setattr(backend_pool, "_is_loopback", lambda url: False)
+        monkeypatch.setattr(backend_pool, "_resolve_proxy", no_proxy)
+        monkeypatch.setattr(httpx_client.http_client, "get_client", no_shared_client)
+
+        prewarmer = ConnectionPrewarmer(connections=2)
+        target = WarmTarget(name="gateway:copilot", url=server.url, backend_key="copilot")
+        await prewarmer.warm_once([target])
+
+        stats = prewarmer.get_stats()["targets"]["gateway:copilot"]
+        assert stats["failures"] == 0
+        assert stats["connections_opened"] == 2
+        assert stats["open_connections"] == 2
+        assert server.connections == 2
+        assert pool.get_stats("copilot")["in_flight"] == 0
+
+    async def test_shared_client_target_records_failures(self, server, monkeypatch):
+        async def no_proxy():
+            return None
+
+        manager = httpx_client.HttpxClientManager()
+        manager._use_curl_cffi = False
+        monkeypatch.setattr(httpx_client, "get_proxy_config", no_proxy)
+        monkeypatch.setattr(httpx_client, "http_client", manager)
+
+        closed = await asyncio.start_server(lambda r, w: None, "127.0.0.1", 0)
+        closed_url = f"http://127.0.0.1:{closed.sockets[0].getsockname()[1]}"
+        closed.close()
+        await closed.wait_closed()
+
+        prewarmer = ConnectionPrewarmer(connections=2, timeout=1.0)
+        await prewarmer.warm_once([
+            WarmTarget(name="antigravity:ok", url=server.url),
+            WarmTarget(name="antigravity:down", url=closed_url),
+        ])
+
+        stats = prewarmer.get_stats()["targets"]
+        assert stats["antigravity:ok"]["failures"] == 0
+        assert stats["antigravity:down"]["failures"] == 2
+        assert stats["antigravity:down"]["last_error"]
+        assert server.connections == 2
+        await manager.close_all()
+
+    def test_jittered_interval(self):
+        prewarmer = ConnectionPrewarmer(interval=20.0, jitter=0.2)
+        delays = [prewarmer.next_delay() for _ in range(200)]
+        assert all(16.0 <= d <= 24.0 for d in delays)
+        assert len(set(delays)) > 1
@@ -0,0 +1,119 @@
+"""
+CredentialManager 并发行为测试
+
+- 凭证选择不持有全局锁，慢 Token 刷新不阻塞其他账号
+- 同一凭证的并发刷新合并为一次（single-flight）
+"""
+
+import asyncio
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.credential_manager import CredentialManager
+
+FRESH = "2099-01-01T00:00:00+00:00"
+
+
+class _FakeBackend:
+    """按顺序返回预设凭证的最小后端"""
+
+    def __init__(self, picks):
+        self._picks = list(picks)
+        self.stored = {}
+
+    async def get_next_available_credential(self, is_antigravity=False, model_key=None):
+        filename, data = self._picks.pop(0)
+        return filename, dict(data)
+
+    async def store_credential(self, filename, credential_data, is_antigravity=False):
+        self.stored[filename] = dict(credential_data)
+        return True
+
+
+def _make_manager(backend) -> CredentialManager:
+    manager = CredentialManager()
+    manager._storage_adapter = SimpleNamespace(_backend=backend)
+    manager._initialized = True
+    return manager
+
+
+class TestSingleFlightRefresh:
+
+    async def test_concurrent_requests_share_one_refresh(self):
+        stale = {"access_token": "old", "refresh_token": "r", "expiry": "2000-01-01T00:00:00+00:00"}
+        backend = _FakeBackend([("a.json", stale)] * 5)
+        manager = _make_manager(backend)
+
+        calls = 0
+        release = asyncio.Event()
+
+        async def fake_refresh(credential_data, filename, is_antigravity=False):
+            nonlocal calls
+            calls += 1
+            await release.wait()
+            return {**credential_data, "access_token": "new", "expiry": FRESH}
+
+        manager._refresh_token = fake_refresh
+
+        tasks = [asyncio.create_task(manager.get_valid_credential()) for _ in range(5)]
+        await asyncio.sleep(0.01)
+        release.set()
+        results = await asyncio.gather(*tasks)
+
+        assert calls == 1
+        assert all(r == ("a.json", {**stale, "access_token": "new", "expiry": FRESH}) for r in results)
+        # 每个调用方拿到的是独立副本
+        assert len({id(r[1]) for r in results}) == 5
+        assert manager._refresh_tasks == {}
+
+    async def test_slow_refresh_does_not_block_other_credentials(self):
+        stale = {"access_token": "old", "refresh_token": "r", "expiry": "2000-01-01T00:00:00+00:00"}
+        fresh = {"access_token": "ok", "refresh_token": "r", "expiry": FRESH}
+        backend = _FakeBackend([("slow.json", stale), ("fast.json", fresh)])
+        manager = _make_manager(backend)
+
+        release = asyncio.Event()
+
+        async def fake_refresh(credential_data, filename, is_antigravity=False):
+            await release.wait()
+            return {**credential_data, "expiry": FRESH}
+
+        manager._refresh_token = fake_refresh
+
+        slow = asyncio.create_task(manager.get_valid_credential())
+        await asyncio.sleep(0.01)
+
+        fast = await asyncio.wait_for(manager.get_valid_credential(), timeout=1.0)
+        assert fast[0] == "fast.json"
+        assert not slow.done()
+
+        release.set()
+        assert (await slow)[0] == "slow.json"
+
+    async def test_cancelled_waiter_does_not_cancel_shared_refresh(self):
+        stale = {"access_token": "old", "refresh_token": "r", "expiry": "2000-01-01T00:00:00+00:00"}
+        backend = _FakeBackend([("a.json", stale)] * 2)
+        manager = _make_manager(backend)
+
+        release = asyncio.Event()
+
+        async def fake_refresh(credential_data, filename, is_antigravity=False):
+            await release.wait()
+            return {**credential_data, "expiry": FRESH}
+
+        manager._refresh_token = fake_refresh
+
+        first = asyncio.create_task(manager.get_valid_credential())
+        second = asyncio.create_task(manager.get_valid_credential())
+        await asyncio.sleep(0.01)
+        first.cancel()
+        release.set()
+
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        assert (await second)[1]["expiry"] == FRESH
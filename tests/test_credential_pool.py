@@ -0,0 +1,245 @@
+"""
+CredentialPool 单元测试
+
+测试内存凭证池：
+- 权重树（Fenwick Tree）加权随机选择
+- 模型级冷却堆
+- 与 SQLiteManager 写入方法的同步
+"""
+
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.storage.credential_pool import CredentialPool, _WeightTree
+
+
+def _make_pool(n: int = 5) -> CredentialPool:
+    pool = CredentialPool("test")
+    pool.load(
+        (f"cred_{i}.json", {"access_token": f"tok_{i}"}, False, {}, None)
+        for i in range(n)
+    )
+    return pool
+
+
+class TestWeightTree:
+    """测试 Fenwick Tree 权重表"""
+
+    def test_find_respects_prefix_sums(self):
+        tree = _WeightTree()
+        tree.rebuild([1.0, 0.0, 3.0, 6.0])
+
+        assert tree.total == pytest.approx(10.0)
+        assert tree.find(0.5) == 0
+        assert tree.find(1.0) == 2
+        assert tree.find(3.9) == 2
+        assert tree.find(4.0) == 3
+        assert tree.find(9.99) == 3
+
+    def test_set_updates_total_and_grows(self):
+        tree = _WeightTree()
+        tree.set(10, 5.0)
+        tree.set(2, 1.0)
+
+        assert len(tree) >= 11
+        assert tree.total == pytest.approx(6.0)
+        assert tree.find(0.5) == 2
+        assert tree.find(1.5) == 10
+
+        tree.set(10, 0.0)
+        assert tree.total == pytest.approx(1.0)
+
+
+class TestCredentialPool:
+    """测试凭证池选择与状态同步"""
+
+    def test_pick_uniform_skips_disabled(self):
+        pool = _make_pool(3)
+        pool.apply_state("cred_0.json", {"disabled": True})
+        pool.apply_state("cred_1.json", {"disabled": True})
+
+        for _ in range(20):
+            assert pool.pick_uniform().filename == "cred_2.json"
+
+        pool.apply_state("cred_2.json", {"disabled": True})
+        assert pool.pick_uniform() is None
+
+    def test_pick_weighted_excludes_unavailable(self):
+        pool = _make_pool(3)
+        pool.set_model_weights(
+            "claude",
+            {
+                "cred_0.json": (False, 10.0),
+                "cred_1.json": (True, 80.0),
+                "cred_2.json": (True, 90.0),
+            },
+            ttl_seconds=60,
+        )
+
+        picked = {pool.pick_weighted("claude")[0].filename for _ in range(200)}
+        assert picked == {"cred_1.json", "cred_2.json"}
+
+    def test_disable_removes_weight_and_enable_restores(self):
+        pool = _make_pool(2)
+        pool.set_model_weights(
+            "claude", {"cred_0.json": (True, 100.0), "cred_1.json": (True, 100.0)}, ttl_seconds=60
+        )
+
+        pool.apply_state("cred_0.json", {"disabled": True})
+        for _ in range(50):
+            assert pool.pick_weighted("claude")[0].filename == "cred_1.json"
+
+        pool.apply_state("cred_0.json", {"disabled": False})
+        picked = {pool.pick_weighted("claude")[0].filename for _ in range(200)}
+        assert picked == {"cred_0.json", "cred_1.json"}
+
+    def test_new_credential_expires_model_weights(self):
+        pool = _make_pool(1)
+        pool.set_model_weights("claude", {"cred_0.json": (True, 100.0)}, ttl_seconds=60)
+        assert not pool.weights_stale("claude")
+
+        pool.upsert("cred_new.json", {"access_token": "x"})
+        assert pool.weights_stale("claude")
+
+    def test_remove_frees_slot(self):
+        pool = _make_pool(2)
+        pool.set_model_weights(
+            "claude", {"cred_0.json": (True, 100.0), "cred_1.json": (True, 100.0)}, ttl_seconds=60
+        )
+        pool.remove("cred_0.json")
+
+        assert "cred_0.json" not in pool
+        for _ in range(50):
+            assert pool.pick_weighted("claude")[0].filename == "cred_1.json"
+
+    def test_earliest_cooldown_lazy_heap(self):
+        pool = _make_pool(3)
+        now = time.time()
+        pool.set_model_cooldown("cred_0.json", "claude", now + 100)
+        pool.set_model_cooldown("cred_1.json", "claude", now + 50)
+        pool.set_model_cooldown("cred_2.json", "claude", now - 10)
+
+        assert pool.earliest_cooldown("claude", now) == pytest.approx(now + 50)
+
+        # 清除后，堆顶元素惰性失效
+        pool.set_model_cooldown("cred_1.json", "claude", None)
+        assert pool.earliest_cooldown("claude", now) == pytest.approx(now + 100)
+
+        # 禁用凭证不参与
+        pool.apply_state("cred_0.json", {"disabled": True})
+        assert pool.earliest_cooldown("claude", now) is None
+        assert pool.earliest_cooldown("gemini", now) is None
+
+    def test_returned_credential_data_is_not_shared(self):
+        pool = _make_pool(1)
+        entry = pool.pick_uniform()
+        entry.credential_data["access_token"] = "mutated"
+
+        pool.upsert("cred_0.json", {"access_token": "fresh"})
+        assert pool.get("cred_0.json").credential_data["access_token"] == "fresh"
+
+
+class TestSQLiteManagerPool:
+    """测试 SQLiteManager 与凭证池的集成"""
+
+    @pytest.fixture
+    async def manager(self, tmp_path, monkeypatch):
+        from src.storage.sqlite_manager import SQLiteManager
+
+        monkeypatch.setenv("CREDENTIALS_DIR", str(tmp_path))
+        manager = SQLiteManager()
+        await manager.initialize()
+        yield manager
+        await manager.close()
+
+    async def test_selection_follows_state_updates(self, manager):
+        await manager.store_credential("a.json", {"access_token": "a"})
+        await manager.store_credential("b.json", {"access_token": "b"})
+
+        result = await manager.get_next_available_credential(model_key="pro")
+        assert result[0] in {"a.json", "b.json"}
+
+        await manager.update_credential_state("a.json", {"disabled": True})
+        for _ in range(20):
+            filename, data = await manager.get_next_available_credential(model_key="pro")
+            assert filename == "b.json"
+            assert data == {"access_token": "b"}
+
+        # 新增凭证后无需重启即可被选中
+        await manager.update_credential_state("b.json", {"disabled": True})
+        await manager.store_credential("c.json", {"access_token": "c"})
+        filename, _ = await manager.get_next_available_credential(model_key="pro")
+        assert filename == "c.json"
+
+    async def test_store_credential_updates_cached_data(self, manager):
+        await manager.store_credential("a.json", {"access_token": "old"})
+        await manager.get_next_available_credential()
+
+        await manager.store_credential("a.json", {"access_token": "new"})
+        _, data = await manager.get_next_available_credential()
+        assert data["access_token"] == "new"
+
+    async def test_earliest_model_cooldown(self, manager):
+        await manager.store_credential("a.json", {"access_token": "a"})
+        await manager.store_credential("b.json", {"access_token": "b"})
+        until = time.time() + 120
+
+        await manager.set_model_cooldown("a.json", "pro", until)
+        await manager.set_model_cooldown("b.json", "pro", until + 60)
+
+        assert await manager.get_earliest_model_cooldown("pro") == pytest.approx(until)
+
+        await manager.clear_all_model_cooldowns("a.json")
+        assert await manager.get_earliest_model_cooldown("pro") == pytest.approx(until + 60)
+
+    async def test_health_scores_follow_record_request_result(self, manager):
+        await manager.store_credential("a.json", {"access_token": "a"})
+        await manager.store_credential("b.json", {"access_token": "b"})
+
+        # 凭证池未加载：一条查询批量评分
+        before = await manager.get_credential_health_scores(["a.json", "b.json", "missing.json"])
+        assert before["a.json"] == pytest.approx(before["b.json"])
+        assert before["missing.json"] == pytest.approx(50.0)
+
+        await manager.get_next_available_credential(model_key="pro")
+        for _ in range(3):
+            await manager.record_request_result("a.json", False, error_code=429)
+        await manager.record_request_result("b.json", True, latency_ms=200)
+
+        # 凭证池已加载：来自内存聚合，且与数据库重新计算的结果一致
+        scores = await manager.get_credential_health_scores()
+        assert scores["a.json"] < before["a.json"]
+        assert scores["b.json"] > scores["a.json"]
+
+        manager._pools[False].invalidate()
+        reloaded = await manager.get_credential_health_scores(["a.json", "b.json"])
+        assert reloaded["a.json"] == pytest.approx(scores["a.json"])
+        assert reloaded["b.json"] == pytest.approx(scores["b.json"])
+        assert await manager.get_credential_health_score("b.json") == pytest.approx(scores["b.json"])
+
+
+class TestHealthStats:
+    """测试内存健康度聚合"""
+
+    def test_record_result_updates_weight(self):
+        pool = _make_pool(2)
+        pool.set_model_weights(
+            "claude", {"cred_0.json": (True, 100.0), "cred_1.json": (True, 100.0)}, ttl_seconds=60
+        )
+        before = pool.get("cred_0.json").health
+
+        for _ in range(5):
+            pool.record_result("cred_0.json", False, error_code=500)
+
+        entry = pool.get("cred_0.json")
+        assert entry.health < before
+        assert entry.stats.failure_count == 5
+        assert len(entry.stats.recent_errors) == 5
+
+        hits = sum(pool.pick_weighted("claude")[0].filename == "cred_0.json" for _ in range(2000))
+        assert hits < 1000
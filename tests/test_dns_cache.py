@@ -0,0 +1,211 @@
+"""
+DNS 缓存测试
+
+- TTL 内命中缓存，过期后重新解析；解析器返回的 TTL 被限制在上下限内
+- 接近过期时后台刷新，并发解析只调用一次解析器
+- 刷新失败时继续使用旧地址
+- httpx 客户端经桩解析器连接本地服务（主机名不存在于系统 DNS）
+"""
+
+import asyncio
+import os
+import sys
+
+import httpx
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import src.dns_cache as dns_cache
+from src.dns_cache import DNSCache, install_dns_cache
+
+
+class _StubResolver:
+    """本地桩解析器：按表返回地址，记录调用次数"""
+
+    def __init__(self, table, ttl=None):
+        self.table = table
+        self.ttl = ttl
+        self.calls = []
+        self.fail = False
+        self.gate = None
+
+    async def resolve(self, host):
+        self.calls.append(host)
+        if self.gate is not None:
+            await self.gate.wait()
+        if self.fail or host not in self.table:
+            raise OSError(f"stub: cannot resolve {host}")
+        return list(self.table[host]), self.ttl
+
+
+async def _drain():
+    """让后台刷新任务运行完（clock 冻结了事件循环的时钟，不能用带延时的 sleep）"""
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(dns_cache.time, "monotonic", lambda: now[0])
+    return now
+
+
+def _cache(resolver, **kwargs):
+    options = dict(default_ttl=60, min_ttl=5, max_ttl=600, refresh_ahead=0.8, max_stale=300)
+    options.update(kwargs)
+    return DNSCache(resolver, **options)
+
+
+class TestDNSCache:
+
+    async def test_hit_within_ttl_and_miss_after_expiry(self, clock):
+        resolver = _StubResolver({"api.example": ["10.0.0.1"]})
+        cache = _cache(resolver)
+
+        assert await cache.resolve("api.example") == ["10.0.0.1"]
+        assert await cache.resolve("API.example") == ["10.0.0.1"]
+        assert len(resolver.calls) == 1
+
+        clock[0] += 61
+        resolver.table["api.example"] = ["10.0.0.2"]
+        assert await cache.resolve("api.example") == ["10.0.0.2"]
+        assert len(resolver.calls) == 2
+        assert (cache.stats.hits, cache.stats.misses) == (1, 2)
+
+    async def test_resolver_ttl_is_honored_and_clamped(self, clock):
+        resolver = _StubResolver({"short.example": ["10.0.0.1"]}, ttl=1)
+        cache = _cache(resolver)
+        await cache.resolve("short.example")
+        assert cache.get_stats()["hosts"]["short.example"]["ttl"] == 5
+
+        resolver.ttl = 120
+        cache.invalidate()
+        await cache.resolve("short.example")
+        clock[0] += 61
+        await cache.resolve("short.example")
+        assert len(resolver.calls) == 2
+
+    async def test_ip_literals_skip_resolver(self):
+        resolver = _StubResolver({})
+        cache = _cache(resolver)
+        assert await cache.resolve("127.0.0.1") == ["127.0.0.1"]
+        assert await cache.resolve("::1") == ["::1"]
+        assert resolver.calls == []
+
+    async def test_concurrent_misses_share_one_lookup(self, clock):
+        resolver = _StubResolver({"api.example": ["10.0.0.1"]})
+        resolver.gate = asyncio.Event()
+        cache = _cache(resolver)
+
+        tasks = [asyncio.ensure_future(cache.resolve("api.example")) for _ in range(10)]
+        await asyncio.sleep(0)
+        resolver.gate.set()
+
+        assert await asyncio.gather(*tasks) == [["10.0.0.1"]] * 10
+        assert len(resolver.calls) == 1
+
+    async def test_refresh_ahead_in_background(self, clock):
+        resolver = _StubResolver({"api.example": ["10.0.0.1"]})
+        cache = _cache(resolver)
+        await cache.resolve("api.example")
+
+        clock[0] += 50
+        resolver.table["api.example"] = ["10.0.0.2"]
+        resolver.gate = asyncio.Event()
+        # 接近过期：立即返回旧地址，刷新在后台进行
+        assert await cache.resolve("api.example") == ["10.0.0.1"]
+        await _drain()
+        assert await cache.resolve("api.example") == ["10.0.0.1"]
+        assert len(resolver.calls) == 2
+
+        resolver.gate.set()
+        await _drain()
+        assert await cache.resolve("api.example") == ["10.0.0.2"]
+        assert cache.stats.refreshes == 1
+        assert cache.stats.misses == 1
+
+    async def test_failed_refresh_keeps_stale_addresses(self, clock):
+        resolver = _StubResolver({"api.example": ["10.0.0.1"]})
+        cache = _cache(resolver)
+        await cache.resolve("api.example")
+
+        resolver.fail = True
+        clock[0] += 61
+        assert await cache.resolve("api.example") == ["10.0.0.1"]
+        assert cache.stats.refresh_failures == 1
+
+        clock[0] += 300
+        with pytest.raises(OSError):
+            await cache.resolve("api.example")
+        assert cache.stats.errors == 1
+
+
+async def _start_server():
+    async def handle(reader, writer):
+        await reader.readuntil(b"\r\n\r\n")
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\nConnection: close\r\n\r\nok")
+        await writer.drain()
+        writer.close()
+
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    return server, server.sockets[0].getsockname()[1]
+
+
+class TestHttpxIntegration:
+
+    async def test_client_connects_through_stub_resolver(self):
+        server, port = await _start_server()
+        resolver = _StubResolver({"upstream.invalid": ["127.0.0.1"]})
+        cache = _cache(resolver)
+        try:
+            async with install_dns_cache(httpx.AsyncClient(timeout=5.0), cache) as client:
+                for _ in range(3):
+                    response = await client.get(f"http://upstream.invalid:{port}/")
+                    assert response.text == "ok"
+        finally:
+            server.close()
+            await server.wait_closed()
+
+        # 每次请求都新建连接（Connection: close），解析只发生一次
+        assert resolver.calls == ["upstream.invalid"]
+        assert (cache.stats.hits, cache.stats.misses) == (2, 1)
+
+    async def test_unreachable_addresses_fall_through_and_invalidate(self):
+        server, port = await _start_server()
+        resolver = _StubResolver({"upstream.invalid": ["127.0.0.2", "127.0.0.1"]})
+        cache = _cache(resolver)
+        try:
+            # 127.0.0.2 上没有监听，连接被拒绝后尝试下一个地址
+            async with install_dns_cache(httpx.AsyncClient(timeout=5.0), cache) as client:
+                response = await client.get(f"http://upstream.invalid:{port}/")
+                assert response.text == "ok"
+
+                resolver.table["upstream.invalid"] = ["127.0.0.2"]
+                cache.invalidate()
+                with pytest.raises(httpx.ConnectError):
+                    await client.get(f"http://upstream.invalid:{port}/")
+        finally:
+            server.close()
+            await server.wait_closed()
+
+        assert "upstream.invalid" not in cache.get_stats()["hosts"]
+
+    async def test_resolution_failure_raises_connect_error(self):
+        cache = _cache(_StubResolver({}))
+        async with install_dns_cache(httpx.AsyncClient(timeout=5.0), cache) as client:
+            with pytest.raises(httpx.ConnectError):
+                await client.get("http://missing.invalid/")
+
+    def test_disabled_leaves_client_untouched(self, monkeypatch):
+        monkeypatch.setenv("DNS_CACHE_ENABLED", "false")
+        client = httpx.AsyncClient()
+        install_dns_cache(client, _cache(_StubResolver({})))
+        assert not isinstance(client._transport._pool._network_backend, dns_cache.CachedDNSBackend)
+
+    def test_proxy_transports_are_wrapped(self):
+        client = httpx.AsyncClient(proxy="http://127.0.0.1:9")
+        install_dns_cache(client, _cache(_StubResolver({})))
+        backends = [t._pool._network_backend for t in client._mounts.values() if t is not None]
+        assert backends and all(isinstance(b, dns_cache.CachedDNSBackend) for b in backends)
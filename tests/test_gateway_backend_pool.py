@@ -0,0 +1,176 @@
+"""
+Gateway 后端连接池测试
+
+- 重试复用同一个后端客户端与 keep-alive 连接
+- 流式请求结束后归还连接池，连接被后续请求复用
+- 不同后端使用独立的客户端，统计按后端汇总
+- 非本机后端借用 http_client 的共享池（保留 TLS 指纹伪装）
+"""
+
+import asyncio
+import json
+import os
+import sys
+
+from contextlib import asynccontextmanager
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import src.gateway.proxy as gateway_proxy
+from src.gateway.backend_pool import BackendClientPool
+from src.httpx_client import http_client
+
+
+class _Backend:
+    """本地 keep-alive 后端：按顺序返回预设状态码"""
+
+    def __init__(self, statuses=None):
+        self.statuses = list(statuses or [])
+        self.connections = 0
+        self.requests = 0
+        self.server = None
+        self._writers = set()
+
+    async def start(self) -> str:
+        self.server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        return f"http://127.0.0.1:{self.server.sockets[0].getsockname()[1]}"
+
+    async def stop(self) -> None:
+        self.server.close()
+        for writer in list(self._writers):
+            writer.close()
+        await self.server.wait_closed()
+
+    async def _handle(self, reader, writer):
+        self.connections += 1
+        self._writers.add(writer)
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                length = 0
+                for line in head.split(b"\r\n"):
+                    if line.lower().startswith(b"content-length:"):
+                        length = int(line.split(b":", 1)[1])
+                if length:
+                    await reader.readexactly(length)
+                self.requests += 1
+                status = self.statuses.pop(0) if self.statuses else 200
+                body = json.dumps({"ok": status == 200}).encode()
+                if head.startswith(b"POST /v1/stream"):
+                    body = b'data: {"ok": true}\n\ndata: [DONE]\n\n'
+                writer.write(
+                    f"HTTP/1.1 {status} X\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+
+@pytest.fixture
+async def pool(monkeypatch):
+    pool = BackendClientPool()
+    monkeypatch.setattr(gateway_proxy, "get_backend_client_pool", lambda: pool)
+    monkeypatch.setattr(gateway_proxy, "calculate_retry_delay", lambda attempt: 0.0)
+    yield pool
+    await pool.close_all()
+
+
+async def _start(statuses=None):
+    backend = _Backend(statuses)
+    url = await backend.start()
+    return backend, url
+
+
+class TestBackendClientPool:
+
+    async def test_retries_reuse_warm_connection(self, pool):
+        backend, url = await _start([502, 502])
+        backends = {"copilot": {"name": "Copilot", "base_url": f"{url}/v1", "max_retries": 3}}
+
+        ok, data = await gateway_proxy.proxy_request_to_backend(
+            "copilot", "/chat/completions", "POST", {}, {"model": "x"}, backends=backends
+        )
+
+        assert ok and data == {"ok": True}
+        assert backend.requests == 3
+        assert backend.connections == 1
+        stats = pool.get_stats("copilot")
+        assert stats["clients_created"] == 1
+        assert stats["requests"] == 3
+        assert stats["in_flight"] == 0
+        assert stats["connections"] == {"open": 1, "idle": 1, "active": 0}
+        await pool.close_all()
+        await backend.stop()
+
+    async def test_stream_returns_client_to_pool(self, pool):
+        backend, url = await _start()
+        backends = {"kiro": {"name": "Kiro", "base_url": f"{url}/v1", "max_retries": 0}}
+
+        for _ in range(3):
+            ok, stream = await gateway_proxy.proxy_request_to_backend(
+                "kiro", "/stream", "POST", {}, {"model": "x"}, stream=True, backends=backends
+            )
+            assert ok
+            chunks = [chunk async for chunk in stream]
+            assert "[DONE]" in "".join(chunks)
+
+        assert backend.connections == 1
+        stats = pool.get_stats("kiro")
+        assert stats["requests"] == 3
+        assert stats["in_flight"] == 0
+        assert stats["errors"] == 0
+        await pool.close_all()
+        await backend.stop()
+
+    async def test_backends_have_separate_clients(self, pool):
+        backend, url = await _start()
+        async with pool.client("a", url, {"max_connections": 4}) as client_a:
+            await client_a.get(f"{url}/ping")
+        async with pool.client("b", url) as client_b:
+            await client_b.get(f"{url}/ping")
+
+        assert client_a is not client_b
+        assert client_a._transport._pool._max_connections == 4
+        assert set(pool.get_all_stats()) == {"a", "b"}
+
+        with pytest.raises(RuntimeError):
+            async with pool.client("a", url):
+                raise RuntimeError("boom")
+        assert pool.get_stats("a")["errors"] == 1
+        await pool.close_all()
+        assert client_a.is_closed and client_b.is_closed
+        await backend.stop()
+
+    async def test_remote_backend_uses_impersonating_client(self, pool, monkeypatch):
+        borrowed = []
+        impersonating = object()
+
+        @asynccontextmanager
+        async def get_client(*args, **kwargs):
+            borrowed.append(kwargs)
+            yield impersonating
+
+        monkeypatch.setattr(http_client, "get_client", get_client)
+
+        async with pool.client("anyrouter", "https://anyrouter.example/v1/chat/completions") as client:
+            assert client is impersonating
+        with pytest.raises(RuntimeError):
+            async with pool.client("anyrouter", "https://anyrouter.example/v1/models"):
+                raise RuntimeError("boom")
+
+        assert len(borrowed) == 2
+        stats = pool.get_stats("anyrouter")
+        assert stats["requests"] == 2
+        assert stats["errors"] == 1
+        assert stats["in_flight"] == 0
+        assert stats["clients_created"] == 0
+
+        # 本机后端仍使用自己的 httpx 客户端
+        async with pool.client("kiro", "http://127.0.0.1:9046/v1/models") as client:
+            assert client is not impersonating
+        assert len(borrowed) == 2
@@ -0,0 +1,285 @@
+"""
+HttpxClientManager 共享客户端注册表测试
+
+- 多次借用复用同一个底层客户端与 keep-alive 连接
+- 超时按请求注入，不需要新建客户端
+- 代理配置变化时淘汰旧客户端，借出中的客户端在归还后关闭
+- 共享客户端不在请求之间保存 Cookie
+- 共享客户端到达请求数 / 存活时间上限后轮换
+- HTTP/2 模式、连续协议错误降级到 HTTP/1.1、连接健康检查
+"""
+
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import src.httpx_client as httpx_client
+from src.httpx_client import HttpxClientManager, PooledClient, create_streaming_client_with_kwargs, safe_close_client
+
+BACKENDS = ["httpx"] + (["curl"] if httpx_client.CURL_CFFI_AVAILABLE else [])
+
+
+class _Server:
+    """本地 keep-alive HTTP/1.1 服务器，记录连接数与请求头"""
+
+    def __init__(self):
+        self.connections = 0
+        self.requests = []
+        self.server = None
+        self._writers = set()
+
+    async def start(self) -> str:
+        self.server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        return f"http://127.0.0.1:{self.server.sockets[0].getsockname()[1]}"
+
+    async def stop(self) -> None:
+        self.server.close()
+        # Python 3.12 起 wait_closed 会等待所有连接断开
+        for writer in list(self._writers):
+            writer.close()
+        await self.server.wait_closed()
+
+    async def _handle(self, reader, writer):
+        self.connections += 1
+        self._writers.add(writer)
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                lines = head.decode().split("\r\n")
+                path = lines[0].split(" ")[1]
+                headers = {k.lower(): v.strip() for k, _, v in (line.partition(":") for line in lines[1:] if line)}
+                self.requests.append((path, headers))
+                if path == "/drop":
+                    break
+                if path == "/slow":
+                    await asyncio.sleep(0.5)
+                body = b"ok"
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\nSet-Cookie: session=abc; Path=/\r\n"
+                    + f"Content-Length: {len(body)}\r\n\r\n".encode()
+                    + body
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+
+@pytest.fixture
+async def server():
+    srv = _Server()
+    srv.url = await srv.start()
+    yield srv
+    await srv.stop()
+
+
+@pytest.fixture
+def proxy(monkeypatch):
+    state = {"value": None}
+
+    async def fake_get_proxy_config():
+        return state["value"]
+
+    monkeypatch.setattr(httpx_client, "get_proxy_config", fake_get_proxy_config)
+    return state
+
+
+def _make_manager(backend: str) -> HttpxClientManager:
+    manager = HttpxClientManager()
+    manager._use_curl_cffi = backend == "curl"
+    return manager
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+class TestClientRegistry:
+
+    async def test_leases_share_client_and_connection(self, backend, server, proxy):
+        manager = _make_manager(backend)
+        seen = set()
+        for _ in range(5):
+            async with manager.get_client(timeout=5.0) as client:
+                assert isinstance(client, PooledClient)
+                response = await client.get(f"{server.url}/ping")
+                assert response.status_code == 200
+                seen.add(id(client.client))
+
+        assert len(seen) == 1
+        assert server.connections == 1
+        status = manager.get_pool_status()
+        assert status["clients_created"] == 1
+        assert status["leases"] == 5
+        await manager.close_all()
+
+    async def test_per_request_timeout(self, backend, server, proxy):
+        manager = _make_manager(backend)
+        async with manager.get_client(timeout=0.1) as client:
+            with pytest.raises(Exception):
+                await client.get(f"{server.url}/slow")
+        async with manager.get_client(timeout=5.0) as client:
+            response = await client.get(f"{server.url}/slow")
+            assert response.status_code == 200
+        assert manager.pool_stats.clients_created == 1
+        await manager.close_all()
+
+    async def test_cookies_are_not_shared(self, backend, server, proxy):
+        manager = _make_manager(backend)
+        for _ in range(2):
+            async with manager.get_client(timeout=5.0) as client:
+                await client.get(f"{server.url}/cookie")
+        assert all("cookie" not in headers for _, headers in server.requests)
+        await manager.close_all()
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+class TestRecycling:
+
+    async def test_max_requests_recycles_session(self, backend, server, proxy, monkeypatch):
+        monkeypatch.setenv("HTTP_POOL_CLIENT_MAX_REQUESTS", "2")
+        manager = _make_manager(backend)
+
+        held = await manager._lease(5.0)
+        old_entry = held._entry
+        for _ in range(2):
+            await held.get(f"{server.url}/ping")
+
+        async with manager.get_client(timeout=5.0) as client:
+            assert client._entry is not old_entry
+            await client.get(f"{server.url}/ping")
+        assert manager.pool_stats.recycled == 1
+
+        # 借出中的旧会话仍可使用，归还后才关闭
+        assert old_entry.retired and manager.pool_stats.clients_closed == 0
+        await held.get(f"{server.url}/ping")
+        await safe_close_client(held)
+        assert manager.pool_stats.clients_closed == 1
+        await manager.close_all()
+
+    async def test_max_age_recycles_session(self, backend, server, proxy, monkeypatch):
+        monkeypatch.setenv("HTTP_POOL_CLIENT_MAX_AGE", "60")
+        manager = _make_manager(backend)
+
+        async with manager.get_client(timeout=5.0) as client:
+            first = client._entry
+        async with manager.get_client(timeout=5.0) as client:
+            assert client._entry is first
+
+        first.created_at -= 61
+        async with manager.get_client(timeout=5.0) as client:
+            assert client._entry is not first
+            response = await client.get(f"{server.url}/ping")
+            assert response.status_code == 200
+        assert manager.pool_stats.recycled == 1
+        assert manager.get_pool_status()["clients_created"] == 2
+        await manager.close_all()
+
+
+class TestProxyChange:
+
+    async def test_proxy_change_retires_clients(self, server, proxy):
+        manager = _make_manager("httpx")
+
+        held = await manager._lease(5.0)
+        old_client = held.client
+
+        proxy["value"] = "http://127.0.0.1:9"
+        async with manager.get_client(timeout=5.0) as client:
+            assert client.client is not old_client
+        assert manager.pool_stats.proxy_rebuilds == 1
+
+        # 借出中的旧客户端仍可使用，归还后才关闭
+        assert not old_client.is_closed
+        response = await held.get(f"{server.url}/ping")
+        assert response.status_code == 200
+        await safe_close_client(held)
+        assert old_client.is_closed
+        await manager.close_all()
+
+    async def test_streaming_lease_is_returned(self, server, proxy, monkeypatch):
+        manager = _make_manager("httpx")
+        monkeypatch.setattr(httpx_client, "http_client", manager)
+
+        client = await create_streaming_client_with_kwargs(timeout=5.0)
+        async with client.stream("GET", f"{server.url}/stream") as response:
+            assert response.status_code == 200
+        entry = client._entry
+        assert entry.leases == 1
+
+        await safe_close_client(client)
+        assert entry.leases == 0
+        assert not entry.client.is_closed
+        assert manager.pool_stats.ttfb_count == 1
+        await manager.close_all()
+        assert entry.client.is_closed
+
+
+class TestHttp2:
+
+    async def test_http2_mode_builds_http2_clients(self, proxy, monkeypatch):
+        monkeypatch.setenv("HTTP2_ENABLED", "true")
+        for backend in BACKENDS:
+            manager = _make_manager(backend)
+            async with manager.get_client(timeout=5.0) as client:
+                assert client._entry.key[2] == "2"
+                if backend == "httpx":
+                    assert client.client._transport._pool._http2 is True
+            await manager.close_all()
+
+    async def test_protocol_errors_fall_back_to_http11(self, server, proxy, monkeypatch):
+        monkeypatch.setenv("HTTP2_ENABLED", "true")
+        monkeypatch.setenv("HTTP2_FALLBACK_ERRORS", "2")
+        manager = _make_manager("httpx")
+
+        async with manager.get_client(timeout=5.0) as client:
+            h2_client = client.client
+            for _ in range(2):
+                with pytest.raises(Exception):
+                    await client.get(f"{server.url}/drop")
+        assert manager.http2_health.fallbacks == 1
+        assert h2_client.is_closed
+
+        async with manager.get_client(timeout=5.0) as client:
+            assert client._entry.key[2] == "1.1"
+            assert (await client.get(f"{server.url}/ping")).status_code == 200
+
+        # 降级到期后重新尝试 HTTP/2
+        manager.http2_health.fallback_until = 0.0
+        async with manager.get_client(timeout=5.0) as client:
+            assert client._entry.key[2] == "2"
+        status = manager.get_pool_status()["http2"]
+        assert status["protocol_errors"] == 2
+        assert status["responses_by_version"] == {"HTTP/1.1": 1}
+        await manager.close_all()
+
+    async def test_success_resets_error_streak(self, server, proxy, monkeypatch):
+        monkeypatch.setenv("HTTP2_ENABLED", "true")
+        monkeypatch.setenv("HTTP2_FALLBACK_ERRORS", "2")
+        manager = _make_manager("httpx")
+
+        async with manager.get_client(timeout=5.0) as client:
+            for _ in range(3):
+                with pytest.raises(Exception):
+                    await client.get(f"{server.url}/drop")
+                await client.get(f"{server.url}/ping")
+        assert manager.http2_health.fallbacks == 0
+        await manager.close_all()
+
+    async def test_check_connection(self, server, proxy):
+        manager = _make_manager("httpx")
+        result = await manager.check_connection(f"{server.url}/health")
+        assert result["ok"] and result["status_code"] == 200
+        assert result["http_version"] == "HTTP/1.1"
+
+        # 已关闭的端口：连接失败
+        closed = await asyncio.start_server(server._handle, "127.0.0.1", 0)
+        closed_port = closed.sockets[0].getsockname()[1]
+        closed.close()
+        await closed.wait_closed()
+        result = await manager.check_connection(f"http://127.0.0.1:{closed_port}/health", timeout=1.0)
+        assert not result["ok"] and result["error"]
+        await manager.close_all()
@@ -0,0 +1,206 @@
+"""
+JSON 编解码后端一致性测试
+
+- 每个已安装的后端（orjson / msgspec / stdlib）对真实 chunk 形状的编码结果逐字节一致
+- 快速后端无法处理的输入、非字符串键、datetime / dataclass 与带 default 的调用退回标准库
+- 已知差异（指数浮点写法）只影响写法，数值相同
+- 解析错误统一为 json.JSONDecodeError
+"""
+
+import dataclasses
+import datetime
+import enum
+import json
+import os
+import sys
+import uuid
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src import json_codec
+from src.augment_compat.ndjson import ndjson_decode_line, ndjson_encode_line
+
+
+BACKENDS = json_codec.get_codec_status()["available"]
+
+
+@pytest.fixture(params=BACKENDS)
+def backend(request):
+    previous = json_codec.set_backend(request.param)
+    yield request.param
+    json_codec.set_backend(previous)
+
+
+def _stdlib(obj) -> str:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+
+def _stdlib_default(obj, default) -> str:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=default)
+
+
+@dataclasses.dataclass
+class _Point:
+    x: int
+    y: int
+
+
+class _Color(enum.Enum):
+    RED = "red"
+
+
+CORPUS = [
+    # OpenAI chat.completion.chunk
+    {
+        "id": "chatcmpl-abc",
+        "object": "chat.completion.chunk",
+        "created": 1760000000,
+        "model": "gemini-2.5-pro",
+        "choices": [{"index": 0, "delta": {"content": "你好，世界 \"quoted\"\n\ttab   \x00"}, "finish_reason": None}],
+    },
+    {
+        "id": "chatcmpl-abc",
+        "object": "chat.completion.chunk",
+        "choices": [{
+            "index": 0,
+            "delta": {"tool_calls": [{"index": 0, "id": "call_1", "type": "function",
+                                      "function": {"name": "read_file", "arguments": "{\"path\": \"a.py\"}"}}]},
+            "finish_reason": "tool_calls",
+        }],
+        "usage": {"prompt_tokens": 12, "completion_tokens": 3, "total_tokens": 15},
+    },
+    # Anthropic SSE 事件
+    {"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": "émoji 🎉 \\ /"}},
+    {"type": "message_delta", "delta": {"stop_reason": "end_turn"}, "usage": {"output_tokens": 42}},
+    # Augment NDJSON
+    {"text": "line1\nline2", "nodes": [{"id": 1, "type": 0, "content": ""}]},
+    # 各种标量
+    {"float": 0.1, "neg": -0.0, "big": 123456.789, "ints": [0, -1, 2**53], "bool": [True, False], "none": None},
+    [],
+    {},
+    "plain string",
+]
+
+
+class TestParity:
+
+    @pytest.mark.parametrize("obj", CORPUS)
+    def test_dumps_matches_stdlib(self, backend, obj):
+        assert json_codec.dumps(obj) == _stdlib(obj)
+        assert json_codec.dumps_bytes(obj) == _stdlib(obj).encode("utf-8")
+
+    @pytest.mark.parametrize("obj", CORPUS)
+    def test_round_trip(self, backend, obj):
+        encoded = _stdlib(obj)
+        assert json_codec.loads(encoded) == obj
+        assert json_codec.loads(encoded.encode("utf-8")) == obj
+        assert json_codec.loads(memoryview(encoded.encode("utf-8"))) == obj
+
+    def test_ndjson_line(self, backend):
+        line = ndjson_encode_line({"text": "你好"})
+        assert line == '{"text":"你好"}\n'
+        assert ndjson_decode_line(line) == {"text": "你好"}
+        assert ndjson_decode_line("{broken") is None
+
+
+class TestFallbacks:
+
+    def test_int_keys(self, backend):
+        assert json_codec.dumps({1: "a", "b": 2}) == _stdlib({1: "a", "b": 2})
+
+    @pytest.mark.parametrize("obj", [
+        {True: 1, False: 0, None: 2},
+        {1.5: "f", 2: "i", "s": {3: [None]}},
+        {"nested": [{True: {None: 1}}]},
+    ])
+    def test_non_str_keys(self, backend, obj):
+        assert json_codec.dumps(obj) == _stdlib(obj)
+
+    @pytest.mark.parametrize("value", [
+        datetime.datetime(2026, 1, 1),
+        datetime.date(2026, 1, 1),
+        datetime.time(1, 2),
+        _Point(1, 2),
+    ])
+    def test_non_json_types_follow_stdlib(self, backend, value):
+        obj = {"v": value}
+        assert json_codec.dumps(obj, default=repr) == _stdlib_default(obj, repr)
+        assert json_codec.dumps_bytes(obj, default=str) == _stdlib_default(obj, str).encode("utf-8")
+
+    @pytest.mark.parametrize("value", [
+        datetime.datetime(2026, 1, 1),
+        _Point(1, 2),
+        {_Color.RED: 1},
+        {datetime.date(2026, 1, 1): 1},
+    ])
+    def test_non_json_types_without_default_raise(self, value):
+        # msgspec 原生支持这些类型，属于文档中的已知差异，不在此检查
+        for name in ("orjson", "stdlib"):
+            if name not in BACKENDS:
+                continue
+            previous = json_codec.set_backend(name)
+            try:
+                with pytest.raises(TypeError):
+                    json_codec.dumps({"v": value})
+                if isinstance(value, dict):
+                    # 标准库不会对键调用 default
+                    with pytest.raises(TypeError):
+                        json_codec.dumps({"v": value}, default=str)
+            finally:
+                json_codec.set_backend(previous)
+
+    def test_default_hook_called_like_stdlib(self, backend):
+        obj = {"u": uuid.UUID(int=1), "c": _Color.RED, "s": {1}}
+        assert json_codec.dumps(obj, default=repr) == _stdlib_default(obj, repr)
+
+    def test_big_int(self, backend):
+        assert json_codec.dumps({"n": 2**70}) == _stdlib({"n": 2**70})
+
+    def test_lone_surrogate(self, backend):
+        obj = {"s": "你好\ud83d", "\udc00": ["\ud83d\ude00"]}
+        expected = '{"s":"你好\\ud83d","\\udc00":["\\ud83d\\ude00"]}'
+        assert json_codec.dumps(obj) == expected
+        # 结果总能编码为 UTF-8 写出，与 ensure_ascii=True 的标准库输出是同一个 JSON 值
+        assert json_codec.dumps_bytes(obj) == expected.encode("utf-8")
+        assert json.loads(expected) == json.loads(json.dumps(obj))
+
+    def test_default_hook(self, backend):
+        class Opaque:
+            pass
+
+        assert json_codec.dumps({"o": Opaque()}, default=lambda o: "opaque") == '{"o":"opaque"}'
+
+    def test_unserializable_raises_type_error(self, backend):
+        with pytest.raises(TypeError):
+            json_codec.dumps({"o": object()})
+
+    def test_exponent_floats_keep_value(self, backend):
+        for value in (1e-7, 1e16, 1.5e300):
+            assert json.loads(json_codec.dumps({"v": value})) == {"v": value}
+
+
+class TestDecodeErrors:
+
+    @pytest.mark.parametrize("raw", ["{not json", "", b"\xff\xfe", "[1,]"])
+    def test_invalid_input_raises_json_decode_error(self, backend, raw):
+        with pytest.raises(json.JSONDecodeError):
+            json_codec.loads(raw)
+
+    def test_stdlib_extensions_accepted(self, backend):
+        # 标准库接受 NaN 字面量，快速后端失败后交给标准库
+        assert json_codec.loads('{"v": NaN}')["v"] != json_codec.loads('{"v": NaN}')["v"]
+
+
+class TestSelection:
+
+    def test_unknown_backend_rejected(self):
+        with pytest.raises(ValueError):
+            json_codec.set_backend("simdjson")
+
+    def test_env_override(self, monkeypatch):
+        monkeypatch.setenv("JSON_CODEC", "stdlib")
+        assert json_codec._select_backend() == "stdlib"
+        monkeypatch.setenv("JSON_CODEC", "not-a-backend")
+        assert json_codec._select_backend() in BACKENDS
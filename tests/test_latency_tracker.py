@@ -0,0 +1,117 @@
+"""
+延迟追踪与 BaseURL 延迟排序测试
+
+- 分位数草图的相对误差在设定范围内，窗口轮换后旧样本被淘汰
+- 期望延迟同时考虑平均延迟与错误率
+- BaseURLHealthManager 优先使用更快的 URL，持续失败的快 URL 被排到后面
+"""
+
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import src.latency_tracker as latency_tracker
+from src.antigravity_api import BaseURLHealthManager
+from src.latency_tracker import LatencyTracker, QuantileSketch, WindowedSketch
+
+
+class TestQuantileSketch:
+
+    def test_relative_accuracy(self):
+        rng = random.Random(7)
+        values = [rng.lognormvariate(0, 1) for _ in range(5000)]
+        sketch = QuantileSketch(relative_accuracy=0.02)
+        for value in values:
+            sketch.add(value)
+
+        ordered = sorted(values)
+        for q in (0.5, 0.95, 0.99):
+            exact = ordered[int(q * (len(ordered) - 1))]
+            assert sketch.quantile(q) == pytest.approx(exact, rel=0.03)
+        assert QuantileSketch().quantile(0.5) is None
+
+    def test_window_rotation_drops_old_samples(self, monkeypatch):
+        now = [1000.0]
+        monkeypatch.setattr(latency_tracker.time, "monotonic", lambda: now[0])
+        sketch = WindowedSketch(window_seconds=10)
+        for _ in range(10):
+            sketch.add(5.0)
+
+        now[0] += 11
+        sketch.add(0.1)
+        # 上一个窗口仍参与计算
+        assert sketch.count == 11
+        assert sketch.quantile(0.5) == pytest.approx(5.0, rel=0.03)
+
+        now[0] += 25
+        assert sketch.count == 0
+        assert sketch.quantile(0.5) is None
+
+
+class TestLatencyTracker:
+
+    def test_expected_latency_weights_error_rate(self):
+        tracker = LatencyTracker(alpha=0.5, error_alpha=0.5)
+        assert tracker.expected_latency() is None
+        assert tracker.expected_latency(default=2.0) == 2.0
+
+        tracker.record_ttfb(1.0)
+        tracker.record_ttfb(2.0)
+        assert tracker.ttfb_ewma.value == pytest.approx(1.5)
+
+        tracker.record_outcome(True)
+        tracker.record_outcome(False)
+        # 错误率 0.5：期望延迟翻倍
+        assert tracker.expected_latency() == pytest.approx(3.0)
+
+        stats = tracker.to_dict()
+        assert stats["ttfb_samples"] == 2
+        assert stats["error_rate"] == 0.5
+        assert stats["ttfb_p50_ms"] is not None
+        assert stats["total_p50_ms"] is None
+
+
+class TestBaseURLLatencyOrdering:
+
+    async def test_routes_around_slow_url(self):
+        manager = BaseURLHealthManager()
+        urls = ["https://slow", "https://fast", "https://new"]
+        for _ in range(10):
+            manager.record_ttfb("https://slow", 3.0)
+            manager.record_ttfb("https://fast", 0.3)
+            await manager.record_success("https://slow")
+            await manager.record_success("https://fast")
+
+        # 两个 URL 都一直成功：只有延迟能区分它们
+        assert manager.get_health_score("https://slow") == pytest.approx(manager.get_health_score("https://fast"), abs=0.1)
+        assert manager.get_sorted_urls(urls) == ["https://fast", "https://new", "https://slow"]
+        assert manager.get_ttfb_percentile("https://fast", 95) == pytest.approx(0.3, rel=0.03)
+        assert manager.get_ttfb_percentile("https://new", 95) is None
+
+    async def test_failing_fast_url_is_demoted(self):
+        manager = BaseURLHealthManager()
+        for _ in range(5):
+            manager.record_ttfb("https://a", 1.0)
+            manager.record_ttfb("https://b", 0.5)
+            await manager.record_success("https://a")
+        for _ in range(5):
+            await manager.record_failure("https://b", error_code=503)
+
+        assert manager.get_sorted_urls(["https://b", "https://a"]) == ["https://a", "https://b"]
+
+        stats = manager.get_stats(["https://a", "https://b"])
+        assert stats["order"] == ["https://a", "https://b"]
+        assert stats["urls"]["https://b"]["latency"]["error_rate"] > 0.5
+        assert stats["urls"]["https://a"]["latency"]["ttfb_ewma_ms"] == pytest.approx(1000.0)
+
+    async def test_without_latency_falls_back_to_health_score(self):
+        manager = BaseURLHealthManager()
+        await manager.record_failure("https://a")
+        await manager.record_success("https://b")
+        assert manager.get_sorted_urls(["https://a", "https://b"]) == ["https://b", "https://a"]
+        manager.record_duration("https://a", 1.5)
+        assert manager.get_stats()["urls"]["https://a"]["latency"]["total_samples"] == 1
@@ -0,0 +1,154 @@
+"""
+模型列表缓存测试
+
+- 并发请求只触发一次上游调用
+- 过期后先返回旧数据，后台刷新完成后返回新数据；刷新失败时保留旧数据
+- ETag 命中时 GET 返回 304，POST 不返回 304
+- 网关 /v1/models 走缓存
+"""
+
+import asyncio
+import os
+import sys
+
+import pytest
+from starlette.requests import Request
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import src.models_cache as models_cache
+import src.unified_gateway_router as unified_gateway_router
+from src.models_cache import SingleFlightCache, etag_json_response
+
+
+def _request(method="GET", if_none_match=None):
+    headers = []
+    if if_none_match is not None:
+        headers.append((b"if-none-match", if_none_match.encode()))
+    return Request({"type": "http", "method": method, "path": "/v1/models", "headers": headers})
+
+
+async def _drain():
+    """让后台刷新任务运行完（clock 冻结了事件循环的时钟，不能用带延时的 sleep）"""
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(models_cache.time, "monotonic", lambda: now[0])
+    return now
+
+
+class TestSingleFlightCache:
+
+    async def test_concurrent_gets_share_one_load(self, clock):
+        cache = SingleFlightCache(ttl=60, max_stale=600)
+        calls = []
+        release = asyncio.Event()
+
+        async def loader():
+            calls.append(1)
+            await release.wait()
+            return ["model-a"]
+
+        tasks = [asyncio.ensure_future(cache.get("models", loader)) for _ in range(10)]
+        await asyncio.sleep(0)
+        release.set()
+
+        assert await asyncio.gather(*tasks) == [["model-a"]] * 10
+        assert len(calls) == 1
+        assert await cache.get("models", loader) == ["model-a"]
+        assert len(calls) == 1
+
+    async def test_serves_stale_while_refreshing(self, clock):
+        cache = SingleFlightCache(ttl=60, max_stale=600)
+        values = iter([["old"], ["new"]])
+        release = asyncio.Event()
+
+        async def loader():
+            value = next(values)
+            if value == ["new"]:
+                await release.wait()
+            return value
+
+        assert await cache.get("models", loader) == ["old"]
+
+        clock[0] += 61
+        # 过期：立即返回旧数据，刷新在后台进行
+        assert await cache.get("models", loader) == ["old"]
+        assert await cache.get("models", loader) == ["old"]
+
+        release.set()
+        await _drain()
+        assert await cache.get("models", loader) == ["new"]
+
+    async def test_failed_refresh_keeps_stale_data(self, clock):
+        cache = SingleFlightCache(ttl=60, max_stale=600)
+        results = iter([["old"], [], RuntimeError("upstream down")])
+
+        async def loader():
+            result = next(results)
+            if isinstance(result, Exception):
+                raise result
+            return result
+
+        assert await cache.get("models", loader, is_valid=bool) == ["old"]
+        for _ in range(2):
+            clock[0] += 61
+            await cache.get("models", loader, is_valid=bool)
+            await _drain()
+            assert await cache.get("models", loader, is_valid=bool) == ["old"]
+
+    async def test_first_load_failure_propagates(self):
+        cache = SingleFlightCache(ttl=60, max_stale=600)
+
+        async def loader():
+            raise RuntimeError("upstream down")
+
+        with pytest.raises(RuntimeError):
+            await cache.get("models", loader)
+
+
+class TestEtagResponse:
+
+    def test_not_modified_for_matching_get(self):
+        content = {"object": "list", "data": [{"id": "model-a"}]}
+        first = etag_json_response(_request(), content, max_age=30)
+        etag = first.headers["etag"]
+
+        assert first.status_code == 200
+        assert first.headers["cache-control"] == "private, max-age=30"
+        assert etag_json_response(_request(if_none_match=etag), content).status_code == 304
+        assert etag_json_response(_request(if_none_match=f'"other", W/{etag}'), content).status_code == 304
+        assert etag_json_response(_request(if_none_match='"other"'), content).status_code == 200
+        # 条件请求的 304 只适用于 GET/HEAD
+        assert etag_json_response(_request("POST", if_none_match=etag), content).status_code == 200
+
+        changed = etag_json_response(_request(if_none_match=etag), {"object": "list", "data": []})
+        assert changed.status_code == 200
+        assert changed.headers["etag"] != etag
+
+
+class TestGatewayModels:
+
+    async def test_list_models_is_cached(self, monkeypatch):
+        monkeypatch.setattr(models_cache, "_models_cache", SingleFlightCache(ttl=60, max_stale=600))
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return {"object": "list", "data": [{"id": "model-a", "object": "model", "owned_by": "gateway"}]}
+
+        monkeypatch.setattr(unified_gateway_router, "_fetch_gateway_models", fetch)
+
+        responses = await asyncio.gather(*(unified_gateway_router.list_models(_request()) for _ in range(5)))
+        assert len(calls) == 1
+        assert all(response.status_code == 200 for response in responses)
+
+        etag = responses[0].headers["etag"]
+        response = await unified_gateway_router.list_models(_request(if_none_match=etag))
+        assert response.status_code == 304
+        assert len(calls) == 1
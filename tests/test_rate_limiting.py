@@ -322,6 +322,98 @@ class TestRateLimiter:
         assert limiter.current_interval_ms > limiter.current_interval_ms * 0.5
 
 
+class TestTokenBucketLimiter:
+    """测试令牌桶（GCRA）限流器"""
+
+    def test_burst_then_rate(self):
+        """测试突发额度用完后按速率放行"""
+        from src.rate_limiter import TokenBucketLimiter
+
+        limiter = TokenBucketLimiter(rate=10, burst=3)
+        now = 100.0
+        assert [limiter.reserve(now) for _ in range(3)] == [0.0, 0.0, 0.0]
+        assert limiter.reserve(now) == pytest.approx(0.1)
+        assert limiter.reserve(now) == pytest.approx(0.2)
+
+        # 空闲足够久后恢复满额突发
+        assert not limiter.try_acquire(now)
+        assert [limiter.try_acquire(now + 10) for _ in range(4)] == [True, True, True, False]
+
+    def test_unlimited(self):
+        """测试 rate <= 0 时不限流"""
+        from src.rate_limiter import TokenBucketLimiter
+
+        limiter = TokenBucketLimiter.from_interval(0)
+        assert limiter.unlimited
+        assert all(limiter.try_acquire() for _ in range(100))
+
+    @pytest.mark.asyncio
+    async def test_waiters_released_by_deadline(self):
+        """测试多个等待者按各自截止时间放行，同一时刻可放行多个"""
+        from src.rate_limiter import TokenBucketLimiter
+
+        limiter = TokenBucketLimiter(rate=20, burst=5)
+        start = time.monotonic()
+        done = []
+
+        async def waiter(i):
+            await limiter.wait()
+            done.append((i, time.monotonic() - start))
+
+        await asyncio.gather(*(waiter(i) for i in range(10)))
+
+        # 前 5 个立即放行，其余每 50ms 一个，总耗时约 250ms
+        assert sum(1 for _, t in done if t < 0.02) == 5
+        assert [i for i, _ in done] == list(range(10))
+        assert 0.2 <= done[-1][1] < 0.4
+
+    @pytest.mark.asyncio
+    async def test_cancelled_waiter_refunds(self):
+        """测试最后一个预留的等待者被取消时归还额度"""
+        from src.rate_limiter import TokenBucketLimiter
+
+        limiter = TokenBucketLimiter(rate=5, burst=1)
+        await limiter.wait()
+        task = asyncio.create_task(limiter.wait())
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+        # 归还后下一次调用只需等待到原来的截止时间
+        assert limiter.reserve() <= 0.2
+
+    def test_keyed_buckets_and_eviction(self):
+        """测试按键独立限流与空闲键回收"""
+        from src.rate_limiter import KeyedTokenBucketLimiter
+
+        limiter = KeyedTokenBucketLimiter(rate=1, burst=2, sweep_interval=1000)
+        now = 100.0
+        assert limiter.reserve("a", now) == 0.0
+        assert limiter.reserve("a", now) == 0.0
+        assert limiter.reserve("a", now) == pytest.approx(1.0)
+        assert limiter.reserve("b", now) == 0.0
+        assert len(limiter) == 2
+
+        # b 在 101 秒恢复满额，a 在 103 秒
+        assert limiter.evict_idle(now=102.0) == 1
+        assert len(limiter) == 1
+        assert limiter.evict_idle(now=103.0) == 1
+        assert len(limiter) == 0
+
+    def test_keyed_auto_sweep(self):
+        """测试 reserve 时顺带清理空闲键"""
+        from src.rate_limiter import KeyedTokenBucketLimiter
+
+        limiter = KeyedTokenBucketLimiter(rate=1, burst=1, sweep_interval=60)
+        for i in range(100):
+            limiter.reserve(f"key{i}", now=0.0)
+        assert len(limiter) == 100
+
+        limiter.reserve("fresh", now=120.0)
+        assert len(limiter) == 1
+
+
 class TestRetryPolicies:
     """测试 antigravity_retry_policies 模块"""
 
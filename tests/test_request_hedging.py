@@ -0,0 +1,280 @@
+"""
+对冲请求测试
+
+- 主请求慢于对冲延迟时发出对冲请求，先成功的一方胜出，落败方被取消或释放
+- 主请求在延迟内完成、没有空闲额度、两边都失败、对冲创建失败或异常结束时的处理
+- 调用方被取消时两个请求都不会泄漏
+- 慢 BaseURL 的流式请求被对冲到下一个 BaseURL
+"""
+
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.request_hedging import HedgeStats, compute_hedge_delay, run_hedged
+
+
+class _Attempt:
+    def __init__(self, name, delay, ok=True):
+        self.name = name
+        self.delay = delay
+        self.ok = ok
+        self.cancelled = False
+
+    async def run(self):
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        return self
+
+
+def _run(primary, hedge, delay=0.05, stats=None):
+    discarded = []
+
+    async def make_hedge():
+        return hedge.run() if hedge is not None else None
+
+    async def discard(attempt):
+        discarded.append(attempt.name)
+
+    coro = run_hedged(
+        primary.run(), make_hedge, delay,
+        is_win=lambda a: a.ok, discard=discard, stats=stats,
+    )
+    return coro, discarded
+
+
+class TestRunHedged:
+
+    async def test_fast_primary_does_not_hedge(self):
+        stats = HedgeStats()
+        hedge = _Attempt("hedge", 0.0)
+        coro, discarded = _run(_Attempt("primary", 0.0), hedge, stats=stats)
+
+        assert (await coro).name == "primary"
+        assert stats.hedges_fired == 0
+        assert stats.requests == 1
+        assert discarded == []
+
+    async def test_hedge_wins_and_primary_is_cancelled(self):
+        stats = HedgeStats()
+        primary = _Attempt("primary", 5.0)
+        coro, discarded = _run(primary, _Attempt("hedge", 0.01), stats=stats)
+
+        started = asyncio.get_running_loop().time()
+        result = await coro
+        assert result.name == "hedge"
+        assert asyncio.get_running_loop().time() - started < 1.0
+        assert primary.cancelled
+        assert stats.hedge_wins == 1
+        assert stats.to_dict()["hedge_win_rate"] == 1.0
+
+    async def test_primary_wins_and_hedge_is_cancelled(self):
+        stats = HedgeStats()
+        hedge = _Attempt("hedge", 5.0)
+        coro, discarded = _run(_Attempt("primary", 0.08), hedge, stats=stats)
+
+        assert (await coro).name == "primary"
+        assert hedge.cancelled
+        assert stats.primary_wins == 1
+        assert stats.hedges_fired == 1
+
+    async def test_failed_hedge_waits_for_primary(self):
+        stats = HedgeStats()
+        coro, discarded = _run(_Attempt("primary", 0.1), _Attempt("hedge", 0.0, ok=False), stats=stats)
+
+        assert (await coro).name == "primary"
+        assert discarded == ["hedge"]
+        assert stats.primary_wins == 1
+
+    async def test_both_failed_returns_primary(self):
+        stats = HedgeStats()
+        coro, discarded = _run(
+            _Attempt("primary", 0.1, ok=False), _Attempt("hedge", 0.0, ok=False), stats=stats
+        )
+
+        assert (await coro).name == "primary"
+        assert discarded == ["hedge"]
+        assert stats.both_failed == 1
+
+    async def test_skipped_without_capacity(self):
+        stats = HedgeStats()
+        coro, _ = _run(_Attempt("primary", 0.1), None, stats=stats)
+
+        assert (await coro).name == "primary"
+        assert stats.hedges_skipped == 1
+        assert stats.hedges_fired == 0
+
+    async def test_make_hedge_error_keeps_primary(self):
+        stats = HedgeStats()
+        discarded = []
+
+        async def make_hedge():
+            raise RuntimeError("no client")
+
+        async def discard(attempt):
+            discarded.append(attempt.name)
+
+        result = await run_hedged(
+            _Attempt("primary", 0.1).run(), make_hedge, 0.02,
+            is_win=lambda a: a.ok, discard=discard, stats=stats,
+        )
+        assert result.name == "primary"
+        assert stats.hedges_skipped == 1
+        assert discarded == []
+
+    async def test_raising_hedge_falls_back_to_primary(self):
+        stats = HedgeStats()
+
+        async def broken_hedge():
+            raise RuntimeError("hedge exploded")
+
+        async def make_hedge():
+            return broken_hedge()
+
+        async def discard(attempt):
+            pass
+
+        result = await run_hedged(
+            _Attempt("primary", 0.1).run(), make_hedge, 0.02,
+            is_win=lambda a: a.ok, discard=discard, stats=stats,
+        )
+        assert result.name == "primary"
+        assert stats.hedges_fired == 1
+        assert stats.primary_wins == 1
+
+    async def test_caller_cancel_cancels_both(self):
+        primary = _Attempt("primary", 5.0)
+        hedge = _Attempt("hedge", 5.0)
+        coro, _ = _run(primary, hedge, stats=HedgeStats())
+
+        task = asyncio.create_task(coro)
+        await asyncio.sleep(0.1)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        await asyncio.sleep(0)
+        assert primary.cancelled and hedge.cancelled
+
+
+    @pytest.mark.parametrize("hedge", [None, _Attempt("hedge", 5.0)])
+    async def test_caller_cancel_after_primary_completes_discards_result(self, hedge):
+        # 主请求已返回（持有上游流和并发额度），调用方恰好在此时被取消
+        caller = None
+        primary = _Attempt("primary", 0.05 if hedge is None else 0.15)
+
+        async def run_then_cancel_caller():
+            result = await primary.run()
+            caller.cancel()
+            return result
+
+        discarded = []
+
+        async def make_hedge():
+            return hedge.run() if hedge is not None else None
+
+        async def discard(attempt):
+            await asyncio.sleep(0.01)
+            discarded.append(attempt.name)
+
+        caller = asyncio.create_task(run_hedged(
+            run_then_cancel_caller(), make_hedge, 0.01 if hedge is None else 0.05,
+            is_win=lambda a: a.ok, discard=discard, stats=HedgeStats(),
+        ))
+        with pytest.raises(asyncio.CancelledError):
+            await caller
+        assert discarded == ["primary"]
+        if hedge is not None:
+            assert hedge.cancelled
+
+
+def test_hedge_delay_is_clamped(monkeypatch):
+    monkeypatch.setenv("ANTIGRAVITY_HEDGE_DEFAULT_DELAY_SECONDS", "3")
+    assert compute_hedge_delay(None) == 3.0
+    assert compute_hedge_delay(0.01) == 0.5
+    assert compute_hedge_delay(120.0) == 10.0
+    assert compute_hedge_delay(2.5) == 2.5
+
+
+class _SSEServer:
+    """本地 SSE 上游，首个数据行之前等待 delay 秒"""
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.requests = 0
+        self.server = None
+        self._writers = set()
+
+    async def start(self) -> str:
+        self.server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        return f"http://127.0.0.1:{self.server.sockets[0].getsockname()[1]}"
+
+    async def stop(self) -> None:
+        self.server.close()
+        for writer in list(self._writers):
+            writer.close()
+        await self.server.wait_closed()
+
+    async def _handle(self, reader, writer):
+        self._writers.add(writer)
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+            for line in head.split(b"\r\n"):
+                if line.lower().startswith(b"content-length:"):
+                    await reader.readexactly(int(line.split(b":", 1)[1]))
+            self.requests += 1
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nTransfer-Encoding: chunked\r\n\r\n")
+            await writer.drain()
+            await asyncio.sleep(self.delay)
+            body = b'data: {"ok": true}\n\n'
+            writer.write(b"%x\r\n%s\r\n0\r\n\r\n" % (len(body), body))
+            await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+
+async def test_slow_base_url_is_hedged(monkeypatch):
+    import httpx
+
+    import src.antigravity_api as antigravity_api
+
+    monkeypatch.setenv("ANTIGRAVITY_HEDGING_ENABLED", "true")
+    monkeypatch.setenv("ANTIGRAVITY_HEDGE_DEFAULT_DELAY_SECONDS", "0.1")
+    monkeypatch.setenv("ANTIGRAVITY_HEDGE_MIN_DELAY_SECONDS", "0.05")
+    stats = HedgeStats()
+    monkeypatch.setattr(antigravity_api, "get_hedge_stats", lambda: stats)
+    monkeypatch.setattr(antigravity_api, "_try_throttle_antigravity_upstream", lambda cred: True)
+
+    async def new_client():
+        return httpx.AsyncClient()
+
+    monkeypatch.setattr(antigravity_api, "create_streaming_client_with_kwargs", new_client)
+
+    slow, fast = _SSEServer(5.0), _SSEServer(0.0)
+    slow_url, fast_url = await slow.start(), await fast.start()
+    primary = antigravity_api._StreamAttempt(httpx.AsyncClient(), slow_url, None)
+
+    attempt = await antigravity_api._open_antigravity_stream(
+        primary, [slow_url, fast_url], 0, "hedge-test.json", "hedge-test-model",
+        {"model": "hedge-test-model"}, {}, first_chunk_timeout=10.0,
+    )
+    try:
+        assert attempt.url == fast_url
+        assert attempt.succeeded
+        assert attempt.first_line.startswith("data:")
+        assert stats.hedge_wins == 1
+        # 落败的主请求已释放
+        assert primary.client.is_closed
+    finally:
+        await attempt.discard()
+        await slow.stop()
+        await fast.stop()
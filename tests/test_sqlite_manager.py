@@ -0,0 +1,288 @@
+"""
+SQLiteManager 连接池、写回缓冲、冷却表与配额快照测试
+
+- 读写连接复用，关闭后可重新初始化
+- 写连接上未提交的事务不会泄漏给下一个调用方
+- 请求结果写回缓冲：合并、批量落盘、关闭时刷新
+- 模型冷却表：旧 JSON 列迁移与索引查询
+- 配额快照：选择只读快照，过期后后台刷新
+"""
+
+import asyncio
+import json
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.storage.credential_state_buffer import CredentialStateBuffer, CredentialStateDelta
+from src.storage.sqlite_manager import SQLiteManager
+
+
+@pytest.fixture
+async def manager(tmp_path, monkeypatch):
+    monkeypatch.setenv("CREDENTIALS_DIR", str(tmp_path))
+    monkeypatch.setenv("SQLITE_READ_CONNECTIONS", "2")
+    manager = SQLiteManager()
+    await manager.initialize()
+    yield manager
+    await manager.close()
+
+
+class TestConnectionPool:
+
+    async def test_connections_are_reused(self, manager):
+        async with manager._conn_pool.reader() as first:
+            pass
+        await manager.store_credential("a.json", {"access_token": "a"})
+        async with manager._conn_pool.writer() as writer:
+            pass
+
+        seen = set()
+        for _ in range(5):
+            async with manager._conn_pool.reader() as db:
+                seen.add(id(db))
+        assert len(seen) <= 2
+        assert id(first) in seen
+        assert writer is manager._conn_pool._writer
+
+    async def test_readers_see_committed_writes(self, manager):
+        await manager.store_credential("a.json", {"access_token": "a"})
+        await manager.update_credential_state("a.json", {"disabled": True})
+
+        results = await asyncio.gather(*(manager.get_credential_state("a.json") for _ in range(6)))
+        assert all(state["disabled"] for state in results)
+
+    async def test_uncommitted_write_is_rolled_back(self, manager):
+        await manager.store_credential("a.json", {"access_token": "a"})
+
+        with pytest.raises(RuntimeError):
+            async with manager._conn_pool.writer() as db:
+                await db.execute("UPDATE credentials SET disabled = 1 WHERE filename = ?", ("a.json",))
+                raise RuntimeError("boom")
+
+        # 下一个写入方的 commit 不会把上面的半截事务一起提交
+        await manager.set_config("k", "v")
+        state = await manager.get_credential_state("a.json")
+        assert state["disabled"] is False
+
+    async def test_reinitialize_after_close(self, manager):
+        await manager.store_credential("a.json", {"access_token": "a"})
+        await manager.close()
+        assert manager._conn_pool is None
+
+        await manager.initialize()
+        assert await manager.get_credential("a.json") == {"access_token": "a"}
+
+
+class TestStateBuffer:
+
+    async def test_results_are_coalesced_and_flushed(self, manager):
+        await manager.store_credential("a.json", {"access_token": "a"})
+        await manager.get_next_available_credential(model_key="pro")
+        until = time.time() + 300
+
+        manager.record_call_result("a.json", False, error_code=500)
+        manager.record_call_result("a.json", False, error_code=429, model_key="pro", cooldown_until=until)
+        manager.record_call_result("a.json", False, error_code=429)
+
+        # 冷却立即对选择生效，数据库尚未写入
+        assert await manager.get_earliest_model_cooldown("pro") == pytest.approx(until)
+        assert (await manager.get_credential_state("a.json"))["error_codes"] == []
+        assert manager._state_buffer.pending_count == 1
+
+        assert await manager.flush_state_buffer() == 1
+        state = await manager.get_credential_state("a.json")
+        assert state["error_codes"] == [500, 429]
+        assert state["model_cooldowns"] == {"pro": pytest.approx(until)}
+
+        manager.record_call_result("a.json", True, model_key="pro")
+        await manager.flush_state_buffer()
+        state = await manager.get_credential_state("a.json")
+        assert state["error_codes"] == []
+        assert state["model_cooldowns"] == {}
+
+        manager._pools[False].invalidate()
+        scores = await manager.get_credential_health_scores(["a.json"])
+        async with manager._conn_pool.reader() as db:
+            async with db.execute(
+                "SELECT success_count, failure_count FROM credentials WHERE filename = ?", ("a.json",)
+            ) as cursor:
+                assert await cursor.fetchone() == (1, 3)
+        assert scores["a.json"] < 100
+
+    async def test_close_flushes_pending_results(self, manager):
+        await manager.store_credential("a.json", {"access_token": "a"})
+        manager.record_call_result("a.json", False, error_code=403)
+
+        await manager.close()
+        await manager.initialize()
+        assert (await manager.get_credential_state("a.json"))["error_codes"] == [403]
+
+    async def test_direct_cooldown_write_wins_over_pending(self, manager):
+        await manager.store_credential("a.json", {"access_token": "a"})
+        until = time.time() + 300
+
+        manager.record_call_result("a.json", True, model_key="pro")
+        await manager.set_model_cooldown("a.json", "pro", until)
+        await manager.flush_state_buffer()
+
+        state = await manager.get_credential_state("a.json")
+        assert state["model_cooldowns"] == {"pro": pytest.approx(until)}
+
+    async def test_failed_flush_is_retried(self):
+        attempts = []
+
+        async def flaky_flush(deltas):
+            attempts.append([(d.filename, d.failure_count) for d in deltas])
+            if len(attempts) == 1:
+                raise RuntimeError("disk full")
+
+        buffer = CredentialStateBuffer(flaky_flush)
+        buffer.record(CredentialStateDelta("a.json", failure_count=1, error_codes_added=[500]))
+        assert await buffer.flush() == 0
+
+        buffer.record(CredentialStateDelta("a.json", failure_count=1, error_codes_added=[429]))
+        assert await buffer.flush() == 1
+        assert attempts[-1] == [("a.json", 2)]
+        assert buffer.stats.total_failed == 1
+
+
+class TestCooldownTable:
+
+    async def test_migrates_json_column(self, tmp_path, monkeypatch):
+        import aiosqlite
+
+        monkeypatch.setenv("CREDENTIALS_DIR", str(tmp_path))
+        manager = SQLiteManager()
+        await manager.initialize()
+        await manager.store_credential("a.json", {"access_token": "a"})
+        await manager.close()
+
+        until = time.time() + 300
+        async with aiosqlite.connect(os.path.join(tmp_path, "credentials.db")) as db:
+            await db.execute(
+                "UPDATE credentials SET model_cooldowns = ? WHERE filename = ?",
+                (json.dumps({"pro": until, "flash": time.time() - 10}), "a.json"),
+            )
+            await db.commit()
+
+        await manager.initialize()
+        try:
+            state = await manager.get_credential_state("a.json")
+            assert state["model_cooldowns"] == {"pro": pytest.approx(until)}
+            async with manager._conn_pool.reader() as db:
+                async with db.execute("SELECT model_cooldowns FROM credentials") as cursor:
+                    assert (await cursor.fetchone())[0] == "{}"
+        finally:
+            await manager.close()
+
+    async def test_indexed_cooldown_queries(self, manager):
+        for name in ("a.json", "b.json", "c.json"):
+            await manager.store_credential(name, {"access_token": name})
+        until = time.time() + 300
+        await manager.set_model_cooldown("a.json", "pro", until)
+        await manager.set_model_cooldown("b.json", "pro", until + 60)
+        await manager.set_model_cooldown("c.json", "flash", until)
+
+        # 凭证池未加载：走索引查询
+        assert not manager._pools[False].loaded
+        assert await manager.get_earliest_model_cooldown("pro") == pytest.approx(until)
+        assert await manager.get_available_credentials_list(model_key="pro") == ["c.json"]
+        assert await manager.get_available_credentials_list() == ["a.json", "b.json", "c.json"]
+
+        async with manager._conn_pool.reader() as db:
+            async with db.execute(
+                "EXPLAIN QUERY PLAN SELECT MIN(cooldown_until) FROM credential_cooldowns "
+                "WHERE model_key = ? AND cooldown_until > ?",
+                ("pro", 0),
+            ) as cursor:
+                plan = " ".join(str(row[-1]) for row in await cursor.fetchall())
+        assert "idx_cooldowns_model_until" in plan
+
+    async def test_summary_cooldown_filter_and_delete_cascade(self, manager):
+        await manager.store_credential("a.json", {"access_token": "a"})
+        await manager.store_credential("b.json", {"access_token": "b"})
+        await manager.set_model_cooldown("a.json", "pro", time.time() + 300)
+        await manager.set_model_cooldown("b.json", "pro", time.time() - 1)
+
+        cooling = await manager.get_credentials_summary(cooldown_filter="in_cooldown")
+        assert [item["filename"] for item in cooling["items"]] == ["a.json"]
+        idle = await manager.get_credentials_summary(cooldown_filter="no_cooldown")
+        assert [item["filename"] for item in idle["items"]] == ["b.json"]
+        assert idle["items"][0]["model_cooldowns"] == {}
+
+        await manager.delete_credential("a.json")
+        async with manager._conn_pool.reader() as db:
+            async with db.execute("SELECT COUNT(*) FROM credential_cooldowns WHERE filename = 'a.json'") as cursor:
+                assert (await cursor.fetchone())[0] == 0
+
+    async def test_update_state_replaces_cooldowns(self, manager):
+        await manager.store_credential("a.json", {"access_token": "a"})
+        until = time.time() + 300
+        await manager.set_model_cooldown("a.json", "flash", until)
+
+        assert await manager.update_credential_state("a.json", {"model_cooldowns": {"pro": until}})
+        state = await manager.get_credential_state("a.json")
+        assert state["model_cooldowns"] == {"pro": pytest.approx(until)}
+
+        assert await manager.clear_expired_model_cooldowns() == 0
+        await manager.clear_all_model_cooldowns("a.json")
+        assert (await manager.get_credential_state("a.json"))["model_cooldowns"] == {}
+
+
+class TestQuotaSnapshots:
+
+    async def test_selection_does_not_wait_for_quota_fetch(self, manager, monkeypatch):
+        import src.antigravity_api as antigravity_api
+
+        fetch_started = asyncio.Event()
+        release = asyncio.Event()
+
+        async def slow_fetch(access_token, cache_key=None, force_refresh=False):
+            fetch_started.set()
+            await release.wait()
+            return {"success": True, "models": {"claude-sonnet": {"remaining": 0.9}}}
+
+        monkeypatch.setattr(antigravity_api, "fetch_quota_info", slow_fetch)
+        await manager.store_credential("ag_a.json", {"access_token": "a"}, is_antigravity=True)
+
+        # 没有快照：不等待网络，按未知配额直接选出
+        filename, _ = await asyncio.wait_for(
+            manager.get_next_available_credential(is_antigravity=True, model_key="claude"), timeout=0.5
+        )
+        assert filename == "ag_a.json"
+        await asyncio.wait_for(fetch_started.wait(), timeout=1.0)
+
+        release.set()
+        await manager._quota_refresher._task
+        snapshot = manager.get_quota_snapshot("ag_a.json")
+        assert snapshot.models == {"claude-sonnet": pytest.approx(0.9)}
+
+    async def test_low_quota_excluded_and_stale_snapshot_served(self, manager, monkeypatch):
+        from src.storage.quota_snapshot import QuotaSnapshot
+
+        requested = []
+        monkeypatch.setattr(manager._quota_refresher, "request", lambda names: requested.extend(names))
+
+        await manager.store_credential("ag_a.json", {"access_token": "a"}, is_antigravity=True)
+        await manager.store_credential("ag_b.json", {"access_token": "b"}, is_antigravity=True)
+        await manager.store_quota_snapshot("ag_a.json", QuotaSnapshot({"claude-sonnet": 0.05}, time.time()))
+        # 过期快照仍被使用，同时请求后台刷新
+        await manager.store_quota_snapshot("ag_b.json", QuotaSnapshot({"claude-sonnet": 0.8}, time.time() - 3600))
+
+        for _ in range(20):
+            filename, _ = await manager.get_next_available_credential(is_antigravity=True, model_key="claude")
+            assert filename == "ag_b.json"
+        assert requested == ["ag_b.json"]
+
+        # 快照持久化，重启后仍可用
+        await manager.close()
+        await manager.initialize()
+        assert manager.get_quota_snapshot("ag_a.json").models == {"claude-sonnet": pytest.approx(0.05)}
+
+        await manager.delete_credential("ag_a.json", is_antigravity=True)
+        assert manager.get_quota_snapshot("ag_a.json") is None
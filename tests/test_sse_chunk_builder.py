@@ -0,0 +1,138 @@
+"""
+SSEChunkBuilder 预渲染模板测试
+
+- 每种 chunk 与逐个构造字典再序列化的结果逐字节一致
+- 固定前缀只在构造时渲染一次，文本增量只转义 delta 文本
+- OpenAI 流式转换器输出可以被逐行解析，id / created / model 在整个流内不变
+"""
+
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src import json_codec
+from src.antigravity_router import convert_antigravity_stream_to_openai
+from src.stream_error_handler import SSEChunkBuilder
+
+
+USAGE = {"prompt_tokens": 10, "completion_tokens": 2, "total_tokens": 12}
+
+
+def _reference(choices, usage=None, model='gemini-2.5-pro "preview"') -> str:
+    chunk = {
+        "id": "chatcmpl-1",
+        "object": "chat.completion.chunk",
+        "created": 1760000000,
+        "model": model,
+        "choices": choices,
+    }
+    if usage:
+        chunk["usage"] = usage
+    return f"data: {json_codec.dumps(chunk)}\n\n"
+
+
+@pytest.fixture
+def builder():
+    return SSEChunkBuilder("chatcmpl-1", 'gemini-2.5-pro "preview"', 1760000000)
+
+
+class TestParity:
+
+    @pytest.mark.parametrize("text", ["Hello", "", "你好\n\t\"quoted\" \\ 🎉 \x00\x1f", " \ud800"])
+    def test_content_chunk(self, builder, text):
+        assert builder.build_content_chunk(text) == _reference(
+            [{"index": 0, "delta": {"content": text}, "finish_reason": None}]
+        )
+        assert builder.build_content_chunk(text, "stop") == _reference(
+            [{"index": 0, "delta": {"content": text}, "finish_reason": "stop"}]
+        )
+
+    def test_tool_calls_chunk(self, builder):
+        tool_calls = [{"index": 0, "id": "call_1", "type": "function",
+                       "function": {"name": "read_file", "arguments": "{\"path\": \"a.py\"}"}}]
+        assert builder.build_tool_calls_chunk(tool_calls) == _reference(
+            [{"index": 0, "delta": {"tool_calls": tool_calls}, "finish_reason": None}]
+        )
+
+    def test_finish_chunk(self, builder):
+        assert builder.build_finish_chunk("stop") == _reference(
+            [{"index": 0, "delta": {}, "finish_reason": "stop"}]
+        )
+        assert builder.build_finish_chunk("length", USAGE) == _reference(
+            [{"index": 0, "delta": {}, "finish_reason": "length"}], USAGE
+        )
+
+    def test_delta_and_choices_chunk(self, builder):
+        delta = {"role": "assistant", "content": "x", "reasoning_content": "y"}
+        assert builder.build_delta_chunk(delta, "stop", USAGE) == _reference(
+            [{"index": 0, "delta": delta, "finish_reason": "stop"}], USAGE
+        )
+        choices = [{"index": 1, "delta": {"content": "z"}, "finish_reason": None}]
+        assert builder.build_choices_chunk(choices) == _reference(choices)
+        assert builder.build_choices_chunk(choices, USAGE) == _reference(choices, USAGE)
+
+    def test_content_chunk_does_not_reserialize_header(self, builder, monkeypatch):
+        calls = []
+        monkeypatch.setattr(json_codec, "dumps", lambda *args, **kwargs: calls.append(args))
+        builder.build_content_chunk("Hello")
+        assert calls == []
+
+    @pytest.mark.parametrize("text", ["ab\ud83d", "你好\udc00", "😀"])
+    def test_surrogates_are_escaped(self, builder, text):
+        # 截断的 emoji 等孤立代理字符转义为 \udXXX，整帧可以编码为 UTF-8 写出
+        for chunk in (builder.build_content_chunk(text), builder.build_delta_chunk({"content": text})):
+            chunk.encode("utf-8")
+            assert json.loads(chunk[6:])["choices"][0]["delta"]["content"] == text
+        assert "\\ud83d" in builder.build_content_chunk("ab\ud83d")
+        assert builder.build_content_chunk(text) == _reference(
+            [{"index": 0, "delta": {"content": text}, "finish_reason": None}]
+        )
+
+
+async def _aiter(items):
+    for item in items:
+        yield item
+
+
+class _NullCtx:
+    async def __aexit__(self, *args):
+        return None
+
+
+class TestOpenAIStream:
+
+    async def test_stream_chunks_share_header(self):
+        def line(parts, finish=None):
+            candidate = {"content": {"role": "model", "parts": parts}}
+            if finish:
+                candidate["finishReason"] = finish
+            data = {"response": {"candidates": [candidate],
+                                 "usageMetadata": {"promptTokenCount": 5, "candidatesTokenCount": 2,
+                                                   "totalTokenCount": 7}}}
+            return f"data: {json.dumps(data)}"
+
+        upstream = [
+            line([{"text": "Hel"}]),
+            line([{"text": "lo"}]),
+            line([{"functionCall": {"name": "read_file", "args": {"path": "a.py"}}}], "STOP"),
+        ]
+        out = []
+        async for chunk in convert_antigravity_stream_to_openai(
+            _aiter(upstream), _NullCtx(), None, "gemini-2.5-pro", "chatcmpl-1", None, None
+        ):
+            out.append(chunk)
+
+        assert out[-1] == "data: [DONE]\n\n"
+        chunks = [json.loads(c[6:]) for c in out[:-1]]
+        assert {(c["id"], c["created"], c["model"]) for c in chunks} == {
+            ("chatcmpl-1", chunks[0]["created"], "gemini-2.5-pro")
+        }
+        assert "".join(c["choices"][0]["delta"].get("content", "") for c in chunks) == "Hello"
+        assert chunks[2]["choices"][0]["delta"]["tool_calls"][0]["function"]["name"] == "read_file"
+        usage_chunks = [c for c in chunks if "usage" in c]
+        assert usage_chunks[0]["choices"][0]["finish_reason"] == "tool_calls"
+        assert usage_chunks[0]["usage"] == {"prompt_tokens": 5, "completion_tokens": 2, "total_tokens": 7}
@@ -0,0 +1,181 @@
+"""
+SSE 增量解码器测试
+
+- 任意位置切分 chunk（包括 \\r\\n 中间、UTF-8 多字节字符中间、BOM 中间）结果一致
+- 多行 data、event / id / retry 字段、注释行与空 data 按规范处理
+- SSEParser 与各转换器基于同一个解码器
+- json_lines 模式兼容事件之间省略空行的上游（逐行 JSON），符合规范的流结果不变
+"""
+
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.gateway.sse import SSEDecoder, SSEParser, iter_sse_events
+from src.gateway.sse.converter import convert_sse_to_augment_ndjson
+
+
+STREAM = (
+    "﻿: keep-alive comment\r\n"
+    "event: message_start\r\n"
+    'data: {"type":"message_start","message":{"id":"m1"}}\r\n'
+    "\r\n"
+    "data: line one\r"
+    "data:line two\r"
+    "\r"
+    "id: 42\n"
+    "data\n"
+    "\n"
+    "event: ping\n"
+    "\n"
+    "retry: 1500\n"
+    "unknown: field\n"
+    'data: {"text":"你好，世界 🎉"}\n'
+    "\n"
+    "data: [DONE]\n"
+).encode("utf-8")
+
+EXPECTED = [
+    ("message_start", '{"type":"message_start","message":{"id":"m1"}}', None, None),
+    ("message", "line one\nline two", None, None),
+    ("message", "", "42", None),
+    ("message", '{"text":"你好，世界 🎉"}', "42", 1500),
+    ("message", "[DONE]", "42", None),
+]
+
+
+def _decode(parts, json_lines=False):
+    decoder = SSEDecoder(json_lines=json_lines)
+    events = []
+    for part in parts:
+        events.extend(decoder.feed(part))
+    events.extend(decoder.flush())
+    return [(e.event, e.data, e.id, e.retry) for e in events]
+
+
+def _split(data: bytes, cuts):
+    bounds = [0] + sorted(cuts) + [len(data)]
+    return [data[a:b] for a, b in zip(bounds, bounds[1:])]
+
+
+class TestSSEDecoder:
+
+    def test_whole_stream(self):
+        assert _decode([STREAM]) == EXPECTED
+
+    def test_byte_by_byte(self):
+        assert _decode([STREAM[i:i + 1] for i in range(len(STREAM))]) == EXPECTED
+
+    @pytest.mark.parametrize("cut", range(1, len(STREAM)))
+    def test_every_single_split_point(self, cut):
+        assert _decode(_split(STREAM, [cut])) == EXPECTED
+
+    def test_random_splits(self):
+        rng = random.Random(1234)
+        for _ in range(300):
+            cuts = rng.sample(range(1, len(STREAM)), rng.randint(2, 20))
+            assert _decode(_split(STREAM, cuts)) == EXPECTED
+
+    def test_str_chunks(self):
+        text = STREAM.decode("utf-8")
+        assert _decode([text[:50], text[50:]]) == EXPECTED
+
+    def test_event_without_data_is_not_dispatched(self):
+        assert _decode([b"event: ping\n\n: comment\n\n"]) == []
+
+    def test_large_event_split_into_many_chunks(self):
+        payload = "x" * 200_000
+        stream = f"data: {payload}\n\n".encode()
+        events = _decode([stream[i:i + 1000] for i in range(0, len(stream), 1000)])
+        assert events == [("message", payload, None, None)]
+
+    def test_many_events_in_one_chunk(self):
+        stream = b"".join(b'data: {"i":%d}\n\n' % i for i in range(5000))
+        decoder = SSEDecoder()
+        events = decoder.feed(stream)
+        assert [e.json()["i"] for e in events] == list(range(5000))
+        assert decoder.flush() == []
+
+
+
+LENIENT = b'data: {"a":1}\ndata: {"b":2}\ndata: not json\ndata: [DONE]\n'
+
+
+class TestJsonLines:
+
+    def test_spec_stream_unchanged(self):
+        assert _decode([STREAM], json_lines=True) == EXPECTED
+        assert _decode([STREAM[i:i + 1] for i in range(len(STREAM))], json_lines=True) == EXPECTED
+
+    def test_multiline_json_still_joined(self):
+        stream = b'data: {"a":\ndata: 1}\n\n'
+        assert _decode([stream[i:i + 1] for i in range(len(stream))], json_lines=True) == [
+            ("message", '{"a":\n1}', None, None)
+        ]
+
+    def test_spec_mode_joins_lines(self):
+        assert [e[1] for e in _decode([LENIENT])] == ['{"a":1}\n{"b":2}\nnot json\n[DONE]']
+
+    @pytest.mark.parametrize("size", [1, 3, 7, len(LENIENT)])
+    def test_missing_blank_lines(self, size):
+        events = _decode([LENIENT[i:i + size] for i in range(0, len(LENIENT), size)], json_lines=True)
+        data = [e[1] for e in events]
+        assert '{"a":1}' in data and '{"b":2}' in data and "[DONE]" in data
+        assert data.index('{"a":1}') < data.index('{"b":2}') < data.index("[DONE]")
+
+    def test_event_dispatched_without_waiting_for_blank_line(self):
+        decoder = SSEDecoder(json_lines=True)
+        assert [e.data for e in decoder.feed(b'data: {"a":1}\n')] == ['{"a":1}']
+        assert [e.data for e in decoder.feed(b'data: {"b":')] == []
+        assert [e.data for e in decoder.feed(b'2}\n\n')] == ['{"b":2}']
+        assert decoder.flush() == []
+
+    def test_parser_lines_without_blank_separator(self):
+        assert SSEParser().feed('data: {"a":1}\ndata: {"b":2}\n') == [{"a": 1}, {"b": 2}]
+        parser = SSEParser()
+        events = parser.feed(LENIENT) + parser.flush()
+        assert events == [{"a": 1}, {"b": 2}, {"done": True}]
+
+async def _aiter(items):
+    for item in items:
+        yield item
+
+
+class TestConsumers:
+
+    async def test_iter_sse_events_flushes_trailing_event(self):
+        events = [e async for e in iter_sse_events(_aiter([b"data: a\n\ndata: b", b""]))]
+        assert [e.data for e in events] == ["a", "b"]
+
+    def test_sse_parser(self):
+        parser = SSEParser()
+        stream = b'data: {"a":1}\r\n\r\ndata: not json\n\ndata: [DONE]'
+        events = []
+        for i in range(0, len(stream), 3):
+            events.extend(parser.feed(stream[i:i + 3]))
+        events.extend(parser.flush())
+        assert events == [{"a": 1}, {"done": True}]
+
+    async def test_augment_ndjson_conversion_across_chunks(self):
+        stream = (
+            'data: {"choices":[{"delta":{"content":"Hel"}}]}\n\n'
+            'data: {"choices":[{"delta":{"content":"lo"},"finish_reason":"stop"}]}\n\n'
+            "data: [DONE]\n\n"
+        ).encode()
+        parts = [stream[i:i + 7] for i in range(0, len(stream), 7)]
+        lines = [line async for line in convert_sse_to_augment_ndjson(_aiter(parts))]
+        assert lines == ['{"text":"Hel"}\n', '{"text":"lo"}\n']
+
+    async def test_augment_ndjson_without_blank_lines(self):
+        stream = (
+            'data: {"choices":[{"delta":{"content":"Hel"}}]}\n'
+            'data: {"choices":[{"delta":{"content":"lo"},"finish_reason":"stop"}]}\n'
+            "data: [DONE]\n"
+        ).encode()
+        parts = [stream[i:i + 5] for i in range(0, len(stream), 5)]
+        lines = [line async for line in convert_sse_to_augment_ndjson(_aiter(parts))]
+        assert lines == ['{"text":"Hel"}\n', '{"text":"lo"}\n']
@@ -0,0 +1,231 @@
+"""
+流式请求取消测试
+
+- 客户端断开后 100ms 内关闭上游连接（等待上游数据时 / 上游持续输出时）
+- 断开后释放并发额度并记录部分用量
+- 网关回写包装器被关闭时关闭内层上游流
+"""
+
+import asyncio
+import json
+import os
+import sys
+import time
+
+import httpx
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import src.antigravity_router as antigravity_router
+import src.unified_gateway_router as unified_gateway_router
+from src.antigravity_api import _StreamCtxWrapper
+from src.stream_cancellation import CancellableStreamingResponse
+
+
+# ASGI 2.4 起服务器不再要求应用监听 http.disconnect，StreamingResponse 只在下一次发送失败时才发现断开
+_SCOPE = {"type": "http", "asgi": {"version": "3.0", "spec_version": "2.4"}}
+
+
+def _sse_line(text: str, output_tokens: int) -> bytes:
+    data = {
+        "response": {
+            "candidates": [{"content": {"parts": [{"text": text}]}}],
+            "usageMetadata": {"promptTokenCount": 100, "candidatesTokenCount": output_tokens},
+        }
+    }
+    return f"data: {json.dumps(data)}\n\n".encode()
+
+
+class _SSEServer:
+    """本地 SSE 上游：先输出若干行，之后按 interval 持续输出（interval 为 None 时保持静默），记录连接关闭时间"""
+
+    def __init__(self, initial_lines: int = 1, interval: float | None = None):
+        self.initial_lines = initial_lines
+        self.interval = interval
+        self.closed_at: float | None = None
+        self.closed = asyncio.Event()
+        self.server = None
+
+    async def start(self) -> str:
+        self.server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        return f"http://127.0.0.1:{self.server.sockets[0].getsockname()[1]}"
+
+    async def stop(self) -> None:
+        self.server.close()
+        await self.server.wait_closed()
+
+    def _chunk(self, payload: bytes) -> bytes:
+        return b"%x\r\n%s\r\n" % (len(payload), payload)
+
+    async def _produce(self, writer) -> None:
+        for i in range(self.initial_lines):
+            writer.write(self._chunk(_sse_line(f"chunk {i}", i + 1)))
+        await writer.drain()
+        if self.interval is None:
+            return
+        i = self.initial_lines
+        while True:
+            await asyncio.sleep(self.interval)
+            i += 1
+            writer.write(self._chunk(_sse_line(f"chunk {i}", i)))
+            await writer.drain()
+
+    async def _handle(self, reader, writer):
+        producer = None
+        try:
+            await reader.readuntil(b"\r\n\r\n")
+            writer.write(
+                b"HTTP/1.1 200 OK\r\n"
+                b"Content-Type: text/event-stream\r\n"
+                b"Transfer-Encoding: chunked\r\n\r\n"
+            )
+            producer = asyncio.ensure_future(self._produce(writer))
+            # 客户端关闭连接时读到 EOF
+            while await reader.read(1024):
+                pass
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.closed_at = time.monotonic()
+            self.closed.set()
+            if producer is not None:
+                producer.cancel()
+            writer.close()
+
+
+class _Permit:
+    def __init__(self):
+        self.released = False
+
+    def release(self):
+        self.released = True
+
+
+async def _open_upstream(url: str):
+    client = httpx.AsyncClient(timeout=5.0)
+    stream_ctx = client.stream("POST", url, json={})
+    response = await stream_ctx.__aenter__()
+    permit = _Permit()
+    return response.aiter_lines(), _StreamCtxWrapper(stream_ctx, permit), client, permit
+
+
+async def _disconnect_after_first_chunk(response) -> float:
+    """以 ASGI 方式运行响应，收到首个 body 后模拟客户端断开，返回断开时间"""
+    inbox: asyncio.Queue = asyncio.Queue()
+    first_body = asyncio.Event()
+
+    async def receive():
+        return await inbox.get()
+
+    async def send(message):
+        if message["type"] == "http.response.body" and message.get("body"):
+            first_body.set()
+
+    task = asyncio.ensure_future(response(_SCOPE, receive, send))
+    await asyncio.wait_for(first_body.wait(), 2)
+    disconnected_at = time.monotonic()
+    await inbox.put({"type": "http.disconnect"})
+    await asyncio.wait_for(task, 2)
+    return disconnected_at
+
+
+@pytest.fixture
+def partial_usage(monkeypatch):
+    events = []
+
+    def record(source, **kwargs):
+        events.append((source, kwargs))
+
+    monkeypatch.setattr(antigravity_router, "record_partial_usage", record)
+    return events
+
+
+class TestClientDisconnect:
+
+    async def test_idle_upstream_closed_within_100ms(self, partial_usage):
+        # 上游发出首行后静默（模型长时间思考），断开不能等到下一次发送才被发现
+        server = _SSEServer(initial_lines=1, interval=None)
+        url = await server.start()
+        try:
+            lines, stream_ctx, client, permit = await _open_upstream(url)
+            response = CancellableStreamingResponse(
+                antigravity_router.convert_antigravity_stream_to_openai(
+                    lines, stream_ctx, client, "gemini-2.5-pro", "req-1", None, None
+                ),
+                media_type="text/event-stream",
+            )
+
+            disconnected_at = await _disconnect_after_first_chunk(response)
+            await asyncio.wait_for(server.closed.wait(), 1)
+
+            assert server.closed_at - disconnected_at < 0.1
+            assert permit.released
+            source, usage = partial_usage[0]
+            assert source == "ANTIGRAVITY STREAM"
+            assert usage["model"] == "gemini-2.5-pro"
+            assert (usage["input_tokens"], usage["output_tokens"]) == (100, 1)
+        finally:
+            await server.stop()
+
+    async def test_busy_upstream_closed_within_100ms(self, partial_usage):
+        server = _SSEServer(initial_lines=3, interval=0.005)
+        url = await server.start()
+        try:
+            lines, stream_ctx, client, permit = await _open_upstream(url)
+            response = CancellableStreamingResponse(
+                antigravity_router.convert_antigravity_stream_to_gemini(
+                    lines, stream_ctx, client, None, None, model="gemini-2.5-flash"
+                ),
+                media_type="text/event-stream",
+            )
+
+            disconnected_at = await _disconnect_after_first_chunk(response)
+            await asyncio.wait_for(server.closed.wait(), 1)
+
+            assert server.closed_at - disconnected_at < 0.1
+            assert permit.released
+            source, usage = partial_usage[0]
+            assert source == "ANTIGRAVITY GEMINI"
+            assert usage["input_tokens"] == 100
+            assert usage["output_tokens"] >= 1
+        finally:
+            await server.stop()
+
+    async def test_completed_stream_is_not_cancelled(self, partial_usage):
+        async def body():
+            yield "data: a\n\n"
+            yield "data: b\n\n"
+
+        sent = []
+
+        async def receive():
+            await asyncio.sleep(10)
+
+        async def send(message):
+            sent.append(message)
+
+        await CancellableStreamingResponse(body())(_SCOPE, receive, send)
+
+        assert [m.get("body") for m in sent[1:]] == [b"data: a\n\n", b"data: b\n\n", b""]
+        assert partial_usage == []
+
+
+class TestGatewayWriteback:
+
+    async def test_closing_wrapper_closes_upstream(self):
+        closed = []
+
+        async def upstream():
+            try:
+                while True:
+                    yield 'data: {"choices": [{"delta": {"content": "x"}}]}\n\n'
+                    await asyncio.sleep(0)
+            finally:
+                closed.append(True)
+
+        wrapped = unified_gateway_router._wrap_stream_with_writeback(upstream(), "scid", None, [])
+        await wrapped.__anext__()
+        await wrapped.aclose()
+
+        assert closed == [True]
@@ -0,0 +1,217 @@
+"""
+流式文本合并测试
+
+- 窗口内连续到达的文本增量合并为一个 chunk，内容与顺序不变
+- 达到字符上限、窗口到期（上游停顿）时立即发出
+- 工具调用 / finish / [DONE] 等帧到达前先发出待合并文本
+- 首段文本与慢速上游不增加延迟
+- 未启用时原样透传，OpenAI 转换器输出与原来一致
+- 客户端断开时上游生成器被关闭
+"""
+
+import asyncio
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.antigravity_router import convert_antigravity_stream_to_openai
+from src.stream_coalescing import CoalescePolicy, TextDelta, coalesce_stream, get_coalesce_policy
+
+
+def _render(text):
+    return f"<{text}>"
+
+
+async def _timed(items):
+    """items: (延迟秒数, 帧)"""
+    for delay, item in items:
+        if delay:
+            await asyncio.sleep(delay)
+        yield item
+
+
+async def _collect(stream):
+    return [frame async for frame in stream]
+
+
+POLICY = CoalescePolicy(window_ms=50, max_chars=1024)
+
+
+class TestCoalescing:
+
+    async def test_merges_burst_within_window(self):
+        frames = [(0, TextDelta("Hel", _render))] + [(0, TextDelta(c, _render)) for c in "lo, world"]
+        out = await _collect(coalesce_stream(_timed(frames + [(0, "[DONE]")]), POLICY))
+        # 第一段立即发出，其余合并，[DONE] 前刷新
+        assert out == ["<Hel>", "<lo, world>", "[DONE]"]
+
+    async def test_flushes_before_other_frames(self):
+        frames = [
+            (0, TextDelta("a", _render)),
+            (0, TextDelta("b", _render)),
+            (0, TextDelta("c", _render)),
+            (0, "tool_call"),
+            (0, TextDelta("d", _render)),
+            (0, "finish"),
+        ]
+        out = await _collect(coalesce_stream(_timed(frames), POLICY))
+        assert out == ["<a>", "<bc>", "tool_call", "<d>", "finish"]
+
+    async def test_flushes_at_char_limit(self):
+        policy = CoalescePolicy(window_ms=1000, max_chars=4)
+        frames = [(0, TextDelta(c, _render)) for c in "abcdefghij"]
+        out = await _collect(coalesce_stream(_timed(frames), policy))
+        assert out == ["<a>", "<bcde>", "<fghi>", "<j>"]
+
+    async def test_window_expires_while_upstream_stalls(self):
+        loop = asyncio.get_running_loop()
+        frames = [
+            (0, TextDelta("a", _render)),
+            (0, TextDelta("b", _render)),
+            (0.3, "finish"),
+        ]
+        started = loop.time()
+        seen = []
+        async for frame in coalesce_stream(_timed(frames), CoalescePolicy(window_ms=20)):
+            seen.append((frame, loop.time() - started))
+        assert [f for f, _ in seen] == ["<a>", "<b>", "finish"]
+        # 待合并文本在窗口到期后发出，而不是等到上游下一帧
+        assert seen[1][1] < 0.2
+        assert seen[2][1] >= 0.25
+
+    async def test_first_text_after_other_frame_is_not_held(self):
+        loop = asyncio.get_running_loop()
+        frames = [(0, "role-frame"), (0, TextDelta("first text", _render)), (0.3, "finish")]
+        started = loop.time()
+        seen = []
+        async for frame in coalesce_stream(_timed(frames), POLICY):
+            seen.append((frame, loop.time() - started))
+        assert [f for f, _ in seen] == ["role-frame", "<first text>", "finish"]
+        assert seen[1][1] < 0.03
+
+    async def test_slow_upstream_is_not_delayed(self):
+        frames = [(0, TextDelta("a", _render)), (0.08, TextDelta("b", _render)), (0.08, TextDelta("c", _render))]
+        out = await _collect(coalesce_stream(_timed(frames), CoalescePolicy(window_ms=30)))
+        assert out == ["<a>", "<b>", "<c>"]
+
+    async def test_different_renderers_are_not_merged(self):
+        other = lambda text: f"[{text}]"
+        frames = [(0, TextDelta("a", _render)), (0, TextDelta("b", _render)), (0, TextDelta("c", other))]
+        out = await _collect(coalesce_stream(_timed(frames), POLICY))
+        assert out == ["<a>", "<b>", "[c]"]
+
+    async def test_disabled_policy_is_passthrough(self):
+        stream = _timed([(0, "x")])
+        assert coalesce_stream(stream, CoalescePolicy()) is stream
+        await stream.aclose()
+
+    async def test_upstream_closed_on_cancel(self):
+        closed = asyncio.Event()
+
+        async def upstream():
+            try:
+                yield TextDelta("a", _render)
+                yield TextDelta("b", _render)
+                await asyncio.sleep(10)
+                yield "never"
+            finally:
+                closed.set()
+
+        stream = coalesce_stream(upstream(), CoalescePolicy(window_ms=5))
+
+        async def consume():
+            async for _ in stream:
+                pass
+
+        task = asyncio.ensure_future(consume())
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        await stream.aclose()
+        assert closed.is_set()
+
+    async def test_upstream_closed_on_aclose_at_yield(self):
+        closed = asyncio.Event()
+
+        async def upstream():
+            try:
+                yield TextDelta("a", _render)
+                yield TextDelta("b", _render)
+                await asyncio.sleep(10)
+            finally:
+                closed.set()
+
+        stream = coalesce_stream(upstream(), CoalescePolicy(window_ms=5))
+        assert await stream.__anext__() == "<a>"
+        assert await stream.__anext__() == "<b>"
+        await stream.aclose()
+        assert closed.is_set()
+
+
+class TestPolicy:
+
+    def test_disabled_by_default(self, monkeypatch):
+        monkeypatch.delenv("STREAM_COALESCE_ENABLED", raising=False)
+        assert not get_coalesce_policy("cursor").enabled
+
+    def test_per_client_settings(self, monkeypatch):
+        monkeypatch.setenv("STREAM_COALESCE_ENABLED", "true")
+        monkeypatch.setenv("STREAM_COALESCE_WINDOW_MS", "15")
+        monkeypatch.setenv("STREAM_COALESCE_WINDOW_MS_CURSOR", "25")
+        monkeypatch.setenv("STREAM_COALESCE_WINDOW_MS_CLAUDE_CODE", "0")
+        assert get_coalesce_policy("cursor") == CoalescePolicy(window_ms=25, max_chars=1024)
+        assert get_coalesce_policy("cline").window_ms == 15
+        assert not get_coalesce_policy("claude_code").enabled
+
+    def test_client_allow_list(self, monkeypatch):
+        monkeypatch.setenv("STREAM_COALESCE_ENABLED", "1")
+        monkeypatch.setenv("STREAM_COALESCE_CLIENTS", "cursor, augment")
+        assert get_coalesce_policy("augment").enabled
+        assert not get_coalesce_policy("cline").enabled
+        assert not get_coalesce_policy(None).enabled
+
+
+class _NullCtx:
+    async def __aexit__(self, *args):
+        return None
+
+
+def _line(parts, finish=None):
+    candidate = {"content": {"role": "model", "parts": parts}}
+    if finish:
+        candidate["finishReason"] = finish
+    return f"data: {json.dumps({'response': {'candidates': [candidate]}})}"
+
+
+class TestOpenAIStream:
+
+    async def _run(self, upstream, coalesce):
+        stream = convert_antigravity_stream_to_openai(
+            _timed([(0, line) for line in upstream]), _NullCtx(), None, "gemini-2.5-pro", "chatcmpl-1",
+            None, None, coalesce=coalesce.enabled
+        )
+        return await _collect(coalesce_stream(stream, coalesce))
+
+    async def test_coalesced_stream_keeps_content_and_tool_boundary(self):
+        upstream = [_line([{"text": t}]) for t in ("Hel", "lo", " wor", "ld")]
+        upstream.append(_line([{"functionCall": {"name": "read_file", "args": {"path": "a.py"}}}], "STOP"))
+
+        plain = await self._run(upstream, CoalescePolicy())
+        merged = await self._run(upstream, POLICY)
+
+        def content(out):
+            chunks = [json.loads(c[6:]) for c in out if c != "data: [DONE]\n\n"]
+            return "".join(c["choices"][0]["delta"].get("content", "") for c in chunks), chunks
+
+        plain_text, plain_chunks = content(plain)
+        merged_text, merged_chunks = content(merged)
+        assert plain_text == merged_text == "Hello world"
+        assert len(merged_chunks) == len(plain_chunks) - 2
+        assert merged_chunks[1]["choices"][0]["delta"] == {"content": "lo world"}
+        assert "tool_calls" in merged_chunks[2]["choices"][0]["delta"]
+        assert merged[-1] == "data: [DONE]\n\n"
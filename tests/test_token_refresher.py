@@ -0,0 +1,165 @@
+"""
+TokenRefresher 单元测试
+
+- expiry 解析与缓存
+- 按过期时间排序的调度堆
+- 到期的活跃凭证被后台提前续期，闲置凭证跳过
+"""
+
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.credential_manager import CredentialManager
+from src.token_refresher import TokenRefresher, parse_expiry_timestamp
+
+
+def _expiry_in(seconds: float) -> str:
+    return (datetime.now(timezone.utc) + timedelta(seconds=seconds)).isoformat()
+
+
+class _FakeAdapter:
+    """只实现 TokenRefresher 用到的存储适配器方法"""
+
+    def __init__(self, credentials):
+        self.credentials = {k: dict(v) for k, v in credentials.items()}
+        self.states = {k: {"disabled": False} for k in credentials}
+        self._backend = self
+
+    async def get_credential_state(self, filename, is_antigravity=False):
+        return self.states.get(filename, {})
+
+    async def get_credential(self, filename, is_antigravity=False):
+        data = self.credentials.get(filename)
+        return dict(data) if data else None
+
+    async def store_credential(self, filename, credential_data, is_antigravity=False):
+        self.credentials[filename] = dict(credential_data)
+        return True
+
+
+def _make_refresher(credentials, lead_seconds=600, active_window=7200):
+    manager = CredentialManager()
+    manager._storage_adapter = _FakeAdapter(credentials)
+    manager._initialized = True
+    refresher = TokenRefresher(manager)
+    refresher.lead_seconds = lead_seconds
+    refresher.active_window_seconds = active_window
+    refresher._semaphore = asyncio.Semaphore(2)
+    manager._token_refresher = refresher
+    return manager, refresher
+
+
+class TestParseExpiry:
+
+    def test_formats(self):
+        ts = datetime(2030, 1, 1, tzinfo=timezone.utc).timestamp()
+        assert parse_expiry_timestamp("2030-01-01T00:00:00+00:00") == pytest.approx(ts)
+        assert parse_expiry_timestamp("2030-01-01T00:00:00Z") == pytest.approx(ts)
+        # 无时区按 UTC 处理
+        assert parse_expiry_timestamp("2030-01-01T00:00:00") == pytest.approx(ts)
+
+    def test_invalid(self):
+        assert parse_expiry_timestamp(None) is None
+        assert parse_expiry_timestamp("") is None
+        assert parse_expiry_timestamp("not-a-date") is None
+
+
+class TestSchedule:
+
+    def test_next_due_follows_earliest_expiry(self):
+        _, refresher = _make_refresher({})
+        refresher.schedule("late.json", {"refresh_token": "r", "expiry": _expiry_in(3600)})
+        refresher.schedule("early.json", {"refresh_token": "r", "expiry": _expiry_in(1200)})
+
+        due = refresher.next_due_at()
+        assert due == pytest.approx(time.time() + 1200 - 600, abs=2)
+
+        # 重新调度后旧的堆元素惰性失效
+        refresher.schedule("early.json", {"refresh_token": "r", "expiry": _expiry_in(7200)})
+        assert refresher.next_due_at() == pytest.approx(time.time() + 3600 - 600, abs=2)
+
+        refresher.unschedule("late.json")
+        assert refresher.next_due_at() == pytest.approx(time.time() + 7200 - 600, abs=2)
+
+    def test_without_refresh_token_is_not_scheduled(self):
+        _, refresher = _make_refresher({})
+        refresher.schedule("a.json", {"access_token": "x", "expiry": _expiry_in(60)})
+        assert refresher.next_due_at() is None
+
+
+class TestProactiveRefresh:
+
+    async def test_due_active_credential_is_refreshed(self):
+        stale = {"access_token": "old", "refresh_token": "r", "expiry": _expiry_in(120)}
+        idle = {"access_token": "old", "refresh_token": "r", "expiry": _expiry_in(120)}
+        manager, refresher = _make_refresher({"active.json": stale, "idle.json": idle})
+
+        refreshed = []
+
+        async def fake_refresh(credential_data, filename, is_antigravity=False):
+            refreshed.append(filename)
+            new_data = {**credential_data, "access_token": "new", "expiry": _expiry_in(3600)}
+            await manager._storage_adapter.store_credential(filename, new_data)
+            refresher.schedule(filename, new_data, is_antigravity)
+            return new_data
+
+        manager._refresh_token = fake_refresh
+
+        refresher.touch("active.json", stale)
+        refresher.schedule("idle.json", idle)
+        refresher._dispatch_due(time.time())
+        await asyncio.gather(*refresher._tasks)
+
+        assert refreshed == ["active.json"]
+        assert manager._storage_adapter.credentials["active.json"]["access_token"] == "new"
+        assert refresher.stats.proactive_refreshes == 1
+        # 续期后按新的过期时间重新入表
+        assert refresher.next_due_at() == pytest.approx(time.time() + 3600 - 600, abs=2)
+
+    async def test_failure_schedules_retry(self):
+        stale = {"access_token": "old", "refresh_token": "r", "expiry": _expiry_in(120)}
+        manager, refresher = _make_refresher({"a.json": stale}, active_window=0)
+
+        async def failing_refresh(credential_data, filename, is_antigravity=False):
+            return None
+
+        manager._refresh_token = failing_refresh
+
+        refresher.schedule("a.json", stale)
+        refresher._dispatch_due(time.time())
+        await asyncio.gather(*refresher._tasks)
+
+        assert refresher.stats.proactive_failures == 1
+        assert refresher.next_due_at() == pytest.approx(time.time() + refresher.retry_seconds, abs=2)
+
+    async def test_request_path_refresh_is_counted(self):
+        stale = {"access_token": "old", "refresh_token": "r", "expiry": "2000-01-01T00:00:00+00:00"}
+        backend = SimpleNamespace()
+
+        async def get_next_available_credential(is_antigravity=False, model_key=None):
+            return "a.json", dict(stale)
+
+        backend.get_next_available_credential = get_next_available_credential
+        manager = CredentialManager()
+        manager._storage_adapter = SimpleNamespace(_backend=backend)
+        manager._initialized = True
+        refresher = TokenRefresher(manager)
+        manager._token_refresher = refresher
+
+        async def fake_refresh(credential_data, filename, is_antigravity=False):
+            return {**credential_data, "expiry": _expiry_in(3600)}
+
+        manager._refresh_token = fake_refresh
+
+        await manager.get_valid_credential()
+        stats = refresher.get_stats()
+        assert stats["request_path_refreshes"] == 1
+        assert stats["proactive_ratio"] == 0.0
@@ -96,6 +96,14 @@ async def lifespan(app: FastAPI):
     # [END PHASE 2 DUAL_WRITE]
     # ================================================================
 
+    # 连接预热：为 antigravity BaseURL 与网关后端保持热连接
+    try:
+        from src.connection_prewarmer import get_connection_prewarmer, is_connection_prewarm_enabled
+        if is_connection_prewarm_enabled():
+            await get_connection_prewarmer().start()
+    except Exception as e:
+        log.error(f"连接预热启动失败: {e}")
+
     # OAuth回调服务器将在需要时按需启动
 
     yield
@@ -118,6 +126,35 @@ async def lifespan(app: FastAPI):
         except Exception as e:
             log.error(f"关闭凭证管理器时出错: {e}")
 
+    # 停止连接预热（在关闭连接池之前）
+    try:
+        from src.connection_prewarmer import get_connection_prewarmer
+        await get_connection_prewarmer().stop()
+    except Exception as e:
+        log.error(f"停止连接预热时出错: {e}")
+
+    # 关闭共享 HTTP 客户端连接池
+    try:
+        from src.httpx_client import http_client
+        await http_client.close_all()
+    except Exception as e:
+        log.error(f"关闭 HTTP 客户端连接池时出错: {e}")
+
+    # 关闭网关各后端的长连接客户端
+    try:
+        from src.gateway.backend_pool import get_backend_client_pool
+        await get_backend_client_pool().close_all()
+    except Exception as e:
+        log.error(f"关闭网关后端连接池时出错: {e}")
+
+    # 最后关闭存储适配器（释放持久化数据库连接）
+    try:
+        from src.storage_adapter import close_storage_adapter
+        await close_storage_adapter()
+        log.info("存储适配器已关闭")
+    except Exception as e:
+        log.error(f"关闭存储适配器时出错: {e}")
+
     log.info("GCLI2API 主服务已停止")
 
 